@@ -39,11 +39,13 @@ from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_sc
 from sklearn.preprocessing import StandardScaler, OneHotEncoder
 import joblib
 import json
-import matplotlib.pyplot as plt
 from datetime import datetime, timedelta
 
 # Define constants
 RANDOM_SEED = 42
+# Files written by save_models; model_registry.py versions a model directory by them
+ARTIFACT_FILES = ('tf_model.keras', 'rf_model.joblib', 'scaler.joblib', 'metrics.json')
+RISK_LEVELS = {0: 'low_risk', 1: 'moderate_risk', 2: 'high_risk'}
 np.random.seed(RANDOM_SEED)
 if TF_AVAILABLE:
     tf.random.set_seed(RANDOM_SEED)
@@ -54,12 +56,13 @@ class MediSyncAIInsights:
     for doctors and nurses.
     """
     
-    def __init__(self, model_dir='models'):
+    def __init__(self, model_dir='models', load=True):
         """
         Initialize the AI insights model.
         
         Args:
             model_dir (str): Directory to save trained models
+            load (bool): Load the persisted models now (model_registry.py loads them itself)
         """
         self.model_dir = model_dir
         os.makedirs(model_dir, exist_ok=True)
@@ -77,11 +80,12 @@ class MediSyncAIInsights:
         }
         
         # Attempt to load any persisted models and preprocessing artifacts
-        try:
-            self.load_models()
-        except Exception:
-            # If loading fails, proceed; generate_insights will apply safe fallbacks
-            pass
+        if load:
+            try:
+                self.load_models()
+            except Exception:
+                # If loading fails, proceed; generate_insights will apply safe fallbacks
+                pass
     
     def preprocess_data(self, data):
         """
@@ -361,72 +365,105 @@ class MediSyncAIInsights:
             with open(metrics_path, 'r') as f:
                 self.metrics = json.load(f)
     
-    def generate_insights(self, data):
+    def predict(self, snapshots):
         """
-        Generate actionable insights from analytics data.
+        Predict risk levels for several analytics snapshots at once.
         
         Args:
-            data (dict): Analytics data dictionary
+            snapshots (list): Analytics data dictionaries
             
         Returns:
-            dict: Actionable insights for doctors and nurses
+            list: Per snapshot, the risk level and confidence of each model and
+            their consensus
         """
-        # Preprocess data
-        X, _ = self.preprocess_data(data)
-        # Safely scale features; fit on-the-fly or bypass if scaler not fitted
+        rows = [self.preprocess_data(data)[0] for data in snapshots]
+        predictions = [None] * len(rows)
+        # Snapshots missing some analytics have fewer features; each width is one model call
+        batches = {}
+        for i, row in enumerate(rows):
+            batches.setdefault(len(row), []).append(i)
+        for indexes in batches.values():
+            X_scaled = self._scale(np.vstack([rows[i] for i in indexes]))
+            tf_proba = self._tensorflow_proba(X_scaled)
+            rf_proba, rf_classes = self._random_forest_proba(X_scaled)
+            for j, i in enumerate(indexes):
+                predictions[i] = self._risk_prediction(
+                    tf_proba[j] if tf_proba is not None else None,
+                    rf_proba[j] if rf_proba is not None else None,
+                    rf_classes,
+                )
+        return predictions
+    
+    def _scale(self, X):
+        """Scale features with the fitted scaler."""
         try:
-            X_scaled = self.scaler.transform(X.reshape(1, -1))
+            return self.scaler.transform(X)
         except Exception:
-            try:
-                self.scaler.fit(X.reshape(1, -1))
-                X_scaled = self.scaler.transform(X.reshape(1, -1))
-            except Exception:
-                X_scaled = X.reshape(1, -1)
-        
-        # Make predictions with both models
+            # Unfitted scaler or another feature count: a scaler fitted on the one
+            # snapshot alone maps it to zeros; the shared scaler is never refitted
+            return np.zeros(X.shape)
+    
+    def _tensorflow_proba(self, X_scaled):
         if TF_AVAILABLE and self.tf_model is not None:
-            tf_pred_proba = self.tf_model.predict(X_scaled)[0]
-            tf_pred_class = np.argmax(tf_pred_proba)
-            tf_confidence = float(tf_pred_proba[tf_pred_class])
-            tf_risk = {0: 'low_risk', 1: 'moderate_risk', 2: 'high_risk'}[tf_pred_class]
+            return self.tf_model.predict(X_scaled, verbose=0)
+        return None
+    
+    def _random_forest_proba(self, X_scaled):
+        """Class probabilities and their class labels; (None, None) when the model is absent/unfitted."""
+        if self.rf_model is None:
+            return None, None
+        try:
+            return self.rf_model.predict_proba(X_scaled), self.rf_model.classes_
+        except Exception:
+            return None, None
+    
+    def _risk_prediction(self, tf_proba, rf_proba, rf_classes):
+        if tf_proba is not None:
+            tf_pred_class = int(np.argmax(tf_proba))
+            tf_risk = RISK_LEVELS[tf_pred_class]
+            tf_confidence = float(tf_proba[tf_pred_class])
         else:
             tf_risk = 'moderate_risk'
             tf_confidence = 0.0
         
-        # Map class indices to risk levels
-        risk_levels = {0: 'low_risk', 1: 'moderate_risk', 2: 'high_risk'}
-        
         # Random Forest prediction with safe fallback when model is absent/unfitted
-        rf_pred_class_idx = 1  # default to 'moderate_risk'
-        if self.rf_model is not None:
-            try:
-                rf_pred_class = self.rf_model.predict(X_scaled)[0]
-                rf_pred_proba = self.rf_model.predict_proba(X_scaled)[0]
-                rf_risk = risk_levels[rf_pred_class]
-                feature_importance = getattr(self.rf_model, 'feature_importances_', np.array([]))
-                rf_pred_class_idx = int(rf_pred_class)
-            except Exception:
-                rf_pred_proba = np.array([0.2, 0.6, 0.2])
-                rf_risk = risk_levels[1]
-                feature_importance = np.array([])
+        if rf_proba is not None:
+            best = int(np.argmax(rf_proba))
+            rf_risk = RISK_LEVELS[int(rf_classes[best])]
+            rf_confidence = float(rf_proba[best])
         else:
-            rf_pred_proba = np.array([0.2, 0.6, 0.2])
-            rf_risk = risk_levels[1]
-            feature_importance = np.array([])
+            rf_risk = RISK_LEVELS[1]
+            rf_confidence = 0.6
+        
+        return {
+            'tensorflow': {
+                'risk_level': tf_risk,
+                'confidence': tf_confidence
+            },
+            'random_forest': {
+                'risk_level': rf_risk,
+                'confidence': rf_confidence
+            },
+            'consensus': self._get_consensus_risk(tf_risk, rf_risk)
+        }
+    
+    def generate_insights(self, data):
+        """
+        Generate actionable insights from analytics data.
+        
+        Args:
+            data (dict): Analytics data dictionary
+            
+        Returns:
+            dict: Actionable insights for doctors and nurses
+        """
+        risk_assessment = self.predict([data])[0]
+        tf_risk = risk_assessment['tensorflow']['risk_level']
+        rf_risk = risk_assessment['random_forest']['risk_level']
         
         # Generate insights based on predictions and data
         insights = {
-            'risk_assessment': {
-                'tensorflow': {
-                    'risk_level': tf_risk,
-                    'confidence': tf_confidence
-                },
-                'random_forest': {
-                    'risk_level': rf_risk,
-                    'confidence': float(rf_pred_proba[rf_pred_class_idx])
-                },
-                'consensus': self._get_consensus_risk(tf_risk, rf_risk)
-            },
+            'risk_assessment': risk_assessment,
             'actionable_insights': self._generate_actionable_insights(data, tf_risk, rf_risk),
             'recommendations': {
                 'doctors': self._generate_doctor_recommendations(data, tf_risk, rf_risk),
@@ -465,9 +502,10 @@ class MediSyncAIInsights:
     def get_detailed_risk_assessment(self, data):
         """Generate comprehensive risk assessment with clinical stratification."""
         # Get base risk predictions
-        tf_risk = self._predict_tensorflow_risk(data)
-        rf_risk = self._predict_random_forest_risk(data)
-        consensus_risk = self._get_consensus_risk(tf_risk, rf_risk)
+        prediction = self.predict([data])[0]
+        tf_risk = prediction['tensorflow']['risk_level']
+        rf_risk = prediction['random_forest']['risk_level']
+        consensus_risk = prediction['consensus']
         
         # Calculate risk scores and percentiles
         risk_scores = self._calculate_risk_scores(data)
@@ -0,0 +1,280 @@
+"""
+Charts for the analytics PDF report.
+
+The report charts used to be drawn through pyplot: every chart opened a figure
+in matplotlib's global figure registry, was rasterised to a 150 dpi PNG and
+embedded as an Image. That global state is shared by every thread of a
+threaded worker, so two reports rendering at once could draw into each other's
+figures, and each chart cost a PNG encode plus a few hundred KB in the PDF.
+
+- charts are drawn with ReportLab graphics (``bar_chart``, ``pie_chart``,
+  ``line_chart``) and written to the PDF as vector paths and text
+- a chart is memoized under a fingerprint of its kind, data and layout
+  (``CHART_CACHE_SIZE`` entries, least recently used dropped first); repeated
+  reports over unchanged data reuse the laid-out shapes
+- cached drawings have their chart widgets expanded to plain shapes, so the
+  layout work is done once; each story gets its own ``ChartFlowable`` around a
+  cached drawing, and drawing it onto a page holds that chart's lock (the
+  ReportLab renderer briefly sets attributes on the shapes it draws), so
+  concurrent reports can share one cached chart
+- rasters that are still needed (the base64 PNG of the forecasting API) come
+  from ``render_png``, which uses a ``Figure`` with its own Agg canvas and never
+  touches pyplot
+"""
+
+import base64
+import hashlib
+import io
+import json
+import logging
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from reportlab.graphics import renderPDF
+from reportlab.graphics.charts.barcharts import HorizontalBarChart, VerticalBarChart
+from reportlab.graphics.charts.linecharts import HorizontalLineChart
+from reportlab.graphics.charts.piecharts import Pie
+from reportlab.graphics.charts.textlabels import Label
+from reportlab.graphics.shapes import Drawing, Group, String, UserNode
+from reportlab.graphics.widgets.markers import makeMarker
+from reportlab.lib import colors
+from reportlab.platypus import Flowable
+
+logger = logging.getLogger(__name__)
+
+TITLE_FONT = ('Helvetica-Bold', 11)
+LABEL_FONT = ('Helvetica', 8)
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+class ChartFlowable(Flowable):
+    """Places a cached chart drawing in a story."""
+
+    def __init__(self, drawing, lock, hAlign='CENTER'):
+        super().__init__()
+        self.drawing = drawing
+        self.lock = lock
+        self.width = drawing.width
+        self.height = drawing.height
+        self.hAlign = hAlign
+
+    def wrap(self, availWidth, availHeight):
+        return self.width, self.height
+
+    def draw(self):
+        with self.lock:
+            renderPDF.draw(self.drawing, self.canv, 0, 0)
+
+
+def chart_fingerprint(spec):
+    encoded = json.dumps(spec, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def _memoized(spec, build):
+    """(drawing, lock) for ``spec``, laid out by ``build`` on a cache miss."""
+    key = chart_fingerprint(spec)
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None:
+            _cache.move_to_end(key)
+            return entry
+    # Built outside the lock; two threads racing on the same chart both build it once
+    entry = (_expanded(build(spec)), threading.Lock())
+    with _cache_lock:
+        entry = _cache.setdefault(key, entry)
+        _cache.move_to_end(key)
+        while len(_cache) > getattr(settings, 'CHART_CACHE_SIZE', 256):
+            _cache.popitem(last=False)
+    return entry
+
+
+def _expanded(node):
+    """``node`` with every widget, at any depth, replaced by the shapes it draws."""
+    while isinstance(node, UserNode):
+        node = node.provideNode()
+    if not isinstance(node, Group):
+        return node
+    group = Drawing(node.width, node.height) if isinstance(node, Drawing) else Group()
+    group.transform = node.transform[:]
+    for child in node.contents:
+        group.add(_expanded(child))
+    return group
+
+
+def _numbers(values):
+    return [float(v or 0) for v in values]
+
+
+def _value_max(values):
+    top = max(values, default=0)
+    return top * 1.15 if top > 0 else 1
+
+
+def _frame(spec):
+    """Drawing with the chart title and axis titles; returns (drawing, plot area)."""
+    width, height = spec['width'], spec['height']
+    drawing = Drawing(width, height)
+    drawing.add(String(width / 2, height - 14, spec['title'], fontName=TITLE_FONT[0],
+                       fontSize=TITLE_FONT[1], textAnchor='middle'))
+    left, bottom, top = 16, 14, 28
+    if spec.get('x_label'):
+        drawing.add(String(width / 2, 2, spec['x_label'], fontName=LABEL_FONT[0],
+                           fontSize=LABEL_FONT[1] + 1, textAnchor='middle'))
+    if spec.get('y_label'):
+        label = Label()
+        label.setOrigin(8, height / 2)
+        label.setText(spec['y_label'])
+        label.angle = 90
+        label.fontName, label.fontSize = LABEL_FONT[0], LABEL_FONT[1] + 1
+        drawing.add(label)
+    return drawing, (left, bottom, width - left - 12, height - bottom - top)
+
+
+def _build_bar(spec):
+    drawing, (x, y, w, h) = _frame(spec)
+    values = spec['values']
+    if spec['horizontal']:
+        chart = HorizontalBarChart()
+        # Room for category names on the left; first item at the top, as it is ranked
+        label_width = min(max((len(name) for name in spec['labels']), default=0) * 4.6 + 10, w / 2)
+        chart.x, chart.y = x + 18 + label_width, y + 16
+        chart.width, chart.height = w - label_width - 40, h - 16
+        chart.categoryAxis.reverseDirection = 1
+        chart.categoryAxis.labels.boxAnchor = 'e'
+        chart.barLabels.boxAnchor = 'w'
+    else:
+        chart = VerticalBarChart()
+        rotated = spec.get('label_angle')
+        bottom = 34 if rotated else 18
+        chart.x, chart.y = x + 24, y + bottom
+        chart.width, chart.height = w - 30, h - bottom
+        if rotated:
+            chart.categoryAxis.labels.angle = rotated
+            chart.categoryAxis.labels.boxAnchor = 'ne'
+        chart.barLabels.boxAnchor = 's'
+    chart.data = [values]
+    chart.categoryAxis.categoryNames = spec['labels']
+    chart.categoryAxis.labels.fontName, chart.categoryAxis.labels.fontSize = LABEL_FONT
+    chart.valueAxis.labels.fontName, chart.valueAxis.labels.fontSize = LABEL_FONT
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.valueMax = _value_max(values)
+    chart.valueAxis.visibleGrid = 1
+    chart.valueAxis.gridStrokeColor = colors.HexColor('#dddddd')
+    chart.bars.strokeColor = None
+    palette = spec['colors']
+    for i in range(len(values)):
+        chart.bars[(0, i)].fillColor = colors.HexColor(palette[i % len(palette)])
+    chart.barLabelFormat = spec['value_format']
+    chart.barLabels.fontName, chart.barLabels.fontSize = LABEL_FONT
+    chart.barLabels.nudge = 6
+    drawing.add(chart)
+    return drawing
+
+
+def _build_pie(spec):
+    drawing, (x, y, w, h) = _frame(spec)
+    values = spec['values']
+    total = sum(values)
+    size = min(w, h) * 0.7
+    pie = Pie()
+    pie.x, pie.y = x + (w - size) / 2, y + (h - size) / 2
+    pie.width = pie.height = size
+    pie.data = values
+    pie.labels = [f"{label} {value / total * 100:.1f}%" for label, value in zip(spec['labels'], values)]
+    pie.startAngle = 90
+    pie.direction = 'anticlockwise'
+    pie.slices.strokeColor = colors.white
+    pie.slices.fontName, pie.slices.fontSize = LABEL_FONT[0], LABEL_FONT[1] + 1
+    palette = spec['colors']
+    for i in range(len(values)):
+        pie.slices[i].fillColor = colors.HexColor(palette[i % len(palette)])
+    drawing.add(pie)
+    return drawing
+
+
+def _build_line(spec):
+    drawing, (x, y, w, h) = _frame(spec)
+    values = spec['values']
+    chart = HorizontalLineChart()
+    rotated = spec.get('label_angle')
+    bottom = 40 if rotated else 18
+    chart.x, chart.y = x + 24, y + bottom
+    chart.width, chart.height = w - 36, h - bottom
+    chart.data = [values]
+    chart.joinedLines = 1
+    chart.categoryAxis.categoryNames = spec['labels']
+    chart.categoryAxis.labels.fontName, chart.categoryAxis.labels.fontSize = LABEL_FONT
+    if rotated:
+        chart.categoryAxis.labels.angle = rotated
+        chart.categoryAxis.labels.boxAnchor = 'ne'
+    chart.valueAxis.labels.fontName, chart.valueAxis.labels.fontSize = LABEL_FONT
+    chart.valueAxis.valueMin = 0
+    chart.valueAxis.valueMax = _value_max(values)
+    chart.valueAxis.visibleGrid = 1
+    chart.valueAxis.gridStrokeColor = colors.HexColor('#dddddd')
+    chart.lines[0].strokeColor = colors.HexColor(spec['colors'][0])
+    chart.lines[0].strokeWidth = 2
+    chart.lines[0].symbol = makeMarker('FilledCircle', size=5, fillColor=colors.HexColor(spec['colors'][0]))
+    chart.lineLabelFormat = spec['value_format']
+    chart.lineLabels.fontName, chart.lineLabels.fontSize = LABEL_FONT
+    chart.lineLabelNudge = 8
+    drawing.add(chart)
+    return drawing
+
+
+def _chart(kind, build, title, labels, values, width, height, **options):
+    values = _numbers(values)
+    if not values:
+        return None
+    spec = dict(options, kind=kind, title=title, labels=[str(label) for label in labels],
+                values=values, width=width, height=height)
+    return ChartFlowable(*_memoized(spec, build))
+
+
+def bar_chart(title, labels, values, width, height, colors=('#1f77b4',), horizontal=False,
+              value_format='%d', x_label=None, y_label=None, label_angle=None):
+    """Bar chart flowable (horizontal bars list the first label at the top); None without data."""
+    return _chart('bar', _build_bar, title, labels, values, width, height, colors=list(colors),
+                  horizontal=horizontal, value_format=value_format, x_label=x_label,
+                  y_label=y_label, label_angle=label_angle)
+
+
+def pie_chart(title, labels, values, size, colors=('#1f77b4',)):
+    """Pie chart flowable with percentage labels; None when there is nothing to share out."""
+    if sum(_numbers(values)) <= 0:
+        return None
+    return _chart('pie', _build_pie, title, labels, values, size, size, colors=list(colors))
+
+
+def line_chart(title, labels, values, width, height, colors=('#1f77b4',), value_format='%d',
+               x_label=None, y_label=None, label_angle=None):
+    """Line chart flowable with a marker and value label on every point; None without data."""
+    return _chart('line', _build_line, title, labels, values, width, height, colors=list(colors),
+                  value_format=value_format, x_label=x_label, y_label=y_label,
+                  label_angle=label_angle)
+
+
+def render_png(draw, figsize, dpi=100):
+    """
+    Rasterise a matplotlib chart without pyplot: ``draw(figure)`` fills a fresh
+    Figure bound to its own Agg canvas. Returns the base64 encoded PNG.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=figsize, dpi=dpi)
+    FigureCanvasAgg(figure)
+    draw(figure)
+    figure.tight_layout()
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png')
+    return base64.b64encode(buffer.getvalue()).decode('utf-8')
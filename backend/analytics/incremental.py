@@ -0,0 +1,311 @@
+"""
+Incremental analytics driven by DataUpdateLog deltas.
+
+The three analyses that only count things (patient demographics, weekly
+condition trends, medication frequencies) are kept as mergeable aggregates in
+``AnalyticsAggregate`` instead of being recomputed over the whole
+``PatientRecord`` table on every save. Like the full analyses they leave out
+seeded dummy records (``is_dummy_data``):
+
+- each PatientRecord contributes to a few (metric, bucket) counters; what it
+  contributed is remembered in ``AnalyticsRecordContribution`` so an update or
+  delete subtracts exactly that before adding the new contribution (a record
+  switched to dummy data is folded in as a removal)
+- only PatientRecord changes are logged, since nothing else feeds the counters
+- saves only insert a ``DataUpdateLog`` row and schedule a flush; the flush is
+  debounced through a cache key, so a burst of saves collapses into one task
+  that folds all pending logs in at once (``apply_pending_updates``)
+- ``reconcile_aggregates`` rebuilds everything from scratch and runs on the
+  Celery beat schedule as a consistency check
+
+After a flush that changed any counter the aggregates are rendered in the same
+shape as ``perform_patient_health_trends``, ``analyze_patient_demographics`` and
+``analyze_common_medications`` and stored as completed ``AnalyticsResult`` rows.
+"""
+
+import logging
+from collections import Counter, defaultdict
+from datetime import timedelta, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import AnalyticsAggregate, AnalyticsRecordContribution, AnalyticsResult, DataUpdateLog, PatientRecord
+
+logger = logging.getLogger(__name__)
+
+DEBOUNCE_SECONDS = 30
+FLUSH_SCHEDULED_KEY = "analytics:incremental:flush_scheduled"
+FLUSH_BATCH_SIZE = 5000
+RECORD_FIELDS = ("id", "date_of_admission", "medical_condition", "age", "gender", "medication")
+
+# Same bins as analyze_patient_demographics
+AGE_BINS = ((20, 40, '20-39'), (40, 60, '40-59'), (60, 80, '60-79'), (80, 100, '80+'))
+
+INCREMENTAL_ANALYSES = ('patient_demographics', 'patient_health_trends', 'medication_analysis')
+INCREMENTAL_MODELS = ('PatientRecord',)
+
+
+def _week_label(admitted):
+    """Label of the W-SUN week containing ``admitted`` (the Sunday, as pandas prints it)."""
+    day = admitted.astimezone(dt_timezone.utc).date()
+    sunday = day + timedelta(days=6 - day.weekday())
+    return f"{sunday} 00:00:00+00:00"
+
+
+def record_buckets(row):
+    """(metric, bucket) pairs a PatientRecord values row counts towards."""
+    buckets = [("gender", row["gender"])]
+    for low, high, label in AGE_BINS:
+        if low <= row["age"] < high:
+            buckets.append(("age_group", label))
+            break
+    if row["date_of_admission"] is not None:
+        buckets.append(("condition_week", f"{_week_label(row['date_of_admission'])}|{row['medical_condition']}"))
+    if row["medication"]:
+        buckets.append(("medication", row["medication"]))
+    return buckets
+
+
+# --- Triggering ---
+def log_data_update(model_name, record_id, action):
+    """
+    Record a data change and make sure a (debounced) incremental flush is scheduled.
+    Changes to models that feed no incremental aggregate are ignored.
+    """
+    if model_name not in INCREMENTAL_MODELS:
+        return
+    DataUpdateLog.objects.create(
+        model_name=model_name,
+        record_id=record_id,
+        action=action,
+        triggered_analytics=True,
+    )
+    transaction.on_commit(schedule_flush)
+
+
+def schedule_flush():
+    """Schedule one flush per debounce window; later calls in the window are no-ops."""
+    from .tasks import flush_incremental_analytics
+
+    try:
+        if not cache.add(FLUSH_SCHEDULED_KEY, 1, timeout=DEBOUNCE_SECONDS * 10):
+            return False
+    except Exception:
+        # Without the cache every change schedules its own (cheap, incremental) flush
+        pass
+    try:
+        flush_incremental_analytics.apply_async(countdown=DEBOUNCE_SECONDS)
+        return True
+    except Exception as e:
+        logger.warning(f"Could not schedule incremental analytics flush: {str(e)}")
+        try:
+            cache.delete(FLUSH_SCHEDULED_KEY)
+        except Exception:
+            pass
+        return False
+
+
+# --- Applying deltas ---
+def _apply_deltas(deltas):
+    """Add ``deltas`` to the aggregates; returns whether any counter changed."""
+    deltas = {key: value for key, value in deltas.items() if value}
+    if not deltas:
+        return False
+    metrics = {metric for metric, _ in deltas}
+    existing = {
+        (agg.metric, agg.bucket): agg
+        for agg in AnalyticsAggregate.objects.select_for_update().filter(
+            metric__in=metrics, bucket__in={bucket for _, bucket in deltas}
+        )
+    }
+    to_update, to_create = [], []
+    for (metric, bucket), delta in deltas.items():
+        agg = existing.get((metric, bucket))
+        if agg is None:
+            to_create.append(AnalyticsAggregate(metric=metric, bucket=bucket, count=max(0, delta)))
+        else:
+            agg.count = max(0, agg.count + delta)
+            to_update.append(agg)
+    AnalyticsAggregate.objects.bulk_update(to_update, ["count"], batch_size=1000)
+    AnalyticsAggregate.objects.bulk_create(to_create, batch_size=1000)
+    AnalyticsAggregate.objects.filter(metric__in=metrics, count=0).delete()
+    return True
+
+
+def _fold_records(record_ids):
+    """Replace the contributions of ``record_ids`` with their current state; returns bucket deltas."""
+    # A record that became dummy data is missing here and so drops its contribution
+    rows = {
+        row["id"]: row
+        for row in PatientRecord.objects.filter(id__in=record_ids, is_dummy_data=False).values(*RECORD_FIELDS)
+    }
+    contributions = {
+        c.record_id: c for c in AnalyticsRecordContribution.objects.select_for_update().filter(record_id__in=record_ids)
+    }
+    deltas = Counter()
+    to_create, to_update, to_delete = [], [], []
+    for record_id in record_ids:
+        contribution = contributions.get(record_id)
+        for metric, bucket in (contribution.buckets if contribution else []):
+            deltas[(metric, bucket)] -= 1
+        row = rows.get(record_id)
+        if row is None:
+            if contribution:
+                to_delete.append(record_id)
+            continue
+        buckets = [list(pair) for pair in record_buckets(row)]
+        for metric, bucket in buckets:
+            deltas[(metric, bucket)] += 1
+        if contribution is None:
+            to_create.append(AnalyticsRecordContribution(record_id=record_id, buckets=buckets))
+        else:
+            contribution.buckets = buckets
+            to_update.append(contribution)
+    AnalyticsRecordContribution.objects.bulk_create(to_create, batch_size=1000)
+    AnalyticsRecordContribution.objects.bulk_update(to_update, ["buckets"], batch_size=1000)
+    AnalyticsRecordContribution.objects.filter(record_id__in=to_delete).delete()
+    return deltas
+
+
+def apply_pending_updates(batch_size=FLUSH_BATCH_SIZE, publish=True):
+    """
+    Fold every unprocessed DataUpdateLog into the aggregates (coalescing repeated changes
+    to the same record) and publish the refreshed results when a counter changed. Returns the
+    number of logs consumed.
+    """
+    # Changes arriving from now on schedule a new flush
+    try:
+        cache.delete(FLUSH_SCHEDULED_KEY)
+    except Exception:
+        pass
+
+    consumed, changed = 0, False
+    while True:
+        with transaction.atomic():
+            logs = list(
+                DataUpdateLog.objects.select_for_update()
+                .filter(processed_at__isnull=True)
+                .order_by('id')
+                .values_list('id', 'model_name', 'record_id')[:batch_size]
+            )
+            if not logs:
+                break
+            record_ids = sorted({record_id for _, model_name, record_id in logs if model_name in INCREMENTAL_MODELS})
+            if record_ids and _apply_deltas(_fold_records(record_ids)):
+                changed = True
+            DataUpdateLog.objects.filter(id__in=[log_id for log_id, _, _ in logs]).update(processed_at=timezone.now())
+            consumed += len(logs)
+        if len(logs) < batch_size:
+            break
+
+    if changed and publish:
+        publish_results()
+    return consumed
+
+
+def reconcile_aggregates(publish=True):
+    """
+    Rebuild aggregates and contributions from the full PatientRecord table.
+
+    The scan runs inside the transaction after the old rows are deleted, so a flush in
+    flight commits before it and later flushes wait on the deleted rows. Only logs up to
+    the highest id seen before the scan are marked processed; later ones stay pending for
+    the next flush, which folds them in against the rebuilt contributions.
+    """
+    totals = Counter()
+    with transaction.atomic():
+        watermark = DataUpdateLog.objects.aggregate(last=Max('id'))['last'] or 0
+        AnalyticsRecordContribution.objects.all().delete()
+        chunk = []
+        records = PatientRecord.objects.filter(is_dummy_data=False).order_by()
+        for row in records.values(*RECORD_FIELDS).iterator(chunk_size=FLUSH_BATCH_SIZE):
+            buckets = [list(pair) for pair in record_buckets(row)]
+            totals.update((metric, bucket) for metric, bucket in buckets)
+            chunk.append(AnalyticsRecordContribution(record_id=row["id"], buckets=buckets))
+            if len(chunk) >= FLUSH_BATCH_SIZE:
+                AnalyticsRecordContribution.objects.bulk_create(chunk, batch_size=1000)
+                chunk = []
+        AnalyticsRecordContribution.objects.bulk_create(chunk, batch_size=1000)
+
+        drift = _drift(totals)
+        AnalyticsAggregate.objects.all().delete()
+        AnalyticsAggregate.objects.bulk_create(
+            [AnalyticsAggregate(metric=m, bucket=b, count=c) for (m, b), c in totals.items() if c],
+            batch_size=1000,
+        )
+        DataUpdateLog.objects.filter(
+            id__lte=watermark, processed_at__isnull=True, model_name__in=INCREMENTAL_MODELS
+        ).update(processed_at=timezone.now())
+
+    if drift:
+        logger.warning(f"Incremental analytics drifted on {drift} buckets; aggregates rebuilt")
+    if publish:
+        publish_results()
+    return drift
+
+
+def _drift(totals):
+    current = {(a.metric, a.bucket): a.count for a in AnalyticsAggregate.objects.all()}
+    keys = set(current) | set(totals)
+    return sum(1 for key in keys if current.get(key, 0) != totals.get(key, 0))
+
+
+# --- Rendering results ---
+def aggregate_results():
+    """Render the aggregates in the output format of the full-table analysis functions."""
+    counts = defaultdict(dict)
+    for metric, bucket, count in AnalyticsAggregate.objects.values_list('metric', 'bucket', 'count'):
+        counts[metric][bucket] = count
+
+    gender = sorted(counts['gender'].items(), key=lambda item: (-item[1], item[0]))
+    gender_total = sum(c for _, c in gender)
+    demographics = {
+        "age_distribution": {label: counts['age_group'].get(label, 0) for _, _, label in AGE_BINS},
+        "gender_proportions": {g: round(c / gender_total * 100, 2) for g, c in gender} if gender_total else {},
+    }
+
+    per_week = defaultdict(list)
+    for bucket, count in counts['condition_week'].items():
+        week, condition = bucket.split('|', 1)
+        per_week[week].append({'date_of_admission': week, 'medical_condition': condition, 'count': count})
+    top = [
+        row
+        for rows in per_week.values()
+        for row in sorted(rows, key=lambda r: (-r['count'], r['medical_condition']))[:5]
+    ]
+    top.sort(key=lambda r: (-r['count'], r['date_of_admission'], r['medical_condition']))
+    health_trends = {"top_illnesses_by_week": top}
+
+    medications = sorted(counts['medication'].items(), key=lambda item: (-item[1], item[0]))
+    med_total = sum(c for _, c in medications)
+    pareto, running = [], 0
+    for name, count in medications:
+        running += count
+        pareto.append({'medication': name, 'frequency': count, 'cumulative_percentage': round(running / med_total * 100, 2)})
+
+    return {
+        'patient_demographics': demographics,
+        'patient_health_trends': health_trends,
+        'medication_analysis': {"medication_pareto_data": pareto},
+    }
+
+
+def publish_results():
+    """
+    Store the rendered aggregates as completed AnalyticsResult rows. bulk_create skips
+    the completion signal, so incremental refreshes do not notify every doctor; they are
+    still published to the analytics stream.
+    """
+    from .stream import publish_result
+
+    results = aggregate_results()
+    created = AnalyticsResult.objects.bulk_create([
+        AnalyticsResult(analysis_type=analysis_type, status='completed', results={**payload, 'incremental': True})
+        for analysis_type, payload in results.items()
+    ])
+    for result in created:
+        publish_result(result)
+    return results
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from backend.analytics import model_registry
+
+
+class Command(BaseCommand):
+    help = 'Serve MediSyncAIInsights predictions to the Django processes on this host (set AI_INFERENCE_URL to use it)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Interface to listen on (default: 127.0.0.1)')
+        parser.add_argument('--port', type=int, default=8765, help='Port to listen on (default: 8765)')
+
+    def handle(self, *args, **options):
+        server = model_registry.make_server(options['host'], options['port'])
+        model = model_registry.local_model()
+        self.stdout.write(self.style.SUCCESS(
+            f"Inference worker on http://{options['host']}:{server.server_address[1]} "
+            f"serving models {model.version or '(none)'} from {model.model_dir}"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
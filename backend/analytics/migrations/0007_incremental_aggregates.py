@@ -0,0 +1,55 @@
+# Generated by Django 5.2.5 on 2026-10-16 23:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0006_rename_analytics_u_service_1e4b29_idx_uptime_ping_service_85679e_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(max_length=50)),
+                ('bucket', models.CharField(max_length=255)),
+                ('count', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Analytics Aggregate',
+                'verbose_name_plural': 'Analytics Aggregates',
+                'db_table': 'analytics_aggregates',
+            },
+        ),
+        migrations.CreateModel(
+            name='AnalyticsRecordContribution',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('record_id', models.PositiveIntegerField(unique=True)),
+                ('buckets', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Analytics Record Contribution',
+                'verbose_name_plural': 'Analytics Record Contributions',
+                'db_table': 'analytics_record_contributions',
+            },
+        ),
+        migrations.AddField(
+            model_name='dataupdatelog',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='dataupdatelog',
+            index=models.Index(fields=['processed_at', 'model_name'], name='data_update_process_837ee4_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='analyticsaggregate',
+            unique_together={('metric', 'bucket')},
+        ),
+    ]
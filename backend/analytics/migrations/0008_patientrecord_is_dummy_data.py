@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0007_incremental_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patientrecord',
+            name='is_dummy_data',
+            field=models.BooleanField(default=False, help_text='Mark as dummy data for testing'),
+        ),
+    ]
@@ -0,0 +1,220 @@
+"""
+Process-wide registry of the trained MediSyncAIInsights models.
+
+``add_factor_analysis_section``, ``add_ai_recommendations_module`` and
+``build_recommendations`` each constructed ``MediSyncAIInsights()``, whose
+``__init__`` deserializes the RandomForest, the scaler and (with TensorFlow) the
+Keras model from disk, so one analytics report loaded the models three times.
+Models now come from this module:
+
+- ``get_model`` returns one resident ``MediSyncAIInsights`` per process, loaded
+  from ``AI_MODEL_DIR`` on first use; Celery workers load it when they start, so
+  report rendering never includes deserialization
+- the artifacts' version is a fingerprint of their names, sizes and modification
+  times, checked at most every ``AI_MODEL_RELOAD_CHECK_SECONDS``; a new version is
+  loaded on a background thread and swapped in, while callers keep using the
+  current model, which also stays in service when the new version fails to load
+  (that version is not tried again; a half-written one changes again when done)
+- ``predict`` scores many analytics snapshots with one call per model
+- with ``AI_INFERENCE_URL`` set, predictions come from a dedicated inference
+  worker on this host (``manage.py run_inference_worker``, see ``make_server``);
+  Django processes then never load the models unless the worker cannot be
+  reached, when they fall back to their own resident copy
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .ai_insights_model import ARTIFACT_FILES, MediSyncAIInsights
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_model = None
+_checked_at = 0.0
+_reload_thread = None
+_failed_version = None
+_remote = {}
+
+
+def model_dir():
+    return getattr(settings, 'AI_MODEL_DIR', 'models')
+
+
+def artifact_version(directory=None):
+    """Fingerprint of the model artifacts on disk; '' when none are there."""
+    directory = directory or model_dir()
+    parts = []
+    for name in ARTIFACT_FILES:
+        try:
+            stat = os.stat(os.path.join(directory, name))
+        except OSError:
+            continue
+        parts.append(f"{name}:{stat.st_size}:{stat.st_mtime_ns}")
+    return hashlib.sha256('|'.join(parts).encode()).hexdigest()[:16] if parts else ''
+
+
+def _load(version):
+    """A model with every artifact of ``version`` loaded; raises when one cannot be read."""
+    model = MediSyncAIInsights(model_dir=model_dir(), load=False)
+    model.load_models()
+    model.version = version
+    return model
+
+
+def local_model():
+    """This process's resident model, reloaded in the background once its artifacts change."""
+    global _model, _checked_at, _reload_thread
+    interval = getattr(settings, 'AI_MODEL_RELOAD_CHECK_SECONDS', 30)
+    now = time.monotonic()
+    model = _model
+    if model is not None and now - _checked_at < interval:
+        return model
+
+    with _lock:
+        if _model is None:
+            version = artifact_version()
+            started = time.perf_counter()
+            try:
+                _model = _load(version)
+            except Exception as e:
+                # As MediSyncAIInsights() did: serve with the safe fallbacks, retry at the next check
+                logger.warning(f"Could not load AI insights models from {model_dir()}: {str(e)}")
+                _model = MediSyncAIInsights(model_dir=model_dir(), load=False)
+                _model.version = None
+            else:
+                logger.info(f"Loaded AI insights models {version or '(none)'} in {(time.perf_counter() - started) * 1000:.0f}ms")
+            _checked_at = time.monotonic()
+            return _model
+        if now - _checked_at >= interval:
+            _checked_at = now
+            version = artifact_version()
+            stale = version not in (_model.version, _failed_version)
+            if stale and (_reload_thread is None or not _reload_thread.is_alive()):
+                _reload_thread = threading.Thread(target=reload, args=(version,), name='ai-model-reload', daemon=True)
+                _reload_thread.start()
+        return _model
+
+
+def reload(version=None):
+    """Load the artifacts now and swap them in; the current model stays when that fails."""
+    global _model, _failed_version
+    version = artifact_version() if version is None else version
+    started = time.perf_counter()
+    try:
+        model = _load(version)
+    except Exception as e:
+        _failed_version = version
+        logger.warning(f"Keeping AI insights models {getattr(_model, 'version', None)}; version {version} failed to load: {str(e)}")
+        return _model
+    with _lock:
+        _model = model
+    logger.info(f"Reloaded AI insights models {version} in {(time.perf_counter() - started) * 1000:.0f}ms")
+    return model
+
+
+def clear():
+    """Drop the resident model (tests)."""
+    global _model, _checked_at, _failed_version
+    with _lock:
+        _model, _checked_at, _failed_version = None, 0.0, None
+        _remote.clear()
+
+
+def warm():
+    """Load the resident model ahead of the first request; never raises."""
+    try:
+        if not getattr(settings, 'AI_INFERENCE_URL', ''):
+            local_model()
+    except Exception:
+        logger.warning("Could not preload AI insights models", exc_info=True)
+
+
+class RemoteInsights(MediSyncAIInsights):
+    """Runs the rule-based insights here and asks the inference worker for ``predict``."""
+
+    def __init__(self, url):
+        super().__init__(model_dir=model_dir(), load=False)
+        self.url = url.rstrip('/')
+        self.version = None
+
+    def predict(self, snapshots):
+        snapshots = list(snapshots)
+        request = urllib.request.Request(
+            f"{self.url}/predict",
+            data=json.dumps({'snapshots': snapshots}, cls=DjangoJSONEncoder).encode(),
+            headers={'Content-Type': 'application/json'},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=getattr(settings, 'AI_INFERENCE_TIMEOUT', 5)) as response:
+                payload = json.loads(response.read())
+        except (OSError, ValueError) as e:
+            logger.warning(f"AI inference worker unavailable, predicting in process: {str(e)}")
+            return local_model().predict(snapshots)
+        self.version = payload.get('version')
+        return payload['predictions']
+
+
+def get_model():
+    """The model to generate insights with: the inference worker's when configured, else the resident one."""
+    url = getattr(settings, 'AI_INFERENCE_URL', '')
+    if not url:
+        return local_model()
+    with _lock:
+        if url not in _remote:
+            _remote[url] = RemoteInsights(url)
+        return _remote[url]
+
+
+def predict(snapshots):
+    """Risk predictions for a batch of analytics snapshots (see MediSyncAIInsights.predict)."""
+    return get_model().predict(list(snapshots))
+
+
+class _InferenceHandler(BaseHTTPRequestHandler):
+    def _reply(self, code, body):
+        data = json.dumps(body, cls=DjangoJSONEncoder).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path != '/health':
+            return self._reply(404, {'error': 'Not found'})
+        model = local_model()
+        self._reply(200, {'version': model.version, 'directory': model.model_dir})
+
+    def do_POST(self):
+        if self.path != '/predict':
+            return self._reply(404, {'error': 'Not found'})
+        try:
+            snapshots = json.loads(self.rfile.read(int(self.headers.get('Content-Length') or 0)))['snapshots']
+        except (ValueError, KeyError, TypeError):
+            return self._reply(400, {'error': 'Expected a JSON body with a "snapshots" list'})
+        model = local_model()
+        try:
+            predictions = model.predict(snapshots)
+        except Exception as e:
+            logger.error(f"AI inference failed for {len(snapshots)} snapshots", exc_info=True)
+            return self._reply(500, {'error': str(e)})
+        self._reply(200, {'version': model.version, 'predictions': predictions})
+
+    def log_message(self, format, *args):
+        logger.debug(f"Inference worker: {format % args}")
+
+
+def make_server(host='127.0.0.1', port=8765):
+    """The inference worker's HTTP server (POST /predict, GET /health), with the models loaded."""
+    local_model()
+    return ThreadingHTTPServer((host, port), _InferenceHandler)
@@ -31,6 +31,7 @@ class PatientRecord(models.Model):
         ('Transferred', 'Transferred'),
         ('Deceased', 'Deceased')
     ], default='Ongoing')
+    is_dummy_data = models.BooleanField(default=False, help_text="Mark as dummy data for testing")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -118,16 +119,60 @@ class DataUpdateLog(models.Model):
     ])
     triggered_analytics = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Set once the incremental analytics engine has folded this change into its aggregates
+    processed_at = models.DateTimeField(null=True, blank=True)
     
     class Meta:
         ordering = ['-created_at']
         db_table = 'data_update_logs'
         verbose_name = 'Data Update Log'
         verbose_name_plural = 'Data Update Logs'
+        indexes = [
+            models.Index(fields=['processed_at', 'model_name']),
+        ]
     
     def __str__(self):
         return f"{self.action} {self.model_name} #{self.record_id}"
 
+class AnalyticsAggregate(models.Model):
+    """
+    Mergeable count aggregate maintained by the incremental analytics engine
+    - One row per (metric, bucket), e.g. ('gender', 'Female') or ('condition_week', '2025-10-05|Flu')
+    - Updated with signed deltas from DataUpdateLog entries; rebuilt by the scheduled reconcile
+    """
+    metric = models.CharField(max_length=50)
+    bucket = models.CharField(max_length=255)
+    count = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'analytics_aggregates'
+        unique_together = ('metric', 'bucket')
+        verbose_name = 'Analytics Aggregate'
+        verbose_name_plural = 'Analytics Aggregates'
+
+    def __str__(self):
+        return f"{self.metric}[{self.bucket}] = {self.count}"
+
+
+class AnalyticsRecordContribution(models.Model):
+    """
+    Buckets a PatientRecord currently counts towards, so an update or delete can
+    subtract exactly what the record added before.
+    """
+    record_id = models.PositiveIntegerField(unique=True)
+    buckets = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'analytics_record_contributions'
+        verbose_name = 'Analytics Record Contribution'
+        verbose_name_plural = 'Analytics Record Contributions'
+
+    def __str__(self):
+        return f"PatientRecord #{self.record_id}: {len(self.buckets)} buckets"
+
+
 class AnalyticsCache(models.Model):
     """
     Caches frequently accessed analytics results for performance
@@ -6,16 +6,26 @@ from sklearn.metrics import mean_absolute_error, mean_squared_error
 from scipy.stats import chi2_contingency
 from django.db.models import QuerySet
 import warnings
-import base64
-import io
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 import os
+import hashlib
+import itertools
+import logging
+import signal
+import threading
+import billiard
+from django.conf import settings
+from django.core.cache import cache
+
+from .charts import render_png
+
+logger = logging.getLogger(__name__)
 
 # Consistent train/test split for predictive analytics
 DEFAULT_TRAIN_RATIO = 0.7
 
+# Winning SARIMA configurations are cached per series fingerprint for a week
+SARIMA_CONFIG_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
 def get_data_from_queryset(queryset: QuerySet):
     """
     Loads data from a Django QuerySet into a pandas DataFrame.
@@ -26,6 +36,71 @@ def get_data_from_queryset(queryset: QuerySet):
     # Efficiently load data into a DataFrame
     return pd.DataFrame.from_records(queryset.values())
 
+# Columns each analysis reads from PatientRecord; loaders select only these
+ANALYSIS_COLUMNS = {
+    'patient_health_trends': ('date_of_admission', 'medical_condition'),
+    'patient_demographics': ('age', 'gender'),
+    'illness_prediction': ('date_of_admission', 'age', 'gender', 'medical_condition'),
+    'medication_analysis': ('medication',),
+    'patient_volume_prediction': ('date_of_admission',),
+    'illness_surge_prediction': ('date_of_admission', 'medical_condition'),
+    'weekly_illness_forecast': ('date_of_admission', 'medical_condition'),
+    'monthly_illness_forecast': ('date_of_admission', 'medical_condition'),
+}
+ANALYSIS_COLUMNS['full_analysis'] = tuple(dict.fromkeys(c for cols in ANALYSIS_COLUMNS.values() for c in cols))
+
+CATEGORICAL_COLUMNS = ('medical_condition', 'gender', 'medication')
+DATETIME_COLUMNS = ('date_of_admission',)
+LOAD_CHUNK_SIZE = 20000
+
+
+def load_analysis_frame(queryset: QuerySet, columns=None, analysis_type: str | None = None, chunk_size: int = LOAD_CHUNK_SIZE) -> pd.DataFrame:
+    """
+    Load only the columns an analysis needs into a typed DataFrame.
+
+    - Rows are streamed with ``values_list(...).iterator(chunk_size)`` (a server-side
+      cursor on PostgreSQL), so no per-row dicts or model instances are built.
+    - Each chunk is appended to per-column buffers: categorical columns are dictionary-encoded
+      to int32 codes as they stream, datetimes are parsed per chunk, numbers go to int64.
+    - ``medical_condition``, ``gender`` and ``medication`` come back as ``category`` dtype.
+    """
+    if columns is None:
+        columns = ANALYSIS_COLUMNS.get(analysis_type, ANALYSIS_COLUMNS['full_analysis'])
+    columns = tuple(columns)
+
+    codes = {c: [] for c in columns if c in CATEGORICAL_COLUMNS}
+    categories = {c: {} for c in codes}
+    chunks = {c: [] for c in columns if c not in codes}
+
+    rows = queryset.order_by().values_list(*columns).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            break
+        for name, values in zip(columns, zip(*chunk)):
+            if name in codes:
+                lookup = categories[name]
+                codes[name].append(np.fromiter(
+                    (-1 if v is None else lookup.setdefault(v, len(lookup)) for v in values),
+                    dtype=np.int32, count=len(values),
+                ))
+            elif name in DATETIME_COLUMNS:
+                chunks[name].append(pd.to_datetime(pd.Series(values, dtype=object), utc=True, errors='coerce').dt.tz_localize(None).to_numpy())
+            else:
+                chunks[name].append(np.asarray(values))
+
+    data = {}
+    for name in columns:
+        if name in codes:
+            merged = np.concatenate(codes[name]) if codes[name] else np.empty(0, dtype=np.int32)
+            data[name] = pd.Categorical.from_codes(merged, categories=list(categories[name]))
+        elif chunks[name]:
+            merged = np.concatenate(chunks[name])
+            data[name] = pd.Series(merged).dt.tz_localize('UTC') if name in DATETIME_COLUMNS else merged
+        else:
+            data[name] = pd.Series([], dtype='datetime64[ns, UTC]' if name in DATETIME_COLUMNS else 'int64')
+    return pd.DataFrame(data)
+
 def normalize_date_range(df: pd.DataFrame, date_col: str, start: str | None = None, end: str | None = None) -> pd.DataFrame:
     """
     Clip a DataFrame to a consistent date range for comparability across analyses.
@@ -94,7 +169,7 @@ def perform_patient_health_trends(df):
     if 'medical_condition' not in df.columns or 'date_of_admission' not in df.columns:
         return {"error": "Required columns not found for patient health trends."}
         
-    weekly_illness_counts = df.groupby([pd.Grouper(key='date_of_admission', freq='W'), 'medical_condition']).size().reset_index(name='count')
+    weekly_illness_counts = df.groupby([pd.Grouper(key='date_of_admission', freq='W'), 'medical_condition'], observed=True).size().reset_index(name='count')
     top_illnesses = weekly_illness_counts.sort_values(by='count', ascending=False).groupby('date_of_admission').head(5)
     
     # Prepare data for JSON serialization
@@ -234,6 +309,69 @@ def _preprocess_daily_series(
     return ts_filled.astype(float)
 
 
+class _FitTimeout(Exception):
+    pass
+
+
+def _raise_fit_timeout(signum, frame):
+    raise _FitTimeout()
+
+
+def _fit_sarima_aic(values, order, seasonal_order, maxiter=None, timeout=None):
+    """
+    Fit one SARIMA candidate and return (order, seasonal_order, aic); aic is None when the
+    fit fails or exceeds ``timeout`` seconds. Module-level so process pools can pickle it.
+    """
+    use_alarm = bool(timeout) and hasattr(signal, 'SIGALRM') and threading.current_thread() is threading.main_thread()
+    if use_alarm:
+        previous = signal.signal(signal.SIGALRM, _raise_fit_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            model = SARIMAX(
+                values,
+                order=order,
+                seasonal_order=seasonal_order,
+                enforce_stationarity=False,
+                enforce_invertibility=False,
+            )
+            fit_kwargs = {'disp': False}
+            if maxiter:
+                fit_kwargs['maxiter'] = maxiter
+            aic = float(model.fit(**fit_kwargs).aic)
+        return order, seasonal_order, (aic if np.isfinite(aic) else None)
+    except Exception:
+        return order, seasonal_order, None
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+
+def _series_fingerprint(ts: pd.Series, grid: tuple) -> str:
+    """Stable hash of the series values, its date span and the searched grid."""
+    digest = hashlib.sha256()
+    digest.update(np.ascontiguousarray(ts.to_numpy(dtype=float)).tobytes())
+    if len(ts):
+        digest.update(f"{ts.index[0]}|{ts.index[-1]}|{len(ts)}".encode())
+    digest.update(repr(grid).encode())
+    return digest.hexdigest()
+
+
+def _run_fits(values, candidates, workers, maxiter, timeout):
+    """Fit candidates across a process pool (or in-process when a pool is not possible)."""
+    jobs = [(values, order, seasonal_order, maxiter, timeout) for order, seasonal_order in candidates]
+    if workers > 1 and len(jobs) > 1:
+        # billiard's pool, unlike multiprocessing's, starts from daemonic Celery prefork workers
+        try:
+            with billiard.Pool(processes=min(workers, len(jobs))) as pool:
+                return pool.starmap(_fit_sarima_aic, jobs)
+        except Exception as e:
+            logger.warning(f"Parallel SARIMA search unavailable, fitting in-process: {str(e)}")
+    return [_fit_sarima_aic(*job) for job in jobs]
+
+
 def _sarima_grid_search(
     ts: pd.Series,
     seasonal_period: int = 7,
@@ -243,58 +381,146 @@ def _sarima_grid_search(
     P_values = (0, 1),
     D_values = (0, 1),
     Q_values = (0, 1),
-    max_models: int = 200
+    max_models: int = 200,
+    workers: int | None = None,
+    fit_timeout: float | None = None,
+    top_k: int | None = None,
+    screen_maxiter: int | None = None,
+    use_cache: bool = True,
 ):
     """
-    Simple SARIMA grid search selecting the configuration with lowest AIC.
+    SARIMA grid search selecting the configuration with lowest AIC.
     Returns (order, seasonal_order, best_aic).
+
+    - Candidates are fitted across a process pool of ``workers`` processes
+      (settings.SARIMA_GRID_WORKERS; 1 fits in-process), each fit bounded by ``fit_timeout`` seconds.
+    - Pruning: every candidate is first screened with a cheap fit capped at ``screen_maxiter``
+      iterations; only the ``top_k`` lowest screening AICs are refitted fully. ``top_k=0``
+      disables pruning and fully fits every candidate.
+    - The winner is cached per series fingerprint, so unchanged data skips the search.
     """
-    best_cfg = None
-    best_aic = np.inf
-    tried = 0
+    workers = workers if workers is not None else (getattr(settings, 'SARIMA_GRID_WORKERS', 0) or os.cpu_count() or 1)
+    fit_timeout = fit_timeout if fit_timeout is not None else getattr(settings, 'SARIMA_FIT_TIMEOUT', None)
+    top_k = top_k if top_k is not None else getattr(settings, 'SARIMA_GRID_TOP_K', 5)
+    screen_maxiter = screen_maxiter or getattr(settings, 'SARIMA_SCREEN_MAXITER', 10)
+
+    candidates = [
+        ((p, d, q), (P, D, Q, seasonal_period))
+        for p, d, q, P, D, Q in itertools.product(p_values, d_values, q_values, P_values, D_values, Q_values)
+    ][:max_models]
+
+    cache_key = f"sarima_cfg:{_series_fingerprint(ts, (candidates, top_k))}"
+    if use_cache:
+        try:
+            cached = cache.get(cache_key)
+        except Exception:
+            cached = None
+        if cached:
+            return tuple(cached[0]), tuple(cached[1]), cached[2]
+
+    values = ts.to_numpy(dtype=float)
+    if top_k and top_k < len(candidates):
+        screened = _run_fits(values, candidates, workers, screen_maxiter, fit_timeout)
+        ranked = sorted((r for r in screened if r[2] is not None), key=lambda r: r[2])
+        finalists = [(order, seasonal_order) for order, seasonal_order, _ in ranked[:top_k]]
+    else:
+        finalists = candidates
+    results = [r for r in _run_fits(values, finalists, workers, None, fit_timeout) if r[2] is not None]
 
-    # Suppress common convergence warnings during search
-    with warnings.catch_warnings():
-        warnings.simplefilter('ignore')
+    # Fallback if search failed
+    if not results:
+        return (1, 1, 1), (1, 1, 1, seasonal_period), np.nan
+
+    order, seasonal_order, best_aic = min(results, key=lambda r: r[2])
+    if use_cache:
+        try:
+            cache.set(cache_key, (order, seasonal_order, best_aic), timeout=SARIMA_CONFIG_CACHE_TIMEOUT)
+        except Exception:
+            pass
+    return order, seasonal_order, best_aic
 
-        for p in p_values:
-            for d in d_values:
-                for q in q_values:
-                    for P in P_values:
-                        for D in D_values:
-                            for Q in Q_values:
-                                if tried >= max_models:
-                                    break
-                                order = (p, d, q)
-                                seasonal_order = (P, D, Q, seasonal_period)
-                                try:
-                                    model = SARIMAX(
-                                        ts,
-                                        order=order,
-                                        seasonal_order=seasonal_order,
-                                        enforce_stationarity=False,
-                                        enforce_invertibility=False,
-                                    )
-                                    res = model.fit(disp=False)
-                                    aic = res.aic
-                                    if aic < best_aic:
-                                        best_aic = aic
-                                        best_cfg = (order, seasonal_order)
-                                except Exception:
-                                    pass
-                                tried += 1
 
-    # Fallback if search failed
-    if best_cfg is None:
-        best_cfg = ((1, 1, 1), (1, 1, 1, seasonal_period))
-        best_aic = np.nan
-    return best_cfg[0], best_cfg[1], best_aic
+def _one_step_forecast(res):
+    fc = res.get_forecast(steps=1)
+    mean = float(fc.predicted_mean.iloc[-1])
+    ci = fc.conf_int().iloc[-1]
+    return mean, float(ci.min()), float(ci.max())
+
+
+def _naive_step(train_series):
+    mean = float(train_series.iloc[-1])
+    return mean, max(0.0, mean - 1.0), mean + 1.0
+
+
+def _fit_sarimax(series, order, seasonal_order, **fit_kwargs):
+    model = SARIMAX(
+        series,
+        order=order,
+        seasonal_order=seasonal_order,
+        enforce_stationarity=False,
+        enforce_invertibility=False,
+    )
+    return model.fit(disp=False, **fit_kwargs)
+
+
+def _walk_forward_exact(ts, order, seasonal_order, train_end):
+    """One full MLE refit per test day (expanding window)."""
+    steps = []
+    for i in range(train_end, len(ts)):
+        train_series = ts.iloc[:i]
+        try:
+            steps.append(_one_step_forecast(_fit_sarimax(train_series, order, seasonal_order)))
+        except Exception:
+            steps.append(_naive_step(train_series))
+    return steps
 
 
-def _walk_forward_validate(ts: pd.Series, order, seasonal_order, test_size: int = 28):
+def _walk_forward_incremental(ts, order, seasonal_order, train_end, refit_every=None):
+    """
+    Fit once on the training window, then advance the state space with
+    ``results.append`` (parameters held fixed) after each observed day. With
+    ``refit_every`` the parameters are re-estimated every N steps, warm-started
+    from the current ones.
+    """
+    try:
+        res = _fit_sarimax(ts.iloc[:train_end], order, seasonal_order)
+    except Exception:
+        return _walk_forward_exact(ts, order, seasonal_order, train_end)
+
+    steps = []
+    for step, i in enumerate(range(train_end, len(ts)), start=1):
+        try:
+            steps.append(_one_step_forecast(res))
+        except Exception:
+            steps.append(_naive_step(ts.iloc[:i]))
+        if i + 1 >= len(ts):
+            break
+        try:
+            if refit_every and step % refit_every == 0:
+                res = _fit_sarimax(ts.iloc[:i + 1], order, seasonal_order, start_params=res.params)
+            else:
+                res = res.append(ts.iloc[i:i + 1], refit=False)
+        except Exception:
+            # State update failed; finish the remaining days with exact refits
+            return steps + _walk_forward_exact(ts, order, seasonal_order, i + 1)
+    return steps
+
+
+def _walk_forward_validate(
+    ts: pd.Series,
+    order,
+    seasonal_order,
+    test_size: int = 28,
+    mode: str = 'incremental',
+    refit_every: int | None = None,
+):
     """
     Walk-forward validation (expanding window) performing 1-step ahead forecasts.
     Returns metrics and per-step predictions with confidence intervals.
+
+    - mode='incremental' (default): one fit on the training window, then the filter state is
+      extended day by day with fixed parameters (optionally refitting every ``refit_every`` steps)
+    - mode='exact': a full refit for every test day (the original behaviour)
     """
     n = len(ts)
     if n < (test_size + 14):
@@ -302,38 +528,18 @@ def _walk_forward_validate(ts: pd.Series, order, seasonal_order, test_size: int
         test_size = max(7, min(test_size, n // 3))
 
     train_end = n - test_size
-    predictions = []
-    actuals = []
-    lowers = []
-    uppers = []
 
     with warnings.catch_warnings():
         warnings.simplefilter('ignore')
-        for i in range(train_end, n):
-            train_series = ts.iloc[:i]
-            try:
-                model = SARIMAX(
-                    train_series,
-                    order=order,
-                    seasonal_order=seasonal_order,
-                    enforce_stationarity=False,
-                    enforce_invertibility=False,
-                )
-                res = model.fit(disp=False)
-                fc = res.get_forecast(steps=1)
-                mean = float(fc.predicted_mean.iloc[-1])
-                ci = fc.conf_int().iloc[-1]
-                lower = float(ci.min())
-                upper = float(ci.max())
-            except Exception:
-                mean = train_series.iloc[-1]
-                lower = max(0.0, mean - 1.0)
-                upper = mean + 1.0
-
-            predictions.append(mean)
-            lowers.append(lower)
-            uppers.append(upper)
-            actuals.append(float(ts.iloc[i]))
+        if mode == 'exact':
+            steps = _walk_forward_exact(ts, order, seasonal_order, train_end)
+        else:
+            steps = _walk_forward_incremental(ts, order, seasonal_order, train_end, refit_every=refit_every)
+
+    predictions = [mean for mean, _, _ in steps]
+    lowers = [lower for _, lower, _ in steps]
+    uppers = [upper for _, _, upper in steps]
+    actuals = [float(v) for v in ts.iloc[train_end:]]
 
     mae = mean_absolute_error(actuals, predictions)
     rmse = np.sqrt(mean_squared_error(actuals, predictions))
@@ -351,6 +557,8 @@ def _walk_forward_validate(ts: pd.Series, order, seasonal_order, test_size: int
     ]
 
     return {
+        'mode': 'exact' if mode == 'exact' else 'incremental',
+        'refit_every': refit_every if mode != 'exact' else None,
         'mae': round(mae, 2),
         'rmse': round(rmse, 2),
         'per_step': per_step,
@@ -362,30 +570,28 @@ def _plot_history_vs_forecast(ts: pd.Series, forecast_df: pd.DataFrame) -> str:
     Plot historical series and forecast horizon; return base64 PNG.
     forecast_df expects columns: 'date', 'predicted', 'confidence_lower', 'confidence_upper'.
     """
-    fig, ax = plt.subplots(figsize=(10, 4))
-    ax.plot(ts.index, ts.values, label='Historical', color='#286660')
-
-    # Forecast horizon
-    dates = pd.to_datetime(forecast_df['date'])
-    ax.plot(dates, forecast_df['predicted'], label='Forecast', color='#1976d2')
-    ax.fill_between(
-        dates,
-        forecast_df['confidence_lower'],
-        forecast_df['confidence_upper'],
-        color='#1976d2', alpha=0.15, label='Confidence Interval'
-    )
-
-    ax.set_title('Daily Patient Volume: History vs Forecast')
-    ax.set_xlabel('Date')
-    ax.set_ylabel('Patients')
-    ax.legend(loc='best')
-    ax.grid(True, alpha=0.25)
-
-    buf = io.BytesIO()
-    plt.tight_layout()
-    fig.savefig(buf, format='png')
-    plt.close(fig)
-    return base64.b64encode(buf.getvalue()).decode('utf-8')
+    def draw(fig):
+        ax = fig.add_subplot()
+        ax.plot(ts.index, ts.values, label='Historical', color='#286660')
+
+        # Forecast horizon
+        dates = pd.to_datetime(forecast_df['date'])
+        ax.plot(dates, forecast_df['predicted'], label='Forecast', color='#1976d2')
+        ax.fill_between(
+            dates,
+            forecast_df['confidence_lower'],
+            forecast_df['confidence_upper'],
+            color='#1976d2', alpha=0.15, label='Confidence Interval'
+        )
+
+        ax.set_title('Daily Patient Volume: History vs Forecast')
+        ax.set_xlabel('Date')
+        ax.set_ylabel('Patients')
+        ax.legend(loc='best')
+        ax.grid(True, alpha=0.25)
+
+    # Own Figure and Agg canvas, not pyplot's global figures (see charts.py)
+    return render_png(draw, figsize=(10, 4))
 
 
 def forecast_patient_volumes_sarima(
@@ -395,6 +601,9 @@ def forecast_patient_volumes_sarima(
     seasonal_period: int = 7,
     test_size_days: int = 28,
     weekly_horizon_weeks: int = 4,
+    validation_mode: str = 'incremental',
+    validation_refit_every: int | None = None,
+    compare_validation_modes: bool = False,
 ):
     """
     End-to-end SARIMA forecasting pipeline for daily patient volumes.
@@ -407,6 +616,7 @@ def forecast_patient_volumes_sarima(
     - Next-day forecast with CI
     - Weekly forecasts (sum over upcoming 7-day periods) with CI (approximate)
     - Walk-forward validation metrics (MAE, RMSE) and per-step predictions
+      (incremental state updates by default; see _walk_forward_validate)
     - Visualization (base64 PNG) comparing history vs forecast horizon
     - Documentation of assumptions and limitations
     """
@@ -421,7 +631,21 @@ def forecast_patient_volumes_sarima(
     order, seasonal_order, best_aic = _sarima_grid_search(ts, seasonal_period=seasonal_period)
 
     # Walk-forward validation
-    validation = _walk_forward_validate(ts, order, seasonal_order, test_size=test_size_days)
+    validation = _walk_forward_validate(
+        ts, order, seasonal_order, test_size=test_size_days,
+        mode=validation_mode, refit_every=validation_refit_every,
+    )
+    if compare_validation_modes:
+        # Run the other mode as well so incremental/exact accuracy can be compared side by side
+        other_mode = 'exact' if validation['mode'] == 'incremental' else 'incremental'
+        other = _walk_forward_validate(
+            ts, order, seasonal_order, test_size=test_size_days,
+            mode=other_mode, refit_every=validation_refit_every,
+        )
+        validation['comparison'] = {
+            validation['mode']: {'mae': validation['mae'], 'rmse': validation['rmse']},
+            other_mode: {'mae': other['mae'], 'rmse': other['rmse']},
+        }
 
     # Fit on full series with best parameters
     with warnings.catch_warnings():
@@ -501,8 +725,9 @@ def forecast_patient_volumes_sarima(
             'Daily seasonality assumed with period s=7 (weekly pattern).',
             'Missing days are interpolated; extreme gaps may affect accuracy.',
             'Weekly confidence interval sums are approximate (sum of daily bounds).',
-            'Grid search selects parameters by AIC; alternate criteria may yield different models.',
-            'Walk-forward validation uses 1-step refits; computationally intensive for very long series.'
+            'Grid search screens candidates with short fits and selects by AIC among the fully refitted top-k; alternate criteria may yield different models.',
+            'Walk-forward validation extends the fitted state one day at a time with fixed parameters by default; '
+            'validation_mode="exact" refits every step (slower) and compare_validation_modes reports both.'
         ],
     }
 
@@ -512,7 +737,7 @@ def predict_illness_surge(df):
     df.dropna(subset=['date_of_admission'], inplace=True)
     
     df['month_year'] = df['date_of_admission'].dt.to_period('M')
-    df_monthly = df.groupby(['month_year', 'medical_condition']).size().unstack(fill_value=0)
+    df_monthly = df.groupby(['month_year', 'medical_condition'], observed=True).size().unstack(fill_value=0)
     df_monthly.index = df_monthly.index.to_timestamp()
     
     forecast_df = pd.DataFrame()
@@ -563,7 +788,7 @@ def predict_weekly_illness_forecast(df):
     
     # Group by week and medical condition
     df['week_year'] = df['date_of_admission'].dt.to_period('W')
-    df_weekly = df.groupby(['week_year', 'medical_condition']).size().unstack(fill_value=0)
+    df_weekly = df.groupby(['week_year', 'medical_condition'], observed=True).size().unstack(fill_value=0)
     df_weekly.index = df_weekly.index.to_timestamp()
     
     forecast_df = pd.DataFrame()
@@ -645,7 +870,7 @@ def predict_monthly_illness_forecast(df):
     
     # Group by month and medical condition
     df['month_year'] = df['date_of_admission'].dt.to_period('M')
-    df_monthly = df.groupby(['month_year', 'medical_condition']).size().unstack(fill_value=0)
+    df_monthly = df.groupby(['month_year', 'medical_condition'], observed=True).size().unstack(fill_value=0)
     df_monthly.index = df_monthly.index.to_timestamp()
     
     forecast_df = pd.DataFrame()
@@ -732,13 +957,17 @@ def predict_monthly_illness_forecast(df):
         }
     }
     
-def run_full_analysis():
-    """Master function to run the full predictive analysis pipeline."""
-    # Assuming this function is called from a Django view or Celery task.
-    # We must access the model from a Django context.
-    from .models import PatientRecord 
-    queryset = PatientRecord.objects.all()
-    df = get_data_from_queryset(queryset)
+def run_full_analysis(df: pd.DataFrame | None = None):
+    """
+    Master function to run the full predictive analysis pipeline.
+    The data is loaded once (only the columns the analyses read) and shared by all of them;
+    callers that already loaded it pass ``df``.
+    """
+    if df is None:
+        # Assuming this function is called from a Django view or Celery task.
+        # We must access the model from a Django context.
+        from .models import PatientRecord
+        df = load_analysis_frame(PatientRecord.objects.all(), analysis_type='full_analysis')
     
     if df.empty:
         return {"error": "No data available for analysis."}
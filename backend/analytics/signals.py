@@ -4,12 +4,11 @@ from django.utils import timezone
 import uuid
 import logging
 
-from backend.users.models import PatientProfile, User
-from .models import AnalyticsResult
+from .models import AnalyticsResult, PatientRecord
 
 # Import tasks with error handling
 try:
-    from .tasks import process_data_update_analytics
+    from .incremental import log_data_update
     TASKS_AVAILABLE = True
 except ImportError as e:
     print(f"Analytics tasks not available: {e}")
@@ -17,42 +16,31 @@ except ImportError as e:
 
 logger = logging.getLogger(__name__)
 
-@receiver(post_save, sender=PatientProfile)
-def patient_profile_saved(sender, instance, created, **kwargs):
+@receiver(post_save, sender=PatientRecord)
+def patient_record_saved(sender, instance, created, **kwargs):
     """
-    Trigger analytics when a patient profile is created or updated
+    Log patient record changes for the incremental analytics aggregates
     """
     if not TASKS_AVAILABLE:
         return
-        
+
     try:
-        action = 'create' if created else 'update'
-        process_data_update_analytics.delay(
-        model_name='PatientProfile',
-        record_id=instance.id,
-        action=action
-        )
+        log_data_update('PatientRecord', instance.id, 'create' if created else 'update')
     except Exception as e:
-        # Log error but don't break the save operation
-        print(f"Error triggering analytics for patient profile {instance.id}: {str(e)}")
+        logger.error(f"Error logging analytics update for patient record {instance.id}: {str(e)}")
 
-@receiver(post_delete, sender=PatientProfile)
-def patient_profile_deleted(sender, instance, **kwargs):
+@receiver(post_delete, sender=PatientRecord)
+def patient_record_deleted(sender, instance, **kwargs):
     """
-    Trigger analytics when a patient profile is deleted
+    Log patient record deletions for the incremental analytics aggregates
     """
     if not TASKS_AVAILABLE:
         return
-        
+
     try:
-        process_data_update_analytics.delay(
-            model_name='PatientProfile',
-            record_id=instance.id,
-            action='delete'
-        )
+        log_data_update('PatientRecord', instance.id, 'delete')
     except Exception as e:
-        # Log error but don't break the delete operation
-        print(f"Error triggering analytics for deleted patient profile {instance.id}: {str(e)}")
+        logger.error(f"Error logging analytics deletion for patient record {instance.id}: {str(e)}")
 
 # You can add more signal handlers for other models that affect analytics
 # For example, if you have appointment models, medicine inventory, etc.
@@ -65,9 +53,8 @@ def appointment_saved(sender, instance, created, **kwargs):
     Signal to trigger analytics update when appointment data changes
     """
     try:
-        if TASKS_AVAILABLE:
-            process_data_update_analytics.delay('AppointmentManagement', instance.id, 'created' if created else 'updated')
-        
+        # Appointments feed no incremental aggregate (see incremental.py), so no update is logged
+
         # Create notification for doctor about analytics update
         if instance.doctor:
             Notification.objects.create(
@@ -84,12 +71,18 @@ def analytics_result_completed(sender, instance, created, **kwargs):
     """
     Signal to notify doctors when analytics results are completed
     """
+    if instance.status == 'completed':
+        try:
+            from .stream import publish_result
+            publish_result(instance)
+        except Exception as e:
+            logger.error(f"Error publishing analytics stream event: {str(e)}")
+
     try:
         # Only notify when analytics are completed (not when created or failed)
         if instance.status == 'completed':
-            # Get all doctors to notify them about new analytics findings
-            doctors = User.objects.filter(role='doctor', is_active=True)
-            
+            from backend.operations.notification_fanout import dispatch_fan_out
+
             # Create a user-friendly message based on analysis type
             analysis_type_messages = {
                 'patient_health_trends': 'New patient health trends analysis is available',
@@ -108,14 +101,10 @@ def analytics_result_completed(sender, instance, created, **kwargs):
                 f'New {instance.get_analysis_type_display()} results are available'
             )
             
-            # Create notifications for all doctors
-            for doctor in doctors:
-                Notification.objects.create(
-                    user=doctor,
-                    message=message
-                )
+            # Notify all doctors from a Celery fan-out once this save commits
+            dispatch_fan_out(message, 'doctors')
             
-            logger.info(f"Created analytics notifications for {doctors.count()} doctors - {instance.analysis_type}")
+            logger.info(f"Queued analytics notification fan-out to doctors - {instance.analysis_type}")
             
     except Exception as e:
         logger.error(f"Error in analytics_result_completed signal: {str(e)}")
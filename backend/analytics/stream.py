@@ -0,0 +1,245 @@
+"""
+Event-driven analytics stream.
+
+Completed AnalyticsResult rows are published once, on commit, to the
+``analytics_stream`` channel-layer group (Redis pub/sub in production). Each
+connected SSE client owns a channel in that group and waits on it, so an idle
+dashboard costs no database queries; it only receives small events carrying the
+result id, analysis type and a digest of the payload, and fetches the result
+itself when the digest changed.
+
+- events carry a monotonically increasing id (a cache counter) and the last
+  ``ANALYTICS_STREAM_REPLAY_SIZE`` events are kept in the cache, so a client
+  reconnecting with ``Last-Event-ID`` gets exactly what it missed; on a Redis
+  cache the buffer is a list appended with RPUSH + LTRIM, elsewhere the
+  read-modify-write runs under a cache lock, so concurrent publishers never
+  drop each other's events
+- when the requested id is older than the replay buffer (or no id is sent) the
+  client gets one ``snapshot`` event with the latest result of every type
+- a comment line is sent every ``ANALYTICS_STREAM_HEARTBEAT`` seconds of
+  silence to keep proxies from closing the connection
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+
+from .models import AnalyticsResult
+
+logger = logging.getLogger(__name__)
+
+ANALYTICS_STREAM_GROUP = "analytics_stream"
+SEQUENCE_KEY = "analytics_stream:sequence"
+REPLAY_KEY = "analytics_stream:replay"
+REPLAY_LOCK_KEY = "analytics_stream:replay:lock"
+REPLAY_LOCK_TIMEOUT = 5
+
+
+def replay_size():
+    return getattr(settings, "ANALYTICS_STREAM_REPLAY_SIZE", 200)
+
+
+def heartbeat_seconds():
+    return getattr(settings, "ANALYTICS_STREAM_HEARTBEAT", 15)
+
+
+def result_digest(results):
+    """Short stable digest of a result payload; changes whenever the payload does."""
+    encoded = json.dumps(results, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+def result_event(result):
+    return {
+        "result_id": str(result.id),
+        "analysis_type": result.analysis_type,
+        "status": result.status,
+        "updated_at": result.updated_at.isoformat() if result.updated_at else None,
+        "digest": result_digest(result.results),
+    }
+
+
+def current_sequence():
+    return cache.get(SEQUENCE_KEY, 0)
+
+
+def _next_sequence():
+    try:
+        return cache.incr(SEQUENCE_KEY)
+    except ValueError:
+        cache.add(SEQUENCE_KEY, 0, timeout=None)
+        return cache.incr(SEQUENCE_KEY)
+
+
+# --- Replay buffer ---
+def _redis_client():
+    """Raw client behind a Redis cache backend, or None for other backends."""
+    backend = getattr(cache, "_cache", None)  # django.core.cache.backends.redis
+    if hasattr(backend, "get_client"):
+        return backend.get_client(write=True)
+    client = getattr(cache, "client", None)  # django-redis
+    if hasattr(client, "get_client"):
+        return client.get_client(write=True)
+    return None
+
+
+@contextmanager
+def _replay_lock():
+    """Cache-wide lock for backends without atomic list operations."""
+    deadline = time.monotonic() + REPLAY_LOCK_TIMEOUT
+    while not cache.add(REPLAY_LOCK_KEY, 1, timeout=REPLAY_LOCK_TIMEOUT):
+        if time.monotonic() > deadline:
+            raise TimeoutError("replay buffer lock not released")
+        time.sleep(0.005)
+    try:
+        yield
+    finally:
+        cache.delete(REPLAY_LOCK_KEY)
+
+
+def _append_replay(event):
+    size = replay_size()
+    client = _redis_client()
+    if client is not None:
+        key = cache.make_key(REPLAY_KEY)
+        pipe = client.pipeline()
+        pipe.rpush(key, json.dumps(event))
+        pipe.ltrim(key, -size, -1)
+        pipe.execute()
+        return
+    with _replay_lock():
+        replay = cache.get(REPLAY_KEY) or []
+        replay.append(event)
+        cache.set(REPLAY_KEY, replay[-size:], timeout=None)
+
+
+def _replay():
+    """Buffered events in id order (publishers may push out of order)."""
+    client = _redis_client()
+    if client is not None:
+        replay = [json.loads(item) for item in client.lrange(cache.make_key(REPLAY_KEY), 0, -1)]
+    else:
+        replay = cache.get(REPLAY_KEY) or []
+    return sorted(replay, key=lambda event: event["id"])
+
+
+# --- Publishing ---
+def publish_result(result):
+    """Publish a completed result to stream subscribers once the transaction commits."""
+    event = result_event(result)
+    transaction.on_commit(lambda: publish_event(event))
+
+
+def publish_event(event):
+    try:
+        event = {**event, "id": _next_sequence()}
+        _append_replay(event)
+    except Exception as e:
+        logger.warning(f"Analytics stream replay buffer unavailable: {str(e)}")
+        return None
+    try:
+        async_to_sync(get_channel_layer().group_send)(
+            ANALYTICS_STREAM_GROUP, {"type": "analytics.event", "event": event}
+        )
+    except Exception as e:
+        logger.warning(f"Failed to publish analytics stream event: {str(e)}")
+    return event
+
+
+# --- Reading ---
+def events_since(last_event_id):
+    """Buffered events after ``last_event_id``, or None when the buffer no longer covers it."""
+    replay = _replay()
+    if last_event_id > current_sequence():
+        return None
+    if replay and replay[0]["id"] > last_event_id + 1:
+        return None
+    if not replay and last_event_id < current_sequence():
+        return None
+    return [event for event in replay if event["id"] > last_event_id]
+
+
+def latest_events():
+    """Event for the latest completed result of every analysis type (one query plus the fetch)."""
+    latest_ids = (
+        AnalyticsResult.objects.filter(status="completed")
+        .values("analysis_type")
+        .annotate(latest=Max("created_at"))
+    )
+    results = {}
+    for result in AnalyticsResult.objects.filter(
+        status="completed", created_at__in=[row["latest"] for row in latest_ids]
+    ):
+        known = results.get(result.analysis_type)
+        if known is None or result.created_at > known.created_at:
+            results[result.analysis_type] = result
+    return [result_event(result) for result in results.values()]
+
+
+def format_sse(data, event=None, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+async def event_stream(last_event_id=None, heartbeat=None):
+    """
+    Async SSE body: replay or snapshot first, then live events from the channel layer.
+    Joining the group before reading the backlog means nothing published in between is lost;
+    duplicates are dropped by event id.
+    """
+    if heartbeat is None:
+        heartbeat = heartbeat_seconds()
+    layer = get_channel_layer()
+    channel = await layer.new_channel()
+    await layer.group_add(ANALYTICS_STREAM_GROUP, channel)
+    try:
+        backlog = None
+        if last_event_id is not None:
+            backlog = await sync_to_async(events_since)(last_event_id)
+        if backlog is None:
+            sequence = await sync_to_async(current_sequence)()
+            snapshot = await sync_to_async(latest_events)()
+            yield format_sse({"results": snapshot}, event="snapshot", event_id=sequence)
+            last_sent = sequence
+        else:
+            last_sent = last_event_id
+            for item in backlog:
+                yield format_sse(item, event="analytics", event_id=item["id"])
+                last_sent = item["id"]
+
+        while True:
+            try:
+                message = await asyncio.wait_for(layer.receive(channel), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                continue
+            item = message.get("event") or {}
+            if item.get("id", 0) <= last_sent:
+                continue
+            yield format_sse(item, event="analytics", event_id=item["id"])
+            last_sent = item["id"]
+    finally:
+        await layer.group_discard(ANALYTICS_STREAM_GROUP, channel)
+
+
+def parse_last_event_id(request):
+    raw = request.headers.get("Last-Event-ID") or request.GET.get("last_event_id")
+    try:
+        return int(raw) if raw not in (None, "") else None
+    except (TypeError, ValueError):
+        return None
@@ -6,13 +6,13 @@ from django.db import transaction
 from celery import shared_task
 from celery.utils.log import get_task_logger
 
-from .models import AnalyticsResult, AnalyticsTask, DataUpdateLog, AnalyticsCache, PatientRecord
+from .models import AnalyticsResult, AnalyticsTask, AnalyticsCache, PatientRecord
 
 # Import analytics functions with error handling
 try:
     import pandas as pd
     from .predictive_analytics import (
-        get_data_from_queryset,
+        load_analysis_frame,
         perform_patient_health_trends,
         analyze_patient_demographics,
         analyze_illness_prediction_chi_square,
@@ -50,13 +50,13 @@ def run_analytics_task_async(self, task_id, analysis_type):
         logger.info(f"Starting analytics task {task_id} for {analysis_type}")
         
         # Get patient data (exclude dummy data for real analytics)
-        patient_queryset = PatientRecord.objects.select_related('patient').filter(is_dummy_data=False)
+        patient_queryset = PatientRecord.objects.filter(is_dummy_data=False)
         
         if not patient_queryset.exists():
             raise Exception("No patient data available for analysis")
         
-        # Convert to DataFrame
-        df = get_data_from_queryset(patient_queryset)
+        # Load only the columns this analysis reads (full_analysis loads once and shares the frame)
+        df = load_analysis_frame(patient_queryset, analysis_type=analysis_type)
         
         if df.empty:
             raise Exception("No data available for analysis")
@@ -84,7 +84,7 @@ def run_analytics_task_async(self, task_id, analysis_type):
         elif analysis_type == 'monthly_illness_forecast':
             results = predict_monthly_illness_forecast(df)
         elif analysis_type == 'full_analysis':
-            results = run_full_analysis()
+            results = run_full_analysis(df)
         else:
             raise Exception(f"Unknown analysis type: {analysis_type}")
         
@@ -137,36 +137,49 @@ def run_analytics_task_async(self, task_id, analysis_type):
 @shared_task
 def process_data_update_analytics(model_name, record_id, action):
     """
-    Process analytics when data is updated
+    Process analytics when data is updated: the change is logged and folded into the
+    incremental aggregates by a debounced flush instead of re-running full analyses
     """
     try:
+        from .incremental import log_data_update
+
         logger.info(f"Processing data update: {model_name} #{record_id} - {action}")
-        
-        # Log the data update
-        DataUpdateLog.objects.create(
-            model_name=model_name,
-            record_id=record_id,
-            action=action,
-            triggered_analytics=True
-        )
-        
-        # Trigger relevant analytics based on the model
-        if model_name == 'PatientProfile':
-            # Trigger patient-related analytics
-            run_analytics_task_async.delay(
-                str(uuid.uuid4()),
-                'patient_demographics'
-            )
-            run_analytics_task_async.delay(
-                str(uuid.uuid4()),
-                'patient_health_trends'
-            )
-        
-        logger.info(f"Analytics triggered for {model_name} #{record_id}")
-        
+        log_data_update(model_name, record_id, action)
+
     except Exception as exc:
         logger.error(f"Error processing data update analytics: {str(exc)}")
 
+@shared_task
+def flush_incremental_analytics():
+    """
+    Fold pending DataUpdateLog entries into the incremental analytics aggregates
+    """
+    try:
+        from .incremental import apply_pending_updates
+
+        consumed = apply_pending_updates()
+        logger.info(f"Incremental analytics flush applied {consumed} data updates")
+        return consumed
+
+    except Exception as exc:
+        logger.error(f"Error flushing incremental analytics: {str(exc)}")
+
+@shared_task
+def reconcile_incremental_analytics():
+    """
+    Rebuild the incremental analytics aggregates from the full table to correct any drift
+    (e.g. rows written with bulk_create/update, which send no signals)
+    """
+    try:
+        from .incremental import reconcile_aggregates
+
+        drift = reconcile_aggregates()
+        logger.info(f"Incremental analytics reconciled ({drift} buckets corrected)")
+        return drift
+
+    except Exception as exc:
+        logger.error(f"Error reconciling incremental analytics: {str(exc)}")
+
 @shared_task
 def cleanup_old_analytics():
     """
@@ -0,0 +1,649 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from backend.analytics import predictive_analytics
+from backend.analytics.predictive_analytics import (
+    _sarima_grid_search,
+    _series_fingerprint,
+    analyze_common_medications,
+    analyze_patient_demographics,
+    get_data_from_queryset,
+    load_analysis_frame,
+    perform_patient_health_trends,
+    run_full_analysis,
+)
+
+SMALL_GRID = dict(p_values=(0, 1), d_values=(0,), q_values=(0, 1), P_values=(0, 1), D_values=(0,), Q_values=(0,))
+
+
+def weekly_series(days=120, seed=3):
+    rng = np.random.default_rng(seed)
+    t = np.arange(days)
+    index = pd.date_range("2024-01-01", periods=days, freq="D")
+    return pd.Series(50 + 8 * np.sin(2 * np.pi * t / 7) + rng.normal(0, 2, days), index=index)
+
+
+def search_in_daemonic_process(queue):
+    """Run a grid search the way a Celery prefork child (a daemonic billiard process) does."""
+    import billiard
+
+    with patch.object(predictive_analytics.billiard, "Pool", wraps=billiard.Pool) as pool, \
+            patch.object(predictive_analytics.logger, "warning") as warning:
+        result = _sarima_grid_search(weekly_series(), workers=2, use_cache=False, **SMALL_GRID)
+    queue.put((billiard.current_process().daemon, pool.call_count, warning.call_count, result))
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class SarimaGridSearchTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_pruned_search_keeps_exhaustive_winner_on_clear_signal(self):
+        ts = weekly_series()
+        exhaustive = _sarima_grid_search(ts, workers=1, top_k=0, use_cache=False, **SMALL_GRID)
+        pruned = _sarima_grid_search(ts, workers=1, top_k=3, use_cache=False, **SMALL_GRID)
+        self.assertEqual(pruned[:2], exhaustive[:2])
+
+    def test_celery_prefork_workers_fit_in_parallel(self):
+        import billiard
+
+        queue = billiard.Queue()
+        worker = billiard.Process(target=search_in_daemonic_process, args=(queue,), daemon=True)
+        worker.start()
+        daemonic, pools, warnings, result = queue.get(timeout=120)
+        worker.join(10)
+        self.assertTrue(daemonic)
+        self.assertEqual((pools, warnings), (2, 0))
+        self.assertEqual(result[:2], _sarima_grid_search(weekly_series(), workers=1, use_cache=False, **SMALL_GRID)[:2])
+
+    def test_unchanged_series_skips_search(self):
+        ts = weekly_series()
+        first = _sarima_grid_search(ts, workers=1, **SMALL_GRID)
+        with patch.object(predictive_analytics, "_run_fits") as run_fits:
+            second = _sarima_grid_search(ts, workers=1, **SMALL_GRID)
+        run_fits.assert_not_called()
+        self.assertEqual(second, first)
+
+    def test_fingerprint_changes_with_data(self):
+        ts = weekly_series()
+        changed = ts.copy()
+        changed.iloc[-1] += 1
+        self.assertNotEqual(_series_fingerprint(ts, ()), _series_fingerprint(changed, ()))
+
+    def test_timed_out_fits_fall_back_to_default_order(self):
+        ts = weekly_series()
+        with patch.object(predictive_analytics, "_fit_sarima_aic", side_effect=lambda v, o, so, *a: (o, so, None)):
+            order, seasonal_order, aic = _sarima_grid_search(ts, workers=1, use_cache=False, **SMALL_GRID)
+        self.assertEqual((order, seasonal_order), ((1, 1, 1), (1, 1, 1, 7)))
+        self.assertTrue(np.isnan(aic))
+
+
+class WalkForwardValidationTests(SimpleTestCase):
+    def test_incremental_matches_exact_refit_accuracy(self):
+        ts = weekly_series(days=90)
+        args = (ts, (1, 0, 0), (1, 0, 0, 7))
+        exact = predictive_analytics._walk_forward_validate(*args, test_size=14, mode="exact")
+        incremental = predictive_analytics._walk_forward_validate(*args, test_size=14)
+        self.assertEqual(incremental["mode"], "incremental")
+        self.assertEqual(len(incremental["per_step"]), len(exact["per_step"]))
+        self.assertEqual([s["date"] for s in incremental["per_step"]], [s["date"] for s in exact["per_step"]])
+        self.assertLess(abs(incremental["mae"] - exact["mae"]), 0.25 * exact["mae"] + 0.5)
+
+    def test_incremental_fits_once_unless_refit_interval_given(self):
+        ts = weekly_series(days=90)
+        with patch.object(predictive_analytics, "_fit_sarimax", wraps=predictive_analytics._fit_sarimax) as fit:
+            predictive_analytics._walk_forward_validate(ts, (1, 0, 0), (1, 0, 0, 7), test_size=14)
+        self.assertEqual(fit.call_count, 1)
+
+        with patch.object(predictive_analytics, "_fit_sarimax", wraps=predictive_analytics._fit_sarimax) as fit:
+            predictive_analytics._walk_forward_validate(ts, (1, 0, 0), (1, 0, 0, 7), test_size=14, refit_every=7)
+        # Initial fit plus one refit after day 7 (no state update follows the last day)
+        self.assertEqual(fit.call_count, 2)
+
+
+class AnalysisFrameLoaderTests(TestCase):
+    def setUp(self):
+        from backend.users.models import User
+        from backend.analytics.models import PatientRecord
+
+        user = User.objects.create_user(
+            email="analytics.patient@example.com",
+            password="Password123",
+            role=User.Role.PATIENT,
+            full_name="Analytics Patient",
+        )
+        start = timezone.now() - timedelta(days=400)
+        PatientRecord.objects.bulk_create([
+            PatientRecord(
+                patient=user,
+                date_of_admission=start + timedelta(days=i),
+                medical_condition=["Flu", "Asthma", "Diabetes"][i % 3],
+                age=20 + i % 60,
+                gender=["Male", "Female"][i % 2],
+                medication=None if i % 5 == 0 else ["Paracetamol", "Insulin"][i % 2],
+            )
+            for i in range(400)
+        ])
+        self.queryset = PatientRecord.objects.all()
+
+    def test_loads_only_requested_columns_with_typed_dtypes(self):
+        df = load_analysis_frame(self.queryset, analysis_type="illness_prediction", chunk_size=64)
+        self.assertEqual(list(df.columns), ["date_of_admission", "age", "gender", "medical_condition"])
+        self.assertEqual(len(df), 400)
+        self.assertEqual(df["gender"].dtype.name, "category")
+        self.assertEqual(df["medical_condition"].dtype.name, "category")
+        self.assertEqual(str(df["date_of_admission"].dt.tz), "UTC")
+        self.assertEqual(df["age"].dtype.kind, "i")
+
+    def test_nullable_categorical_keeps_missing_values(self):
+        df = load_analysis_frame(self.queryset, columns=["medication"])
+        self.assertEqual(int(df["medication"].isna().sum()), 80)
+
+    def test_matches_queryset_values_frame(self):
+        loaded = load_analysis_frame(self.queryset, analysis_type="full_analysis")
+        reference = get_data_from_queryset(self.queryset)
+        self.assertEqual(
+            analyze_patient_demographics(loaded.copy()),
+            analyze_patient_demographics(reference.copy()),
+        )
+        # Rows stream unordered, so ties in the weekly top-5 may come out in another order
+        def weekly(df):
+            rows = perform_patient_health_trends(df)["top_illnesses_by_week"]
+            return sorted((r["date_of_admission"], str(r["medical_condition"]), r["count"]) for r in rows)
+
+        self.assertEqual(weekly(loaded.copy()), weekly(reference.copy()))
+        self.assertEqual(
+            analyze_common_medications(loaded.copy()),
+            analyze_common_medications(reference.copy()),
+        )
+
+    def test_full_analysis_loads_once(self):
+        with patch.object(predictive_analytics, "load_analysis_frame", wraps=load_analysis_frame) as loader:
+            results = run_full_analysis()
+        self.assertEqual(loader.call_count, 1)
+        self.assertIn("patient_demographics", results)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class IncrementalAnalyticsTests(TestCase):
+    def setUp(self):
+        from backend.users.models import User
+
+        cache.clear()
+        self.user = User.objects.create_user(
+            email="incremental.patient@example.com",
+            password="Password123",
+            role=User.Role.PATIENT,
+            full_name="Incremental Patient",
+        )
+        self.start = timezone.now() - timedelta(days=60)
+
+    def _create(self, i, **fields):
+        from backend.analytics.models import PatientRecord
+
+        return PatientRecord.objects.create(
+            **fields,
+            patient=self.user,
+            date_of_admission=self.start + timedelta(days=i % 50, hours=i % 24),
+            medical_condition=["Flu", "Asthma", "Diabetes", "Dengue", "Cancer", "Arthritis"][i % 6],
+            age=15 + (i * 7) % 90,
+            gender=["Male", "Female"][i % 2],
+            medication=None if i % 4 == 0 else ["Paracetamol", "Insulin", "Aspirin"][i % 3],
+        )
+
+    def _assert_matches_full_analysis(self):
+        from backend.analytics.incremental import aggregate_results
+        from backend.analytics.models import PatientRecord
+
+        results = aggregate_results()
+        df = get_data_from_queryset(PatientRecord.objects.filter(is_dummy_data=False))
+        self.assertEqual(results["patient_demographics"], analyze_patient_demographics(df.copy()))
+        self.assertEqual(
+            sorted((r["date_of_admission"], r["count"]) for r in results["patient_health_trends"]["top_illnesses_by_week"]),
+            sorted((r["date_of_admission"], r["count"]) for r in perform_patient_health_trends(df.copy())["top_illnesses_by_week"]),
+        )
+        full_meds = analyze_common_medications(df.copy())["medication_pareto_data"]
+        self.assertEqual(
+            [(r["frequency"], r["cumulative_percentage"]) for r in results["medication_analysis"]["medication_pareto_data"]],
+            [(r["frequency"], r["cumulative_percentage"]) for r in full_meds],
+        )
+        self.assertEqual(
+            {r["medication"]: r["frequency"] for r in results["medication_analysis"]["medication_pareto_data"]},
+            {r["medication"]: r["frequency"] for r in full_meds},
+        )
+
+    def test_burst_of_saves_schedules_one_flush(self):
+        from backend.analytics import tasks
+
+        with patch.object(tasks.flush_incremental_analytics, "apply_async") as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                for i in range(20):
+                    self._create(i)
+        self.assertEqual(apply_async.call_count, 1)
+
+    def test_incremental_aggregates_match_full_recompute(self):
+        from backend.analytics.incremental import apply_pending_updates
+        from backend.analytics.models import AnalyticsResult, DataUpdateLog
+
+        records = [self._create(i) for i in range(120)]
+        self.assertEqual(apply_pending_updates(), 120)
+        self._assert_matches_full_analysis()
+
+        records[3].medical_condition = "Flu"
+        records[3].medication = "Ibuprofen"
+        records[3].age = 85
+        records[3].save()
+        records[3].save()
+        records[7].delete()
+        records[8].date_of_admission = self.start - timedelta(days=30)
+        records[8].save()
+        self.assertEqual(apply_pending_updates(), 4)
+        self._assert_matches_full_analysis()
+        self.assertFalse(DataUpdateLog.objects.filter(processed_at__isnull=True).exists())
+
+        latest = AnalyticsResult.objects.filter(analysis_type="patient_demographics").latest("created_at")
+        self.assertTrue(latest.results["incremental"])
+
+    def test_dummy_records_are_left_out_like_the_full_analysis(self):
+        from backend.analytics.incremental import apply_pending_updates, reconcile_aggregates
+
+        records = [self._create(i, is_dummy_data=i % 3 == 0) for i in range(60)]
+        apply_pending_updates()
+        self._assert_matches_full_analysis()
+
+        records[1].is_dummy_data = True
+        records[1].save()
+        records[3].is_dummy_data = False
+        records[3].save()
+        apply_pending_updates()
+        self._assert_matches_full_analysis()
+        self.assertEqual(reconcile_aggregates(), 0)
+
+    def test_results_are_published_only_when_a_counter_changes(self):
+        from backend.analytics.incremental import apply_pending_updates
+        from backend.analytics.models import AnalyticsResult, DataUpdateLog
+        from backend.users.models import PatientProfile
+
+        record = self._create(1)
+        self.assertEqual(apply_pending_updates(), 1)
+        published = AnalyticsResult.objects.count()
+        self.assertEqual(published, 3)
+
+        PatientProfile.objects.get_or_create(user=self.user)[0].save()
+        record.severity = "High"
+        record.save()
+        self.assertEqual(DataUpdateLog.objects.filter(processed_at__isnull=True).count(), 1)
+        self.assertEqual(apply_pending_updates(), 1)
+        self.assertEqual(AnalyticsResult.objects.count(), published)
+
+    def test_incremental_refresh_does_not_notify_doctors(self):
+        from backend.analytics.incremental import apply_pending_updates
+        from backend.operations.models import Notification
+        from backend.users.models import User
+
+        User.objects.create_user(email="doc.incremental@example.com", password="Password123", role=User.Role.DOCTOR, full_name="Doc")
+        self._create(1)
+        apply_pending_updates()
+        self.assertFalse(Notification.objects.exists())
+
+    def test_reconcile_corrects_rows_written_without_signals(self):
+        from backend.analytics.incremental import apply_pending_updates, reconcile_aggregates
+        from backend.analytics.models import PatientRecord
+
+        for i in range(30):
+            self._create(i)
+        apply_pending_updates()
+        PatientRecord.objects.bulk_create([
+            PatientRecord(patient=self.user, date_of_admission=self.start, medical_condition="Flu", age=30, gender="Male", medication="Aspirin")
+            for _ in range(5)
+        ])
+        self.assertGreater(reconcile_aggregates(), 0)
+        self._assert_matches_full_analysis()
+        self.assertEqual(reconcile_aggregates(), 0)
+
+
+    def test_changes_during_reconcile_are_left_for_the_next_flush(self):
+        from backend.analytics import incremental
+        from backend.analytics.models import DataUpdateLog
+
+        for i in range(10):
+            self._create(i)
+        incremental.apply_pending_updates()
+        drift = incremental._drift
+
+        def save_during_reconcile(totals):
+            # Saved after the scan: not in the rebuilt totals, so its log must stay pending
+            self._create(20)
+            return drift(totals)
+
+        with patch.object(incremental, "_drift", side_effect=save_during_reconcile):
+            incremental.reconcile_aggregates(publish=False)
+        self.assertEqual(DataUpdateLog.objects.filter(processed_at__isnull=True).count(), 1)
+        self.assertEqual(incremental.apply_pending_updates(), 1)
+        self._assert_matches_full_analysis()
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+)
+class AnalyticsStreamTests(TestCase):
+    def setUp(self):
+        from channels.layers import channel_layers
+
+        cache.clear()
+        channel_layers.backends.clear()
+
+    def _result(self, analysis_type="patient_demographics", results=None):
+        from backend.analytics.models import AnalyticsResult
+
+        return AnalyticsResult.objects.bulk_create([
+            AnalyticsResult(analysis_type=analysis_type, status="completed", results=results or {"n": 1})
+        ])[0]
+
+    async def _next(self, stream, timeout=2):
+        import asyncio
+
+        return await asyncio.wait_for(stream.__anext__(), timeout)
+
+    @staticmethod
+    def _data(chunk):
+        import json
+
+        return json.loads(chunk.split("data: ", 1)[1])
+
+    async def test_snapshot_then_live_events_without_reloading(self):
+        from asgiref.sync import sync_to_async
+        from backend.analytics import stream as analytics_stream
+        from backend.analytics.stream import event_stream, publish_event, result_event
+
+        result = await sync_to_async(self._result)()
+        stream = event_stream(heartbeat=0.05)
+        snapshot = await self._next(stream)
+        self.assertIn("event: snapshot", snapshot)
+        self.assertEqual(self._data(snapshot)["results"][0]["result_id"], str(result.id))
+
+        # Once subscribed, heartbeats and live events never go back to the database
+        with patch.object(analytics_stream, "latest_events") as latest, patch.object(analytics_stream, "events_since") as since:
+            self.assertEqual(await self._next(stream), ": heartbeat\n\n")
+            event = await sync_to_async(publish_event)(result_event(result))
+            chunk = await self._next(stream)
+        latest.assert_not_called()
+        since.assert_not_called()
+        self.assertIn(f"id: {event['id']}", chunk)
+        self.assertEqual(self._data(chunk)["digest"], event["digest"])
+        await stream.aclose()
+
+    async def test_last_event_id_replays_missed_events(self):
+        from asgiref.sync import sync_to_async
+        from backend.analytics.stream import event_stream, publish_event, result_event
+
+        first = await sync_to_async(self._result)(results={"n": 1})
+        second = await sync_to_async(self._result)("medication_analysis", results={"n": 2})
+        seen = await sync_to_async(publish_event)(result_event(first))
+        missed = await sync_to_async(publish_event)(result_event(second))
+
+        stream = event_stream(last_event_id=seen["id"], heartbeat=0.05)
+        chunk = await self._next(stream)
+        self.assertIn(f"id: {missed['id']}", chunk)
+        self.assertEqual(self._data(chunk)["result_id"], str(second.id))
+        self.assertEqual(await self._next(stream), ": heartbeat\n\n")
+        await stream.aclose()
+
+    def test_concurrent_publishers_keep_every_event(self):
+        import threading
+        import time
+
+        from django.core.cache.backends.locmem import LocMemCache
+        from backend.analytics.stream import REPLAY_KEY, events_since, publish_event
+
+        get = LocMemCache.get
+
+        def slow_get(cache_self, key, *args, **kwargs):
+            # Widen the read-modify-write window so publishers interleave
+            value = get(cache_self, key, *args, **kwargs)
+            if key == REPLAY_KEY:
+                time.sleep(0.001)
+            return value
+
+        def publish():
+            for i in range(25):
+                publish_event({"result_id": str(i)})
+
+        with override_settings(ANALYTICS_STREAM_REPLAY_SIZE=500), patch.object(LocMemCache, "get", slow_get):
+            threads = [threading.Thread(target=publish) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual([event["id"] for event in events_since(0)], list(range(1, 201)))
+
+    @override_settings(ANALYTICS_STREAM_REPLAY_SIZE=3)
+    def test_replay_size_is_read_at_publish_time(self):
+        from backend.analytics.stream import events_since, publish_event
+
+        for i in range(5):
+            publish_event({"result_id": str(i)})
+        self.assertIsNone(events_since(1))
+        self.assertEqual([event["id"] for event in events_since(2)], [3, 4, 5])
+
+    def test_digest_tracks_payload_changes(self):
+        from backend.analytics.stream import result_digest
+
+        self.assertEqual(result_digest({"a": 1, "b": [1, 2]}), result_digest({"b": [1, 2], "a": 1}))
+        self.assertNotEqual(result_digest({"a": 1}), result_digest({"a": 2}))
+
+    def test_completed_result_is_published_on_commit(self):
+        from backend.analytics.models import AnalyticsResult
+
+        with patch("backend.analytics.stream.publish_event") as publish_event, \
+                patch("backend.operations.tasks.fan_out_notification.delay") as fan_out:
+            with self.captureOnCommitCallbacks(execute=True):
+                result = AnalyticsResult.objects.create(analysis_type="patient_demographics", status="completed", results={})
+        self.assertEqual(publish_event.call_args.args[0]["result_id"], str(result.id))
+        fan_out.assert_called_once_with("Updated patient demographics analysis is ready", "doctors")
+
+    def test_stream_requires_authentication(self):
+        response = self.client.get("/api/analytics/stream/")
+        self.assertEqual(response.status_code, 401)
+
+
+REPORT_DATA = {
+    "patient_demographics": {
+        "age_distribution": {"0-18": 12, "19-35": 40, "36-50": 33, "51-65": 20, "65+": 9},
+        "gender_proportions": {"Male": 48.0, "Female": 50.0, "Other": 2.0},
+    },
+    "health_trends": {"top_illnesses_by_week": [{"medical_condition": f"Condition {i}", "count": 50 - i} for i in range(10)]},
+    "medication_analysis": {"medication_pareto_data": [{"medication": f"Med {i}", "frequency": 30 - i} for i in range(10)]},
+    "volume_prediction": {"evaluation_metrics": {"mae": 3.21, "rmse": 4.56}},
+    "surge_prediction": {"forecasted_monthly_cases": [{"date": f"2026-{m:02d}", "total_cases": 100 + m} for m in range(1, 7)]},
+}
+
+
+class ReportChartTests(SimpleTestCase):
+    def setUp(self):
+        from backend.analytics import charts
+
+        charts.clear_cache()
+        self.addCleanup(charts.clear_cache)
+
+    def _report(self, data=REPORT_DATA):
+        from backend.analytics.views import render_analytics_report
+
+        return render_analytics_report({
+            "hospital_info": {"name": "Test Hospital", "address": "Street 1", "phone": "1", "email": "h@example.com"},
+            "user_info": {"name": "Doctor", "role": "Doctor", "department": "General", "specialization": "General"},
+            "analytics_data": data,
+            "title": "Report",
+        })
+
+    def test_report_charts_are_vector_drawings(self):
+        from backend.analytics import views
+        from backend.analytics.charts import ChartFlowable
+
+        chart = views.create_age_distribution_chart(REPORT_DATA["patient_demographics"]["age_distribution"])
+        self.assertIsInstance(chart, ChartFlowable)
+        self.assertIsNone(views.create_forecast_chart([]))
+
+        pdf = self._report()
+        self.assertTrue(pdf.startswith(b"%PDF"))
+        self.assertNotIn(b"/Subtype /Image", pdf)
+
+    def test_charts_are_memoized_by_data(self):
+        from backend.analytics import charts, views
+
+        ages = REPORT_DATA["patient_demographics"]["age_distribution"]
+        with patch("backend.analytics.charts._build_bar", wraps=charts._build_bar) as build:
+            first = views.create_age_distribution_chart(ages)
+            second = views.create_age_distribution_chart(dict(ages))
+            self.assertIs(first.drawing, second.drawing)
+            self.assertEqual(build.call_count, 1)
+
+            views.create_age_distribution_chart(dict(ages, **{"65+": 10}))
+            self.assertEqual(build.call_count, 2)
+
+    @override_settings(CHART_CACHE_SIZE=2)
+    def test_cache_drops_least_recently_used_charts(self):
+        from backend.analytics import charts
+
+        for n in range(4):
+            charts.bar_chart("Chart", ["a"], [n], width=100, height=100)
+        self.assertEqual(len(charts._cache), 2)
+
+    def test_concurrent_reports_share_cached_charts(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        datasets = [
+            dict(REPORT_DATA, volume_prediction={"evaluation_metrics": {"mae": n, "rmse": n + 1}}) for n in range(4)
+        ] * 3
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            pdfs = list(pool.map(self._report, datasets))
+        self.assertTrue(all(pdf.startswith(b"%PDF") for pdf in pdfs))
+        # Page count is the same as a report rendered alone
+        self.assertEqual({pdf.count(b"/Type /Page\n") for pdf in pdfs}, {self._report().count(b"/Type /Page\n")})
+
+    def test_forecast_plot_does_not_use_pyplot(self):
+        import base64
+        import matplotlib.pyplot as plt
+
+        ts = weekly_series(days=30)
+        forecast = pd.DataFrame({
+            "date": pd.date_range("2024-01-31", periods=7, freq="D"),
+            "predicted": np.full(7, 50.0),
+            "confidence_lower": np.full(7, 45.0),
+            "confidence_upper": np.full(7, 55.0),
+        })
+        with patch.object(plt, "subplots", side_effect=AssertionError("pyplot used")), \
+                patch.object(plt, "figure", side_effect=AssertionError("pyplot used")):
+            png = predictive_analytics._plot_history_vs_forecast(ts, forecast)
+        self.assertTrue(base64.b64decode(png).startswith(b"\x89PNG"))
+
+
+class ModelRegistryTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        import tempfile
+        from backend.analytics.ai_insights_model import MediSyncAIInsights, generate_synthetic_data
+
+        super().setUpClass()
+        cls.model_dir = tempfile.mkdtemp()
+        cls.snapshots = generate_synthetic_data(num_samples=40)
+        MediSyncAIInsights(model_dir=cls.model_dir, load=False).train_models(cls.snapshots)
+
+    @classmethod
+    def tearDownClass(cls):
+        import shutil
+
+        shutil.rmtree(cls.model_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        from backend.analytics import model_registry
+
+        self.registry = model_registry
+        overrides = override_settings(AI_MODEL_DIR=self.model_dir, AI_MODEL_RELOAD_CHECK_SECONDS=0, AI_INFERENCE_URL="")
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        model_registry.clear()
+        self.addCleanup(model_registry.clear)
+
+    def _touch_artifacts(self, rf_bytes=None):
+        import os
+
+        path = os.path.join(self.model_dir, "rf_model.joblib")
+        if rf_bytes is not None:
+            with open(path, "wb") as f:
+                f.write(rf_bytes)
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+    def test_report_loads_the_models_once(self):
+        from backend.analytics.ai_insights_model import MediSyncAIInsights
+
+        with patch.object(MediSyncAIInsights, "load_models", autospec=True,
+                          side_effect=MediSyncAIInsights.load_models) as load:
+            ReportChartTests._report(self, REPORT_DATA)
+            ReportChartTests._report(self, REPORT_DATA)
+        self.assertEqual(load.call_count, 1)
+        self.assertIsNotNone(self.registry.local_model().rf_model)
+
+    def test_batched_predictions_match_single_ones(self):
+        model = self.registry.local_model()
+        partial = {"patient_demographics": self.snapshots[0]["patient_demographics"]}
+        snapshots = self.snapshots[:5] + [partial]
+        with patch.object(model.rf_model, "predict_proba", wraps=model.rf_model.predict_proba) as rf:
+            batched = self.registry.predict(snapshots)
+        # One model call per feature width
+        self.assertEqual(rf.call_count, 2)
+        self.assertEqual(batched, [model.predict([snapshot])[0] for snapshot in snapshots])
+        self.assertEqual(set(batched[0]), {"tensorflow", "random_forest", "consensus"})
+
+    def test_changed_artifacts_are_reloaded_in_the_background(self):
+        first = self.registry.local_model()
+        self._touch_artifacts()
+        self.assertIs(self.registry.local_model(), first)
+        self.registry._reload_thread.join()
+        reloaded = self.registry.local_model()
+        self.assertIsNot(reloaded, first)
+        self.assertEqual(reloaded.version, self.registry.artifact_version())
+
+    def test_broken_version_keeps_the_current_model(self):
+        import os
+
+        first = self.registry.local_model()
+        path = os.path.join(self.model_dir, "rf_model.joblib")
+        with open(path, "rb") as f:
+            good = f.read()
+        self.addCleanup(self._touch_artifacts, good)
+        self._touch_artifacts(b"not a model")
+        self.registry.local_model()
+        self.registry._reload_thread.join()
+        self.assertIs(self.registry.local_model(), first)
+
+    def test_predictions_come_from_the_inference_worker(self):
+        import threading
+
+        server = self.registry.make_server(port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        expected = self.registry.local_model().predict(self.snapshots[:3])
+
+        with override_settings(AI_INFERENCE_URL=f"http://127.0.0.1:{server.server_address[1]}"):
+            remote = self.registry.get_model()
+            self.assertIsInstance(remote, self.registry.RemoteInsights)
+            urlopen = self.registry.urllib.request.urlopen
+            with patch.object(self.registry.urllib.request, "urlopen", wraps=urlopen) as call:
+                self.assertEqual(self.registry.predict(self.snapshots[:3]), expected)
+            self.assertEqual(call.call_count, 1)
+            self.assertEqual(remote.version, self.registry.artifact_version())
+
+        # An unreachable worker falls back to the resident model
+        with override_settings(AI_INFERENCE_URL="http://127.0.0.1:1", AI_INFERENCE_TIMEOUT=1):
+            self.assertEqual(self.registry.predict(self.snapshots[:3]), expected)
@@ -46,9 +46,7 @@ try:
     from reportlab.graphics.charts.barcharts import VerticalBarChart
     from reportlab.graphics.charts.linecharts import HorizontalLineChart
     from reportlab.graphics import renderPDF
-    import matplotlib.pyplot as plt
-    import matplotlib
-    matplotlib.use('Agg')  # Use non-interactive backend
+    from . import charts  # Vector report charts (ReportLab graphics)
     import io
     import base64
     PDF_AVAILABLE = True
@@ -63,7 +61,8 @@ from .serializers import (
 )
 from .tasks import run_analytics_task_async
 from backend.users.models import PatientProfile
-from .ai_insights_model import MediSyncAIInsights
+from backend.operations.reports import report_response, request_report
+from . import model_registry
 
 class AnalyticsView(APIView):
     """
@@ -371,35 +370,51 @@ def system_performance(request):
         'data': data
     })
 
-# WebSocket-like endpoint for real-time updates (using Server-Sent Events)
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def analytics_stream(request):
-    """Stream analytics updates in real-time"""
-    import time
-    
-    def event_stream():
-        while True:
-            # Get latest analytics results
-            latest_results = AnalyticsResult.objects.filter(
-                status='completed'
-            ).order_by('-updated_at')[:5]
-            
-            data = {
-                'timestamp': timezone.now().isoformat(),
-                'results': AnalyticsResultSerializer(latest_results, many=True).data
-            }
-            
-            yield f"data: {json.dumps(data)}\n\n"
-            time.sleep(5)  # Update every 5 seconds
-    
+def _authenticate_stream_request(request):
+    """
+    JWT authentication for the stream endpoint. EventSource cannot set headers, so the
+    access token may also be passed as ?token=...
+    """
+    from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+    for authenticator in (AdminJWTAuthentication(), JWTAuthentication()):
+        try:
+            raw_token = request.GET.get('token')
+            if raw_token:
+                validated = authenticator.get_validated_token(raw_token)
+                user = authenticator.get_user(validated)
+            else:
+                authenticated = authenticator.authenticate(request)
+                user = authenticated[0] if authenticated else None
+            if user is not None and user.is_active:
+                return user
+        except (InvalidToken, TokenError):
+            continue
+    return None
+
+
+# Real-time analytics updates (Server-Sent Events fed by the channel layer)
+async def analytics_stream(request):
+    """
+    Stream analytics result changes. Runs on the ASGI event loop: idle connections hold
+    no worker thread and issue no queries; see backend.analytics.stream.
+    """
+    from asgiref.sync import sync_to_async
     from django.http import StreamingHttpResponse
+    from .stream import event_stream, parse_last_event_id
+
+    if request.method != 'GET':
+        return JsonResponse({'detail': 'Method not allowed.'}, status=405)
+    user = await sync_to_async(_authenticate_stream_request)(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
     response = StreamingHttpResponse(
-        event_stream(),
+        event_stream(parse_last_event_id(request)),
         content_type='text/event-stream'
     )
     response['Cache-Control'] = 'no-cache'
-    response['Connection'] = 'keep-alive'
+    response['X-Accel-Buffering'] = 'no'
     return response
 
 # Stress testing endpoint to assess API performance for doctor, nurse, and patient flows
@@ -771,8 +786,7 @@ def generate_analytics_pdf(request):
             from reportlab.lib.units import inch
             from reportlab.lib import colors
             from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT, TA_JUSTIFY
-            import matplotlib
-            matplotlib.use('Agg')
+            from . import charts
             import io
             import base64
             globals()['PDF_AVAILABLE'] = True
@@ -881,80 +895,15 @@ def generate_analytics_pdf(request):
             title = "Patient Findings Generated Report"
             user_info = None
         
-        # Generate PDF with standardized template
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="{user_role}_analytics_report_{timezone.now().strftime("%Y%m%d_%H%M%S")}.pdf"'
-        
-        # Build PDF into an in-memory buffer for reliable response writing
-        buffer = io.BytesIO()
-        # Create PDF with custom page template
-        doc = create_standardized_pdf_template(buffer, hospital_info, user_info)
-        styles = get_custom_styles()
-        story = []
-        
-        # Add standardized header
-        add_standardized_header(story, hospital_info, user_info, title, styles)
-
-        # Overview section
-        story.append(Paragraph("Overview:", styles['SectionHeaderNoBorder']))
-        story.append(Paragraph(
-            "This report provides comprehensive analytics insights for healthcare management. "
-            "It integrates patient demographics, health trends, medication patterns, and forecasting "
-            "to support evidence-based decisions and improve patient care outcomes.",
-            styles['ContentText']
-        ))
-        
-        # Executive summary at the beginning
-        try:
-            add_executive_summary_section(story, analytics_data, styles)
-        except Exception:
-            pass
-
-        # Add analytics sections with visualizations and interpretations
-        add_analytics_sections_with_visualizations(story, analytics_data, styles)
-
-        # Interpretation section (narrative + AI interpretation)
-        try:
-            add_data_interpretation_section(story, analytics_data, styles)
-        except Exception:
-            pass
-        add_ai_interpretation_section(story, analytics_data, styles)
-
-        # Factor analysis section
-        try:
-            add_factor_analysis_section(story, analytics_data, styles)
-        except Exception:
-            pass
-
-        # AI Recommendations module (priority, guidance, outcomes)
-        try:
-            role = (user_info.get('role', 'Doctor') if user_info else 'Doctor').lower()
-            add_ai_recommendations_module(story, analytics_data, role, styles)
-        except Exception:
-            pass
-
-        # Key takeaways and citations at the end
-        try:
-            add_key_takeaways_section(story, analytics_data, styles)
-        except Exception:
-            pass
-        try:
-            add_citations_section(story, styles)
-        except Exception:
-            pass
-        
-        # Prepared by signature (bottom-right)
-        if user_info:
-            add_doctor_signature(story, user_info, styles)
-        
-        # Add standardized footer
-        add_standardized_footer(story, styles)
-        
-        doc.build(story)
-        # Write generated PDF bytes to HTTP response
-        response.write(buffer.getvalue())
-        buffer.close()
-        return response
+        # Rendered by a report worker into the report store (see operations/reports.py):
+        # unchanged inputs are served from there, otherwise the client gets a job to poll
+        job = request_report(
+            'analytics',
+            {'hospital_info': hospital_info, 'user_info': user_info, 'title': title, 'analytics_data': analytics_data},
+            request.user,
+            f'{user_role}_analytics_report_{timezone.now().strftime("%Y%m%d_%H%M%S")}.pdf',
+        )
+        return report_response(job)
         
     except Exception as e:
         # Log detailed traceback to server console for debugging
@@ -968,6 +917,84 @@ def generate_analytics_pdf(request):
             'error': f'Error generating PDF report: {str(e)}'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def render_analytics_report(params):
+    """
+    Report renderer for analytics PDFs (runs on a report worker, see
+    operations/reports.py); ``params`` are the inputs gathered by generate_analytics_pdf.
+    """
+    hospital_info = params['hospital_info']
+    user_info = params.get('user_info')
+    analytics_data = params['analytics_data']
+    title = params['title']
+
+    # Build the PDF in memory; reports.py stores the bytes as the job's artifact
+    buffer = io.BytesIO()
+    # Create PDF with custom page template
+    doc = create_standardized_pdf_template(buffer, hospital_info, user_info)
+    styles = get_custom_styles()
+    story = []
+    
+    # Add standardized header
+    add_standardized_header(story, hospital_info, user_info, title, styles)
+
+    # Overview section
+    story.append(Paragraph("Overview:", styles['SectionHeaderNoBorder']))
+    story.append(Paragraph(
+        "This report provides comprehensive analytics insights for healthcare management. "
+        "It integrates patient demographics, health trends, medication patterns, and forecasting "
+        "to support evidence-based decisions and improve patient care outcomes.",
+        styles['ContentText']
+    ))
+    
+    # Executive summary at the beginning
+    try:
+        add_executive_summary_section(story, analytics_data, styles)
+    except Exception:
+        pass
+
+    # Add analytics sections with visualizations and interpretations
+    add_analytics_sections_with_visualizations(story, analytics_data, styles)
+
+    # Interpretation section (narrative + AI interpretation)
+    try:
+        add_data_interpretation_section(story, analytics_data, styles)
+    except Exception:
+        pass
+    add_ai_interpretation_section(story, analytics_data, styles)
+
+    # Factor analysis section
+    try:
+        add_factor_analysis_section(story, analytics_data, styles)
+    except Exception:
+        pass
+
+    # AI Recommendations module (priority, guidance, outcomes)
+    try:
+        role = (user_info.get('role', 'Doctor') if user_info else 'Doctor').lower()
+        add_ai_recommendations_module(story, analytics_data, role, styles)
+    except Exception:
+        pass
+
+    # Key takeaways and citations at the end
+    try:
+        add_key_takeaways_section(story, analytics_data, styles)
+    except Exception:
+        pass
+    try:
+        add_citations_section(story, styles)
+    except Exception:
+        pass
+    
+    # Prepared by signature (bottom-right)
+    if user_info:
+        add_doctor_signature(story, user_info, styles)
+    
+    # Add standardized footer
+    add_standardized_footer(story, styles)
+
+    doc.build(story)
+    return buffer.getvalue()
+
 def get_doctor_analytics_data(user):
     """Get analytics data for doctors"""
     return {
@@ -1038,6 +1065,7 @@ def get_hospital_information(user):
         'phone': '+1 (555) 123-4567',  # Default phone
         'email': 'info@medisync.healthcare'  # Default email
     }
+    return hospital_info
 
 def normalize_gender_proportions(gender_data):
     """Validate and normalize gender proportions to ensure integrity.
@@ -1089,8 +1117,6 @@ def normalize_gender_proportions(gender_data):
         # Fallback to a safe default in case of any unexpected error
         return {'Male': 50.0, 'Female': 48.0, 'Other': 2.0}
 
-    return hospital_info
-
 def get_custom_styles():
     """
     Get responsive custom styles for the standardized PDF template
@@ -1812,7 +1838,7 @@ def add_factor_analysis_section(story, analytics_data, styles):
 
     story.append(Paragraph("Factor Analysis", section_style))
     try:
-        model = MediSyncAIInsights()
+        model = model_registry.get_model()
         risk = model.get_detailed_risk_assessment(analytics_data)
     except Exception:
         risk = {}
@@ -1882,7 +1908,7 @@ def add_ai_recommendations_module(story, analytics_data, role, styles):
 
     # Build recommendations and supporting protocols
     try:
-        model = MediSyncAIInsights()
+        model = model_registry.get_model()
         insights = model.generate_insights(analytics_data) or {}
         risk_assessment = model.get_detailed_risk_assessment(analytics_data)
         protocols = model.generate_evidence_based_protocols(risk_assessment)
@@ -2175,7 +2201,7 @@ def _extract_clinical_context(analytics_data):
 
 def build_recommendations(analytics_data, role: str):
     """Return suggestions grouped by priority using MediSyncAIInsights outputs."""
-    model = MediSyncAIInsights()
+    model = model_registry.get_model()
     full = model.generate_insights(analytics_data)
     risk = (full.get('risk_assessment') or {}).get('consensus', 'moderate_risk')
     rec_list = (full.get('recommendations') or {}).get('doctors' if role == 'doctor' else 'nurses', [])
@@ -2339,37 +2365,12 @@ def add_doctor_signature(story, doctor_info, styles):
 def create_age_distribution_chart(age_data):
     """Create age distribution bar chart"""
     try:
-        # Create matplotlib figure
-        fig, ax = plt.subplots(figsize=(8, 4))
-        
-        ages = list(age_data.keys())
-        counts = list(age_data.values())
-        
-        bars = ax.bar(ages, counts, color=['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd'])
-        ax.set_xlabel('Age Groups')
-        ax.set_ylabel('Number of Patients')
-        ax.set_title('Patient Age Distribution')
-        
-        # Add value labels on bars
-        for bar in bars:
-            height = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width()/2., height,
-                   f'{int(height)}', ha='center', va='bottom')
-        
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        
-        # Convert to image for PDF
-        img_buffer = io.BytesIO()
-        plt.savefig(img_buffer, format='png', dpi=150, bbox_inches='tight')
-        img_buffer.seek(0)
-        plt.close()
-        
-        # Create ReportLab Image
-        img = Image(img_buffer, width=6*inch, height=3*inch)
-        img.hAlign = 'CENTER'
-        return img
-        
+        return charts.bar_chart(
+            'Patient Age Distribution', list(age_data.keys()), list(age_data.values()),
+            width=6*inch, height=3*inch,
+            colors=['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd'],
+            x_label='Age Groups', y_label='Number of Patients', label_angle=45,
+        )
     except Exception as e:
         print(f"Error creating age distribution chart: {e}")
         return None
@@ -2379,32 +2380,10 @@ def create_gender_pie_chart(gender_data):
     try:
         # Validate and normalize before charting
         safe_gender = normalize_gender_proportions(gender_data or {})
-
-        # Create matplotlib figure
-        fig, ax = plt.subplots(figsize=(6, 6))
-        
-        genders = list(safe_gender.keys())
-        percentages = list(safe_gender.values())
-        colors_list = ['#ff9999', '#66b3ff', '#99ff99', '#ffcc99']
-        
-        wedges, texts, autotexts = ax.pie(percentages, labels=genders, autopct='%1.1f%%',
-                                         colors=colors_list[:len(genders)], startangle=90)
-        
-        ax.set_title('Gender Distribution')
-        
-        plt.tight_layout()
-        
-        # Convert to image for PDF
-        img_buffer = io.BytesIO()
-        plt.savefig(img_buffer, format='png', dpi=150, bbox_inches='tight')
-        img_buffer.seek(0)
-        plt.close()
-        
-        # Create ReportLab Image
-        img = Image(img_buffer, width=4*inch, height=4*inch)
-        img.hAlign = 'CENTER'
-        return img
-        
+        return charts.pie_chart(
+            'Gender Distribution', list(safe_gender.keys()), list(safe_gender.values()),
+            size=4*inch, colors=['#ff9999', '#66b3ff', '#99ff99', '#ffcc99'],
+        )
     except Exception as e:
         print(f"Error creating gender pie chart: {e}")
         return None
@@ -2412,36 +2391,13 @@ def create_gender_pie_chart(gender_data):
 def create_illness_trends_chart(illness_data):
     """Create illness trends bar chart"""
     try:
-        # Create matplotlib figure
-        fig, ax = plt.subplots(figsize=(10, 5))
-        
         illnesses = [item.get('medical_condition', 'Unknown')[:20] for item in illness_data[:8]]  # Top 8, truncate names
         counts = [item.get('count', 0) for item in illness_data[:8]]
-        
-        bars = ax.barh(illnesses, counts, color='#2ca02c')
-        ax.set_xlabel('Number of Cases')
-        ax.set_ylabel('Medical Conditions')
-        ax.set_title('Top Medical Conditions by Frequency')
-        
-        # Add value labels on bars
-        for i, bar in enumerate(bars):
-            width = bar.get_width()
-            ax.text(width, bar.get_y() + bar.get_height()/2.,
-                   f'{int(width)}', ha='left', va='center')
-        
-        plt.tight_layout()
-        
-        # Convert to image for PDF
-        img_buffer = io.BytesIO()
-        plt.savefig(img_buffer, format='png', dpi=150, bbox_inches='tight')
-        img_buffer.seek(0)
-        plt.close()
-        
-        # Create ReportLab Image
-        img = Image(img_buffer, width=7*inch, height=4*inch)
-        img.hAlign = 'CENTER'
-        return img
-        
+        return charts.bar_chart(
+            'Top Medical Conditions by Frequency', illnesses, counts,
+            width=7*inch, height=4*inch, colors=['#2ca02c'], horizontal=True,
+            x_label='Number of Cases', y_label='Medical Conditions',
+        )
     except Exception as e:
         print(f"Error creating illness trends chart: {e}")
         return None
@@ -2449,36 +2405,13 @@ def create_illness_trends_chart(illness_data):
 def create_medication_chart(medication_data):
     """Create medication frequency bar chart"""
     try:
-        # Create matplotlib figure
-        fig, ax = plt.subplots(figsize=(10, 5))
-        
         medications = [item.get('medication', 'Unknown')[:15] for item in medication_data[:8]]  # Top 8, truncate names
         frequencies = [item.get('frequency', 0) for item in medication_data[:8]]
-        
-        bars = ax.barh(medications, frequencies, color='#ff7f0e')
-        ax.set_xlabel('Prescription Frequency')
-        ax.set_ylabel('Medications')
-        ax.set_title('Most Prescribed Medications')
-        
-        # Add value labels on bars
-        for i, bar in enumerate(bars):
-            width = bar.get_width()
-            ax.text(width, bar.get_y() + bar.get_height()/2.,
-                   f'{int(width)}', ha='left', va='center')
-        
-        plt.tight_layout()
-        
-        # Convert to image for PDF
-        img_buffer = io.BytesIO()
-        plt.savefig(img_buffer, format='png', dpi=150, bbox_inches='tight')
-        img_buffer.seek(0)
-        plt.close()
-        
-        # Create ReportLab Image
-        img = Image(img_buffer, width=7*inch, height=4*inch)
-        img.hAlign = 'CENTER'
-        return img
-        
+        return charts.bar_chart(
+            'Most Prescribed Medications', medications, frequencies,
+            width=7*inch, height=4*inch, colors=['#ff7f0e'], horizontal=True,
+            x_label='Prescription Frequency', y_label='Medications',
+        )
     except Exception as e:
         print(f"Error creating medication chart: {e}")
         return None
@@ -2486,38 +2419,12 @@ def create_medication_chart(medication_data):
 def create_metrics_chart(metrics):
     """Create model performance metrics chart"""
     try:
-        # Create matplotlib figure
-        fig, ax = plt.subplots(figsize=(6, 4))
-        
-        metric_names = ['MAE', 'RMSE']
-        metric_values = [
-            float(metrics.get('mae', 0)),
-            float(metrics.get('rmse', 0))
-        ]
-        
-        bars = ax.bar(metric_names, metric_values, color=['#d62728', '#9467bd'])
-        ax.set_ylabel('Error Value')
-        ax.set_title('Model Performance Metrics')
-        
-        # Add value labels on bars
-        for bar in bars:
-            height = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width()/2., height,
-                   f'{height:.2f}', ha='center', va='bottom')
-        
-        plt.tight_layout()
-        
-        # Convert to image for PDF
-        img_buffer = io.BytesIO()
-        plt.savefig(img_buffer, format='png', dpi=150, bbox_inches='tight')
-        img_buffer.seek(0)
-        plt.close()
-        
-        # Create ReportLab Image
-        img = Image(img_buffer, width=4*inch, height=3*inch)
-        img.hAlign = 'CENTER'
-        return img
-        
+        return charts.bar_chart(
+            'Model Performance Metrics', ['MAE', 'RMSE'],
+            [float(metrics.get('mae', 0)), float(metrics.get('rmse', 0))],
+            width=4*inch, height=3*inch, colors=['#d62728', '#9467bd'],
+            value_format='%.2f', y_label='Error Value',
+        )
     except Exception as e:
         print(f"Error creating metrics chart: {e}")
         return None
@@ -2525,36 +2432,13 @@ def create_metrics_chart(metrics):
 def create_forecast_chart(forecast_data):
     """Create forecast line chart"""
     try:
-        # Create matplotlib figure
-        fig, ax = plt.subplots(figsize=(8, 4))
-        
         dates = [item.get('date', 'Unknown') for item in forecast_data[:6]]
         cases = [item.get('total_cases', 0) for item in forecast_data[:6]]
-        
-        ax.plot(dates, cases, marker='o', linewidth=2, markersize=6, color='#1f77b4')
-        ax.set_xlabel('Month')
-        ax.set_ylabel('Predicted Cases')
-        ax.set_title('6-Month Illness Surge Forecast')
-        
-        # Add value labels on points
-        for i, (date, case) in enumerate(zip(dates, cases)):
-            ax.annotate(f'{int(case)}', (i, case), textcoords="offset points", 
-                       xytext=(0,10), ha='center')
-        
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        
-        # Convert to image for PDF
-        img_buffer = io.BytesIO()
-        plt.savefig(img_buffer, format='png', dpi=150, bbox_inches='tight')
-        img_buffer.seek(0)
-        plt.close()
-        
-        # Create ReportLab Image
-        img = Image(img_buffer, width=6*inch, height=3*inch)
-        img.hAlign = 'CENTER'
-        return img
-        
+        return charts.line_chart(
+            '6-Month Illness Surge Forecast', dates, cases,
+            width=6*inch, height=3*inch, colors=['#1f77b4'],
+            x_label='Month', y_label='Predicted Cases', label_angle=45,
+        )
     except Exception as e:
         print(f"Error creating forecast chart: {e}")
         return None
@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.signals import worker_process_init
 from django.conf import settings
 
 # Set the default Django settings module for the 'celery' program.
@@ -28,6 +29,10 @@ app.conf.beat_schedule = {
         'task': 'backend.analytics.tasks.refresh_analytics_cache',
         'schedule': 1800.0,  # Run every 30 minutes
     },
+    'reconcile-incremental-analytics': {
+        'task': 'backend.analytics.tasks.reconcile_incremental_analytics',
+        'schedule': 21600.0,  # Run every 6 hours
+    },
     'auto-close-queues': {
         'task': 'backend.operations.tasks.auto_close_queues',
         'schedule': 300.0,  # Run every 5 minutes
@@ -36,6 +41,26 @@ app.conf.beat_schedule = {
         'task': 'backend.operations.tasks.retry_failed_notifications',
         'schedule': 900.0,  # Run every 15 minutes
     },
+    'reconcile-notification-counters': {
+        'task': 'backend.operations.tasks.reconcile_notification_counters',
+        'schedule': 86400.0,  # Run daily
+    },
+    'expire-attachment-uploads': {
+        'task': 'backend.operations.tasks.expire_attachment_uploads',
+        'schedule': 3600.0,  # Run every hour
+    },
+    'prune-notification-log': {
+        'task': 'backend.operations.tasks.prune_notification_log',
+        'schedule': 86400.0,  # Run daily
+    },
+    'index-message-search-backlog': {
+        'task': 'backend.operations.tasks.index_message_search_backlog',
+        'schedule': 60.0,  # Run every minute
+    },
+    'prune-report-artifacts': {
+        'task': 'backend.operations.tasks.prune_report_artifacts',
+        'schedule': 86400.0,  # Run daily
+    },
     'update-queue-statistics': {
         'task': 'backend.operations.tasks.update_queue_statistics',
         'schedule': 120.0,  # Run every 2 minutes
@@ -44,6 +69,15 @@ app.conf.beat_schedule = {
 
 app.conf.timezone = 'UTC'
 
+
+@worker_process_init.connect
+def load_ai_models(**kwargs):
+    """Load the AI insights models once per worker process, before it renders any report."""
+    from backend.analytics import model_registry
+
+    model_registry.warm()
+
+
 @app.task(bind=True)
 def debug_task(self):
     print(f'Request: {self.request!r}')
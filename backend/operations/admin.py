@@ -16,6 +16,7 @@ from .models import (
     QueueSchedule,
     QueueStatus,
     QueueStatusLog,
+    DepartmentServiceStats,
 )
 
 
@@ -102,8 +103,8 @@ class DoctorAvailabilityAdmin(admin.ModelAdmin):
 
 @admin.register(MessageNotification)
 class MessageNotificationAdmin(admin.ModelAdmin):
-    list_display = ('recipient', 'message', 'notification_type', 'is_sent', 'created_at')
-    list_filter = ('notification_type', 'is_sent', 'created_at')
+    list_display = ('recipient', 'message', 'notification_type', 'seq', 'created_at')
+    list_filter = ('notification_type', 'created_at')
     search_fields = ('recipient__full_name', 'message__content')
 
 
@@ -199,3 +200,10 @@ class QueueStatusLogAdmin(admin.ModelAdmin):
             'fields': ('changed_by', 'changed_at', 'additional_notes')
         })
     )
+
+
+@admin.register(DepartmentServiceStats)
+class DepartmentServiceStatsAdmin(admin.ModelAdmin):
+    list_display = ('department', 'sample_count', 'ewma_seconds', 'window_mean_seconds', 'p50_seconds', 'p90_seconds', 'updated_at')
+    list_filter = ('department',)
+    readonly_fields = ('updated_at',)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class OperationsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "backend.operations"
+
+    def ready(self):
+        # Import signal handlers when the app is ready
+        import backend.operations.signals
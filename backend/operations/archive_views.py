@@ -6,14 +6,14 @@ from django.utils import timezone
 from datetime import datetime
 from django.core.cache import cache
 from django.db import transaction
-from django.http import HttpResponse
 import os
 
 from backend.users.models import User, GeneralDoctorProfile
 from backend.users.models import PatientProfile
 from .models import PatientAssessmentArchive, ArchiveAccessLog
 from .serializers import PatientAssessmentArchiveSerializer, ArchiveAccessLogSerializer
-from .pdf_service import generate_archive_pdf
+from .pdf_service import archive_report_content
+from .reports import report_response, request_report
 
 import hmac
 import hashlib
@@ -425,30 +425,24 @@ def archive_create(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def archive_export(request, archive_id):
-    """Export a single archived assessment as a PDF with header and selected forms."""
+    """
+    Export a single archived assessment as a PDF with header and selected forms.
+    The PDF is rendered by a report worker (see reports.py): an unchanged record is
+    served from the report store, otherwise a 202 with the job to poll is returned.
+    """
     start_time = timezone.now()
     try:
-        record = PatientAssessmentArchive.objects.filter(id=archive_id).first()
+        record = PatientAssessmentArchive.objects.select_related('user', 'patient_profile').filter(id=archive_id).first()
         if not record:
             return Response({'error': 'Archive record not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        cache_key = f"archives:export_pdf:{archive_id}"
-        cached_pdf = cache.get(cache_key)
-        if cached_pdf:
-            try:
-                ArchiveAccessLog.objects.create(
-                    user=request.user, action='export', record=record,
-                    duration_ms=int((timezone.now()-start_time).total_seconds()*1000),
-                )
-            except Exception:
-                pass
-            return HttpResponse(cached_pdf, content_type='application/pdf', headers={
-                'Content-Disposition': f'attachment; filename="archive_{archive_id}.pdf"'
-            })
-
-        # Generate the PDF bytes using the pdf service
-        pdf_bytes = generate_archive_pdf(record)
-        cache.set(cache_key, pdf_bytes, timeout=180)
+        job = request_report(
+            'archive',
+            {'archive_id': record.id},
+            request.user,
+            f'archive_{archive_id}.pdf',
+            content=archive_report_content(record),
+        )
 
         try:
             ArchiveAccessLog.objects.create(
@@ -458,9 +452,7 @@ def archive_export(request, archive_id):
         except Exception:
             pass
 
-        return HttpResponse(pdf_bytes, content_type='application/pdf', headers={
-            'Content-Disposition': f'attachment; filename="archive_{archive_id}.pdf"'
-        })
+        return report_response(job)
     except Exception as e:
         return Response({'error': f'Failed to export archive: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -0,0 +1,123 @@
+"""
+Helpers for async-native REST views served on the ASGI event loop.
+
+DRF function views are synchronous: under Daphne every request holds a worker
+thread for its whole lifetime, including channel-layer round trips made through
+``async_to_sync``. Views built with these helpers are ``async def``:
+
+- ``async_api_view`` gives them what ``@api_view`` + ``IsAuthenticated`` gave the
+  sync views: a DRF ``Request`` (parsers, ``request.data``/``query_params``), the
+  configured authentication classes, 401/405 handling and DRF-rendered responses
+- ``run_db`` runs a block of ORM work off the loop on a small shared pool
+  (``CHAT_API_DB_THREADS`` threads, each keeping its own database connection);
+  Django's own async ORM would hand every query to a thread created per request,
+  so a thousand open requests meant a thousand threads and connections again.
+  ``CHAT_API_DB_THREADS = 0`` uses that per-request thread instead (tests, where
+  the test case's transaction must be visible)
+- everything that is not ORM work (serialization of loaded rows, channel-layer
+  sends) stays on the event loop
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor(threads):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="chat-api-db")
+        return _executor
+
+
+def _drop_broken_connections():
+    """
+    ``close_old_connections`` without the CONN_MAX_AGE check: pool threads are few
+    and long-lived, so they keep their connections and only drop ones that broke.
+    """
+    for conn in connections.all(initialized_only=True):
+        if conn.connection is None:
+            continue
+        if conn.get_autocommit() != conn.settings_dict['AUTOCOMMIT']:
+            conn.close()
+        elif conn.errors_occurred:
+            if conn.is_usable():
+                conn.errors_occurred = False
+            else:
+                conn.close()
+
+
+def _with_connection_checks(func):
+    @wraps(func)
+    def inner(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _drop_broken_connections()
+    return inner
+
+
+async def run_db(func, *args, **kwargs):
+    """Await ``func(*args, **kwargs)`` (synchronous ORM work) without blocking the event loop."""
+    threads = getattr(settings, 'CHAT_API_DB_THREADS', 8)
+    if threads <= 0:
+        return await sync_to_async(func)(*args, **kwargs)
+    call = sync_to_async(_with_connection_checks(func), thread_sensitive=False, executor=_get_executor(threads))
+    return await call(*args, **kwargs)
+
+
+def render(data, status_code=status.HTTP_200_OK, headers=None):
+    """A DRF ``Response`` rendered as JSON outside of an APIView."""
+    response = Response(data, status=status_code, headers=headers)
+    response.accepted_renderer = JSONRenderer()
+    response.accepted_media_type = 'application/json'
+    response.renderer_context = {}
+    return response.render()
+
+
+def async_api_view(methods):
+    """``@api_view(methods)`` with ``IsAuthenticated`` for ``async def`` views."""
+    def decorator(view):
+        @csrf_exempt
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                detail = exceptions.MethodNotAllowed(request.method).detail
+                return render({'detail': detail}, status.HTTP_405_METHOD_NOT_ALLOWED, {'Allow': ', '.join(methods)})
+
+            request = Request(
+                request,
+                parsers=[parser() for parser in api_settings.DEFAULT_PARSER_CLASSES],
+                authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES],
+            )
+            try:
+                # Authenticators may hit the database (user lookup, sessions, tokens)
+                user = await run_db(lambda: request.user)
+                if not user or not user.is_authenticated:
+                    raise exceptions.NotAuthenticated()
+            except exceptions.APIException as e:
+                headers = None
+                if isinstance(e, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+                    header = request.authenticators[0].authenticate_header(request) if request.authenticators else None
+                    if header:
+                        headers = {'WWW-Authenticate': header}
+                    else:
+                        e.status_code = status.HTTP_403_FORBIDDEN
+                return render({'detail': e.detail}, e.status_code, headers)
+            return await view(request, *args, **kwargs)
+        return wrapper
+    return decorator
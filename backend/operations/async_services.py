@@ -367,16 +367,17 @@ class AsyncNotificationService:
             if notification_ids:
                 filter_kwargs['id__in'] = notification_ids
             
-            # Get notifications to update
-            notifications = await AsyncModelManager.filter_objects(
-                Notification, **filter_kwargs
-            )
-            
-            # Update each notification
-            updated_count = 0
-            for notification in notifications:
-                await AsyncModelManager.update_object(notification, is_read=True)
-                updated_count += 1
+            def _mark_read():
+                from .notification_fanout import decrement_unread, reset_unread
+
+                updated = Notification.objects.filter(**filter_kwargs).update(is_read=True)
+                if notification_ids:
+                    decrement_unread(user_id, updated)
+                else:
+                    reset_unread(user_id)
+                return updated
+
+            updated_count = await sync_to_async(_mark_read)()
             
             return updated_count
         except Exception as e:
@@ -398,45 +399,18 @@ class AsyncNotificationService:
             Dictionary with notification statistics
         """
         try:
-            from django.contrib.auth import get_user_model
-            User = get_user_model()
-            
-            # Get all patient users
-            patients = await sync_to_async(list)(
-                User.objects.filter(role='patient').select_related('patient_profile')
-            )
-            
-            notifications_created = []
-            notifications_failed = []
-            
-            for patient in patients:
-                try:
-                    # Create notification record
-                    notification = await AsyncModelManager.create_object(
-                        Notification,
-                        user=patient,
-                        message=message,
-                        channel=Notification.CHANNEL_WEBSOCKET,
-                        delivery_status=Notification.DELIVERY_PENDING,
-                        delivery_attempts=0
-                    )
-                    notifications_created.append(notification)
-                    
-                except Exception as e:
-                    logger.error(f"Failed to create notification for patient {patient.id}: {str(e)}")
-                    notifications_failed.append({
-                        'patient_id': patient.id,
-                        'error': str(e)
-                    })
+            from .notification_fanout import fan_out
+
+            # Batched inserts plus one broadcast to the patients group
+            result = await sync_to_async(fan_out)(message, 'patients')
             
-            logger.info(f"Created {len(notifications_created)} notifications for queue opening. Failed: {len(notifications_failed)}")
+            logger.info(f"Created {result['recipients']} notifications for queue opening")
             
             return {
                 'success': True,
-                'total_patients': len(patients),
-                'notifications_created': len(notifications_created),
-                'notifications_failed': len(notifications_failed),
-                'notification_ids': [n.id for n in notifications_created]
+                'total_patients': result['recipients'],
+                'notifications_created': result['recipients'],
+                'notifications_failed': 0,
             }
             
         except Exception as e:
@@ -0,0 +1,160 @@
+"""
+Pluggable storage backends for message attachments.
+
+Attachments live outside MEDIA_ROOT, under content-addressed keys (see
+attachments.py), and Django never streams their bytes:
+
+- ``LocalAttachmentStorage`` keeps files under ``ATTACHMENT_STORAGE_ROOT``. Downloads
+  are handed to the front proxy with ``X-Accel-Redirect`` (nginx, internal location
+  ``ATTACHMENT_ACCEL_PREFIX`` aliased to the storage root) or ``X-Sendfile``
+  (Apache/lighttpd), which answer Range requests themselves.
+  ``ATTACHMENT_SERVE_MODE = 'django'`` serves through FileResponse for local development.
+- ``S3AttachmentStorage`` talks to any S3-compatible bucket (AWS, MinIO) through
+  boto3. Downloads redirect to a short-lived presigned URL, and the object store
+  handles Range requests.
+- ``get_storage()`` builds the configured backend once per process.
+"""
+
+import io
+import logging
+import os
+import shutil
+from functools import lru_cache
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import FileResponse, HttpResponse, HttpResponseRedirect
+from django.utils.http import content_disposition_header
+
+logger = logging.getLogger(__name__)
+
+
+class LocalAttachmentStorage:
+    def __init__(self, root, serve_mode="accel", accel_prefix="/protected-attachments/"):
+        self.root = os.path.abspath(root)
+        self.serve_mode = serve_mode
+        self.accel_prefix = accel_prefix
+
+    def path(self, key):
+        path = os.path.abspath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid attachment key: {key}")
+        return path
+
+    def put_file(self, local_path, key, content_type=None):
+        """Move a finished staging file into the store under ``key``."""
+        destination = self.path(key)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        shutil.move(local_path, destination)
+
+    def save_bytes(self, key, data, content_type=None):
+        destination = self.path(key)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        with open(destination, "wb") as f:
+            f.write(data)
+
+    def open(self, key):
+        return open(self.path(key), "rb")
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def download_response(self, key, file_name, content_type, inline=False):
+        if self.serve_mode == "django":
+            return FileResponse(
+                self.open(key), content_type=content_type, as_attachment=not inline, filename=file_name
+            )
+        response = HttpResponse(content_type=content_type)
+        if self.serve_mode == "sendfile":
+            response["X-Sendfile"] = self.path(key)
+        else:
+            response["X-Accel-Redirect"] = self.accel_prefix.rstrip("/") + "/" + quote(key)
+        response["Content-Disposition"] = content_disposition_header(not inline, file_name)
+        return response
+
+
+class S3AttachmentStorage:
+    def __init__(self, bucket, endpoint_url=None, region=None, access_key=None, secret_key=None, url_ttl=300):
+        try:
+            import boto3
+        except ImportError as e:
+            raise RuntimeError("boto3 is required for the S3 attachment storage backend. Please install it.") from e
+        self.bucket = bucket
+        self.url_ttl = url_ttl
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            region_name=region or None,
+            aws_access_key_id=access_key or None,
+            aws_secret_access_key=secret_key or None,
+        )
+
+    def put_file(self, local_path, key, content_type=None):
+        extra = {"ContentType": content_type} if content_type else None
+        self.client.upload_file(local_path, self.bucket, key, ExtraArgs=extra)
+        os.remove(local_path)
+
+    def save_bytes(self, key, data, content_type=None):
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data, ContentType=content_type or "application/octet-stream")
+
+    def open(self, key):
+        body = self.client.get_object(Bucket=self.bucket, Key=key)["Body"]
+        return io.BytesIO(body.read())
+
+    def exists(self, key):
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+            return True
+        except ClientError:
+            return False
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def download_response(self, key, file_name, content_type, inline=False):
+        url = self.client.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": key,
+                "ResponseContentType": content_type,
+                "ResponseContentDisposition": content_disposition_header(not inline, file_name),
+            },
+            ExpiresIn=self.url_ttl,
+        )
+        return HttpResponseRedirect(url)
+
+
+@lru_cache(maxsize=None)
+def get_storage():
+    backend = getattr(settings, "ATTACHMENT_STORAGE_BACKEND", "local")
+    if backend == "s3":
+        return S3AttachmentStorage(
+            bucket=settings.ATTACHMENT_S3_BUCKET,
+            endpoint_url=getattr(settings, "ATTACHMENT_S3_ENDPOINT_URL", None),
+            region=getattr(settings, "ATTACHMENT_S3_REGION", None),
+            access_key=getattr(settings, "ATTACHMENT_S3_ACCESS_KEY", None),
+            secret_key=getattr(settings, "ATTACHMENT_S3_SECRET_KEY", None),
+            url_ttl=getattr(settings, "ATTACHMENT_URL_TTL", 300),
+        )
+    return LocalAttachmentStorage(
+        root=settings.ATTACHMENT_STORAGE_ROOT,
+        serve_mode=getattr(settings, "ATTACHMENT_SERVE_MODE", "accel"),
+        accel_prefix=getattr(settings, "ATTACHMENT_ACCEL_PREFIX", "/protected-attachments/"),
+    )
+
+
+@receiver(setting_changed)
+def reset_storage(setting, **kwargs):
+    if setting.startswith("ATTACHMENT_"):
+        get_storage.cache_clear()
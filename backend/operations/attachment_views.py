@@ -0,0 +1,119 @@
+import re
+
+from django.http import HttpResponseRedirect
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from .attachment_storage import get_storage
+from .attachments import (
+    OffsetMismatch, UploadError, append_chunk, complete_upload, create_upload, upload_payload,
+)
+from .models import AttachmentUpload, Conversation, Message
+
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+|\*)$')
+
+
+def _own_upload(request, upload_id):
+    return AttachmentUpload.objects.filter(id=upload_id, user=request.user).select_related('blob').first()
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def create_attachment_upload(request, conversation_id):
+    """Open a resumable upload session for an attachment to this conversation."""
+    conversation = Conversation.objects.filter(id=conversation_id, participants=request.user).first()
+    if not conversation:
+        return Response({'error': 'Conversation not found or access denied'}, status=status.HTTP_404_NOT_FOUND)
+    try:
+        upload = create_upload(
+            request.user,
+            conversation,
+            request.data.get('file_name'),
+            request.data.get('content_type'),
+            request.data.get('size'),
+        )
+    except UploadError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(upload_payload(upload), status=status.HTTP_201_CREATED)
+
+
+@api_view(['GET', 'PUT'])
+@permission_classes([IsAuthenticated])
+def attachment_upload_detail(request, upload_id):
+    """
+    GET: the session's state, including the offset to resume from.
+    PUT: one chunk as the raw request body with ``Content-Range: bytes <start>-<end>/<total>``.
+    """
+    upload = _own_upload(request, upload_id)
+    if not upload:
+        return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+    if request.method == 'GET':
+        return Response(upload_payload(upload))
+
+    match = CONTENT_RANGE.match(request.META.get('HTTP_CONTENT_RANGE', ''))
+    if not match:
+        return Response(
+            {'error': 'Content-Range: bytes <start>-<end>/<total> is required'}, status=status.HTTP_400_BAD_REQUEST
+        )
+    start, end = int(match.group(1)), int(match.group(2))
+    if end < start:
+        return Response({'error': 'Content-Range end is before its start'}, status=status.HTTP_400_BAD_REQUEST)
+    if match.group(3) != '*' and int(match.group(3)) != upload.total_size:
+        return Response(
+            {'error': f"Content-Range total does not match the declared size {upload.total_size}"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    try:
+        upload = append_chunk(upload.id, start, request.stream, end - start + 1)
+    except OffsetMismatch as e:
+        return Response({'error': str(e), 'offset': e.offset}, status=status.HTTP_409_CONFLICT)
+    except UploadError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(upload_payload(upload))
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def complete_attachment_upload(request, upload_id):
+    """Hash and store a fully received upload; pass its upload_id to send_message afterwards."""
+    upload = _own_upload(request, upload_id)
+    if not upload:
+        return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+    try:
+        upload, _ = complete_upload(upload.id)
+    except UploadError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    data = upload_payload(upload)
+    data['sha256'] = upload.blob.sha256
+    return Response(data)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def download_message_attachment(request, message_id):
+    """
+    Hand the attachment of a message to the proxy or object store; ``?thumbnail=1``
+    serves the image thumbnail. Range requests are answered there, not by Django.
+    """
+    message = Message.objects.filter(
+        id=message_id, conversation__participants=request.user
+    ).select_related('attachment').first()
+    if not message:
+        return Response({'error': 'Message not found or access denied'}, status=status.HTTP_404_NOT_FOUND)
+
+    if message.attachment is None:
+        if message.file_attachment:
+            return HttpResponseRedirect(message.file_attachment.url)
+        return Response({'error': 'Message has no attachment'}, status=status.HTTP_404_NOT_FOUND)
+
+    blob = message.attachment
+    content_type = message.attachment_content_type or 'application/octet-stream'
+    if request.query_params.get('thumbnail'):
+        if not blob.thumbnail_key:
+            return Response({'error': 'Thumbnail not available yet'}, status=status.HTTP_404_NOT_FOUND)
+        return get_storage().download_response(blob.thumbnail_key, f"thumb-{message.file_name}.jpg", 'image/jpeg', inline=True)
+    inline = content_type.startswith('image/') or content_type == 'application/pdf'
+    return get_storage().download_response(blob.storage_key, message.file_name, content_type, inline=inline)
+
@@ -0,0 +1,273 @@
+"""
+Resumable chunked uploads and content-addressed storage for message attachments.
+
+``CreateMessageSerializer`` used to take the whole file through Django's upload
+handling, and ``send_message`` saved the message a second time to fill in
+``file_name``/``file_size``. Attachments now go through upload sessions:
+
+- ``create_upload`` validates name, type and declared size, then opens an
+  ``AttachmentUpload`` with an empty staging file under ``ATTACHMENT_STAGING_DIR``
+- ``append_chunk`` writes one chunk at the session's current offset. A mismatched
+  offset raises ``OffsetMismatch`` carrying the offset to resume from.
+- ``complete_upload`` hashes the staging file. If a blob with the same SHA-256 already
+  exists it is reused (deduplicated); otherwise the file moves into the storage
+  backend (attachment_storage.py) under ``blobs/<aa>/<bb>/<sha256>``. Image blobs get
+  a thumbnail from a Celery task. Blobs are shared across users, so clients are never
+  told whether theirs was deduplicated, and the content type each sender declared is
+  kept on their message rather than on the blob.
+- ``expire_uploads`` drops staging files of sessions that were never completed
+
+``send_message`` links a completed session with ``upload_id``; the message is saved
+once with ``attachment``, ``file_name`` and ``file_size`` already set.
+"""
+
+import hashlib
+import io
+import logging
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from .attachment_storage import get_storage
+from .models import AttachmentBlob, AttachmentUpload
+
+logger = logging.getLogger(__name__)
+
+ALLOWED_CONTENT_TYPES = [
+    'image/jpeg', 'image/png', 'image/gif', 'application/pdf', 'text/plain', 'application/msword',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+]
+THUMBNAIL_CONTENT_TYPES = {'image/jpeg', 'image/png', 'image/gif'}
+THUMBNAIL_SIZE = (320, 320)
+READ_BLOCK = 64 * 1024
+
+
+class UploadError(ValueError):
+    pass
+
+
+class OffsetMismatch(UploadError):
+    def __init__(self, offset):
+        super().__init__(f"Chunk does not start at the current upload offset {offset}")
+        self.offset = offset
+
+
+def max_attachment_size():
+    return getattr(settings, 'ATTACHMENT_MAX_SIZE', 10 * 1024 * 1024)
+
+
+def max_chunk_size():
+    return getattr(settings, 'ATTACHMENT_MAX_CHUNK_SIZE', 4 * 1024 * 1024)
+
+
+def staging_path(upload):
+    return os.path.join(settings.ATTACHMENT_STAGING_DIR, f"{upload.id}.part")
+
+
+def blob_key(sha256):
+    return f"blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+def thumbnail_key(sha256):
+    return f"thumbnails/{sha256[:2]}/{sha256}.jpg"
+
+
+def create_upload(user, conversation, file_name, content_type, total_size):
+    """Open an upload session for a file of ``total_size`` bytes."""
+    file_name = os.path.basename(file_name or '').strip()
+    if not file_name:
+        raise UploadError("file_name is required")
+    if content_type not in ALLOWED_CONTENT_TYPES:
+        raise UploadError("File type not allowed")
+    try:
+        total_size = int(total_size)
+    except (TypeError, ValueError):
+        raise UploadError("size must be an integer")
+    if total_size <= 0:
+        raise UploadError("size must be positive")
+    if total_size > max_attachment_size():
+        raise UploadError(f"File size cannot exceed {max_attachment_size() // (1024 * 1024)}MB")
+
+    ttl = timedelta(hours=getattr(settings, 'ATTACHMENT_UPLOAD_TTL_HOURS', 24))
+    upload = AttachmentUpload.objects.create(
+        user=user,
+        conversation=conversation,
+        file_name=file_name[:255],
+        content_type=content_type,
+        total_size=total_size,
+        expires_at=timezone.now() + ttl,
+    )
+    os.makedirs(settings.ATTACHMENT_STAGING_DIR, exist_ok=True)
+    open(staging_path(upload), 'wb').close()
+    return upload
+
+
+def append_chunk(upload_id, offset, stream, length):
+    """
+    Write ``length`` bytes read from ``stream`` at ``offset`` of the upload.
+    Returns the updated session; raises OffsetMismatch when ``offset`` is not the
+    session's current offset and UploadError for anything else.
+    """
+    if length <= 0 or length > max_chunk_size():
+        raise UploadError(f"Chunks must be between 1 byte and {max_chunk_size()} bytes")
+
+    with transaction.atomic():
+        upload = AttachmentUpload.objects.select_for_update().get(id=upload_id)
+        if upload.status != 'pending':
+            raise UploadError(f"Upload is {upload.status}")
+        if offset != upload.received_bytes:
+            raise OffsetMismatch(upload.received_bytes)
+        if offset + length > upload.total_size:
+            raise UploadError("Chunk extends past the declared file size")
+
+        written = 0
+        with open(staging_path(upload), 'r+b') as f:
+            # Drop bytes a previously interrupted request wrote past the committed offset
+            f.seek(offset)
+            f.truncate()
+            while written < length:
+                block = stream.read(min(READ_BLOCK, length - written))
+                if not block:
+                    break
+                f.write(block)
+                written += len(block)
+        if written != length:
+            raise UploadError(f"Expected {length} bytes, received {written}")
+
+        upload.received_bytes = offset + written
+        upload.save(update_fields=['received_bytes', 'updated_at'])
+    return upload
+
+
+def _sha256_of(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_BLOCK * 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def complete_upload(upload_id):
+    """
+    Finish an upload whose bytes have all arrived. Returns (upload, deduplicated):
+    the session with ``blob`` set, and whether an existing blob was reused (for logs
+    only; it says whether someone else already uploaded the same file).
+    """
+    with transaction.atomic():
+        upload = AttachmentUpload.objects.select_for_update().select_related('blob').get(id=upload_id)
+        if upload.status == 'completed':
+            return upload, False
+        if upload.status != 'pending':
+            raise UploadError(f"Upload is {upload.status}")
+        if upload.received_bytes != upload.total_size:
+            raise UploadError(f"Upload incomplete: {upload.received_bytes} of {upload.total_size} bytes received")
+
+        path = staging_path(upload)
+        sha256 = _sha256_of(path)
+        blob = AttachmentBlob.objects.filter(sha256=sha256).first()
+        deduplicated = blob is not None
+        if deduplicated:
+            os.remove(path)
+        else:
+            key = blob_key(sha256)
+            get_storage().put_file(path, key)
+            try:
+                with transaction.atomic():
+                    blob = AttachmentBlob.objects.create(sha256=sha256, size=upload.total_size, storage_key=key)
+            except IntegrityError:
+                # Another session stored the same bytes concurrently; both wrote identical content
+                blob = AttachmentBlob.objects.get(sha256=sha256)
+                deduplicated = True
+        if upload.content_type in THUMBNAIL_CONTENT_TYPES and not blob.thumbnail_key:
+            schedule_thumbnail(blob.id)
+        if deduplicated:
+            logger.info(f"Upload {upload.id} reuses attachment blob {blob.id}")
+
+        upload.blob = blob
+        upload.status = 'completed'
+        upload.save(update_fields=['blob', 'status', 'updated_at'])
+    return upload, deduplicated
+
+
+def schedule_thumbnail(blob_id):
+    """Queue thumbnail generation in Celery after the current transaction commits."""
+    def _dispatch():
+        from .tasks import generate_attachment_thumbnail
+
+        try:
+            generate_attachment_thumbnail.delay(blob_id)
+        except Exception as e:
+            logger.warning(f"Celery unavailable for attachment thumbnail, running inline: {str(e)}")
+            generate_thumbnail(blob_id)
+
+    transaction.on_commit(_dispatch)
+
+
+def generate_thumbnail(blob_id):
+    """Store a JPEG thumbnail of an image blob; returns the thumbnail key or None (not an image)."""
+    from PIL import Image
+
+    blob = AttachmentBlob.objects.filter(id=blob_id).first()
+    if blob is None or blob.thumbnail_key:
+        return getattr(blob, 'thumbnail_key', None) or None
+
+    storage = get_storage()
+    try:
+        with storage.open(blob.storage_key) as f:
+            image = Image.open(f)
+            image.thumbnail(THUMBNAIL_SIZE)
+            buffer = io.BytesIO()
+            image.convert('RGB').save(buffer, format='JPEG', quality=80)
+    except Exception as e:
+        logger.warning(f"Failed to create thumbnail for attachment {blob.sha256}: {str(e)}")
+        return None
+
+    key = thumbnail_key(blob.sha256)
+    storage.save_bytes(key, buffer.getvalue(), 'image/jpeg')
+    AttachmentBlob.objects.filter(id=blob.id).update(thumbnail_key=key)
+    return key
+
+
+def expire_uploads(now=None):
+    """Expire pending sessions past their deadline and remove their staging files."""
+    now = now or timezone.now()
+    expired = list(AttachmentUpload.objects.filter(status='pending', expires_at__lt=now))
+    for upload in expired:
+        try:
+            os.remove(staging_path(upload))
+        except FileNotFoundError:
+            pass
+    AttachmentUpload.objects.filter(id__in=[upload.id for upload in expired]).update(status='expired', updated_at=now)
+    return len(expired)
+
+
+def upload_payload(upload):
+    return {
+        'upload_id': str(upload.id),
+        'file_name': upload.file_name,
+        'content_type': upload.content_type,
+        'size': upload.total_size,
+        'offset': upload.received_bytes,
+        'status': upload.status,
+        'max_chunk_size': max_chunk_size(),
+        'expires_at': upload.expires_at.isoformat(),
+    }
+
+
+def attachment_payload(message):
+    """What MessageSerializer exposes about a stored attachment (None for legacy/no attachment)."""
+    blob = message.attachment
+    if blob is None:
+        return None
+    url = reverse('download_message_attachment', args=[message.id])
+    return {
+        'sha256': blob.sha256,
+        'size': blob.size,
+        'content_type': message.attachment_content_type,
+        'download_url': url,
+        'thumbnail_url': f"{url}?thumbnail=1" if blob.thumbnail_key else None,
+    }
@@ -0,0 +1,142 @@
+"""
+Serialize-once event bus for chat WebSocket events.
+
+``send_message`` used to re-serialize the message for the event and then call
+``async_to_sync(group_send)`` once per participant on the request thread, so every
+send waited on one channel-layer round trip per recipient. Events now go through
+this module:
+
+- ``encode`` builds the JSON text of an event once; ``MessageConsumer.chat_event``
+  forwards that text as-is, so no consumer re-encodes it
+- ``publish`` sends one ``chat.event`` to all recipient groups in a single
+  ``async_to_sync`` call, the group sends running concurrently
+- the send happens after commit on a small publisher thread pool
+  (``CHAT_EVENTS_PUBLISHER_THREADS``; 0 publishes inline), so the view returns
+  without waiting on Redis
+- new messages carry the payload the view already serialized for its response;
+  receipts (see receipts.py) only carry ids and timestamps
+- async views (chat_views.py) use the ``apublish*`` variants and await the sends
+  on their own event loop once their transaction has committed
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPE = "chat.event"
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+
+
+def user_group(user_id):
+    return f"messaging_{user_id}"
+
+
+def encode(event_type, **body):
+    """The WebSocket text of an event, encoded once for every recipient."""
+    return json.dumps({"type": event_type, **body}, cls=DjangoJSONEncoder, separators=(",", ":"))
+
+
+async def group_send_all(groups, event):
+    """Send one event to several groups concurrently (usable directly from consumers)."""
+    layer = get_channel_layer()
+    results = await asyncio.gather(*(layer.group_send(group, event) for group in groups), return_exceptions=True)
+    for group, result in zip(groups, results):
+        if isinstance(result, Exception):
+            logger.warning(f"Failed to publish chat event to {group}: {str(result)}")
+
+
+def publish_now(groups, text):
+    """Send pre-encoded ``text`` to every group in one channel-layer call, on the calling thread."""
+    if not groups:
+        return
+    try:
+        async_to_sync(group_send_all)(list(groups), {"type": EVENT_TYPE, "text": text})
+    except Exception as e:
+        logger.warning(f"Failed to publish chat event: {str(e)}")
+
+
+def _get_executor(threads):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="chat-events")
+        return _executor
+
+
+def publish(groups, text):
+    """Hand the event to the publisher pool (or send inline when it is disabled)."""
+    groups = list(groups)
+    if not groups:
+        return None
+    threads = getattr(settings, "CHAT_EVENTS_PUBLISHER_THREADS", 2)
+    if threads <= 0:
+        publish_now(groups, text)
+        return None
+    future = _get_executor(threads).submit(publish_now, groups, text)
+    _pending.add(future)
+    future.add_done_callback(_pending.discard)
+    return future
+
+
+def publish_on_commit(groups, text):
+    groups = list(groups)
+    transaction.on_commit(lambda: publish(groups, text))
+
+
+def wait_for_pending(timeout=None):
+    """Block until queued events are sent (tests, benchmarks, worker shutdown)."""
+    wait(list(_pending), timeout=timeout)
+
+
+async def apublish(groups, text):
+    """Send pre-encoded ``text`` from async code (async views), awaiting the channel layer on the caller's loop."""
+    groups = list(groups)
+    if groups:
+        await group_send_all(groups, {"type": EVENT_TYPE, "text": text})
+
+
+def _new_message_event(message, message_data, participant_ids, seqs):
+    recipients = [user_group(user_id) for user_id in participant_ids if user_id != message.sender_id]
+    body = {"message": message_data}
+    if seqs:
+        body["seqs"] = {str(user_id): seq for user_id, seq in seqs.items()}
+    return recipients, encode("new_message", **body)
+
+
+def publish_new_message(message, message_data, participant_ids, seqs=None):
+    """
+    Push an already serialized message to every participant except its sender.
+    ``seqs`` maps recipient ids to the message's position in their notification log,
+    so clients can acknowledge it and resume after it (see notification_log.py).
+    """
+    publish_on_commit(*_new_message_event(message, message_data, participant_ids, seqs))
+
+
+async def apublish_new_message(message, message_data, participant_ids, seqs=None):
+    """``publish_new_message`` for async callers whose transaction has already committed."""
+    await apublish(*_new_message_event(message, message_data, participant_ids, seqs))
+
+
+def publish_receipt(sender_id, kind, receipt):
+    publish([user_group(sender_id)], encode(f"messages_{kind}", receipt=receipt))
+
+
+async def apublish_receipts(kind, receipts):
+    """Send the {sender_id: receipt} result of receipts.mark(..., publish=False) concurrently."""
+    await asyncio.gather(*(
+        apublish([user_group(sender_id)], encode(f"messages_{kind}", receipt=receipt))
+        for sender_id, receipt in receipts.items()
+    ))
@@ -0,0 +1,217 @@
+"""
+Async chat REST endpoints: conversation list, message history, send and react.
+
+These were sync DRF function views: each request held a thread from start to
+finish and pushed WebSocket events through ``async_to_sync``. They now run on the
+ASGI event loop next to the consumers (see async_api.py):
+
+- each view does its ORM work in one ``run_db`` call (reads, or the whole write
+  transaction) and serializes loaded rows on the loop
+- ``send_message`` and the read receipts from ``get_messages`` are published after
+  the transaction with a native ``await`` on the channel layer (chat_events)
+- request/response shapes are unchanged
+"""
+
+import os
+
+from django.db import transaction
+from rest_framework import status
+
+from . import chat_events
+from .async_api import async_api_view, render, run_db
+from .inbox import inbox_for, record_message
+from .message_history import InvalidCursor, message_page, parse_limit, serialize_page
+from .models import AttachmentUpload, Conversation, Message, MessageReaction
+from .receipts import READ, mark_read
+from .serializers import ConversationInboxSerializer, CreateMessageSerializer, CreateReactionSerializer, MessageSerializer
+
+
+def _conversation_for(user, conversation_id):
+    return Conversation.objects.filter(id=conversation_id, participants=user).first()
+
+
+@async_api_view(['GET'])
+async def get_conversations(request):
+    """
+    Get all conversations for the current user
+    """
+    try:
+        # Conversations from the user's denormalized inbox (one indexed query, no message prefetch)
+        entries = await run_db(lambda: list(inbox_for(request.user)))
+        serializer = ConversationInboxSerializer(entries, many=True, context={'request': request})
+        return render(serializer.data)
+    except Exception as e:
+        return render({
+            'error': f'Failed to fetch conversations: {str(e)}'
+        }, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@async_api_view(['GET'])
+async def get_messages(request, conversation_id):
+    """
+    Get one page of messages for a specific conversation.
+    Query params: before / after (cursors from a previous page), limit (default 50);
+    without a cursor the newest page is returned. See message_history.py.
+    """
+    try:
+        user = request.user
+        conversation = await run_db(_conversation_for, user, conversation_id)
+        if not conversation:
+            return render({
+                'error': 'Conversation not found or access denied'
+            }, status.HTTP_404_NOT_FOUND)
+
+        # Get one keyset page of messages (reactions prefetched for the page only)
+        try:
+            page = await run_db(
+                message_page,
+                conversation,
+                before=request.query_params.get('before') or None,
+                after=request.query_params.get('after') or None,
+                limit=parse_limit(request.query_params.get('limit')),
+            )
+        except InvalidCursor as e:
+            return render({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
+        data = serialize_page(page)
+
+        # Mark messages as read (and delivered) in one UPDATE; senders get one batched receipt
+        receipts = await run_db(mark_read, conversation, user, publish=False)
+        await chat_events.apublish_receipts(READ, receipts)
+
+        return render(data)
+
+    except Exception as e:
+        return render({
+            'error': f'Failed to fetch messages: {str(e)}'
+        }, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class UploadNotReady(Exception):
+    pass
+
+
+def _store_message(conversation, user, serializer):
+    """Save the message and everything that follows from it in one transaction."""
+    from .message_search import schedule_indexing
+
+    with transaction.atomic():
+        # File information is known up front, so the message is saved once
+        attachment_fields = {}
+        upload_id = serializer.validated_data.pop('upload_id', None)
+        file_attachment = serializer.validated_data.get('file_attachment')
+        if upload_id:
+            upload = AttachmentUpload.objects.select_related('blob').filter(
+                id=upload_id, user=user, conversation=conversation, status='completed'
+            ).first()
+            if not upload:
+                raise UploadNotReady()
+            attachment_fields = {
+                'attachment': upload.blob,
+                'file_name': upload.file_name,
+                'file_size': upload.blob.size,
+                'attachment_content_type': upload.content_type,
+            }
+        elif file_attachment:
+            attachment_fields = {
+                'file_name': os.path.basename(file_attachment.name),
+                'file_size': file_attachment.size,
+            }
+
+        message = serializer.save(
+            conversation=conversation,
+            sender=user,
+            **attachment_fields
+        )
+
+        # Update conversation timestamp and every participant's inbox row
+        conversation.save()
+        participant_ids = list(conversation.participants.values_list('id', flat=True))
+        record_message(message, participant_ids)
+
+        # Append to each recipient's notification log and queue the search index update
+        seqs = message.create_notifications(participant_ids)
+        schedule_indexing(message.id)
+
+        # Serialize once for both the response and the WebSocket event
+        message_data = MessageSerializer(message).data
+    return message, message_data, participant_ids, seqs
+
+
+@async_api_view(['POST'])
+async def send_message(request, conversation_id):
+    """
+    Send a message to a conversation
+    """
+    try:
+        user = request.user
+        conversation = await run_db(_conversation_for, user, conversation_id)
+        if not conversation:
+            return render({
+                'error': 'Conversation not found or access denied'
+            }, status.HTTP_404_NOT_FOUND)
+
+        serializer = CreateMessageSerializer(data=request.data)
+        if not serializer.is_valid():
+            return render(serializer.errors, status.HTTP_400_BAD_REQUEST)
+        try:
+            message, message_data, participant_ids, seqs = await run_db(_store_message, conversation, user, serializer)
+        except UploadNotReady:
+            return render({
+                'error': 'Attachment upload not found or not completed'
+            }, status.HTTP_400_BAD_REQUEST)
+
+        # Committed: push the event to the other participants on this event loop
+        await chat_events.apublish_new_message(message, message_data, participant_ids, seqs)
+        return render(message_data, status.HTTP_201_CREATED)
+
+    except Exception as e:
+        return render({
+            'error': f'Failed to send message: {str(e)}'
+        }, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def _toggle_reaction(message, user, reaction_type):
+    """Remove the user's reaction of this type, or replace their other reactions with it."""
+    existing_reaction = MessageReaction.objects.filter(message=message, user=user, reaction_type=reaction_type).first()
+    if existing_reaction:
+        existing_reaction.delete()
+        return None
+    MessageReaction.objects.filter(message=message, user=user).exclude(reaction_type=reaction_type).delete()
+    return MessageReaction.objects.create(message=message, user=user, reaction_type=reaction_type)
+
+
+@async_api_view(['POST'])
+async def add_reaction(request, message_id):
+    """
+    Add a reaction to a message
+    """
+    try:
+        user = request.user
+        message = await run_db(
+            lambda: Message.objects.filter(id=message_id, conversation__participants=user).first()
+        )
+        if not message:
+            return render({
+                'error': 'Message not found or access denied'
+            }, status.HTTP_404_NOT_FOUND)
+
+        serializer = CreateReactionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return render(serializer.errors, status.HTTP_400_BAD_REQUEST)
+
+        reaction = await run_db(_toggle_reaction, message, user, serializer.validated_data['reaction_type'])
+        if reaction is None:
+            return render({
+                'message': 'Reaction removed',
+                'action': 'removed'
+            })
+        return render({
+            'message': 'Reaction added',
+            'action': 'added',
+            'reaction': CreateReactionSerializer(reaction).data
+        }, status.HTTP_201_CREATED)
+
+    except Exception as e:
+        return render({
+            'error': f'Failed to add reaction: {str(e)}'
+        }, status.HTTP_500_INTERNAL_SERVER_ERROR)
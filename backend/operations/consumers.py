@@ -1,9 +1,15 @@
 import json
+import time
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from .models import Message, MessageNotification, Conversation, QueueStatus, QueueSchedule
-from .serializers import MessageSerializer, MessageNotificationSerializer, QueueStatusSerializer, QueueScheduleSerializer
+from . import notification_log, presence
+from .chat_events import EVENT_TYPE, encode, group_send_all
+from .models import Message, Conversation, QueueStatus, QueueSchedule
+from .serializers import MessageSerializer, QueueStatusSerializer, QueueScheduleSerializer
 
 User = get_user_model()
 
@@ -11,6 +17,15 @@ class MessageConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.user_id = self.scope['url_route']['kwargs']['user_id']
         self.user_group_name = f'messaging_{self.user_id}'
+        self.conversation_peers = {}
+        self.typing_sent = {}
+        
+        # The socket's history, notification replay and presence are the user's
+        # own, so only that user may open it
+        user = self.scope.get('user')
+        if not (user and user.is_authenticated and str(user.id) == str(self.user_id)):
+            await self.close(code=4403)
+            return
         
         # Join user group
         await self.channel_layer.group_add(
@@ -18,10 +33,23 @@ class MessageConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
         
+        # Join the audience group used for role-wide announcements and the
+        # hospital's presence group (see presence.py)
+        self.audience_group_name, self.hospital_name = await self.get_user_context()
+        self.presence_group_name = presence.presence_group(self.hospital_name)
+        for group in (self.audience_group_name, self.presence_group_name):
+            if group:
+                await self.channel_layer.group_add(group, self.channel_name)
+        
         await self.accept()
         
-        # Send any pending notifications
-        await self.send_pending_notifications()
+        # Replay the notifications missed since the client's last_seq (or the last ack)
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        await self.send_notification_replay(query.get('last_seq', [None])[0], skip_empty=True)
+        
+        # Mark the user online and send who else is
+        await self.refresh_presence()
+        await self.send_presence_snapshot()
 
     async def disconnect(self, close_code):
         # Leave user group
@@ -29,20 +57,105 @@ class MessageConsumer(AsyncWebsocketConsumer):
             self.user_group_name,
             self.channel_name
         )
+        for group in (getattr(self, 'audience_group_name', None), getattr(self, 'presence_group_name', None)):
+            if group:
+                await self.channel_layer.group_discard(group, self.channel_name)
+        if getattr(self, 'presence_group_name', None):
+            went_offline = await sync_to_async(presence.disconnect)(self.user_id, self.hospital_name, self.channel_name)
+            if went_offline:
+                await self.broadcast_presence(False)
+
+    @database_sync_to_async
+    def get_user_context(self):
+        """Audience group of the user's role for fanned-out notifications, and their hospital"""
+        from .notification_fanout import audience_for_role, audience_group
+
+        try:
+            row = User.objects.filter(id=self.user_id).values_list('role', 'hospital_name').first()
+        except (TypeError, ValueError):
+            return None, None
+        role, hospital_name = row or (None, None)
+        audience = audience_for_role(role)
+        return (audience_group(audience) if audience else None), hospital_name
+
+    async def refresh_presence(self):
+        """Connect/heartbeat: extend this connection's presence TTL, announcing the user if they just came online"""
+        if not self.presence_group_name:
+            return
+        came_online = await sync_to_async(presence.connect)(self.user_id, self.hospital_name, self.channel_name)
+        if came_online:
+            await self.broadcast_presence(True)
+
+    async def broadcast_presence(self, online):
+        await group_send_all([self.presence_group_name], {
+            'type': EVENT_TYPE,
+            'text': encode('presence', user_id=int(self.user_id), online=online),
+        })
+
+    async def send_presence_snapshot(self):
+        if not self.presence_group_name:
+            return
+        online = await sync_to_async(presence.online_user_ids)(self.hospital_name)
+        await self.send(text_data=encode('presence_snapshot', online=sorted(online), ttl=presence.presence_ttl()))
+
+    @database_sync_to_async
+    def get_conversation_peers(self, conversation_id):
+        """Other participants of a conversation the user is in (None if not a participant)"""
+        participant_ids = list(
+            Conversation.objects.filter(id=conversation_id).values_list('participants__id', flat=True)
+        )
+        if int(self.user_id) not in participant_ids:
+            return None
+        return [pid for pid in participant_ids if pid != int(self.user_id)]
+
+    async def send_typing(self, conversation_id, is_typing):
+        """
+        Relay a typing indicator to the other participants as an ephemeral event.
+        Repeats of the same state are dropped within PRESENCE_TYPING_INTERVAL seconds.
+        """
+        try:
+            conversation_id = int(conversation_id)
+        except (TypeError, ValueError):
+            return
+        is_typing = bool(is_typing)
+        now = time.monotonic()
+        last_state, last_sent = self.typing_sent.get(conversation_id, (None, 0.0))
+        interval = getattr(settings, 'PRESENCE_TYPING_INTERVAL', 3)
+        if last_state == is_typing and now - last_sent < interval:
+            return
+
+        if conversation_id not in self.conversation_peers:
+            self.conversation_peers[conversation_id] = await self.get_conversation_peers(conversation_id)
+        peers = self.conversation_peers[conversation_id]
+        if not peers:
+            return
+        self.typing_sent[conversation_id] = (is_typing, now)
+        await group_send_all([f'messaging_{peer}' for peer in peers], {
+            'type': EVENT_TYPE,
+            'text': encode('typing', conversation_id=conversation_id, user_id=int(self.user_id), is_typing=is_typing),
+        })
 
     async def receive(self, text_data):
         try:
             text_data_json = json.loads(text_data)
             message_type = text_data_json.get('type')
             
-            if message_type == 'mark_notification_sent':
+            if message_type == 'ack':
+                await self.ack_notifications(text_data_json.get('seq'))
+            elif message_type == 'mark_notification_sent':
                 notification_id = text_data_json.get('notification_id')
                 await self.mark_notification_as_sent(notification_id)
             elif message_type == 'mark_message_read':
                 message_id = text_data_json.get('message_id')
                 await self.mark_message_as_read(message_id)
-            elif message_type == 'get_notifications':
-                await self.send_pending_notifications()
+            elif message_type in ('resume', 'get_notifications'):
+                await self.send_notification_replay(text_data_json.get('last_seq'))
+            elif message_type == 'load_more':
+                await self.send_message_history(text_data_json)
+            elif message_type == 'heartbeat':
+                await self.refresh_presence()
+            elif message_type == 'typing':
+                await self.send_typing(text_data_json.get('conversation_id'), text_data_json.get('is_typing', True))
                 
         except json.JSONDecodeError:
             await self.send(text_data=json.dumps({
@@ -50,29 +163,9 @@ class MessageConsumer(AsyncWebsocketConsumer):
                 'message': 'Invalid JSON'
             }))
 
-    async def new_message(self, event):
-        """Send new message to WebSocket"""
-        message_data = event['message']
-        await self.send(text_data=json.dumps({
-            'type': 'new_message',
-            'message': message_data
-        }))
-
-    async def message_delivered(self, event):
-        """Send message delivered notification to WebSocket"""
-        message_data = event['message']
-        await self.send(text_data=json.dumps({
-            'type': 'message_delivered',
-            'message': message_data
-        }))
-
-    async def message_read(self, event):
-        """Send message read notification to WebSocket"""
-        message_data = event['message']
-        await self.send(text_data=json.dumps({
-            'type': 'message_read',
-            'message': message_data
-        }))
+    async def chat_event(self, event):
+        """Forward a chat event that chat_events already encoded (new_message, messages_read, ...)"""
+        await self.send(text_data=event['text'])
 
     async def notification(self, event):
         """Send notification to WebSocket"""
@@ -84,60 +177,88 @@ class MessageConsumer(AsyncWebsocketConsumer):
 
     @database_sync_to_async
     def mark_notification_as_sent(self, notification_id):
-        """Mark notification as sent"""
+        """Acknowledge the log up to this notification (see notification_log.py)"""
+        return notification_log.ack_notification(self.user_id, notification_id)
+
+    async def ack_notifications(self, seq):
+        """Advance the user's acknowledged position to ``seq``"""
         try:
-            notification = MessageNotification.objects.get(
-                id=notification_id,
-                recipient_id=self.user_id
-            )
-            notification.is_sent = True
-            notification.save()
-            return True
-        except MessageNotification.DoesNotExist:
-            return False
+            await database_sync_to_async(notification_log.ack)(self.user_id, seq)
+        except (TypeError, ValueError):
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'message': 'Invalid seq'
+            }))
 
     @database_sync_to_async
     def mark_message_as_read(self, message_id):
-        """Mark message as read"""
+        """Mark message (and every earlier one in its conversation) as read"""
+        from .receipts import mark_read
+
         try:
             message = Message.objects.get(
                 id=message_id,
                 conversation__participants__id=self.user_id
             )
-            if not message.is_read and message.sender_id != self.user_id:
-                message.is_read = True
-                message.save()
+            if not message.is_read and str(message.sender_id) != str(self.user_id):
+                mark_read(message.conversation_id, int(self.user_id), up_to_id=message.id)
                 
-                # Create read notification for sender
-                MessageNotification.objects.create(
-                    message=message,
-                    recipient=message.sender,
-                    notification_type='message_read'
-                )
+                # Log a read notification for the sender
+                notification_log.append(message, [message.sender_id], 'message_read')
                 return True
         except Message.DoesNotExist:
             pass
         return False
 
     @database_sync_to_async
-    def get_pending_notifications(self):
-        """Get pending notifications for user"""
-        notifications = MessageNotification.objects.filter(
-            recipient_id=self.user_id,
-            is_sent=False
-        ).order_by('-created_at')[:20]
-        
-        return MessageNotificationSerializer(notifications, many=True).data
+    def get_message_history(self, conversation_id, before=None, after=None, limit=None):
+        """One keyset page of a conversation the user participates in (see message_history.py)"""
+        from .message_history import message_page, parse_limit, serialize_page
 
-    async def send_pending_notifications(self):
-        """Send pending notifications to WebSocket"""
-        notifications = await self.get_pending_notifications()
-        
-        for notification in notifications:
+        conversation = Conversation.objects.filter(id=conversation_id, participants__id=self.user_id).first()
+        if not conversation:
+            return None
+        page = message_page(conversation, before=before, after=after, limit=parse_limit(limit))
+        return serialize_page(page)
+
+    async def send_message_history(self, request):
+        """Answer a load_more command with the next page before/after the given cursor"""
+        from .message_history import InvalidCursor
+
+        conversation_id = request.get('conversation_id')
+        try:
+            page = await self.get_message_history(
+                conversation_id,
+                before=request.get('before'),
+                after=request.get('after'),
+                limit=request.get('limit'),
+            )
+        except (InvalidCursor, ValueError):
+            page = None
+        if page is None:
+            await self.send(text_data=json.dumps({
+                'type': 'error',
+                'message': 'Conversation not found or invalid cursor'
+            }))
+            return
+        await self.send(text_data=json.dumps({
+            'type': 'message_history',
+            'conversation_id': conversation_id,
+            **page
+        }, default=str))
+
+    async def send_notification_replay(self, last_seq=None, skip_empty=False):
+        """Send every notification after ``last_seq`` in one notification_replay frame"""
+        try:
+            replay = await database_sync_to_async(notification_log.replay)(self.user_id, last_seq)
+        except (TypeError, ValueError):
             await self.send(text_data=json.dumps({
-                'type': 'notification',
-                'notification': notification
+                'type': 'error',
+                'message': 'Invalid last_seq'
             }))
+            return
+        if replay['notifications'] or not skip_empty:
+            await self.send(text_data=encode('notification_replay', **replay))
 
 
 class QueueStatusConsumer(AsyncWebsocketConsumer):
@@ -166,8 +287,9 @@ class QueueStatusConsumer(AsyncWebsocketConsumer):
         
         await self.accept()
         
-        # Send current queue status
+        # Send current queue status and the snapshot that queue_delta events patch
         await self.send_current_queue_status()
+        await self.send_current_queue_snapshot()
 
     async def disconnect(self, close_code):
         # Leave groups
@@ -191,6 +313,9 @@ class QueueStatusConsumer(AsyncWebsocketConsumer):
                 await self.send_current_queue_status()
             elif message_type == 'get_queue_schedule':
                 await self.send_current_queue_schedule()
+            elif message_type == 'get_queue_snapshot':
+                # Clients resync with this when they miss a delta version
+                await self.send_current_queue_snapshot()
                 
         except json.JSONDecodeError:
             await self.send(text_data=json.dumps({
@@ -206,6 +331,13 @@ class QueueStatusConsumer(AsyncWebsocketConsumer):
             'status': status_data
         }))
 
+    async def queue_delta(self, event):
+        """Send a versioned join/serve/leave/status delta for the department snapshot"""
+        await self.send(text_data=json.dumps({
+            'type': 'queue_delta',
+            'delta': event['delta']
+        }))
+
     async def queue_schedule_update(self, event):
         """Send queue schedule update to WebSocket"""
         schedule_data = event['schedule']
@@ -282,6 +414,19 @@ class QueueStatusConsumer(AsyncWebsocketConsumer):
             'status': status_data
         }))
 
+    @database_sync_to_async
+    def get_current_queue_snapshot(self):
+        """Get the cached department snapshot (rebuilt from the database on a miss)"""
+        from .queue_snapshot import queue_snapshots
+        return queue_snapshots.get(self.department)
+
+    async def send_current_queue_snapshot(self):
+        snapshot = await self.get_current_queue_snapshot()
+        await self.send(text_data=json.dumps({
+            'type': 'queue_snapshot',
+            'snapshot': snapshot
+        }))
+
     async def send_current_queue_schedule(self):
         schedule_data = await self.get_current_queue_schedule()
         await self.send(text_data=json.dumps({
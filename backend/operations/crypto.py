@@ -0,0 +1,126 @@
+"""
+Shared Fernet cipher for encrypted message content and archived assessments.
+
+``Message`` and ``PatientAssessmentArchive`` used to build a new ``Fernet`` (and
+re-read settings) on every encrypt/decrypt call, and stored each token wrapped in
+a second base64 layer. This module keeps one cipher per purpose for the process:
+
+- keys come from ``MESSAGE_ENCRYPTION_KEYS`` / ``MESSAGE_ENCRYPTION_KEY`` (archives
+  look at ``ARCHIVE_ENCRYPTION_KEYS`` / ``ARCHIVE_ENCRYPTION_KEY`` first); the first
+  key encrypts, every key decrypts (``MultiFernet``), so a new key can be put in
+  front while old rows are still readable
+- tokens are stored as the Fernet token itself (already url-safe base64); rows in
+  the old double-encoded format (prefix ``LEGACY_PREFIX``) are still accepted and
+  are rewritten by migration 0037
+- ``decrypt_many`` decrypts a whole page with one cipher lookup; the list
+  serializers call it once per page through ``Message.decrypt_batch`` /
+  ``PatientAssessmentArchive.decrypt_batch``
+- without a valid key nothing is encrypted (``encrypt`` returns ``""``) and callers
+  fall back to the plaintext columns, as before
+"""
+
+import base64
+import logging
+from functools import lru_cache
+
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+MESSAGES = "messages"
+ARCHIVES = "archives"
+
+# base64 of "gAAAAA", the start of every Fernet token: marks the old double-encoded format
+LEGACY_PREFIX = "Z0FBQUFB"
+
+KEY_SETTINGS = {
+    MESSAGES: ("MESSAGE_ENCRYPTION_KEYS", "MESSAGE_ENCRYPTION_KEY"),
+    ARCHIVES: (
+        "ARCHIVE_ENCRYPTION_KEYS", "ARCHIVE_ENCRYPTION_KEY",
+        "MESSAGE_ENCRYPTION_KEYS", "MESSAGE_ENCRYPTION_KEY",
+    ),
+}
+
+
+def configured_keys(purpose=MESSAGES):
+    """Keys for ``purpose`` in priority order (the first one encrypts), without duplicates."""
+    keys = []
+    for name in KEY_SETTINGS[purpose]:
+        value = getattr(settings, name, None)
+        if not value:
+            continue
+        for key in [value] if isinstance(value, (str, bytes)) else value:
+            key = key.encode() if isinstance(key, str) else key
+            if key and key not in keys:
+                keys.append(key)
+    return keys
+
+
+@lru_cache(maxsize=None)
+def get_cipher(purpose=MESSAGES):
+    """The process-wide MultiFernet for ``purpose``, or None when no valid key is configured."""
+    fernets = []
+    for key in configured_keys(purpose):
+        try:
+            fernets.append(Fernet(key))
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Ignoring invalid {purpose} encryption key: {str(e)}")
+    if not fernets:
+        logger.warning(f"No valid {purpose} encryption key configured; content is stored unencrypted")
+        return None
+    return MultiFernet(fernets)
+
+
+@receiver(setting_changed)
+def reset_cipher(setting, **kwargs):
+    if "ENCRYPTION_KEY" in setting:
+        get_cipher.cache_clear()
+
+
+def strip_legacy_encoding(stored):
+    """Turn an old double-base64 value into the plain Fernet token (no key needed)."""
+    if stored and stored.startswith(LEGACY_PREFIX):
+        return base64.b64decode(stored).decode()
+    return stored
+
+
+def encrypt(plaintext, purpose=MESSAGES):
+    """Fernet token for ``plaintext`` as a str, or ``""`` when encryption is unavailable."""
+    cipher = get_cipher(purpose)
+    if cipher is None:
+        return ""
+    return cipher.encrypt(plaintext.encode()).decode()
+
+
+def _decrypt(cipher, stored):
+    try:
+        return cipher.decrypt(strip_legacy_encoding(stored).encode()).decode()
+    except (InvalidToken, ValueError):
+        return None
+
+
+def decrypt(stored, purpose=MESSAGES):
+    """Plaintext of a stored token, or None when it is empty or cannot be decrypted."""
+    cipher = get_cipher(purpose) if stored else None
+    if cipher is None:
+        return None
+    return _decrypt(cipher, stored)
+
+
+def decrypt_many(stored_values, purpose=MESSAGES):
+    """``decrypt`` for a sequence of stored tokens, returned in the same order."""
+    cipher = get_cipher(purpose)
+    if cipher is None:
+        return [None] * len(stored_values)
+    return [_decrypt(cipher, stored) if stored else None for stored in stored_values]
+
+
+def rotate(stored, purpose=MESSAGES):
+    """Re-encrypt ``stored`` under the current first key (for key rotation jobs)."""
+    cipher = get_cipher(purpose)
+    if cipher is None or not stored:
+        return stored
+    return cipher.rotate(strip_legacy_encoding(stored).encode()).decode()
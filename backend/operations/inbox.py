@@ -0,0 +1,111 @@
+"""
+Denormalized conversation inbox.
+
+``get_conversations`` used to serialize each conversation with three extra
+queries (last message, unread count, other participant) on top of prefetching
+every message of every conversation. Each participant now has a
+``ConversationInbox`` row holding what the list shows, so the inbox is one
+indexed query on ``(user, -last_activity_at)``:
+
+- ``ensure_entries`` creates the rows when a conversation is created
+- ``record_message`` moves the last-message columns for everyone and bumps the
+  recipients' ``unread_count`` (two UPDATEs), called from ``send_message``
+- ``record_read`` lowers the reader's count by the messages a receipt flipped
+- ``rebuild_inbox`` recomputes rows from the messages table
+"""
+
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import Conversation, ConversationInbox, Message
+
+PREVIEW_LENGTH = 255
+
+
+def preview_of(message):
+    text = message.content or ""
+    return text[:PREVIEW_LENGTH]
+
+
+def ensure_entries(conversation, participant_ids=None):
+    """Create missing inbox rows for the participants of ``conversation``."""
+    if participant_ids is None:
+        participant_ids = list(conversation.participants.values_list("id", flat=True))
+    ConversationInbox.objects.bulk_create(
+        [
+            ConversationInbox(
+                conversation=conversation,
+                user_id=user_id,
+                other_participant_id=next((other for other in participant_ids if other != user_id), None),
+                last_activity_at=conversation.created_at,
+            )
+            for user_id in participant_ids
+        ],
+        ignore_conflicts=True,
+    )
+    return participant_ids
+
+
+def record_message(message, participant_ids=None):
+    """Make ``message`` the last message of its conversation in every participant's inbox."""
+    ensure_entries(message.conversation, participant_ids)
+    common = {
+        "last_message_id": message.id,
+        "last_message_sender_id": message.sender_id,
+        "last_message_preview": preview_of(message),
+        "last_message_has_attachment": message.has_attachment,
+        "last_activity_at": message.created_at,
+    }
+    entries = ConversationInbox.objects.filter(conversation_id=message.conversation_id)
+    entries.filter(user_id=message.sender_id).update(**common)
+    entries.exclude(user_id=message.sender_id).update(unread_count=F("unread_count") + 1, **common)
+
+
+def record_read(conversation_id, user_id, count):
+    """Lower ``user_id``'s unread counter after ``count`` messages were marked read."""
+    if count:
+        ConversationInbox.objects.filter(conversation_id=conversation_id, user_id=user_id).update(
+            unread_count=Greatest(F("unread_count") - count, 0)
+        )
+
+
+def inbox_for(user):
+    """The user's active conversations, most recent activity first, with everything the list renders."""
+    return (
+        ConversationInbox.objects.filter(user=user, conversation__is_active=True)
+        .select_related("conversation", "other_participant")
+        .order_by("-last_activity_at", "-conversation_id")
+    )
+
+
+def inbox_entry(user, conversation):
+    return ConversationInbox.objects.select_related("conversation", "other_participant").get(
+        user=user, conversation=conversation
+    )
+
+
+def rebuild_inbox(conversations=None):
+    """Recompute inbox rows of ``conversations`` (default: all) from their messages."""
+    if conversations is None:
+        conversations = Conversation.objects.all()
+    for conversation in conversations.prefetch_related("participants").iterator(chunk_size=500):
+        participant_ids = [p.id for p in conversation.participants.all()]
+        ensure_entries(conversation, participant_ids)
+        last = Message.objects.filter(conversation=conversation).order_by("-created_at", "-id").first()
+        unread = dict(
+            Message.objects.filter(conversation=conversation, is_read=False)
+            .order_by()
+            .values_list("sender_id")
+            .annotate(n=Count("id"))
+        )
+        for user_id in participant_ids:
+            values = {"unread_count": sum(n for sender, n in unread.items() if sender != user_id)}
+            if last is not None:
+                values.update(
+                    last_message_id=last.id,
+                    last_message_sender_id=last.sender_id,
+                    last_message_preview=preview_of(last),
+                    last_message_has_attachment=last.has_attachment,
+                    last_activity_at=last.created_at,
+                )
+            ConversationInbox.objects.filter(conversation=conversation, user_id=user_id).update(**values)
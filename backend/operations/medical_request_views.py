@@ -8,10 +8,10 @@ from django.db import transaction
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 
-from .models import MedicalRecordRequest, ArchiveAccessLog
-from backend.users.models import GeneralDoctorProfile, NurseProfile, PatientProfile
+from .models import MedicalRecordRequest, MedicalRecordDelivery, ArchiveAccessLog
+from backend.users.models import GeneralDoctorProfile, NurseProfile
 from .serializers import MedicalRecordRequestSerializer, CreateMedicalRecordRequestSerializer
-from .pdf_service import generate_records_pdf, encrypt_pdf_aes256, send_encrypted_pdf_to_patient
+from . import record_delivery
 
 User = get_user_model()
 
@@ -32,67 +32,6 @@ def _broadcast_notification(user_ids, payload):
         pass
 
 
-def _build_password(doctor_user: User, patient_user: User) -> str:
-    # First letter of doctor's first name and last name (uppercase), + patient birth year
-    # Example: EI2001
-    first_name = ''
-    last_name = ''
-    if getattr(doctor_user, 'full_name', None):
-        parts = str(doctor_user.full_name).strip().split()
-        if parts:
-            first_name = parts[0]
-            last_name = parts[-1] if len(parts) > 1 else ''
-    else:
-        first_name = getattr(doctor_user, 'first_name', '')
-        last_name = getattr(doctor_user, 'last_name', '')
-
-    d1 = (first_name[:1] or 'X').upper()
-    d2 = (last_name[:1] or 'X').upper()
-    birth_year = ''
-    dob = getattr(patient_user, 'date_of_birth', None)
-    if dob:
-        birth_year = str(dob.year)
-    else:
-        birth_year = '0000'
-    return f"{d1}{d2}{birth_year}"
-
-
-def _collect_records(patient_user: User, requested_records):
-    # For now, pull from PatientProfile structured fields
-    data = {}
-    try:
-        profile = patient_user.patient_profile
-    except PatientProfile.DoesNotExist:
-        profile = None
-    if not profile:
-        return data
-
-    # Map possible keys to profile attributes
-    mapping = {
-        'intake_assessment': 'intake_assessment',
-        'graphic_flow_sheets': 'graphic_flow_sheets',
-        'mar': 'medication_administration_record',
-        'education_records': 'patient_education_records',
-        'discharge_summary': 'discharge_summary',
-        'history_physical': 'history_and_physical',
-        'progress_notes': 'progress_notes',
-        'provider_orders': 'provider_order_sheets',
-        'operative_reports': 'operative_procedure_reports',
-    }
-    # If requested_records is empty, include a basic summary
-    keys = list(mapping.keys()) if not requested_records else [k for k in mapping.keys() if requested_records.get(k)]
-    for key in keys:
-        attr = mapping[key]
-        data[key] = getattr(profile, attr, None)
-    # Always include minimal demographics
-    data['patient'] = {
-        'full_name': getattr(patient_user, 'full_name', ''),
-        'email': getattr(patient_user, 'email', ''),
-        'date_of_birth': str(getattr(patient_user, 'date_of_birth', '') or ''),
-    }
-    return data
-
-
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticated])
 def medical_requests(request):
@@ -236,63 +175,52 @@ def deliver_medical_request(request, request_id: int):
     if role != 'doctor':
         return Response({'error': 'Only doctors can deliver medical records.'}, status=status.HTTP_403_FORBIDDEN)
 
-    try:
-        mreq = MedicalRecordRequest.objects.get(id=request_id)
-    except MedicalRecordRequest.DoesNotExist:
-        return Response({'error': 'Request not found.'}, status=status.HTTP_404_NOT_FOUND)
-
-    if mreq.status not in ['approved', 'pending']:
-        return Response({'error': f'Cannot deliver in current status: {mreq.status}'}, status=status.HTTP_400_BAD_REQUEST)
-
-    # Optional: enforce approved first
-    if mreq.status == 'pending':
-        return Response({'error': 'Request must be approved before delivery.'}, status=status.HTTP_400_BAD_REQUEST)
-
-    # Gather records and generate + encrypt PDF
-    patient = mreq.patient
-    doctor_user = user
-    records_payload = _collect_records(patient, mreq.requested_records)
-
-    pdf_bytes = generate_records_pdf(
-        patient_name=getattr(patient, 'full_name', patient.email),
-        patient_email=getattr(patient, 'email', ''),
-        details={
-            'request': {
-                'id': mreq.id,
-                'type': mreq.request_type,
-                'urgency': mreq.urgency,
-                'reason': mreq.reason,
-                'approved_at': str(mreq.approved_at) if mreq.approved_at else None,
-            },
-            'records': records_payload
-        }
-    )
-    password = _build_password(doctor_user, patient)
-    encrypted_bytes = encrypt_pdf_aes256(pdf_bytes, password)
+    # The request row is locked so concurrent deliveries under different keys
+    # cannot both pass the in-progress check and email the records twice
+    with transaction.atomic():
+        try:
+            mreq = MedicalRecordRequest.objects.select_for_update().get(id=request_id)
+        except MedicalRecordRequest.DoesNotExist:
+            return Response({'error': 'Request not found.'}, status=status.HTTP_404_NOT_FOUND)
 
-    filename = f"medical-records-{patient.id}-{mreq.id}.pdf"
-    send_encrypted_pdf_to_patient(getattr(patient, 'email', ''), encrypted_bytes, filename)
+        # Delivering again under the same key answers with that delivery instead of sending twice
+        key = record_delivery.idempotency_key(mreq, request.headers.get('Idempotency-Key'))
+        delivered = MedicalRecordDelivery.objects.filter(idempotency_key=key, status='delivered').first()
+        if delivered is not None:
+            return _delivery_response(mreq, delivered, request)
 
-    with transaction.atomic():
-        mreq.status = 'delivered'
-        mreq.delivered_at = timezone.now()
-        mreq.delivery_reference = filename
-        mreq.save(update_fields=['status', 'delivered_at', 'delivery_reference', 'updated_at'])
+        if mreq.status not in ['approved', 'pending']:
+            return Response({'error': f'Cannot deliver in current status: {mreq.status}'}, status=status.HTTP_400_BAD_REQUEST)
 
-        ArchiveAccessLog.objects.create(
-            record=None, user=user, action='export', ip_address=request.META.get('REMOTE_ADDR', ''), query_params=f'deliver:{mreq.id}'
-        )
+        # Optional: enforce approved first
+        if mreq.status == 'pending':
+            return Response({'error': 'Request must be approved before delivery.'}, status=status.HTTP_400_BAD_REQUEST)
 
-    notif = {
-        'type': 'medical_record_request_delivered',
-        'request_id': mreq.id,
-        'patient_id': mreq.patient_id,
-        'delivery_reference': mreq.delivery_reference,
-    }
-    _broadcast_notification([mreq.patient_id], notif)
+        running = record_delivery.in_progress(mreq)
+        if running is not None and running.idempotency_key != key:
+            return Response({'error': 'A delivery of this request is already in progress.'}, status=status.HTTP_409_CONFLICT)
 
-    serializer = MedicalRecordRequestSerializer(mreq, context={'request': request})
-    return Response(serializer.data)
+        # Collecting, rendering and sending run in a Celery worker (see record_delivery.py)
+        delivery, created = record_delivery.request_delivery(mreq, user, key)
+        if created:
+            ArchiveAccessLog.objects.create(
+                record=None, user=user, action='export', ip_address=request.META.get('REMOTE_ADDR', ''), query_params=f'deliver:{mreq.id}'
+            )
+    # Sent already if Celery was unavailable and the task ran inline on commit
+    delivery.refresh_from_db()
+    return _delivery_response(mreq, delivery, request)
+
+
+def _delivery_response(mreq, delivery, request):
+    """The request with its delivery: 200 once sent, 202 while under way, 500 when it failed."""
+    mreq.refresh_from_db()
+    data = dict(MedicalRecordRequestSerializer(mreq, context={'request': request}).data)
+    data['delivery'] = record_delivery.delivery_payload(delivery)
+    if delivery.status == 'delivered':
+        return Response(data)
+    if delivery.status == 'failed':
+        return Response(dict(data, error=f'Delivery failed: {delivery.error}'), status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return Response(data, status=status.HTTP_202_ACCEPTED)
 
 
 @api_view(['POST'])
@@ -0,0 +1,103 @@
+"""
+Keyset pagination for conversation message history.
+
+Pages are cut on ``(created_at, id)`` using the composite index on
+``messages(conversation_id, created_at, id)``, so fetching a page costs the same
+at the top of a thread as at the bottom and only the page's messages are
+decrypted and serialized.
+
+- ``before``: messages strictly older than the cursor (default when no cursor is
+  given: the newest page)
+- ``after``: messages strictly newer than the cursor (catching up after a reconnect)
+- cursors are opaque url-safe strings; every page returns ``before_cursor`` (its
+  oldest message) and ``after_cursor`` (its newest) for the next request
+- messages inside a page are always oldest-first, as the chat renders them
+
+Used by the ``get_messages`` view and the ``load_more`` MessageConsumer command.
+"""
+
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+from .models import Message
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(message):
+    raw = f"{message.created_at.isoformat()}|{message.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def encode_cursor_through(message):
+    """A ``before`` cursor whose page ends with ``message`` itself (search hits jump here)."""
+    raw = f"{message.created_at.isoformat()}|{message.id + 1}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, message_id = base64.urlsafe_b64decode(padded.encode()).decode().rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(message_id)
+    except (ValueError, TypeError, UnicodeDecodeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {cursor}") from e
+
+
+def parse_limit(raw, default=DEFAULT_PAGE_SIZE):
+    try:
+        return max(1, min(MAX_PAGE_SIZE, int(raw)))
+    except (TypeError, ValueError):
+        return default
+
+
+def message_page(conversation, before=None, after=None, limit=DEFAULT_PAGE_SIZE):
+    """
+    One page of ``conversation``'s messages around a cursor. Returns a dict with the
+    ``messages`` (oldest-first), ``has_more_before``/``has_more_after`` and both cursors.
+    Raises InvalidCursor for malformed cursors.
+    """
+    queryset = (
+        Message.objects.filter(conversation=conversation)
+        .select_related("sender", "attachment")
+        .prefetch_related("reactions__user")
+    )
+    if after is not None:
+        created_at, message_id = decode_cursor(after)
+        newer = Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=message_id)
+        rows = list(queryset.filter(newer).order_by("created_at", "id")[: limit + 1])
+        has_more_after = len(rows) > limit
+        messages = rows[:limit]
+        has_more_before = True
+    else:
+        if before is not None:
+            created_at, message_id = decode_cursor(before)
+            older = Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=message_id)
+            queryset = queryset.filter(older)
+        rows = list(queryset.order_by("-created_at", "-id")[: limit + 1])
+        has_more_before = len(rows) > limit
+        messages = rows[:limit][::-1]
+        has_more_after = before is not None
+
+    return {
+        "messages": messages,
+        "has_more_before": has_more_before,
+        "has_more_after": has_more_after,
+        "before_cursor": encode_cursor(messages[0]) if messages else before,
+        "after_cursor": encode_cursor(messages[-1]) if messages else after,
+    }
+
+
+def serialize_page(page, context=None):
+    from .serializers import MessageSerializer
+
+    data = {key: value for key, value in page.items() if key != "messages"}
+    data["results"] = MessageSerializer(page["messages"], many=True, context=context or {}).data
+    return data
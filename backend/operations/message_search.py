@@ -0,0 +1,209 @@
+"""
+Blind-index search over message history.
+
+Message content is encrypted at rest, so there was no way to search it short of
+loading a whole thread through ``get_messages`` and reading it. Search now runs
+against a token index that never holds readable text:
+
+- every message is split into normalized words (lowercased, at least two
+  characters, at most ``MAX_TOKENS_PER_MESSAGE`` distinct words); each word is
+  stored as a keyed 64-bit hash (HMAC-SHA256 with ``MESSAGE_SEARCH_KEY``, derived
+  from ``SECRET_KEY`` when unset) in ``MessageSearchToken``
+- rows are keyed ``(conversation, token, message)``: a query hashes its words the
+  same way and matches messages containing all of them inside the conversations
+  the user participates in, newest first, with ``before=<message id>`` keyset pages
+- only the hits of the page are decrypted, to build short snippets; each hit
+  carries a ``history_cursor`` so ``get_messages?before=<cursor>`` opens the thread
+  on the page ending with that message
+- the index is built in the background: ``send_message`` queues the new message
+  after commit, and a periodic sweep indexes everything past the
+  ``MessageSearchWatermark`` (messages from other code paths, backfill after
+  deploy) once older than ``MESSAGE_SEARCH_SETTLE_SECONDS``
+
+Whole words only; changing ``MESSAGE_SEARCH_KEY`` requires ``reset_index()`` and a
+new sweep.
+"""
+
+import hashlib
+import hmac
+import logging
+import re
+from datetime import timedelta
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models import Count
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .message_history import encode_cursor_through, parse_limit
+from .models import Conversation, Message, MessageSearchToken, MessageSearchWatermark
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = "messages"
+DEFAULT_LIMIT = 20
+MAX_TOKENS_PER_MESSAGE = 256
+MAX_QUERY_TERMS = 8
+MAX_TERM_LENGTH = 64
+SNIPPET_WIDTH = 120
+
+WORD_RE = re.compile(r"\w{2,}")
+
+
+@lru_cache(maxsize=None)
+def index_key():
+    secret = getattr(settings, 'MESSAGE_SEARCH_KEY', '') or f"message-search:{settings.SECRET_KEY}"
+    return hashlib.sha256(secret.encode()).digest()
+
+
+@lru_cache(maxsize=100_000)
+def blind_token(term):
+    """Signed 64-bit keyed hash of a normalized term (fits a BIGINT column)."""
+    digest = hmac.new(index_key(), term.encode(), hashlib.sha256).digest()
+    return int.from_bytes(digest[:8], 'big', signed=True)
+
+
+@receiver(setting_changed)
+def reset_key(setting, **kwargs):
+    if setting in ('MESSAGE_SEARCH_KEY', 'SECRET_KEY'):
+        index_key.cache_clear()
+        blind_token.cache_clear()
+
+
+def tokenize(text, limit=MAX_TOKENS_PER_MESSAGE):
+    """Distinct normalized words of ``text`` in order of appearance."""
+    words = dict.fromkeys(word[:MAX_TERM_LENGTH] for word in WORD_RE.findall((text or '').lower()))
+    return list(words)[:limit]
+
+
+def index_messages(messages):
+    """Add index rows for already loaded messages; safe to repeat. Returns the row count."""
+    Message.decrypt_batch(messages)
+    rows = [
+        MessageSearchToken(conversation_id=message.conversation_id, message_id=message.id, token=blind_token(term))
+        for message in messages
+        for term in tokenize(message.decrypt_content())
+    ]
+    MessageSearchToken.objects.bulk_create(rows, batch_size=5000, ignore_conflicts=True)
+    return len(rows)
+
+
+def _indexable():
+    return Message.objects.only('id', 'conversation_id', 'content', 'encrypted_content', 'created_at')
+
+
+def index_message_ids(message_ids):
+    return index_messages(list(_indexable().filter(id__in=message_ids)))
+
+
+def index_backlog(batch_size=None, max_batches=50):
+    """
+    Index messages past the watermark in id order, stopping at the first message
+    younger than the settle window. Returns the number of messages indexed.
+    """
+    batch_size = batch_size or getattr(settings, 'MESSAGE_SEARCH_BATCH_SIZE', 2000)
+    settle = timedelta(seconds=getattr(settings, 'MESSAGE_SEARCH_SETTLE_SECONDS', 60))
+    indexed = 0
+    for _ in range(max_batches):
+        cutoff = timezone.now() - settle
+        with transaction.atomic():
+            watermark = MessageSearchWatermark.locked(WATERMARK_NAME)
+            batch = list(_indexable().filter(id__gt=watermark.last_message_id).order_by('id')[:batch_size])
+            settled = []
+            for message in batch:
+                if message.created_at >= cutoff:
+                    break
+                settled.append(message)
+            if not settled:
+                return indexed
+            index_messages(settled)
+            watermark.last_message_id = settled[-1].id
+            watermark.save(update_fields=['last_message_id', 'updated_at'])
+        indexed += len(settled)
+        if len(settled) < batch_size:
+            return indexed
+    return indexed
+
+
+def reset_index():
+    """Drop every token and rewind the watermark (after changing MESSAGE_SEARCH_KEY)."""
+    with transaction.atomic():
+        MessageSearchToken.objects.all().delete()
+        MessageSearchWatermark.objects.filter(name=WATERMARK_NAME).delete()
+
+
+def schedule_indexing(message_id):
+    """Queue indexing of a new message in Celery after the current transaction commits."""
+    def _dispatch():
+        from .tasks import index_message_search
+
+        try:
+            index_message_search.delay([message_id])
+        except Exception as e:
+            logger.warning(f"Celery unavailable for message search indexing, running inline: {str(e)}")
+            index_message_ids([message_id])
+
+    transaction.on_commit(_dispatch)
+
+
+def snippet(text, terms, width=SNIPPET_WIDTH):
+    """A ``width``-character window of ``text`` around the first matching term."""
+    lowered = text.lower()
+    positions = [position for position in (lowered.find(term) for term in terms) if position >= 0]
+    start = max(0, min(positions) - width // 3) if positions else 0
+    end = min(len(text), start + width)
+    return f"{'…' if start else ''}{text[start:end].strip()}{'…' if end < len(text) else ''}"
+
+
+def search(user_id, query, conversation_id=None, before=None, limit=None):
+    """
+    Messages visible to ``user_id`` containing every word of ``query``, newest first.
+    ``before`` is the ``next_before`` of the previous page. Raises ValueError for a bad ``before``.
+    """
+    limit = parse_limit(limit, DEFAULT_LIMIT)
+    terms = tokenize(query, MAX_QUERY_TERMS)
+    if not terms:
+        return {'query': query, 'results': [], 'has_more': False, 'next_before': None}
+
+    conversations = Conversation.objects.filter(participants__id=user_id)
+    if conversation_id is not None:
+        conversations = conversations.filter(id=conversation_id)
+    hits = MessageSearchToken.objects.filter(
+        conversation_id__in=conversations.values('id'),
+        token__in=[blind_token(term) for term in terms],
+    )
+    if before is not None:
+        hits = hits.filter(message_id__lt=int(before))
+    message_ids = list(
+        hits.values('message_id')
+        .annotate(matched=Count('token'))
+        .filter(matched=len(terms))
+        .order_by('-message_id')
+        .values_list('message_id', flat=True)[:limit + 1]
+    )
+    has_more = len(message_ids) > limit
+    message_ids = message_ids[:limit]
+
+    messages = Message.decrypt_batch(list(
+        Message.objects.filter(id__in=message_ids).select_related('sender').order_by('-id')
+    ))
+    results = []
+    for message in messages:
+        results.append({
+            'message_id': message.id,
+            'conversation_id': message.conversation_id,
+            'sender_id': message.sender_id,
+            'sender_name': message.sender.full_name,
+            'created_at': message.created_at,
+            'snippet': snippet(message.decrypt_content(), terms),
+            'history_cursor': encode_cursor_through(message),
+        })
+    return {
+        'query': query,
+        'results': results,
+        'has_more': has_more,
+        'next_before': message_ids[-1] if has_more else None,
+    }
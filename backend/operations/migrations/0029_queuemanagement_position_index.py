@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-16 22:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0028_alter_medicalrecordrequest_clarification_notes_and_more'),
+        ('users', '0015_remove_patientprofile_hospital_fk'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='queuemanagement',
+            index=models.Index(fields=['department', 'status', 'position_in_queue'], name='queue_manag_departm_1c7565_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.5 on 2026-10-16 22:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0029_queuemanagement_position_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DepartmentServiceStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('department', models.CharField(choices=[('OPD', 'Out Patient Department'), ('Pharmacy', 'Pharmacy'), ('Appointment', 'Appointment')], help_text='Department whose service times are aggregated.', max_length=100, unique=True)),
+                ('sample_count', models.PositiveIntegerField(default=0, help_text='Total number of completed services recorded.')),
+                ('ewma_seconds', models.FloatField(blank=True, help_text='Exponentially weighted moving average of service time.', null=True)),
+                ('window_seconds', models.JSONField(blank=True, default=list, help_text='Most recent service times in seconds (oldest first).')),
+                ('window_mean_seconds', models.FloatField(blank=True, help_text='Mean service time over the recent window.', null=True)),
+                ('p50_seconds', models.FloatField(blank=True, help_text='Median service time over the recent window.', null=True)),
+                ('p90_seconds', models.FloatField(blank=True, help_text='90th percentile service time over the recent window.', null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Department Service Stats',
+                'verbose_name_plural': 'Department Service Stats',
+                'db_table': 'department_service_stats',
+            },
+        ),
+    ]
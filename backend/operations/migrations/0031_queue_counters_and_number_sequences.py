@@ -0,0 +1,49 @@
+# Generated by Django 5.2.5 on 2026-10-16 23:02
+
+from django.db import migrations, models
+
+from backend.operations.queue_numbers import create_sequence_sql, drop_sequence_sql
+
+QUEUE_TABLES = ("queue_management", "priority_queue")
+
+
+def create_queue_number_sequences(apps, schema_editor):
+    # Sequences back QueueNumberAllocator on PostgreSQL only; other backends use QueueCounter rows
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table in QUEUE_TABLES:
+        for statement in create_sequence_sql(table):
+            schema_editor.execute(statement)
+
+
+def drop_queue_number_sequences(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for table in QUEUE_TABLES:
+        for statement in drop_sequence_sql(table):
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0030_departmentservicestats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueueCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text="Counter name, e.g. 'position:queue_management:OPD'.", max_length=150, unique=True)),
+                ('value', models.BigIntegerField(default=0, help_text='Last value handed out by this counter.')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Queue Counter',
+                'verbose_name_plural': 'Queue Counters',
+                'db_table': 'queue_counters',
+            },
+        ),
+        migrations.RunPython(create_queue_number_sequences, drop_queue_number_sequences),
+    ]
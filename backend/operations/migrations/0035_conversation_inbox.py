@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-16 23:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0034_conversation_read_states'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationInbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_message_preview', models.CharField(blank=True, help_text='Start of the last message.', max_length=255)),
+                ('last_message_has_attachment', models.BooleanField(default=False)),
+                ('last_activity_at', models.DateTimeField(help_text='Time of the last message, or creation of the conversation.')),
+                ('unread_count', models.PositiveIntegerField(default=0, help_text='Messages from others not yet read by the user.')),
+                ('conversation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbox_entries', to='operations.conversation')),
+                ('last_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='operations.message')),
+                ('last_message_sender', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('other_participant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inbox_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Conversation Inbox Entry',
+                'verbose_name_plural': 'Conversation Inbox Entries',
+                'db_table': 'conversation_inbox',
+                'indexes': [models.Index(fields=['user', '-last_activity_at'], name='inbox_user_activity_idx')],
+                'unique_together': {('conversation', 'user')},
+            },
+        ),
+    ]
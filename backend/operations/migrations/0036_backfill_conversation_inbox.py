@@ -0,0 +1,46 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+def backfill_inbox(apps, schema_editor):
+    Conversation = apps.get_model("operations", "Conversation")
+    ConversationInbox = apps.get_model("operations", "ConversationInbox")
+    Message = apps.get_model("operations", "Message")
+
+    for conversation in Conversation.objects.prefetch_related("participants").iterator(chunk_size=500):
+        participant_ids = [p.id for p in conversation.participants.all()]
+        last = Message.objects.filter(conversation=conversation).order_by("-created_at", "-id").first()
+        unread = dict(
+            Message.objects.filter(conversation=conversation, is_read=False)
+            .order_by()
+            .values_list("sender_id")
+            .annotate(n=Count("id"))
+        )
+        ConversationInbox.objects.bulk_create(
+            [
+                ConversationInbox(
+                    conversation=conversation,
+                    user_id=user_id,
+                    other_participant_id=next((other for other in participant_ids if other != user_id), None),
+                    last_message=last,
+                    last_message_sender_id=last.sender_id if last else None,
+                    last_message_preview=(last.content or "")[:255] if last else "",
+                    last_message_has_attachment=bool(last.file_attachment) if last else False,
+                    last_activity_at=last.created_at if last else conversation.created_at,
+                    unread_count=sum(n for sender, n in unread.items() if sender != user_id),
+                )
+                for user_id in participant_ids
+            ],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("operations", "0035_conversation_inbox"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_inbox, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.5 on 2026-10-16 23:49
+
+import base64
+
+from django.db import migrations, models
+
+# base64 of "gAAAAA": tokens that were wrapped in a second base64 layer
+LEGACY_PREFIX = "Z0FBQUFB"
+CHUNK_SIZE = 1000
+
+REWRITES = [
+    ("Message", "encrypted_content"),
+    ("PatientAssessmentArchive", "encrypted_assessment_data"),
+]
+
+
+def _rewrite(apps, convert, prefix):
+    """Apply ``convert`` to every value starting with ``prefix``, CHUNK_SIZE rows per UPDATE batch."""
+    for model_name, field in REWRITES:
+        model = apps.get_model("operations", model_name)
+        last_id = 0
+        while True:
+            rows = list(
+                model.objects.filter(**{f"{field}__startswith": prefix, "id__gt": last_id})
+                .only("id", field)
+                .order_by("id")[:CHUNK_SIZE]
+            )
+            if not rows:
+                break
+            last_id = rows[-1].id
+            changed = []
+            for row in rows:
+                try:
+                    setattr(row, field, convert(getattr(row, field)))
+                except ValueError:
+                    continue
+                changed.append(row)
+            model.objects.bulk_update(changed, [field])
+
+
+def strip_double_encoding(apps, schema_editor):
+    _rewrite(apps, lambda value: base64.b64decode(value, validate=True).decode(), LEGACY_PREFIX)
+
+
+def restore_double_encoding(apps, schema_editor):
+    _rewrite(apps, lambda value: base64.b64encode(value.encode()).decode(), "gAAAAA")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0036_backfill_conversation_inbox'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='message',
+            name='encrypted_content',
+            field=models.TextField(blank=True, help_text='Fernet token of the content'),
+        ),
+        migrations.AlterField(
+            model_name='patientassessmentarchive',
+            name='encrypted_assessment_data',
+            field=models.TextField(blank=True, help_text='Fernet token of the assessment data'),
+        ),
+        migrations.RunPython(strip_double_encoding, restore_double_encoding, elidable=True),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+CHUNK_SIZE = 1000
+
+
+def number_existing_notifications(apps, schema_editor):
+    """
+    Give every recipient's existing notifications seq 1..n in creation order and a
+    cursor acknowledged up to the row before their oldest unsent one.
+    """
+    MessageNotification = apps.get_model("operations", "MessageNotification")
+    NotificationCursor = apps.get_model("operations", "NotificationCursor")
+    recipient_ids = MessageNotification.objects.order_by().values_list("recipient_id", flat=True).distinct()
+    for recipient_id in list(recipient_ids):
+        rows = list(
+            MessageNotification.objects.filter(recipient_id=recipient_id)
+            .only("id", "is_sent")
+            .order_by("created_at", "id")
+        )
+        first_unsent = None
+        for seq, row in enumerate(rows, start=1):
+            row.seq = seq
+            if first_unsent is None and not row.is_sent:
+                first_unsent = seq
+        MessageNotification.objects.bulk_update(rows, ["seq"], batch_size=CHUNK_SIZE)
+        NotificationCursor.objects.create(
+            user_id=recipient_id,
+            last_seq=len(rows),
+            acked_seq=len(rows) if first_unsent is None else first_unsent - 1,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0038_message_attachments'),
+        ('users', '0015_remove_patientprofile_hospital_fk'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCursor',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='notification_cursor', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('last_seq', models.BigIntegerField(default=0, help_text="Last sequence number appended to the user's log.")),
+                ('acked_seq', models.BigIntegerField(default=0, help_text='Highest sequence number acknowledged by the user.')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Notification Cursor',
+                'verbose_name_plural': 'Notification Cursors',
+                'db_table': 'message_notification_cursors',
+            },
+        ),
+        migrations.AddField(
+            model_name='messagenotification',
+            name='seq',
+            field=models.BigIntegerField(blank=True, help_text="Position in the recipient's notification log (see notification_log.py).", null=True),
+        ),
+        migrations.RunPython(number_existing_notifications, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='messagenotification',
+            constraint=models.UniqueConstraint(fields=('recipient', 'seq'), name='msg_notification_seq_uniq'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.5 on 2026-10-17 00:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0039_notification_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.BigIntegerField(help_text='Keyed 64-bit hash of a normalized word.')),
+                ('conversation', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='operations.conversation')),
+                ('message', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='operations.message')),
+            ],
+            options={
+                'verbose_name': 'Message Search Token',
+                'verbose_name_plural': 'Message Search Tokens',
+                'db_table': 'message_search_tokens',
+                'indexes': [models.Index(fields=['conversation', 'token', 'message'], name='msg_search_conv_token_idx')],
+                'constraints': [models.UniqueConstraint(fields=('message', 'token'), name='msg_search_token_uniq')],
+            },
+        ),
+    ]
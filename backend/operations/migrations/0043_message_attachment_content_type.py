@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+
+def copy_content_types(apps, schema_editor):
+    Message = apps.get_model('operations', 'Message')
+    AttachmentUpload = apps.get_model('operations', 'AttachmentUpload')
+    for message in Message.objects.filter(attachment__isnull=False).select_related('attachment').iterator():
+        # The sender's own upload session knows what they declared; else what the blob recorded
+        declared = AttachmentUpload.objects.filter(
+            user_id=message.sender_id, conversation_id=message.conversation_id, blob_id=message.attachment_id
+        ).values_list('content_type', flat=True).first()
+        Message.objects.filter(id=message.id).update(attachment_content_type=declared or message.attachment.content_type)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0042_medical_record_deliveries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='message',
+            name='attachment_content_type',
+            field=models.CharField(blank=True, help_text='Content type the sender declared for the attachment', max_length=100),
+        ),
+        migrations.RunPython(copy_content_types, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='attachmentblob',
+            name='content_type',
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:31
+
+from django.db import migrations, models
+
+
+def move_watermark(apps, schema_editor):
+    QueueCounter = apps.get_model('operations', 'QueueCounter')
+    MessageSearchWatermark = apps.get_model('operations', 'MessageSearchWatermark')
+    for counter in QueueCounter.objects.filter(key='search:messages'):
+        MessageSearchWatermark.objects.create(name='messages', last_message_id=counter.value)
+    QueueCounter.objects.filter(key='search:messages').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('operations', '0043_message_attachment_content_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MessageSearchWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text="Index name, e.g. 'messages'.", max_length=50, unique=True)),
+                ('last_message_id', models.BigIntegerField(default=0, help_text='Highest message id indexed by the sweep.')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Message Search Watermark',
+                'verbose_name_plural': 'Message Search Watermarks',
+                'db_table': 'message_search_watermarks',
+            },
+        ),
+        migrations.RunPython(move_watermark, migrations.RunPython.noop),
+    ]
@@ -4,11 +4,14 @@ from backend.users.models import GeneralDoctorProfile, NurseProfile, PatientProf
 from backend.admin_site.models import Hospital
 from django.utils import timezone
 from datetime import timedelta
-from cryptography.fernet import Fernet
 from django.conf import settings
-import base64
 import json
-from django.db import transaction
+import uuid
+import math
+from django.db import IntegrityError, transaction
+from .queue_positions import QueuePositionEngine
+from .queue_numbers import QueueNumberAllocator
+from . import crypto
 
 
 # Custom User Model
@@ -76,8 +79,95 @@ class Notification(models.Model):
     def __str__(self):
         return f"Notification for {self.user.full_name}: {self.message[:50]}..."  # Display first 50 characters of the message
 
+class NotificationCounter(models.Model):
+    """
+    Denormalized per-user notification counters (see notification_fanout.py).
+    - ``unread`` is moved by the fan-out pipeline, the Notification signals and the
+      mark-read endpoints instead of counting the notifications table per request.
+    - ``recount_unread`` rebuilds the counters from the table.
+    """
+    user = models.OneToOneField(Users, on_delete=models.CASCADE, primary_key=True, related_name="notification_counter")
+    unread = models.PositiveIntegerField(default=0, help_text="Number of unread notifications.")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "notification_counters"
+        verbose_name = "Notification Counter"
+        verbose_name_plural = "Notification Counters"
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread} unread"
+
+class QueueCounter(models.Model):
+    """
+    Named counter rows used by the queue allocators (see queue_numbers.py / queue_positions.py).
+    - Rows are locked with SELECT ... FOR UPDATE for the duration of the caller's transaction.
+    - Holds queue-number counters on databases without native sequences and the
+      per-department waiting-line tail used to hand out positions.
+    """
+    key = models.CharField(max_length=150, unique=True, help_text="Counter name, e.g. 'position:queue_management:OPD'.")
+    value = models.BigIntegerField(default=0, help_text="Last value handed out by this counter.")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "queue_counters"
+        verbose_name = "Queue Counter"
+        verbose_name_plural = "Queue Counters"
+
+    @classmethod
+    def locked(cls, key: str, initial):
+        """
+        Return ``(counter, created)`` with the row for ``key`` locked for update.
+        A missing row is created from ``initial()``; must run inside a transaction.
+        """
+        counter = cls.objects.select_for_update().filter(key=key).first()
+        if counter is not None:
+            return counter, False
+        try:
+            with transaction.atomic():
+                return cls.objects.create(key=key, value=initial()), True
+        except IntegrityError:
+            # Another worker created the row first; wait for its lock instead
+            return cls.objects.select_for_update().get(key=key), False
+
+    def advance(self, delta: int = 1) -> int:
+        """Move the (locked) counter by ``delta`` and return the new value."""
+        self.value = max(0, self.value + delta)
+        self.save(update_fields=["value", "updated_at"])
+        return self.value
+
+    def __str__(self):
+        return f"{self.key} = {self.value}"
+
+
+class WaitingLineMixin:
+    """
+    Remembers the persisted status of a queue entry so save()/delete() can tell
+    when it leaves the waiting line and hand its position back to the position engine.
+    """
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get("status")
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._loaded_status = self.__dict__.get("status")
+
+    def _is_leaving_waiting(self, creating):
+        return (
+            not creating
+            and getattr(self, "_loaded_status", None) == "waiting"
+            and self.status != "waiting"
+        )
+
+    def _was_waiting(self):
+        return getattr(self, "_loaded_status", self.status) == "waiting"
+
+
 #queueing system for operations normal queues
-class QueueManagement(models.Model):
+class QueueManagement(WaitingLineMixin, models.Model):
     """Queue management model for handling patient queues in operations.
     - Each queue is associated with a patient.
     - Tracks the queue number, status, and timestamps for creation and updates.
@@ -120,95 +210,75 @@ class QueueManagement(models.Model):
         verbose_name = "Queue Management"
         verbose_name_plural = "Queue Management"
         unique_together = ["department", "queue_number", "patient"] #each patient should have unique queue number when queueing in different departments
+        indexes = [
+            # Serves the position engine's tail lookup and gap-closing UPDATE
+            models.Index(fields=["department", "status", "position_in_queue"]),
+        ]
         
     #fifo implementtion
     def save(self, *args, **kwargs):
         """
-        Assign a globally unique queue_number and per-department FIFO position_on_queue
-        in a safe way, then persist and normalize positions.
+        Assign a globally unique queue_number and per-department FIFO position_in_queue,
+        then persist. Numbers come from the queue number allocator (no MAX() scan) and
+        positions are maintained incrementally by the position engine: a join appends at
+        the tail and an entry leaving the waiting state closes its gap.
         """
         creating = self.pk is None
         with transaction.atomic():
             # Assign queue number globally unique across all departments
             if creating and not self.queue_number:
-                last_queue_number = QueueManagement.objects.aggregate(
-                    maximum_queue_number=models.Max("queue_number")
-                )["maximum_queue_number"] or 0
-                self.queue_number = last_queue_number + 1
+                self.queue_number = normal_queue_numbers.next_number()
 
-            # Assign FIFO position per department for waiting/in_progress entries
+            # Append to the tail of the department's waiting line (FIFO)
             if creating and not self.position_in_queue:
-                last_position = QueueManagement.objects.filter(
-                    department=self.department,
-                    status__in=["waiting", "in_progress"]
-                ).aggregate(
-                    maximum_position=models.Max("position_in_queue")
-                )["maximum_position"] or 0
-                self.position_in_queue = last_position + 1
+                self.position_in_queue = normal_queue_positions.next_position(self.department)
 
+            left_waiting = self._is_leaving_waiting(creating)
+            if left_waiting:
+                self.position_in_queue = normal_queue_positions.stored_position(self)
             super().save(*args, **kwargs)
-            # Normalize positions of waiting patients by enqueue_time (FIFO)
-            self.update_queue_positions()
+            if left_waiting:
+                normal_queue_positions.release(self.department, self.position_in_queue)
+            self._loaded_status = self.status
+
+    def delete(self, *args, **kwargs):
+        """Delete the entry and close its gap in the waiting line."""
+        with transaction.atomic():
+            was_waiting = self._was_waiting()
+            if was_waiting:
+                self.position_in_queue = normal_queue_positions.stored_position(self)
+            result = super().delete(*args, **kwargs)
+            if was_waiting:
+                normal_queue_positions.release(self.department, self.position_in_queue)
+        return result
 
     #update the queueu 
     def update_queue_positions(self):
         """
-        Update the positions for all waiting patients in the queue.
-        """
-        waiting_patients = QueueManagement.objects.filter(
-            department=self.department, status="waiting"
-            ).order_by("enqueue_time")
-        
-        #ensures that each patient has a position in queueu
-        for index, patient in enumerate(waiting_patients, start=1):
-            if patient.position_in_queue != index:
-                patient.position_in_queue = index
-                QueueManagement.objects.filter(id=patient.id).update(position_in_queue=index)
-        
-        
-        #get the patient estimated waiting time
-        """
-        calculate the estimated waiting time for each patient in the queue.
+        Rebuild the positions for all waiting patients in this entry's department.
+        Not needed on the hot path; kept for repairs after out-of-band edits.
         """
+        return normal_queue_positions.renumber(self.department)
 
     @classmethod
     def update_queue_positions_for_department(cls, department: str):
         """
         Recalculate FIFO positions for all waiting normal-queue entries in a department.
-        Safe for use after deletions, cancellations, or bulk updates.
+        Safe for use after bulk deletions, cancellations, or bulk updates that bypass save().
         """
-        waiting_patients = cls.objects.filter(
-            department=department, status="waiting"
-        ).order_by("enqueue_time")
-        for index, patient in enumerate(waiting_patients, start=1):
-            if patient.position_in_queue != index:
-                cls.objects.filter(id=patient.id).update(position_in_queue=index)
+        return normal_queue_positions.renumber(department)
 
     def get_estimated_wait_time(self):
+        estimate = self.get_estimated_wait_range()
+        return estimate["expected"] if estimate else None
+
+    def get_estimated_wait_range(self):
+        """Expected/p50/p90 wait from the department's rolling service-time stats."""
         if self.status != "waiting":
             return None
-        
-        # Calculate average service time
-        completed_queues = QueueManagement.objects.filter(
-            department=self.department, status="completed",
-            started_at__isnull=False, finished_at__isnull=False
-        )
-        total_service_time = sum([q.finished_at - q.started_at for q in completed_queues], timedelta())
-        
-        if completed_queues.count() > 0:
-            avg_service_time = total_service_time / completed_queues.count()
-        else:
-            # Use a default value if no one has completed yet
-            avg_service_time = timedelta(minutes=15) 
-
-        # Count patients ahead
-        patients_ahead_count = QueueManagement.objects.filter(
-            department=self.department,
-            status__in=["waiting", "in_progress"],
-            position_in_queue__lt=self.position_in_queue
-        ).count()
-        
-        return avg_service_time * patients_ahead_count
+        stats = DepartmentServiceStats.for_department(self.department)
+        # Patients ahead come straight from the position engine
+        return stats.estimate_wait(normal_queue_positions.patients_ahead(self))
     
     def mark_started(self):
         """
@@ -228,18 +298,16 @@ class QueueManagement(models.Model):
         self.finished_at = timezone.now()
         if self.started_at:
             self.actual_wait_time = self.finished_at - self.enqueue_time
+        # save() closes the gap in the waiting line if this entry was still waiting
         self.save()
-        # Update subsequent queue positions after completion
-        self.update_queue_positions()
+        if self.started_at:
+            DepartmentServiceStats.record(self.department, self.finished_at - self.started_at, queue_entry_id=self.pk)
         
     def get_next_in_queue(self):
         """
         Get the next patient in the queue.
         """
-        next_patient = QueueManagement.objects.filter(
-            department=self.department, status="waiting"
-        ).order_by("position_in_queue").first()
-        return next_patient
+        return normal_queue_positions.head(self.department)
     @classmethod
     def get_queue_by_dept(cls, department):
         """
@@ -250,6 +318,11 @@ class QueueManagement(models.Model):
         
     def __str__(self):
         return f"Queue {self.queue_number} - Patient: {self.patient.full_name}"
+
+
+# Position engine and number allocator for the normal (FIFO) queue; see queue_positions.py / queue_numbers.py
+normal_queue_positions = QueuePositionEngine(QueueManagement, "position_in_queue")
+normal_queue_numbers = QueueNumberAllocator(QueueManagement)
     
 #medicine inventory management
 class MedicineInventory(models.Model):
@@ -432,7 +505,7 @@ class DoctorTimeSlot(models.Model):
 
 #queue for priority patients
 # no show.
-class PriorityQueue(models.Model):
+class PriorityQueue(WaitingLineMixin, models.Model):
     """Priority queue model for handling patients with special needs or conditions or age. """
     appointment_id = models.ForeignKey(AppointmentManagement, on_delete=models.CASCADE, related_name="priority_queue", null=True, blank=True)
     patient = models.ForeignKey(PatientProfile, on_delete=models.CASCADE, related_name="priority_queue")
@@ -480,54 +553,50 @@ class PriorityQueue(models.Model):
         verbose_name_plural = "Priority Queues"
         
     def save(self, *args, **kwargs):
-        #auto assign queue number per department
-        if not self.queue_number:
-            self.queue_number = PriorityQueue.objects.filter(
-                department=self.department
-            ).aggregate(
-                maximum_queue_number = models.Max("queue_number")
-            )['maximum_queue_number'] or 0
-            self.queue_number += 1
-            
-        #auto assign priority positions (FIFO within priority queue)
-        if not self.priority_position:
-            last_position = PriorityQueue.objects.filter(
-                department=self.department,
-                status__in=["waiting", "in_progress"]
-            ).aggregate(
-                maximum_position=models.Max("priority_position")
-            )["maximum_position"] or 0
-            self.priority_position = last_position + 1
-        super().save(*args, **kwargs)
+        creating = self.pk is None
+        with transaction.atomic():
+            #auto assign queue number (the field is globally unique, so one allocator for all departments)
+            if not self.queue_number:
+                self.queue_number = priority_queue_numbers.next_number()
+
+            #auto assign priority positions (FIFO within priority queue)
+            if not self.priority_position:
+                self.priority_position = priority_queue_positions.next_position(self.department)
+
+            left_waiting = self._is_leaving_waiting(creating)
+            if left_waiting:
+                self.priority_position = priority_queue_positions.stored_position(self)
+            super().save(*args, **kwargs)
+            if left_waiting:
+                priority_queue_positions.release(self.department, self.priority_position)
+            self._loaded_status = self.status
+
+    def delete(self, *args, **kwargs):
+        """Delete the entry and close its gap in the priority waiting line."""
+        with transaction.atomic():
+            was_waiting = self._was_waiting()
+            if was_waiting:
+                self.priority_position = priority_queue_positions.stored_position(self)
+            result = super().delete(*args, **kwargs)
+            if was_waiting:
+                priority_queue_positions.release(self.department, self.priority_position)
+        return result
        
     """
     Calculate the estimated waiting time for priority lists
     """ 
     def get_estimated_wait_time(self):
+        estimate = self.get_estimated_wait_range()
+        return estimate["expected"] if estimate else None
+
+    def get_estimated_wait_range(self):
+        """Expected/p50/p90 wait from the department's rolling service-time stats."""
         if self.status != "waiting":
             return None
-        
-        # Calculate average service time based on completed normal queues
-        completed_queues = QueueManagement.objects.filter(
-            department=self.department, status="completed",
-            started_at__isnull=False, finished_at__isnull=False
-        )
-        total_service_time = sum([q.finished_at - q.started_at for q in completed_queues], timedelta())
-        
-        if completed_queues.count() > 0:
-            avg_service_time = total_service_time / completed_queues.count()
-        else:
-            # Use a default value if no one has completed yet
-            avg_service_time = timedelta(minutes=15)
+        stats = DepartmentServiceStats.for_department(self.department)
             
-        # Count priority patients ahead in the same department
-        patients_ahead_count = PriorityQueue.objects.filter(
-            department=self.department,
-            status__in=["waiting", "in_progress"],
-            enqueue_time__lt=self.enqueue_time
-        ).count()
-        
-        return avg_service_time * patients_ahead_count
+        # Priority patients ahead in the same department come from the position engine
+        return stats.estimate_wait(priority_queue_positions.patients_ahead(self))
 
     def mark_started(self):
         self.status = "in_progress"
@@ -540,9 +609,128 @@ class PriorityQueue(models.Model):
         if self.started_at:
             self.actual_wait_time = self.finished_at - self.enqueue_time
         self.save()
+        if self.started_at:
+            DepartmentServiceStats.record(self.department, self.finished_at - self.started_at)
 
     def __str__(self):
         return f"Priority Queue - Patient: {self.patient.user.full_name} ({self.priority_level})"
+
+
+priority_queue_positions = QueuePositionEngine(PriorityQueue, "priority_position")
+priority_queue_numbers = QueueNumberAllocator(PriorityQueue)
+
+
+class DepartmentServiceStats(models.Model):
+    """
+    Rolling service-time aggregate per department used for wait-time estimates.
+    - Updated incrementally each time a queue entry is completed.
+    - Keeps an EWMA plus a bounded window of recent samples (mean, p50, p90),
+      so estimates are a single-row lookup instead of a scan of the queue history.
+    """
+    WINDOW_SIZE = 50
+    EWMA_ALPHA = 0.2
+    DEFAULT_SERVICE_TIME = timedelta(minutes=15)
+
+    department = models.CharField(max_length=100, choices=[
+        ("OPD", "Out Patient Department"),
+        ("Pharmacy", "Pharmacy"),
+        ("Appointment", "Appointment"),
+    ], unique=True, help_text="Department whose service times are aggregated.")
+    sample_count = models.PositiveIntegerField(default=0, help_text="Total number of completed services recorded.")
+    ewma_seconds = models.FloatField(null=True, blank=True, help_text="Exponentially weighted moving average of service time.")
+    window_seconds = models.JSONField(default=list, blank=True, help_text="Most recent service times in seconds (oldest first).")
+    window_mean_seconds = models.FloatField(null=True, blank=True, help_text="Mean service time over the recent window.")
+    p50_seconds = models.FloatField(null=True, blank=True, help_text="Median service time over the recent window.")
+    p90_seconds = models.FloatField(null=True, blank=True, help_text="90th percentile service time over the recent window.")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "department_service_stats"
+        verbose_name = "Department Service Stats"
+        verbose_name_plural = "Department Service Stats"
+
+    @staticmethod
+    def _percentile(sorted_values, fraction):
+        # Nearest-rank percentile over an already sorted window
+        if not sorted_values:
+            return None
+        rank = max(1, math.ceil(fraction * len(sorted_values)))
+        return float(sorted_values[rank - 1])
+
+    def add_sample(self, seconds: float):
+        """Fold one service duration into the aggregate (does not save)."""
+        seconds = max(0.0, float(seconds))
+        self.sample_count += 1
+        if self.ewma_seconds is None:
+            self.ewma_seconds = seconds
+        else:
+            self.ewma_seconds = self.EWMA_ALPHA * seconds + (1 - self.EWMA_ALPHA) * self.ewma_seconds
+        window = list(self.window_seconds or []) + [seconds]
+        self.window_seconds = window[-self.WINDOW_SIZE:]
+        ordered = sorted(self.window_seconds)
+        self.window_mean_seconds = sum(ordered) / len(ordered)
+        self.p50_seconds = self._percentile(ordered, 0.5)
+        self.p90_seconds = self._percentile(ordered, 0.9)
+
+    @classmethod
+    def record(cls, department: str, duration: timedelta, queue_entry_id=None):
+        """
+        Record a completed service for ``department``. Constant work per call.
+        ``queue_entry_id`` is the completed normal-queue row, kept out of first-time seeding
+        so it is not counted twice.
+        """
+        if duration is None or not department:
+            return None
+        with transaction.atomic():
+            stats = cls.for_department(department, lock=True, exclude_entry_id=queue_entry_id)
+            stats.add_sample(duration.total_seconds())
+            stats.save()
+        return stats
+
+    @classmethod
+    def for_department(cls, department: str, lock: bool = False, exclude_entry_id=None):
+        """
+        Return the aggregate row for ``department``. Missing rows are seeded once from the
+        latest WINDOW_SIZE completed normal-queue entries, so existing history is not lost.
+        """
+        manager = cls.objects.select_for_update() if lock else cls.objects
+        stats = manager.filter(department=department).first()
+        if stats is not None:
+            return stats
+        stats = cls(department=department)
+        recent = QueueManagement.objects.filter(
+            department=department, status="completed",
+            started_at__isnull=False, finished_at__isnull=False
+        ).exclude(pk=exclude_entry_id).order_by("-finished_at").values_list("started_at", "finished_at")[:cls.WINDOW_SIZE]
+        for started_at, finished_at in reversed(list(recent)):
+            stats.add_sample((finished_at - started_at).total_seconds())
+        try:
+            with transaction.atomic():
+                stats.save()
+        except IntegrityError:
+            # Another worker seeded the row first
+            return manager.get(department=department)
+        return stats
+
+    def _as_timedelta(self, seconds):
+        return timedelta(seconds=seconds) if seconds is not None else self.DEFAULT_SERVICE_TIME
+
+    @property
+    def average_service_time(self) -> timedelta:
+        """Point estimate for one service (EWMA, falling back to the default)."""
+        return self._as_timedelta(self.ewma_seconds)
+
+    def estimate_wait(self, patients_ahead: int) -> dict:
+        """Expected, p50 and p90 wait for someone with ``patients_ahead`` patients before them."""
+        ahead = max(0, int(patients_ahead or 0))
+        return {
+            "expected": self.average_service_time * ahead,
+            "p50": self._as_timedelta(self.p50_seconds) * ahead,
+            "p90": self._as_timedelta(self.p90_seconds) * ahead,
+        }
+
+    def __str__(self):
+        return f"{self.department} service stats ({self.sample_count} samples)"
     
 #exchanging communications via messaging app
 class Conversation(models.Model):
@@ -573,26 +761,14 @@ class Conversation(models.Model):
         return self.messages.filter(is_read=False).exclude(sender=user).count()
     
     def mark_messages_as_delivered(self, user):
-        """Mark messages as delivered for a specific user"""
-        undelivered_messages = self.messages.filter(
-            is_delivered=False
-        ).exclude(sender=user)
-        
-        for message in undelivered_messages:
-            message.is_delivered = True
-            message.delivered_at = timezone.now()
-            message.save()
+        """Mark messages as delivered for a specific user (one UPDATE, see receipts.py)"""
+        from .receipts import mark_delivered
+        return mark_delivered(self, user)
     
     def mark_messages_as_read(self, user):
-        """Mark messages as read for a specific user"""
-        unread_messages = self.messages.filter(
-            is_read=False
-        ).exclude(sender=user)
-        
-        for message in unread_messages:
-            message.is_read = True
-            message.read_at = timezone.now()
-            message.save()
+        """Mark messages as read for a specific user (one UPDATE, see receipts.py)"""
+        from .receipts import mark_read
+        return mark_read(self, user)
 
 class Message(models.Model):
     """
@@ -601,15 +777,26 @@ class Message(models.Model):
     conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name="messages")
     sender = models.ForeignKey(Users, on_delete=models.CASCADE, related_name="sent_messages")
     content = models.TextField(help_text="Encrypted message content.")
-    encrypted_content = models.TextField(blank=True, help_text="Base64 encoded encrypted content")
+    encrypted_content = models.TextField(blank=True, help_text="Fernet token of the content")
     file_attachment = models.FileField(
         upload_to='message_attachments/', 
         blank=True, 
         null=True,
         help_text="Optional file attachment"
     )
+    attachment = models.ForeignKey(
+        "AttachmentBlob",
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="messages",
+        help_text="Attachment uploaded through an upload session (see attachments.py)"
+    )
     file_name = models.CharField(max_length=255, blank=True, help_text="Original file name")
     file_size = models.PositiveIntegerField(null=True, blank=True, help_text="File size in bytes")
+    attachment_content_type = models.CharField(
+        max_length=100, blank=True, help_text="Content type the sender declared for the attachment"
+    )
     is_read = models.BooleanField(default=False, help_text="Whether the message has been read")
     is_delivered = models.BooleanField(default=False, help_text="Whether the message has been delivered")
     read_at = models.DateTimeField(null=True, blank=True, help_text="When the message was read")
@@ -620,6 +807,10 @@ class Message(models.Model):
     class Meta:        
         ordering = ["created_at"]
         db_table = "messages"
+        indexes = [
+            # Keyset pagination of a conversation's history (message_history.py)
+            models.Index(fields=["conversation", "created_at", "id"], name="messages_conv_created_id_idx"),
+        ]
         verbose_name = "Message"
         verbose_name_plural = "Messages"
 
@@ -628,66 +819,153 @@ class Message(models.Model):
 
     @property
     def has_attachment(self):
-        return bool(self.file_attachment)
+        return bool(self.file_attachment) or self.attachment_id is not None
     
     def encrypt_content(self, plaintext):
-        """Encrypt message content using Fernet encryption"""
-        try:
-            # Get encryption key from settings or generate one
-            key = getattr(settings, 'MESSAGE_ENCRYPTION_KEY', None)
-            if not key:
-                # Generate a new key if none exists (for development)
-                key = Fernet.generate_key()
-                print(f"Generated new encryption key: {key.decode()}")
-            
-            if isinstance(key, str):
-                key = key.encode()
-            
-            f = Fernet(key)
-            encrypted_data = f.encrypt(plaintext.encode())
-            return base64.b64encode(encrypted_data).decode()
-        except Exception as e:
-            print(f"Encryption error: {e}")
-            return plaintext  # Fallback to plaintext
-    
+        """Encrypt message content with the shared Fernet cipher (see crypto.py)"""
+        return crypto.encrypt(plaintext, crypto.MESSAGES)
+
     def decrypt_content(self):
-        """Decrypt message content"""
-        try:
-            if not self.encrypted_content:
-                return self.content
-            
-            key = getattr(settings, 'MESSAGE_ENCRYPTION_KEY', None)
-            if not key:
-                return self.content
-            
-            if isinstance(key, str):
-                key = key.encode()
-            
-            f = Fernet(key)
-            encrypted_data = base64.b64decode(self.encrypted_content.encode())
-            decrypted_data = f.decrypt(encrypted_data)
-            return decrypted_data.decode()
-        except Exception as e:
-            print(f"Decryption error: {e}")
-            return self.content  # Fallback to stored content
-    
+        """Decrypt message content, falling back to the stored content"""
+        if hasattr(self, '_decrypted_content'):
+            return self._decrypted_content
+        plaintext = crypto.decrypt(self.encrypted_content, crypto.MESSAGES)
+        return self.content if plaintext is None else plaintext
+
+    @classmethod
+    def decrypt_batch(cls, messages):
+        """Decrypt a page of messages in one pass; later decrypt_content() calls reuse the result."""
+        plaintexts = crypto.decrypt_many([m.encrypted_content for m in messages], crypto.MESSAGES)
+        for message, plaintext in zip(messages, plaintexts):
+            message._decrypted_content = message.content if plaintext is None else plaintext
+        return messages
+
     def save(self, *args, **kwargs):
         """Override save to encrypt content before saving"""
         if self.content and not self.encrypted_content:
             self.encrypted_content = self.encrypt_content(self.content)
         super().save(*args, **kwargs)
     
-    def create_notifications(self):
-        """Create notifications for all participants except sender"""
-        # Get all participants except sender
-        recipients = self.conversation.participants.exclude(id=self.sender.id)
-        
-        for recipient in recipients:
-            MessageNotification.objects.create(
-                message=self,
-                recipient=recipient,
-                notification_type='new_message'
-            )
+    def create_notifications(self, participant_ids=None):
+        """Append a new_message entry to every other participant's notification log; returns {user_id: seq}"""
+        from .notification_log import append
+
+        if participant_ids is None:
+            participant_ids = self.conversation.participants.values_list('id', flat=True)
+        recipient_ids = [user_id for user_id in participant_ids if user_id != self.sender_id]
+        return append(self, recipient_ids, 'new_message')
+
+class ConversationReadState(models.Model):
+    """
+    Per-participant receipt watermarks for a conversation (see receipts.py).
+    - Every message from others with id <= ``read_up_to_id`` has been read by ``user``;
+      ``delivered_up_to_id`` likewise for delivery.
+    - Moved forward by one set-based UPDATE per receipt instead of saving messages one by one.
+    """
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name="read_states")
+    user = models.ForeignKey(Users, on_delete=models.CASCADE, related_name="conversation_read_states")
+    read_up_to_id = models.BigIntegerField(default=0, help_text="Highest message id read by the user.")
+    delivered_up_to_id = models.BigIntegerField(default=0, help_text="Highest message id delivered to the user.")
+    read_at = models.DateTimeField(null=True, blank=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "conversation_read_states"
+        unique_together = ("conversation", "user")
+        verbose_name = "Conversation Read State"
+        verbose_name_plural = "Conversation Read States"
+
+    def __str__(self):
+        return f"{self.user_id} read conversation {self.conversation_id} up to {self.read_up_to_id}"
+
+class ConversationInbox(models.Model):
+    """
+    Denormalized inbox row per participant per conversation (see inbox.py).
+    - Holds everything the conversation list shows (other participant, last message
+      preview, unread count) so the inbox renders from one indexed query.
+    - Updated by send_message and the read-receipt paths; ``rebuild_inbox`` recomputes it.
+    """
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name="inbox_entries")
+    user = models.ForeignKey(Users, on_delete=models.CASCADE, related_name="inbox_entries")
+    other_participant = models.ForeignKey(Users, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    last_message = models.ForeignKey("Message", on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    last_message_sender = models.ForeignKey(Users, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    last_message_preview = models.CharField(max_length=255, blank=True, help_text="Start of the last message.")
+    last_message_has_attachment = models.BooleanField(default=False)
+    last_activity_at = models.DateTimeField(help_text="Time of the last message, or creation of the conversation.")
+    unread_count = models.PositiveIntegerField(default=0, help_text="Messages from others not yet read by the user.")
+
+    class Meta:
+        db_table = "conversation_inbox"
+        unique_together = ("conversation", "user")
+        indexes = [
+            models.Index(fields=["user", "-last_activity_at"], name="inbox_user_activity_idx"),
+        ]
+        verbose_name = "Conversation Inbox Entry"
+        verbose_name_plural = "Conversation Inbox Entries"
+
+    def __str__(self):
+        return f"Inbox of {self.user_id}: conversation {self.conversation_id} ({self.unread_count} unread)"
+
+class AttachmentBlob(models.Model):
+    """
+    Content-addressed attachment bytes (see attachments.py).
+    - One row per distinct SHA-256; messages sharing the same file share the blob. What
+      a sender declared about the file (name, content type) stays on their message.
+    - ``storage_key`` / ``thumbnail_key`` are keys in the configured attachment storage
+      backend (local disk or S3-compatible), never paths under MEDIA_ROOT.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    size = models.BigIntegerField(help_text="Size in bytes.")
+    storage_key = models.CharField(max_length=255)
+    thumbnail_key = models.CharField(max_length=255, blank=True, help_text="Set once the background thumbnail exists.")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "attachment_blobs"
+        verbose_name = "Attachment Blob"
+        verbose_name_plural = "Attachment Blobs"
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.size} bytes)"
+
+class AttachmentUpload(models.Model):
+    """
+    Resumable chunked upload session for a message attachment.
+    - Chunks are appended to a staging file at ``received_bytes``; a client that lost
+      its connection asks for the session and continues from that offset.
+    - Completing the session hashes the staging file and links (or creates) the blob.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('completed', 'Completed'),
+        ('expired', 'Expired'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(Users, on_delete=models.CASCADE, related_name="attachment_uploads")
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name="attachment_uploads")
+    file_name = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    total_size = models.BigIntegerField(help_text="Declared size of the whole file in bytes.")
+    received_bytes = models.BigIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    blob = models.ForeignKey(AttachmentBlob, on_delete=models.SET_NULL, null=True, blank=True, related_name="uploads")
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "attachment_uploads"
+        indexes = [
+            models.Index(fields=["status", "expires_at"], name="attach_upload_expiry_idx"),
+        ]
+        verbose_name = "Attachment Upload"
+        verbose_name_plural = "Attachment Uploads"
+
+    def __str__(self):
+        return f"Upload {self.id} of {self.file_name} ({self.received_bytes}/{self.total_size})"
 
 class MessageNotification(models.Model):
     """
@@ -704,6 +982,7 @@ class MessageNotification(models.Model):
         ],
         default='new_message'
     )
+    seq = models.BigIntegerField(null=True, blank=True, help_text="Position in the recipient's notification log (see notification_log.py).")
     is_sent = models.BooleanField(default=False)
     sent_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -711,12 +990,92 @@ class MessageNotification(models.Model):
     class Meta:
         ordering = ["-created_at"]
         db_table = "message_notifications"
+        constraints = [
+            models.UniqueConstraint(fields=["recipient", "seq"], name="msg_notification_seq_uniq"),
+        ]
         verbose_name = "Message Notification"
         verbose_name_plural = "Message Notifications"
     
     def __str__(self):
         return f"Notification for {self.recipient.full_name}: {self.notification_type}"
 
+class MessageSearchToken(models.Model):
+    """
+    Blind index entry for message search (see message_search.py).
+    - ``token`` is a keyed hash of one normalized word of the message, so the index
+      never stores readable text.
+    - Keyed by conversation first so searches only touch the conversations a user is in.
+    """
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name="+", db_index=False)
+    message = models.ForeignKey(Message, on_delete=models.CASCADE, related_name="+", db_index=False)
+    token = models.BigIntegerField(help_text="Keyed 64-bit hash of a normalized word.")
+
+    class Meta:
+        db_table = "message_search_tokens"
+        constraints = [
+            models.UniqueConstraint(fields=["message", "token"], name="msg_search_token_uniq"),
+        ]
+        indexes = [
+            models.Index(fields=["conversation", "token", "message"], name="msg_search_conv_token_idx"),
+        ]
+        verbose_name = "Message Search Token"
+        verbose_name_plural = "Message Search Tokens"
+
+    def __str__(self):
+        return f"Token {self.token} in message {self.message_id}"
+
+class MessageSearchWatermark(models.Model):
+    """
+    How far the background sweep of message_search.py has indexed.
+    - ``last_message_id`` is the highest message id swept; the row is locked with
+      SELECT ... FOR UPDATE while a batch is indexed so sweeps never overlap.
+    """
+    name = models.CharField(max_length=50, unique=True, help_text="Index name, e.g. 'messages'.")
+    last_message_id = models.BigIntegerField(default=0, help_text="Highest message id indexed by the sweep.")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "message_search_watermarks"
+        verbose_name = "Message Search Watermark"
+        verbose_name_plural = "Message Search Watermarks"
+
+    @classmethod
+    def locked(cls, name: str):
+        """Return the row for ``name`` locked for update, creating it at 0; must run inside a transaction."""
+        watermark = cls.objects.select_for_update().filter(name=name).first()
+        if watermark is not None:
+            return watermark
+        try:
+            with transaction.atomic():
+                return cls.objects.create(name=name)
+        except IntegrityError:
+            # Another sweep created the row first; wait for its lock instead
+            return cls.objects.select_for_update().get(name=name)
+
+    def __str__(self):
+        return f"{self.name} indexed through {self.last_message_id}"
+
+class NotificationCursor(models.Model):
+    """
+    Per-user position in the message notification log (see notification_log.py).
+    - ``last_seq`` is the last sequence number handed out to the user; rows are locked
+      while appending so numbers are gap-free and increasing per user.
+    - ``acked_seq`` is the highest sequence the user's clients acknowledged; acks move it
+      forward with one UPDATE instead of saving notifications one by one.
+    """
+    user = models.OneToOneField(Users, on_delete=models.CASCADE, primary_key=True, related_name="notification_cursor")
+    last_seq = models.BigIntegerField(default=0, help_text="Last sequence number appended to the user's log.")
+    acked_seq = models.BigIntegerField(default=0, help_text="Highest sequence number acknowledged by the user.")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "message_notification_cursors"
+        verbose_name = "Notification Cursor"
+        verbose_name_plural = "Notification Cursors"
+
+    def __str__(self):
+        return f"{self.user_id} acked {self.acked_seq}/{self.last_seq}"
+
 class MessageReaction(models.Model):
     """
     Model for message reactions (like, love, etc.)
@@ -1206,7 +1565,7 @@ class PatientAssessmentArchive(models.Model):
     medical_condition = models.CharField(max_length=200, blank=True)
     medical_history_summary = models.TextField(blank=True)
     assessment_data = models.JSONField(default=dict, help_text="Complete patient assessment data (unencrypted copy for development)")
-    encrypted_assessment_data = models.TextField(blank=True, help_text="Base64 encoded encrypted assessment data")
+    encrypted_assessment_data = models.TextField(blank=True, help_text="Fernet token of the assessment data")
     diagnostics = models.JSONField(default=dict, blank=True, help_text="Relevant diagnostic information")
     last_assessed_at = models.DateTimeField(null=True, blank=True)
     hospital_name = models.CharField(max_length=255, blank=True)
@@ -1223,40 +1582,30 @@ class PatientAssessmentArchive(models.Model):
         name = getattr(self.user, 'full_name', '') or str(self.user_id)
         return f"Archive for {name} - {self.medical_condition or self.assessment_type}"
 
-    def _get_encryption_key(self):
-        key = getattr(settings, 'ARCHIVE_ENCRYPTION_KEY', None) or getattr(settings, 'MESSAGE_ENCRYPTION_KEY', None)
-        if isinstance(key, str):
-            key = key.encode()
-        return key
-
     def encrypt_payload(self, payload: dict) -> str:
-        try:
-            key = self._get_encryption_key()
-            if not key:
-                # Fallback for development when key is missing
-                key = Fernet.generate_key()
-            f = Fernet(key)
-            raw = json.dumps(payload or {}, ensure_ascii=False)
-            encrypted = f.encrypt(raw.encode())
-            return base64.b64encode(encrypted).decode()
-        except Exception:
-            # Fallback to plain JSON to avoid data loss in development
-            return json.dumps(payload or {}, ensure_ascii=False)
+        return crypto.encrypt(json.dumps(payload or {}, ensure_ascii=False), crypto.ARCHIVES)
 
     def decrypt_payload(self) -> dict:
+        if hasattr(self, '_decrypted_payload'):
+            return self._decrypted_payload
+        return self._load_payload(crypto.decrypt(self.encrypted_assessment_data, crypto.ARCHIVES))
+
+    def _load_payload(self, plaintext) -> dict:
+        if plaintext is None:
+            return self.assessment_data or {}
         try:
-            if not self.encrypted_assessment_data:
-                return self.assessment_data or {}
-            key = self._get_encryption_key()
-            if not key:
-                return self.assessment_data or {}
-            f = Fernet(key)
-            encrypted_data = base64.b64decode(self.encrypted_assessment_data.encode())
-            decrypted = f.decrypt(encrypted_data).decode()
-            return json.loads(decrypted)
-        except Exception:
+            return json.loads(plaintext)
+        except ValueError:
             return self.assessment_data or {}
 
+    @classmethod
+    def decrypt_batch(cls, records):
+        """Decrypt the payloads of a page of archives in one pass (see crypto.decrypt_many)."""
+        plaintexts = crypto.decrypt_many([r.encrypted_assessment_data for r in records], crypto.ARCHIVES)
+        for record, plaintext in zip(records, plaintexts):
+            record._decrypted_payload = record._load_payload(plaintext)
+        return records
+
     def save(self, *args, **kwargs):
         # Ensure encrypted payload is populated
         if (self.assessment_data or {}) and not self.encrypted_assessment_data:
@@ -1294,6 +1643,69 @@ class ArchiveAccessLog(models.Model):
         rid = getattr(self.record, 'id', None)
         return f"Archive access: {self.action} by {getattr(self.user, 'email', 'system')} on {rid}"
 
+class ReportArtifact(models.Model):
+    """
+    A rendered report PDF, addressed by the fingerprint of its inputs (see reports.py).
+    - ``fingerprint`` is the SHA-256 of the report kind, renderer version and input
+      data; exporting unchanged data finds this row and serves the stored file.
+    - ``storage_key`` is a key in the attachment storage backend (local disk or S3).
+    """
+    fingerprint = models.CharField(max_length=64, unique=True)
+    kind = models.CharField(max_length=32)
+    storage_key = models.CharField(max_length=255)
+    size = models.BigIntegerField(help_text="Size in bytes.")
+    render_ms = models.PositiveIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, help_text="Last time a job was served this file.")
+
+    class Meta:
+        db_table = "report_artifacts"
+        indexes = [
+            models.Index(fields=["last_used_at"], name="report_artifact_used_idx"),
+        ]
+        verbose_name = "Report Artifact"
+        verbose_name_plural = "Report Artifacts"
+
+    def __str__(self):
+        return f"{self.kind} report {self.fingerprint[:12]} ({self.size} bytes)"
+
+class ReportJob(models.Model):
+    """
+    One request for a report PDF, rendered by a Celery worker (see reports.py).
+    - Jobs with the same fingerprint share one render and one artifact.
+    - ``params`` is what the renderer needs to draw the report; the requester polls
+      the job or waits for its ``report_ready`` WebSocket event.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('rendering', 'Rendering'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(Users, on_delete=models.CASCADE, related_name="report_jobs")
+    kind = models.CharField(max_length=32)
+    fingerprint = models.CharField(max_length=64)
+    params = models.JSONField(default=dict, blank=True)
+    file_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    artifact = models.ForeignKey(ReportArtifact, on_delete=models.SET_NULL, null=True, blank=True, related_name="jobs")
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "report_jobs"
+        indexes = [
+            models.Index(fields=["fingerprint", "status"], name="report_job_fingerprint_idx"),
+        ]
+        verbose_name = "Report Job"
+        verbose_name_plural = "Report Jobs"
+
+    def __str__(self):
+        return f"{self.kind} report job {self.id} ({self.status})"
+
 
 class MedicalRecordRequest(models.Model):
     """
@@ -1364,6 +1776,50 @@ class MedicalRecordRequest(models.Model):
         return f"RecordRequest(patient={getattr(self.patient,'email','')}, status={self.status}, urgency={self.urgency})"
 
 
+class MedicalRecordDelivery(models.Model):
+    """
+    One delivery of a medical record request's encrypted PDF by email, run in
+    stages by a Celery worker (see record_delivery.py).
+    - ``idempotency_key`` is unique: delivering again under the same key returns
+      this delivery instead of sending the records twice.
+    - ``storage_key`` holds the encrypted PDF between rendering and sending;
+      ``sent_at`` is set as soon as the mail server accepts the email.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('collecting', 'Collecting'),
+        ('rendering', 'Rendering'),
+        ('sending', 'Sending'),
+        ('delivered', 'Delivered'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    request = models.ForeignKey(MedicalRecordRequest, on_delete=models.CASCADE, related_name='deliveries')
+    requested_by = models.ForeignKey(Users, on_delete=models.SET_NULL, null=True, blank=True, related_name='record_deliveries')
+    idempotency_key = models.CharField(max_length=64, unique=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    stage_timings = models.JSONField(default=dict, blank=True, help_text='Milliseconds spent in each stage')
+    file_name = models.CharField(max_length=255)
+    storage_key = models.CharField(max_length=255, blank=True)
+    message_id = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'medical_record_deliveries'
+        ordering = ['-created_at']
+        verbose_name = 'Medical Record Delivery'
+        verbose_name_plural = 'Medical Record Deliveries'
+
+    def __str__(self):
+        return f"Delivery {self.id} of record request {self.request_id} ({self.status})"
+
+
 class SecureKey(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='secure_keys')
     public_key_pem = models.TextField()
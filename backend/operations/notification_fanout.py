@@ -0,0 +1,187 @@
+"""
+Notification fan-out for audience-wide announcements.
+
+Announcements to a whole role (every doctor when analytics complete, every
+patient when a queue opens) used to insert one Notification per user inside
+the triggering request or signal. They now go through ``dispatch_fan_out``:
+
+- the work runs in the ``fan_out_notification`` Celery task once the triggering
+  transaction commits (inline only when no broker is reachable)
+- recipients are streamed as ids and inserted with ``bulk_create`` in batches
+  of ``NOTIFICATION_FANOUT_BATCH_SIZE``, each batch in its own transaction
+- connected clients get a single channel-layer message per audience group
+  (``notifications_<audience>``) instead of one per user
+- unread counts live in ``NotificationCounter`` rows, bumped with one UPDATE per
+  batch; ``unread_count`` reads them and ``recount_unread`` (daily beat task)
+  rebuilds them, which also covers deleted notifications
+"""
+
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Notification, NotificationCounter
+
+logger = logging.getLogger(__name__)
+
+FANOUT_BATCH_SIZE = getattr(settings, "NOTIFICATION_FANOUT_BATCH_SIZE", 2000)
+
+# Audience name -> User.role
+AUDIENCE_ROLES = {
+    "doctors": "doctor",
+    "nurses": "nurse",
+    "patients": "patient",
+}
+
+
+def audience_group(audience):
+    return f"notifications_{audience}"
+
+
+def audience_for_role(role):
+    for audience, audience_role in AUDIENCE_ROLES.items():
+        if audience_role == role:
+            return audience
+    return None
+
+
+def audience_recipients(audience):
+    if audience not in AUDIENCE_ROLES:
+        raise ValueError(f"Unknown notification audience: {audience}")
+    User = get_user_model()
+    return User.objects.filter(role=AUDIENCE_ROLES[audience], is_active=True).order_by("id").values_list("id", flat=True)
+
+
+# --- Unread counters ---
+def increment_unread(user_ids, by=1):
+    """Add ``by`` to the unread counter of every user in ``user_ids`` (two queries)."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=user_id) for user_id in user_ids],
+        ignore_conflicts=True,
+        batch_size=FANOUT_BATCH_SIZE,
+    )
+    NotificationCounter.objects.filter(user_id__in=user_ids).update(unread=F("unread") + by, updated_at=timezone.now())
+
+
+def decrement_unread(user_id, by=1):
+    NotificationCounter.objects.filter(user_id=user_id).update(
+        unread=Greatest(F("unread") - by, 0), updated_at=timezone.now()
+    )
+
+
+def reset_unread(user_id):
+    NotificationCounter.objects.filter(user_id=user_id).update(unread=0, updated_at=timezone.now())
+
+
+def unread_count(user):
+    """Unread notifications of ``user``, from the counter row (created from the table if missing)."""
+    user_id = getattr(user, "id", user)
+    counter = NotificationCounter.objects.filter(user_id=user_id).values_list("unread", flat=True).first()
+    if counter is not None:
+        return counter
+    return recount_unread([user_id]).get(user_id, 0)
+
+
+def recount_unread(user_ids=None):
+    """Rebuild unread counters from the notifications table; returns {user_id: unread}."""
+    unread = Notification.objects.filter(is_read=False)
+    if user_ids is not None:
+        unread = unread.filter(user_id__in=user_ids)
+    counts = dict(unread.order_by().values("user_id").annotate(n=Count("id")).values_list("user_id", "n"))
+
+    with transaction.atomic():
+        stale = NotificationCounter.objects.exclude(unread=0)
+        if user_ids is not None:
+            stale = stale.filter(user_id__in=user_ids)
+        stale.exclude(user_id__in=list(counts)).update(unread=0)
+        if user_ids is not None:
+            counts.update({user_id: 0 for user_id in user_ids if user_id not in counts})
+        NotificationCounter.objects.bulk_create(
+            [NotificationCounter(user_id=user_id, unread=n) for user_id, n in counts.items()],
+            update_conflicts=True,
+            unique_fields=["user"],
+            update_fields=["unread"],
+            batch_size=FANOUT_BATCH_SIZE,
+        )
+    return counts
+
+
+# --- Fan-out ---
+def fan_out(message, audience, batch_size=None, broadcast=True):
+    """Create ``message`` for every active user of ``audience`` in batched inserts."""
+    batch_size = batch_size or FANOUT_BATCH_SIZE
+    recipients = 0
+    batch = []
+
+    def flush(user_ids):
+        with transaction.atomic():
+            Notification.objects.bulk_create(
+                [
+                    Notification(
+                        user_id=user_id,
+                        message=message,
+                        channel=Notification.CHANNEL_WEBSOCKET,
+                        delivery_status=Notification.DELIVERY_PENDING,
+                    )
+                    for user_id in user_ids
+                ],
+                batch_size=batch_size,
+            )
+            increment_unread(user_ids)
+
+    for user_id in audience_recipients(audience).iterator(chunk_size=batch_size):
+        batch.append(user_id)
+        if len(batch) >= batch_size:
+            flush(batch)
+            recipients += len(batch)
+            batch = []
+    if batch:
+        flush(batch)
+        recipients += len(batch)
+
+    if broadcast and recipients:
+        broadcast_to_audience(audience, message)
+    logger.info(f"Fanned out notification to {recipients} {audience}")
+    return {"audience": audience, "recipients": recipients}
+
+
+def broadcast_to_audience(audience, message):
+    try:
+        async_to_sync(get_channel_layer().group_send)(
+            audience_group(audience),
+            {
+                "type": "notification",
+                "notification": {
+                    "message": message,
+                    "audience": audience,
+                    "broadcast": True,
+                    "created_at": timezone.now().isoformat(),
+                },
+            },
+        )
+    except Exception as e:
+        logger.warning(f"Failed to broadcast notification to {audience}: {str(e)}")
+
+
+def dispatch_fan_out(message, audience):
+    """Queue a fan-out to run in Celery after the current transaction commits."""
+    def _dispatch():
+        from .tasks import fan_out_notification
+
+        try:
+            fan_out_notification.delay(message, audience)
+        except Exception as e:
+            logger.warning(f"Celery unavailable for notification fan-out, running inline: {str(e)}")
+            fan_out(message, audience)
+
+    transaction.on_commit(_dispatch)
@@ -0,0 +1,146 @@
+"""
+Per-user ordered log of message notifications with resumable replay.
+
+``MessageConsumer`` used to send the latest 20 unsent ``MessageNotification`` rows
+on connect, one frame per row with the full nested message and recipient, and
+each ``mark_notification_sent`` saved a single row. Anything past 20 was never
+delivered and every ``get_notifications`` repeated the work. The notifications
+table is now a log:
+
+- every row carries ``seq``, increasing without gaps per recipient; ``append``
+  hands out the numbers for all recipients of a message under one lock on their
+  ``NotificationCursor`` rows and inserts the rows in one statement
+- clients remember the last ``seq`` they saw and reconnect with ``?last_seq=N`` (or
+  send ``resume``); ``replay`` returns everything after it in one frame of
+  lightweight entries (ids, type, sender, time) with ``has_more`` when the gap is
+  larger than ``NOTIFICATION_REPLAY_LIMIT``; without ``last_seq`` it replays from
+  the user's acknowledged position
+- ``ack`` moves the cursor's ``acked_seq`` forward with one UPDATE; acknowledging a
+  sequence acknowledges everything before it
+- ``prune`` drops acknowledged rows older than ``NOTIFICATION_LOG_RETENTION_DAYS``
+
+``is_sent``/``sent_at`` are only kept for rows written before the log existed.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Least
+from django.utils import timezone
+
+from .models import MessageNotification, NotificationCursor
+
+
+def replay_limit():
+    return getattr(settings, 'NOTIFICATION_REPLAY_LIMIT', 200)
+
+
+def append(message, recipient_ids, notification_type):
+    """Append one notification per recipient; returns {recipient_id: seq}."""
+    recipient_ids = sorted({int(user_id) for user_id in recipient_ids})
+    if not recipient_ids:
+        return {}
+    now = timezone.now()
+    with transaction.atomic():
+        NotificationCursor.objects.bulk_create(
+            [NotificationCursor(user_id=user_id) for user_id in recipient_ids], ignore_conflicts=True
+        )
+        # Locked in user id order so concurrent appends never deadlock
+        cursors = list(
+            NotificationCursor.objects.select_for_update().filter(user_id__in=recipient_ids).order_by('user_id')
+        )
+        for cursor in cursors:
+            cursor.last_seq += 1
+            cursor.updated_at = now
+        NotificationCursor.objects.bulk_update(cursors, ['last_seq', 'updated_at'])
+        MessageNotification.objects.bulk_create([
+            MessageNotification(
+                message=message,
+                recipient_id=cursor.user_id,
+                notification_type=notification_type,
+                seq=cursor.last_seq,
+            )
+            for cursor in cursors
+        ])
+    return {cursor.user_id: cursor.last_seq for cursor in cursors}
+
+
+def acked_seq(user_id):
+    return NotificationCursor.objects.filter(user_id=user_id).values_list('acked_seq', flat=True).first() or 0
+
+
+def unacked(user_id):
+    """Notifications the user has not acknowledged yet."""
+    return MessageNotification.objects.filter(recipient_id=user_id, seq__gt=acked_seq(user_id))
+
+
+def replay(user_id, after_seq=None, limit=None):
+    """
+    The user's notifications after ``after_seq`` (default: their acknowledged position),
+    oldest first, as the body of one ``notification_replay`` frame.
+    """
+    limit = limit or replay_limit()
+    if after_seq is None:
+        after_seq = acked_seq(user_id)
+    after_seq = max(int(after_seq), 0)
+    rows = list(
+        MessageNotification.objects.filter(recipient_id=user_id, seq__gt=after_seq)
+        .order_by('seq')
+        .values(
+            'seq', 'notification_type', 'message_id', 'message__conversation_id',
+            'message__sender_id', 'message__sender__full_name', 'created_at',
+        )[:limit + 1]
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        'after_seq': after_seq,
+        'last_seq': rows[-1]['seq'] if rows else after_seq,
+        'has_more': has_more,
+        'notifications': [
+            {
+                'seq': row['seq'],
+                'notification_type': row['notification_type'],
+                'message_id': row['message_id'],
+                'conversation_id': row['message__conversation_id'],
+                'sender_id': row['message__sender_id'],
+                'sender_name': row['message__sender__full_name'],
+                'created_at': row['created_at'],
+            }
+            for row in rows
+        ],
+    }
+
+
+def ack(user_id, seq):
+    """Acknowledge every notification up to ``seq``; returns True when the cursor moved."""
+    seq = int(seq)
+    updated = NotificationCursor.objects.filter(user_id=user_id, acked_seq__lt=seq).update(
+        acked_seq=Least(seq, F('last_seq')),
+        updated_at=timezone.now(),
+    )
+    return bool(updated)
+
+
+def ack_notification(user_id, notification_id):
+    """Acknowledge up to one notification by id; returns False when it is not the user's."""
+    seq = (
+        MessageNotification.objects.filter(id=notification_id, recipient_id=user_id)
+        .values_list('seq', flat=True).first()
+    )
+    if seq is None:
+        return False
+    ack(user_id, seq)
+    return True
+
+
+def prune(retention_days=None):
+    """Delete acknowledged notifications older than the retention window; returns the row count."""
+    if retention_days is None:
+        retention_days = getattr(settings, 'NOTIFICATION_LOG_RETENTION_DAYS', 30)
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    acked = NotificationCursor.objects.filter(user_id=OuterRef('recipient_id')).values('acked_seq')[:1]
+    deleted, _ = MessageNotification.objects.filter(created_at__lt=cutoff, seq__lte=Subquery(acked)).delete()
+    return deleted
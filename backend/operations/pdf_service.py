@@ -1,8 +1,11 @@
 import io
+import os
+import tempfile
 from typing import Dict, Any, List
 from reportlab.lib.pagesizes import A4
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import inch
+from reportlab.lib.pdfencrypt import StandardEncryption
 from datetime import datetime
 from django.core.mail import EmailMessage
 from django.conf import settings
@@ -18,20 +21,43 @@ try:
 except ImportError:
     PLATYPUS_AVAILABLE = False
 
+# ReportLab's AES-256 PDF encryption needs pyaes
 try:
-    from PyPDF2 import PdfReader, PdfWriter
-except Exception:  # pragma: no cover
-    PdfReader = None
-    PdfWriter = None
+    import pyaes  # noqa: F401
+    AES256_AVAILABLE = True
+except ImportError:
+    AES256_AVAILABLE = False
+
+
+class _AES256Encryption(StandardEncryption):
+    """
+    ReportLab's 256-bit (AES, revision 5) encryption. ReportLab pads the
+    encrypted file keys (/UE, /OE) and /Perms to 48 bytes; readers such as
+    MuPDF reject anything but the 32 and 16 bytes the PDF spec defines. With
+    the zero IV used, the leading bytes are exactly the unpadded values.
+    """
+
+    def prepare(self, document, overrideID=None):
+        super().prepare(document, overrideID)
+        if self.revision == 5:
+            self.UE, self.OE, self.Perms = self.UE[:32], self.OE[:32], self.Perms[:16]
 
 
-def generate_records_pdf(patient_name: str, patient_email: str, details: Dict[str, Any]) -> bytes:
+def pdf_encryption(password: str):
+    """AES-256 encryption for a ReportLab canvas or document, opened by ``password``."""
+    if not AES256_AVAILABLE:
+        raise RuntimeError("pyaes is required for AES-256 PDF encryption. Please install it.")
+    return _AES256Encryption(password, ownerPassword=password, strength=256)
+
+
+def generate_records_pdf(patient_name: str, patient_email: str, details: Dict[str, Any], password: str = None) -> bytes:
     """
     Generate a simple PDF containing requested medical records summary using reportlab.
-    Returns raw PDF bytes (unencrypted).
+    Returns raw PDF bytes, encrypted with AES-256 as they are written when a
+    ``password`` is given.
     """
     buffer = io.BytesIO()
-    c = canvas.Canvas(buffer, pagesize=A4)
+    c = canvas.Canvas(buffer, pagesize=A4, encrypt=pdf_encryption(password) if password else None)
     width, height = A4
 
     y = height - 1 * inch
@@ -355,24 +381,24 @@ def _add_assessment_context_section(story, record, styles):
     story.append(Spacer(1, 16))
 
 
-def _add_archive_forms_sections(story, profile, record, styles):
-    """Add forms sections (exclude discharge and patient education)"""
+def _archive_forms_flowables(profile, record, styles):
+    """Forms sections (exclude discharge and patient education), generated one flowable at a time"""
     if not PLATYPUS_AVAILABLE:
         return
     
-    story.append(Paragraph("Medical Forms and Records", styles['DepartmentHeader']))
+    yield Paragraph("Medical Forms and Records", styles['DepartmentHeader'])
     
     # Forms to include (exclude discharge and patient education)
     forms = []
     if profile:
         forms.extend([
             ("Nursing Intake & Assessment", getattr(profile, 'nursing_intake_assessment', {}) or {}),
-            ("Graphic Flow Sheets", list(getattr(profile, 'graphic_flow_sheets', []) or [])),
-            ("Medication Administration Records", list(getattr(profile, 'medication_administration_records', []) or [])),
-            ("History & Physical Forms", list(getattr(profile, 'history_physical_forms', []) or [])),
-            ("Progress Notes", list(getattr(profile, 'progress_notes', []) or [])),
-            ("Provider Order Sheets", list(getattr(profile, 'provider_order_sheets', []) or [])),
-            ("Operative/Procedure Reports", list(getattr(profile, 'operative_procedure_reports', []) or [])),
+            ("Graphic Flow Sheets", getattr(profile, 'graphic_flow_sheets', []) or []),
+            ("Medication Administration Records", getattr(profile, 'medication_administration_records', []) or []),
+            ("History & Physical Forms", getattr(profile, 'history_physical_forms', []) or []),
+            ("Progress Notes", getattr(profile, 'progress_notes', []) or []),
+            ("Provider Order Sheets", getattr(profile, 'provider_order_sheets', []) or []),
+            ("Operative/Procedure Reports", getattr(profile, 'operative_procedure_reports', []) or []),
         ])
     
     # Add assessment snapshot data (excluding discharge and patient education)
@@ -393,79 +419,88 @@ def _add_archive_forms_sections(story, profile, record, styles):
     
     # Render each form section
     for title, data in forms:
-        _add_form_section(story, title, data, styles)
+        yield from _form_section_flowables(title, data, styles)
     
     if not forms:
-        story.append(Paragraph("No medical forms available for this archived assessment.", styles['ContentText']))
+        yield Paragraph("No medical forms available for this archived assessment.", styles['ContentText'])
 
 
-def _add_form_section(story, title, data, styles):
-    """Add individual form section with proper formatting"""
-    if not PLATYPUS_AVAILABLE:
-        return
-    
-    story.append(Paragraph(title, styles['SectionHeader']))
+def _form_section_flowables(title, data, styles):
+    """Individual form section with proper formatting"""
+    yield Paragraph(title, styles['SectionHeader'])
     
     if not data:
-        story.append(Paragraph("No data available", styles['ContentText']))
-        story.append(Spacer(1, 8))
+        yield Paragraph("No data available", styles['ContentText'])
+        yield Spacer(1, 8)
         return
     
     if isinstance(data, dict):
-        _add_dict_content(story, data, styles)
+        yield from _dict_flowables(data, styles)
     elif isinstance(data, list):
-        _add_list_content(story, data, styles)
+        yield from _list_flowables(data, styles)
     else:
-        story.append(Paragraph(str(data), styles['ContentText']))
+        yield Paragraph(str(data), styles['ContentText'])
     
-    story.append(Spacer(1, 12))
+    yield Spacer(1, 12)
 
 
-def _add_dict_content(story, data_dict, styles):
-    """Add dictionary content as formatted table"""
+def _dict_flowables(data_dict, styles):
+    """
+    Dictionary content as formatted tables of at most ARCHIVE_PDF_TABLE_ROWS rows,
+    so a large JSON object never becomes one table that is re-split on every page
+    """
     if not PLATYPUS_AVAILABLE or not data_dict:
         return
     
+    rows_per_table = max(1, getattr(settings, 'ARCHIVE_PDF_TABLE_ROWS', 40))
     table_data = []
     for key, value in data_dict.items():
-        formatted_key = key.replace('_', ' ').title()
+        formatted_key = str(key).replace('_', ' ').title()
         if isinstance(value, (dict, list)):
-            formatted_value = str(value)[:100] + "..." if len(str(value)) > 100 else str(value)
+            text = str(value)
+            formatted_value = text[:100] + "..." if len(text) > 100 else text
         else:
             formatted_value = str(value) if value is not None else "Not specified"
         table_data.append([formatted_key, formatted_value])
+        if len(table_data) == rows_per_table:
+            yield _content_table(table_data)
+            table_data = []
     
     if table_data:
-        content_table = Table(table_data, colWidths=[2*inch, 4*inch])
-        content_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#2c3e50')),
-            ('TEXTCOLOR', (1, 0), (1, -1), colors.HexColor('#34495e')),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('LEFTPADDING', (0, 0), (-1, -1), 6),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 6),
-            ('TOPPADDING', (0, 0), (-1, -1), 3),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#ecf0f1')),
-        ]))
-        story.append(content_table)
-
-
-def _add_list_content(story, data_list, styles):
-    """Add list content as formatted entries"""
+        yield _content_table(table_data)
+
+
+def _content_table(table_data):
+    content_table = Table(table_data, colWidths=[2*inch, 4*inch])
+    content_table.setStyle(TableStyle([
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTNAME', (1, 0), (1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('TEXTCOLOR', (0, 0), (0, -1), colors.HexColor('#2c3e50')),
+        ('TEXTCOLOR', (1, 0), (1, -1), colors.HexColor('#34495e')),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('LEFTPADDING', (0, 0), (-1, -1), 6),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 6),
+        ('TOPPADDING', (0, 0), (-1, -1), 3),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#ecf0f1')),
+    ]))
+    return content_table
+
+
+def _list_flowables(data_list, styles):
+    """List content as formatted entries"""
     if not PLATYPUS_AVAILABLE or not data_list:
         return
     
     for i, item in enumerate(data_list, 1):
-        story.append(Paragraph(f"Entry {i}:", styles['SubsectionHeader']))
+        yield Paragraph(f"Entry {i}:", styles['SubsectionHeader'])
         if isinstance(item, dict):
-            _add_dict_content(story, item, styles)
+            yield from _dict_flowables(item, styles)
         else:
-            story.append(Paragraph(str(item), styles['ContentText']))
-        story.append(Spacer(1, 6))
+            yield Paragraph(str(item), styles['ContentText'])
+        yield Spacer(1, 6)
 
 
 def _add_archive_standardized_footer(story, styles):
@@ -489,33 +524,15 @@ def _add_archive_standardized_footer(story, styles):
     story.append(Paragraph(footer_text, styles['FooterText']))
 
 
-def encrypt_pdf_aes256(pdf_bytes: bytes, password: str) -> bytes:
-    """
-    Encrypt PDF bytes using AES-256 (requires PyPDF2 >= 3.0.0).
-    """
-    if PdfReader is None or PdfWriter is None:
-        raise RuntimeError("PyPDF2 is required for AES-256 PDF encryption. Please install it.")
-
-    reader = PdfReader(io.BytesIO(pdf_bytes))
-    writer = PdfWriter()
-    for page in reader.pages:
-        writer.add_page(page)
-
-    # AES-256 encryption
-    writer.encrypt(user_password=password, owner_password=password, use_128bit=False, permissions={})
-
-    out_buf = io.BytesIO()
-    writer.write(out_buf)
-    return out_buf.getvalue()
-
-
-def send_encrypted_pdf_to_patient(patient_email: str, encrypted_pdf: bytes, filename: str, message: str = None):
+def send_encrypted_pdf_to_patient(patient_email: str, encrypted_pdf: bytes, filename: str, message: str = None,
+                                  message_id: str = None):
     subject = "Your Requested Medical Records (Encrypted PDF)"
     body = message or (
         "Attached is your encrypted medical records PDF. "
         "Use the provided password format to open it."
     )
-    email = EmailMessage(subject, body, getattr(settings, 'DEFAULT_FROM_EMAIL', None), [patient_email])
+    headers = {'Message-ID': message_id} if message_id else None
+    email = EmailMessage(subject, body, getattr(settings, 'DEFAULT_FROM_EMAIL', None), [patient_email], headers=headers)
     email.attach(filename, encrypted_pdf, 'application/pdf')
     email.send(fail_silently=False)
 
@@ -559,18 +576,108 @@ def _draw_section_json(c: canvas.Canvas, title: str, data: Any, width: float, y:
     return y
 
 
-def generate_archive_pdf(record: PatientAssessmentArchive) -> bytes:
+class ArchiveTooLarge(Exception):
+    """An archive export outgrew ARCHIVE_PDF_MEMORY_LIMIT_MB while rendering."""
+
+
+def _rss_bytes():
+    """Resident set size of this process (peak RSS where /proc is not available)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class _FlowableFeed(list):
+    """
+    The story handed to ``doc.build``: a short list that refills itself from a
+    flowable iterator whenever the document template asks for its length, so
+    only the flowables around the current page are alive at any time. Every
+    ``check_every`` flowables the process RSS is compared with ``limit`` bytes
+    above what it was at the start.
+    """
+
+    lookahead = 32
+    check_every = 500
+
+    def __init__(self, flowables, limit=0):
+        super().__init__()
+        self._source = iter(flowables)
+        self._limit = limit
+        self._baseline = _rss_bytes() if limit else 0
+        self._pulled = 0
+
+    def __len__(self):
+        size = super().__len__()
+        while self._source is not None and size < self.lookahead:
+            try:
+                self.append(next(self._source))
+            except StopIteration:
+                self._source = None
+                break
+            size += 1
+            self._pulled += 1
+            if self._limit and self._pulled % self.check_every == 0:
+                grown = _rss_bytes() - self._baseline
+                if grown > self._limit:
+                    raise ArchiveTooLarge(
+                        f"Archive export needs more than {self._limit // (1024 * 1024)}MB "
+                        f"(grew {grown // (1024 * 1024)}MB after {self._pulled} elements)"
+                    )
+        return size
+
+
+def _archive_story(record, hospital_info, user_info, styles):
+    user = getattr(record, 'user', None)
+    profile = getattr(record, 'patient_profile', None)
+    head = []
+    
+    # Add standardized header matching analytics format
+    _add_archive_standardized_header(head, hospital_info, user_info, "Patient Assessment Archive", styles)
+    
+    # Add patient demographics section
+    _add_patient_demographics_section(head, user, profile, record, styles)
+    
+    # Add assessment context section
+    _add_assessment_context_section(head, record, styles)
+    yield from head
+    
+    # Add forms sections (exclude discharge and patient education)
+    yield from _archive_forms_flowables(profile, record, styles)
+    
+    # Add standardized footer matching analytics format
+    tail = []
+    _add_archive_standardized_footer(tail, styles)
+    yield from tail
+
+
+def generate_archive_pdf(record: PatientAssessmentArchive, output=None):
     """
     Build a PDF for an archived record using standardized analytics PDF format
     with proper styling, header, and footer matching the analytics template.
+
+    The story is generated section by section while pages are laid out, and form
+    tables are split into ARCHIVE_PDF_TABLE_ROWS-row tables, so memory follows the
+    finished pages rather than the number of entries; ArchiveTooLarge is raised
+    when rendering grows the process by more than ARCHIVE_PDF_MEMORY_LIMIT_MB.
+    Writes to ``output`` (a path or binary file) when given, else returns the bytes.
     """
     if not PLATYPUS_AVAILABLE:
         # Fallback to basic canvas if platypus not available
-        return _generate_archive_pdf_basic(record)
+        pdf = _generate_archive_pdf_basic(record)
+        if output is None:
+            return pdf
+        if isinstance(output, str):
+            with open(output, 'wb') as f:
+                f.write(pdf)
+        else:
+            output.write(pdf)
+        return None
     
-    buffer = io.BytesIO()
+    buffer = io.BytesIO() if output is None else output
     user = getattr(record, 'user', None)
-    profile = getattr(record, 'patient_profile', None)
     
     # Get hospital information using analytics format
     hospital_info = _get_archive_hospital_information(user, record)
@@ -581,25 +688,58 @@ def generate_archive_pdf(record: PatientAssessmentArchive) -> bytes:
     # Create standardized PDF template matching analytics format
     doc = _create_archive_pdf_template(buffer, hospital_info, user_info)
     styles = _get_archive_custom_styles()
-    story = []
-    
-    # Add standardized header matching analytics format
-    _add_archive_standardized_header(story, hospital_info, user_info, "Patient Assessment Archive", styles)
-    
-    # Add patient demographics section
-    _add_patient_demographics_section(story, user, profile, record, styles)
     
-    # Add assessment context section
-    _add_assessment_context_section(story, record, styles)
-    
-    # Add forms sections (exclude discharge and patient education)
-    _add_archive_forms_sections(story, profile, record, styles)
-    
-    # Add standardized footer matching analytics format
-    _add_archive_standardized_footer(story, styles)
-    
-    doc.build(story)
-    return buffer.getvalue()
+    limit = getattr(settings, 'ARCHIVE_PDF_MEMORY_LIMIT_MB', 512) * 1024 * 1024
+    doc.build(_FlowableFeed(_archive_story(record, hospital_info, user_info, styles), limit))
+    return buffer.getvalue() if output is None else None
+
+
+ARCHIVE_FORM_FIELDS = (
+    'nursing_intake_assessment', 'graphic_flow_sheets', 'medication_administration_records',
+    'history_physical_forms', 'progress_notes', 'provider_order_sheets', 'operative_procedure_reports',
+)
+
+
+def archive_report_content(record: PatientAssessmentArchive) -> Dict[str, Any]:
+    """
+    Everything generate_archive_pdf draws from, as the fingerprint of the archive
+    report (see reports.py): an unchanged record, patient and profile are served
+    from the report store.
+    """
+    user = getattr(record, 'user', None)
+    profile = getattr(record, 'patient_profile', None)
+    return {
+        'record': [
+            record.id, record.hospital_name, record.assessment_type, record.medical_condition,
+            record.last_assessed_at, record.encrypted_assessment_data or record.assessment_data,
+        ],
+        'user': [
+            getattr(user, field, None) for field in (
+                'full_name', 'role', 'department', 'hospital_name', 'hospital_address',
+                'hospital_phone', 'hospital_email', 'date_of_birth', 'gender',
+            )
+        ],
+        'profile': {
+            field: getattr(profile, field, None) for field in ('blood_type',) + ARCHIVE_FORM_FIELDS
+        } if profile else None,
+    }
+
+
+def render_archive_report(params: Dict[str, Any]) -> str:
+    """
+    Report renderer for archive exports (runs on a report worker, see reports.py).
+    Renders into a staging file and returns its path; reports.py moves it into the store.
+    """
+    record = PatientAssessmentArchive.objects.select_related('user', 'patient_profile').get(id=params['archive_id'])
+    os.makedirs(settings.ATTACHMENT_STAGING_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix='archive-', suffix='.pdf', dir=settings.ATTACHMENT_STAGING_DIR)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            generate_archive_pdf(record, f)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
 
 
 def _generate_archive_pdf_basic(record: PatientAssessmentArchive) -> bytes:
@@ -0,0 +1,175 @@
+"""
+Ephemeral presence for MessageConsumer connections.
+
+Clients used to poll ``get_available_users`` and the conversation list to learn
+who is online. Presence now lives only in Redis (never in the database):
+
+- every MessageConsumer connection is a member of ``presence:user:<id>`` and the
+  user a member of ``presence:hospital:<key>``; both are sorted sets scored by the
+  connection's expiry time, and both keys carry a TTL
+- connections refresh their expiry on connect and on each client ``heartbeat``
+  (``PRESENCE_TTL`` seconds); members whose expiry passed count as offline even
+  if their socket died without a disconnect
+- a user goes offline when their last connection leaves; online/offline changes are
+  broadcast once per hospital on ``presence_<key>``
+- ``online_user_ids(hospital)`` is one ZRANGEBYSCORE, used for the snapshot sent
+  on connect and to annotate ``get_available_users`` / ``available_nurses``
+
+``PRESENCE_BACKEND = 'local'`` keeps the same structures in process memory for
+development and tests (single process only).
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+
+def hospital_key(hospital_name):
+    """Stable key for a hospital name, matching the case-insensitive lookups in the views."""
+    normalized = (hospital_name or '').strip().lower()
+    if not normalized:
+        return None
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+
+def presence_group(hospital_name):
+    key = hospital_key(hospital_name)
+    return f"presence_{key}" if key else None
+
+
+def presence_ttl():
+    return getattr(settings, 'PRESENCE_TTL', 75)
+
+
+class RedisPresenceStore:
+    def __init__(self, url):
+        import redis
+
+        self.client = redis.Redis.from_url(url, socket_connect_timeout=1, socket_timeout=1)
+
+    def touch(self, user_id, hospital, connection, ttl):
+        """Refresh a connection; returns True when the user was offline before."""
+        now = time.time()
+        user_set = f"presence:user:{user_id}"
+        hospital_set = f"presence:hospital:{hospital}"
+        pipe = self.client.pipeline()
+        pipe.zremrangebyscore(user_set, '-inf', now)
+        pipe.zcard(user_set)
+        pipe.zadd(user_set, {connection: now + ttl})
+        pipe.expire(user_set, int(ttl) + 1)
+        pipe.zremrangebyscore(hospital_set, '-inf', now)
+        pipe.zadd(hospital_set, {str(user_id): now + ttl})
+        pipe.expire(hospital_set, int(ttl) + 1)
+        results = pipe.execute()
+        return results[1] == 0
+
+    def leave(self, user_id, hospital, connection):
+        """Drop a connection; returns True when it was the user's last one."""
+        now = time.time()
+        user_set = f"presence:user:{user_id}"
+        pipe = self.client.pipeline()
+        pipe.zrem(user_set, connection)
+        pipe.zcount(user_set, now, '+inf')
+        remaining = pipe.execute()[1]
+        if remaining:
+            return False
+        self.client.zrem(f"presence:hospital:{hospital}", str(user_id))
+        return True
+
+    def online(self, hospital):
+        members = self.client.zrangebyscore(f"presence:hospital:{hospital}", time.time(), '+inf')
+        return {int(member) for member in members}
+
+
+class LocalPresenceStore:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.users = {}
+        self.hospitals = {}
+
+    @staticmethod
+    def _live(members, now):
+        for member, expires_at in list(members.items()):
+            if expires_at <= now:
+                del members[member]
+        return members
+
+    def touch(self, user_id, hospital, connection, ttl):
+        now = time.time()
+        with self.lock:
+            connections = self._live(self.users.setdefault(user_id, {}), now)
+            was_offline = not connections
+            connections[connection] = now + ttl
+            self._live(self.hospitals.setdefault(hospital, {}), now)[user_id] = now + ttl
+        return was_offline
+
+    def leave(self, user_id, hospital, connection):
+        now = time.time()
+        with self.lock:
+            connections = self._live(self.users.get(user_id, {}), now)
+            connections.pop(connection, None)
+            if connections:
+                return False
+            self.hospitals.get(hospital, {}).pop(user_id, None)
+        return True
+
+    def online(self, hospital):
+        with self.lock:
+            return set(self._live(self.hospitals.get(hospital, {}), time.time()))
+
+
+@lru_cache(maxsize=None)
+def get_store():
+    if getattr(settings, 'PRESENCE_BACKEND', 'redis') == 'local':
+        return LocalPresenceStore()
+    return RedisPresenceStore(settings.PRESENCE_REDIS_URL)
+
+
+@receiver(setting_changed)
+def reset_store(setting, **kwargs):
+    if setting.startswith('PRESENCE_'):
+        get_store.cache_clear()
+
+
+def connect(user_id, hospital_name, connection):
+    """Register or refresh a connection; returns True when the user just came online."""
+    key = hospital_key(hospital_name)
+    if not key:
+        return False
+    try:
+        return get_store().touch(int(user_id), key, connection, presence_ttl())
+    except Exception as e:
+        logger.warning(f"Presence update failed for user {user_id}: {str(e)}")
+        return False
+
+
+def disconnect(user_id, hospital_name, connection):
+    """Remove a connection; returns True when the user just went offline."""
+    key = hospital_key(hospital_name)
+    if not key:
+        return False
+    try:
+        return get_store().leave(int(user_id), key, connection)
+    except Exception as e:
+        logger.warning(f"Presence removal failed for user {user_id}: {str(e)}")
+        return False
+
+
+def online_user_ids(hospital_name):
+    """Ids of users with a live connection in this hospital (empty when presence is unavailable)."""
+    key = hospital_key(hospital_name)
+    if not key:
+        return set()
+    try:
+        return get_store().online(key)
+    except Exception as e:
+        logger.warning(f"Presence lookup failed for {hospital_name}: {str(e)}")
+        return set()
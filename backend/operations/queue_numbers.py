@@ -0,0 +1,61 @@
+"""
+Queue number allocation without MAX() scans.
+
+``queue_number`` is globally unique on both queue tables, so numbers come from one
+allocator per table:
+
+- PostgreSQL: a dedicated sequence (created in migration 0031). ``nextval`` never
+  blocks concurrent callers and never hands out the same value twice, so bursts of
+  joins no longer collide on the unique constraint or serialize on a table scan.
+- Other databases (SQLite in tests and local development): a ``QueueCounter`` row
+  incremented under a row lock, seeded once from the current maximum.
+
+Sequences are not transactional: a rolled-back join burns its number. Queue numbers
+only need to be unique and increasing, so gaps are fine.
+"""
+
+from django.db import connection, transaction
+from django.db.models import Max
+
+
+class QueueNumberAllocator:
+    """Hands out unique, increasing queue numbers for one queue model."""
+
+    def __init__(self, model, field_name="queue_number"):
+        self.model = model
+        self.field_name = field_name
+
+    @property
+    def sequence_name(self):
+        return f"{self.model._meta.db_table}_{self.field_name}_seq"
+
+    @property
+    def counter_key(self):
+        return f"{self.field_name}:{self.model._meta.db_table}"
+
+    def _current_max(self):
+        return self.model.objects.aggregate(last=Max(self.field_name))["last"] or 0
+
+    def next_number(self) -> int:
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT nextval(%s)", [self.sequence_name])
+                return cursor.fetchone()[0]
+        from .models import QueueCounter
+
+        with transaction.atomic():
+            counter, _ = QueueCounter.locked(self.counter_key, initial=self._current_max)
+            return counter.advance(1)
+
+
+def create_sequence_sql(table, field_name="queue_number"):
+    """SQL creating the PostgreSQL sequence for ``table`` and aligning it with existing rows."""
+    sequence = f"{table}_{field_name}_seq"
+    return [
+        f'CREATE SEQUENCE IF NOT EXISTS "{sequence}" MINVALUE 1',
+        f'SELECT setval(\'"{sequence}"\', COALESCE((SELECT MAX("{field_name}") FROM "{table}"), 0) + 1, false)',
+    ]
+
+
+def drop_sequence_sql(table, field_name="queue_number"):
+    return [f'DROP SEQUENCE IF EXISTS "{table}_{field_name}_seq"']
@@ -0,0 +1,124 @@
+"""
+FIFO position engine for department queues.
+
+Waiting entries of a department always hold the contiguous positions 1..N in
+enqueue order. Instead of reloading and renumbering the whole department on
+every change, the engine keeps that invariant incrementally:
+
+- the department's tail N lives in a ``QueueCounter`` row; a join takes N + 1
+- an entry leaving the waiting state decrements N and closes its gap with a
+  single ``UPDATE ... SET position = position - 1`` for everyone behind it
+
+so joins and serves cost a constant number of queries regardless of queue
+length. The counter row is locked until the caller's transaction commits, which
+keeps concurrent joins and serves in one department from handing out duplicate
+positions. ``renumber`` rebuilds positions with one window-function UPDATE and is
+only needed for repairs (bulk imports, manual edits, periodic consistency
+checks).
+"""
+
+import logging
+
+from django.db import connection, transaction
+from django.db.models import F
+
+logger = logging.getLogger(__name__)
+
+
+class QueuePositionEngine:
+    """Maintains contiguous per-department positions for one queue model."""
+
+    waiting_status = "waiting"
+
+    def __init__(self, model, position_field, order_fields=("enqueue_time", "id")):
+        self.model = model
+        self.position_field = position_field
+        self.order_fields = order_fields
+
+    def _waiting(self, department):
+        return self.model.objects.filter(department=department, status=self.waiting_status)
+
+    def _tail(self, department):
+        """Locked tail counter for ``department``, seeded from the waiting count when missing."""
+        from .models import QueueCounter
+
+        key = f"position:{self.model._meta.db_table}:{department}"
+        return QueueCounter.locked(key, initial=lambda: self._waiting(department).count())
+
+    def next_position(self, department):
+        """Reserve the position a new waiting entry takes at the tail of the department queue."""
+        with transaction.atomic():
+            tail, _ = self._tail(department)
+            return tail.advance(1)
+
+    def release(self, department, position):
+        """
+        Close the gap left by an entry at ``position`` that is no longer waiting.
+        Every waiting entry behind it moves up by one in a single UPDATE.
+        """
+        if not position:
+            return 0
+        with transaction.atomic():
+            tail, created = self._tail(department)
+            # A freshly seeded tail already reflects the entry having left
+            if not created:
+                tail.advance(-1)
+            return self._waiting(department).filter(
+                **{f"{self.position_field}__gt": position}
+            ).update(**{self.position_field: F(self.position_field) - 1})
+
+    def stored_position(self, entry):
+        """
+        Position currently persisted for ``entry``. Gaps closed by other entries leaving
+        shift positions behind the instance's back, so releases use this, not the attribute.
+        """
+        stored = self.model.objects.filter(pk=entry.pk).values_list(self.position_field, flat=True).first()
+        return stored if stored is not None else getattr(entry, self.position_field)
+
+    def head(self, department):
+        """Waiting entry at the front of the department queue."""
+        return self._waiting(department).order_by(self.position_field, *self.order_fields).first()
+
+    def position_of(self, entry):
+        """Current 1-based position of a waiting entry (None once it left the queue)."""
+        if entry.status != self.waiting_status:
+            return None
+        return getattr(entry, self.position_field) or None
+
+    def patients_ahead(self, entry):
+        """Number of patients served before ``entry``: waiting ones ahead plus those in progress."""
+        position = self.position_of(entry)
+        if position is None:
+            return 0
+        in_progress = self.model.objects.filter(
+            department=entry.department, status="in_progress"
+        ).count()
+        return (position - 1) + in_progress
+
+    def renumber(self, department):
+        """
+        Rebuild positions 1..N for the waiting entries of ``department`` in one
+        window-function UPDATE. Only rows whose position actually changes are written.
+        """
+        opts = self.model._meta
+        qn = connection.ops.quote_name
+        table = qn(opts.db_table)
+        pk = qn(opts.pk.column)
+        position = qn(opts.get_field(self.position_field).column)
+        order_by = ", ".join(qn(opts.get_field(f).column) for f in self.order_fields)
+        sql = (
+            f"UPDATE {table} SET {position} = ranked.rn "
+            f"FROM (SELECT {pk} AS rid, ROW_NUMBER() OVER (ORDER BY {order_by}) AS rn "
+            f"FROM {table} WHERE {qn('department')} = %s AND {qn('status')} = %s) AS ranked "
+            f"WHERE {table}.{pk} = ranked.rid AND {table}.{position} <> ranked.rn"
+        )
+        with transaction.atomic():
+            tail, _ = self._tail(department)
+            with connection.cursor() as cursor:
+                cursor.execute(sql, [department, self.waiting_status])
+                updated = cursor.rowcount
+            tail.value = self._waiting(department).count()
+            tail.save(update_fields=["value", "updated_at"])
+        if updated:
+            logger.info(f"Renumbered {updated} {opts.model_name} positions for {department}")
+        return updated
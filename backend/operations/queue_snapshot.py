@@ -0,0 +1,287 @@
+"""
+Authoritative per-department queue snapshot kept in the cache (Redis).
+
+Each department has one snapshot holding everything queue dashboards render:
+
+- waiting counts for the normal and priority lines (and their total)
+- the number currently being served
+- the ordered head of the queue (priority line first, as it is served first)
+- the estimated wait for a patient joining now
+- a ``version`` that increases by one on every change
+
+Views apply join/serve/leave/complete events to the snapshot instead of
+recounting ``QueueManagement``/``PriorityQueue`` rows, and broadcast a compact
+``queue_delta`` (the event, the new counts and, only when it changed, the head)
+to ``queue_{department}``. Clients apply deltas in version order and request a
+full snapshot through the WebSocket when they see a gap.
+
+Mutations lock the department's ``QueueStatus`` row, so concurrent events in
+one department are applied one at a time; deltas go out once the transaction
+commits. When the cache is unavailable or the snapshot expired it is rebuilt
+from the database, and ``update_queue_statistics`` periodically reconciles it.
+"""
+
+import copy
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+HEAD_SIZE = 10
+SNAPSHOT_TIMEOUT = 60 * 60 * 12
+
+
+class QueueSnapshotStore:
+    """Reads, mutates and broadcasts per-department queue snapshots."""
+
+    key_prefix = "queue_snapshot"
+    count_fields = ("waiting_normal", "waiting_priority", "total_waiting", "in_progress")
+
+    def __init__(self, head_size=HEAD_SIZE, timeout=SNAPSHOT_TIMEOUT):
+        self.head_size = head_size
+        self.timeout = timeout
+
+    def key(self, department):
+        return f"{self.key_prefix}:{department}"
+
+    # --- Cache access (never fatal; the database is the fallback) ---
+    def _cache_get(self, department):
+        try:
+            return cache.get(self.key(department))
+        except Exception as e:
+            logger.warning(f"Queue snapshot cache read failed for {department}: {str(e)}")
+            return None
+
+    def _cache_set(self, department, snapshot):
+        try:
+            cache.set(self.key(department), snapshot, timeout=self.timeout)
+        except Exception as e:
+            logger.warning(f"Queue snapshot cache write failed for {department}: {str(e)}")
+
+    # --- Building from the database ---
+    @staticmethod
+    def _head_item(entry, entry_type):
+        if entry_type == "priority":
+            return {
+                "queue_number": entry.queue_number,
+                "type": "priority",
+                "position": entry.priority_position,
+                "priority_level": entry.priority_level,
+            }
+        return {"queue_number": entry.queue_number, "type": "normal", "position": entry.position_in_queue}
+
+    def _load_head(self, department):
+        from .models import PriorityQueue, QueueManagement
+
+        head = [
+            self._head_item(entry, "priority")
+            for entry in PriorityQueue.objects.filter(department=department, status="waiting")
+            .only("queue_number", "priority_position", "priority_level")
+            .order_by("priority_position", "enqueue_time", "id")[: self.head_size]
+        ]
+        if len(head) < self.head_size:
+            head += [
+                self._head_item(entry, "normal")
+                for entry in QueueManagement.objects.filter(department=department, status="waiting")
+                .only("queue_number", "position_in_queue")
+                .order_by("position_in_queue", "enqueue_time", "id")[: self.head_size - len(head)]
+            ]
+        return head
+
+    def _estimated_wait_minutes(self, department, waiting):
+        from .models import DepartmentServiceStats
+
+        if not waiting:
+            return 0
+        stats = DepartmentServiceStats.for_department(department)
+        return int((stats.average_service_time * waiting).total_seconds() // 60)
+
+    def build(self, department, version=0):
+        """Snapshot computed from the database (used on cache misses and reconciliation)."""
+        from .models import PriorityQueue, QueueManagement, QueueStatus
+
+        waiting_normal = QueueManagement.objects.filter(department=department, status="waiting").count()
+        waiting_priority = PriorityQueue.objects.filter(department=department, status="waiting").count()
+        in_progress = (
+            QueueManagement.objects.filter(department=department, status="in_progress").count()
+            + PriorityQueue.objects.filter(department=department, status="in_progress").count()
+        )
+        queue_status = QueueStatus.objects.filter(department=department).only("is_open", "current_serving").first()
+        return {
+            "department": department,
+            "version": version,
+            "is_open": bool(queue_status and queue_status.is_open),
+            "current_serving": queue_status.current_serving if queue_status else None,
+            "waiting_normal": waiting_normal,
+            "waiting_priority": waiting_priority,
+            "total_waiting": waiting_normal + waiting_priority,
+            "in_progress": in_progress,
+            "head": self._load_head(department),
+            "estimated_wait_minutes": self._estimated_wait_minutes(department, waiting_normal + waiting_priority),
+            "updated_at": timezone.now().isoformat(),
+        }
+
+    def get(self, department):
+        """Current snapshot, rebuilt from the database when the cache has none."""
+        snapshot = self._cache_get(department)
+        if snapshot is None:
+            snapshot = self.build(department)
+            self._cache_set(department, snapshot)
+        return snapshot
+
+    # --- Mutations ---
+    def _mutate(self, department, apply):
+        """
+        Apply ``apply(snapshot) -> delta`` under the department lock, bump the version,
+        store the snapshot and broadcast the delta after commit. Callers record events after
+        writing them to the database. Returns the new snapshot.
+        """
+        from .models import QueueStatus
+
+        with transaction.atomic():
+            list(QueueStatus.objects.select_for_update().filter(department=department).values_list("pk", flat=True))
+            snapshot = self._cache_get(department)
+            if snapshot is None:
+                # Rebuilt after the change was written, so it already reflects the event;
+                # apply it to a scratch copy only to describe the delta
+                snapshot = self.build(department)
+                head_before = [dict(item) for item in snapshot["head"]]
+                delta = apply(copy.deepcopy(snapshot)) or {}
+            else:
+                head_before = [dict(item) for item in snapshot["head"]]
+                delta = apply(snapshot) or {}
+
+            snapshot["version"] += 1
+            snapshot["updated_at"] = timezone.now().isoformat()
+            snapshot["total_waiting"] = snapshot["waiting_normal"] + snapshot["waiting_priority"]
+            snapshot["estimated_wait_minutes"] = self._estimated_wait_minutes(department, snapshot["total_waiting"])
+            self._cache_set(department, snapshot)
+
+            delta.update(
+                department=department,
+                version=snapshot["version"],
+                current_serving=snapshot["current_serving"],
+                estimated_wait_minutes=snapshot["estimated_wait_minutes"],
+                **{field: snapshot[field] for field in self.count_fields},
+            )
+            if snapshot["head"] != head_before:
+                delta["head"] = snapshot["head"]
+            transaction.on_commit(lambda: self.broadcast(department, delta))
+        return snapshot
+
+    def _rank(self, snapshot, entry_type, position):
+        """Index of a waiting entry in the served order (priority line first)."""
+        if entry_type == "priority":
+            return position - 1
+        return snapshot["waiting_priority"] + position - 1
+
+    def _remove_from_head(self, snapshot, entry, entry_type, position):
+        """Drop a no-longer-waiting entry from the head and refill it when it ran short."""
+        head = [item for item in snapshot["head"] if item["queue_number"] != entry.queue_number]
+        for item in head:
+            if item["type"] == entry_type and position and item["position"] > position:
+                item["position"] -= 1
+        snapshot["head"] = head
+        if len(head) < min(self.head_size, snapshot["waiting_normal"] + snapshot["waiting_priority"]):
+            snapshot["head"] = self._load_head(snapshot["department"])
+
+    def _leave_waiting(self, snapshot, entry, entry_type, position):
+        count_field = "waiting_priority" if entry_type == "priority" else "waiting_normal"
+        snapshot[count_field] = max(0, snapshot[count_field] - 1)
+        self._remove_from_head(snapshot, entry, entry_type, position)
+
+    def record_join(self, department, entry, entry_type):
+        """A new waiting entry was appended to the tail of its line."""
+        def apply(snapshot):
+            count_field = "waiting_priority" if entry_type == "priority" else "waiting_normal"
+            snapshot[count_field] += 1
+            item = self._head_item(entry, entry_type)
+            rank = self._rank(snapshot, entry_type, item["position"])
+            if rank < self.head_size:
+                snapshot["head"].insert(rank, item)
+                del snapshot["head"][self.head_size:]
+            return {"op": "join", "entry": item}
+
+        return self._mutate(department, apply)
+
+    def record_serve(self, department, entry, entry_type, position, completed=None):
+        """``entry`` left the waiting line to be served; ``completed`` is the entry it replaced."""
+        def apply(snapshot):
+            if completed is not None:
+                snapshot["in_progress"] = max(0, snapshot["in_progress"] - 1)
+            self._leave_waiting(snapshot, entry, entry_type, position)
+            snapshot["in_progress"] += 1
+            snapshot["current_serving"] = entry.queue_number
+            return {
+                "op": "serve",
+                "entry": {"queue_number": entry.queue_number, "type": entry_type, "position": position},
+                "completed": completed.queue_number if completed is not None else None,
+            }
+
+        return self._mutate(department, apply)
+
+    def record_leave(self, department, entry, entry_type, position, was_status="waiting"):
+        """``entry`` was removed, or completed, from the ``was_status`` state."""
+        def apply(snapshot):
+            if was_status == "waiting":
+                self._leave_waiting(snapshot, entry, entry_type, position)
+            elif was_status == "in_progress":
+                snapshot["in_progress"] = max(0, snapshot["in_progress"] - 1)
+            if snapshot["current_serving"] == entry.queue_number:
+                snapshot["current_serving"] = None
+            return {
+                "op": "leave",
+                "entry": {"queue_number": entry.queue_number, "type": entry_type, "position": position},
+                "was_status": was_status,
+            }
+
+        return self._mutate(department, apply)
+
+    def record_status(self, department, is_open):
+        """The department queue was opened or closed."""
+        def apply(snapshot):
+            snapshot["is_open"] = bool(is_open)
+            return {"op": "status", "is_open": snapshot["is_open"]}
+
+        return self._mutate(department, apply)
+
+    def reconcile(self, department):
+        """
+        Rebuild the snapshot from the database. When it differs from the cached one the
+        version is bumped and a ``reset`` delta carrying the full snapshot is broadcast.
+        """
+        cached = self._cache_get(department)
+        fresh = self.build(department, version=(cached or {}).get("version", 0))
+        volatile = ("version", "updated_at", "estimated_wait_minutes")
+        if cached is not None and all(cached.get(k) == fresh.get(k) for k in fresh if k not in volatile):
+            cached["estimated_wait_minutes"] = fresh["estimated_wait_minutes"]
+            self._cache_set(department, cached)
+            return cached
+        fresh["version"] += 1
+        self._cache_set(department, fresh)
+        transaction.on_commit(lambda: self.broadcast(department, {"op": "reset", "snapshot": fresh, "version": fresh["version"], "department": department}))
+        return fresh
+
+    def invalidate(self, department):
+        try:
+            cache.delete(self.key(department))
+        except Exception:
+            pass
+
+    def broadcast(self, department, delta):
+        try:
+            channel_layer = get_channel_layer()
+            async_to_sync(channel_layer.group_send)(
+                f"queue_{department}",
+                {"type": "queue_delta", "delta": delta},
+            )
+        except Exception as e:
+            logger.warning(f"Queue delta broadcast failed for {department}: {str(e)}")
+
+
+queue_snapshots = QueueSnapshotStore()
@@ -0,0 +1,154 @@
+"""
+Set-based read/delivered receipts for conversations.
+
+Opening a thread used to save every unread message one by one (each save also
+re-running the encryption check) and then push one fully serialized
+``message_delivered`` event per message. Receipts now work per conversation:
+
+- one ``UPDATE ... RETURNING id, sender_id`` flips ``is_read``/``is_delivered``
+  on every matching message from the other participants (a read implies delivery);
+  databases without UPDATE ... RETURNING (MySQL/MariaDB) select the ids, then update them
+- the reader's ``ConversationReadState`` watermark moves to the highest id covered
+  and their inbox unread counter drops by the number of messages read
+- each sender gets one compact event on ``messaging_<sender_id>`` after commit
+  through chat_events: ``{conversation_id, up_to_id, at, reader_id}`` (types
+  ``messages_read`` / ``messages_delivered``), meaning "every message of yours up to this id"
+
+The query count does not depend on how many messages were unread.
+"""
+
+import logging
+
+from django.db import connection, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from . import chat_events
+from .inbox import record_read
+from .models import ConversationReadState, Message
+
+logger = logging.getLogger(__name__)
+
+READ = "read"
+DELIVERED = "delivered"
+
+
+def _can_return_from_update():
+    """
+    UPDATE ... RETURNING works on PostgreSQL and SQLite >= 3.35 (the same release that added
+    INSERT ... RETURNING). MariaDB only supports it on INSERT/DELETE, so the feature flag
+    for inserts alone is not enough.
+    """
+    if connection.vendor == "postgresql":
+        return True
+    return connection.vendor == "sqlite" and connection.features.can_return_columns_from_insert
+
+
+def _flip_messages(conversation_id, user_id, kind, up_to_id, now):
+    """Mark matching messages in one statement; returns [(message_id, sender_id), ...]."""
+    qn = connection.ops.quote_name
+    at = connection.ops.adapt_datetimefield_value(now)
+    if kind == READ:
+        assignments = (
+            f"{qn('is_read')} = %s, {qn('read_at')} = %s, "
+            f"{qn('is_delivered')} = %s, {qn('delivered_at')} = COALESCE({qn('delivered_at')}, %s), "
+            f"{qn('updated_at')} = %s"
+        )
+        params = [True, at, True, at, at]
+        flag = "is_read"
+    else:
+        assignments = f"{qn('is_delivered')} = %s, {qn('delivered_at')} = %s, {qn('updated_at')} = %s"
+        params = [True, at, at]
+        flag = "is_delivered"
+
+    where = f"{qn('conversation_id')} = %s AND {qn('sender_id')} <> %s AND {qn(flag)} = %s"
+    params += [conversation_id, user_id, False]
+    if up_to_id is not None:
+        where += f" AND {qn('id')} <= %s"
+        params.append(up_to_id)
+
+    table = qn(Message._meta.db_table)
+    if _can_return_from_update():
+        with connection.cursor() as cursor:
+            cursor.execute(f"UPDATE {table} SET {assignments} WHERE {where} RETURNING {qn('id')}, {qn('sender_id')}", params)
+            return cursor.fetchall()
+
+    # Backends without UPDATE ... RETURNING: select the ids first, then update exactly those
+    pending = Message.objects.filter(conversation_id=conversation_id, **{flag: False}).exclude(sender_id=user_id)
+    if up_to_id is not None:
+        pending = pending.filter(id__lte=up_to_id)
+    rows = list(pending.values_list("id", "sender_id"))
+    if rows:
+        updates = {flag: True, f"{kind}_at": now, "updated_at": now}
+        if kind == READ:
+            updates["is_delivered"] = True
+            updates["delivered_at"] = Coalesce(F("delivered_at"), Value(now))
+        Message.objects.filter(id__in=[message_id for message_id, _ in rows]).update(**updates)
+    return rows
+
+
+def _advance_watermark(conversation_id, user_id, kind, up_to_id, now):
+    updates = {
+        f"{kind}_up_to_id": Greatest(F(f"{kind}_up_to_id"), up_to_id),
+        f"{kind}_at": now,
+    }
+    defaults = {f"{kind}_up_to_id": up_to_id, f"{kind}_at": now}
+    if kind == READ:
+        updates["delivered_up_to_id"] = Greatest(F("delivered_up_to_id"), up_to_id)
+        defaults["delivered_up_to_id"] = up_to_id
+    updated = ConversationReadState.objects.filter(conversation_id=conversation_id, user_id=user_id).update(**updates)
+    if not updated:
+        ConversationReadState.objects.get_or_create(
+            conversation_id=conversation_id, user_id=user_id, defaults=defaults
+        )
+
+
+def send_receipt(sender_id, kind, receipt):
+    try:
+        chat_events.publish_receipt(sender_id, kind, receipt)
+    except Exception as e:
+        logger.warning(f"Failed to send {kind} receipt to user {sender_id}: {str(e)}")
+
+
+def mark(conversation, user, kind, up_to_id=None, publish=True):
+    """
+    Mark ``user``'s incoming messages in ``conversation`` (optionally only up to
+    ``up_to_id``) as read or delivered. Returns {sender_id: receipt} for the senders notified;
+    with ``publish=False`` sending them is left to the caller (async views).
+    """
+    conversation_id = getattr(conversation, "id", conversation)
+    user_id = getattr(user, "id", user)
+    now = timezone.now()
+
+    with transaction.atomic():
+        rows = _flip_messages(conversation_id, user_id, kind, up_to_id, now)
+        if not rows:
+            return {}
+        _advance_watermark(conversation_id, user_id, kind, max(message_id for message_id, _ in rows), now)
+        if kind == READ:
+            record_read(conversation_id, user_id, len(rows))
+
+    receipts = {}
+    for message_id, sender_id in rows:
+        receipt = receipts.setdefault(sender_id, {
+            "conversation_id": conversation_id,
+            "up_to_id": message_id,
+            "at": now.isoformat(),
+            "reader_id": user_id,
+        })
+        receipt["up_to_id"] = max(receipt["up_to_id"], message_id)
+
+    if not publish:
+        return receipts
+    for sender_id, receipt in receipts.items():
+        transaction.on_commit(lambda sender_id=sender_id, receipt=receipt: send_receipt(sender_id, kind, receipt))
+    return receipts
+
+
+def mark_read(conversation, user, up_to_id=None, publish=True):
+    return mark(conversation, user, READ, up_to_id, publish)
+
+
+def mark_delivered(conversation, user, up_to_id=None, publish=True):
+    return mark(conversation, user, DELIVERED, up_to_id, publish)
@@ -0,0 +1,309 @@
+"""
+Background delivery of a medical record request's encrypted PDF by email.
+
+``deliver_medical_request`` used to collect the records, draw the PDF, read it
+back and write it out again through PyPDF2 to encrypt it, and talk to the mail
+server, all on the doctor's request thread, so a slow SMTP server held the
+doctor's UI. Deliveries now go through this module:
+
+- the view creates a ``MedicalRecordDelivery`` under an idempotency key (the
+  client's ``Idempotency-Key`` header, or one per approval of the request) and
+  answers 202; posting again with the same key returns that delivery and never
+  sends the records a second time
+- the ``deliver_medical_records`` Celery task (inline when Celery is unavailable)
+  runs the stages collect -> render -> send and records the milliseconds spent in
+  each in ``stage_timings``
+- the PDF is encrypted with AES-256 by ReportLab while it is written, so there is
+  no separate encrypt pass parsing the file again; the encrypted file waits under
+  ``deliveries/`` in the attachment storage until the mail server accepts it
+- a failing stage is retried with backoff (``RECORD_DELIVERY_MAX_RETRIES``); a
+  retry starts after the last finished stage, so a rendered PDF is not drawn
+  again and an accepted email is not sent again. The email's Message-ID is
+  derived from the delivery, so mail clients fold a duplicate into the original
+- every status change is pushed to the doctor's messaging WebSocket as a
+  ``medical_record_delivery`` notification; the request becomes ``delivered``
+  and the patient is notified once the email is sent
+"""
+
+import hashlib
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail.utils import DNS_NAME
+from django.db import transaction
+from django.utils import timezone
+
+from . import chat_events
+from .attachment_storage import get_storage
+from .models import MedicalRecordDelivery, MedicalRecordRequest
+from .pdf_service import generate_records_pdf, send_encrypted_pdf_to_patient
+from backend.users.models import PatientProfile
+
+logger = logging.getLogger(__name__)
+
+ACTIVE = ('queued', 'collecting', 'rendering', 'sending')
+CONTENT_TYPE = 'application/pdf'
+
+
+def _build_password(doctor_user, patient_user) -> str:
+    # First letter of doctor's first name and last name (uppercase), + patient birth year
+    # Example: EI2001
+    first_name = ''
+    last_name = ''
+    if getattr(doctor_user, 'full_name', None):
+        parts = str(doctor_user.full_name).strip().split()
+        if parts:
+            first_name = parts[0]
+            last_name = parts[-1] if len(parts) > 1 else ''
+    else:
+        first_name = getattr(doctor_user, 'first_name', '')
+        last_name = getattr(doctor_user, 'last_name', '')
+
+    d1 = (first_name[:1] or 'X').upper()
+    d2 = (last_name[:1] or 'X').upper()
+    birth_year = ''
+    dob = getattr(patient_user, 'date_of_birth', None)
+    if dob:
+        birth_year = str(dob.year)
+    else:
+        birth_year = '0000'
+    return f"{d1}{d2}{birth_year}"
+
+
+def _collect_records(patient_user, requested_records):
+    # For now, pull from PatientProfile structured fields
+    data = {}
+    try:
+        profile = patient_user.patient_profile
+    except PatientProfile.DoesNotExist:
+        profile = None
+    if not profile:
+        return data
+
+    # Map possible keys to profile attributes
+    mapping = {
+        'intake_assessment': 'intake_assessment',
+        'graphic_flow_sheets': 'graphic_flow_sheets',
+        'mar': 'medication_administration_record',
+        'education_records': 'patient_education_records',
+        'discharge_summary': 'discharge_summary',
+        'history_physical': 'history_and_physical',
+        'progress_notes': 'progress_notes',
+        'provider_orders': 'provider_order_sheets',
+        'operative_reports': 'operative_procedure_reports',
+    }
+    # If requested_records is empty, include a basic summary
+    keys = list(mapping.keys()) if not requested_records else [k for k in mapping.keys() if requested_records.get(k)]
+    for key in keys:
+        attr = mapping[key]
+        data[key] = getattr(profile, attr, None)
+    # Always include minimal demographics
+    data['patient'] = {
+        'full_name': getattr(patient_user, 'full_name', ''),
+        'email': getattr(patient_user, 'email', ''),
+        'date_of_birth': str(getattr(patient_user, 'date_of_birth', '') or ''),
+    }
+    return data
+
+
+def idempotency_key(mreq, client_key=None):
+    """The delivery key: the client's own key, or one per approval of the request."""
+    scope = f"client:{client_key}" if client_key else f"approved:{mreq.approved_at.isoformat() if mreq.approved_at else ''}"
+    return hashlib.sha256(f"{mreq.id}:{scope}".encode()).hexdigest()
+
+
+def storage_key(delivery):
+    return f"deliveries/{delivery.id}.pdf"
+
+
+def message_id(delivery):
+    return f"<record-delivery.{delivery.id}@{DNS_NAME}>"
+
+
+def in_progress(mreq):
+    """The request's unfinished delivery, unless its worker has not touched it in ``RECORD_DELIVERY_STALE_SECONDS``."""
+    stale = timezone.now() - timedelta(seconds=getattr(settings, 'RECORD_DELIVERY_STALE_SECONDS', 900))
+    return MedicalRecordDelivery.objects.filter(request=mreq, status__in=ACTIVE, updated_at__gte=stale).first()
+
+
+def request_delivery(mreq, doctor, key):
+    """
+    The delivery under ``key``, created and queued when it is new. A failed
+    delivery, or one whose worker was lost, is queued again and picks up where
+    it stopped. Returns (delivery, created).
+    """
+    delivery, created = MedicalRecordDelivery.objects.get_or_create(
+        idempotency_key=key,
+        defaults={'request': mreq, 'requested_by': doctor, 'file_name': f"medical-records-{mreq.patient_id}-{mreq.id}.pdf"},
+    )
+    if created:
+        schedule_delivery(delivery.id)
+    elif delivery.status == 'failed' or (delivery.status in ACTIVE and in_progress(mreq) is None):
+        requeued = MedicalRecordDelivery.objects.filter(pk=delivery.pk, status=delivery.status).update(
+            status='queued', error='', finished_at=None, updated_at=timezone.now()
+        )
+        if requeued:
+            schedule_delivery(delivery.id)
+    # Sent already if Celery was unavailable and we are not in a transaction
+    delivery.refresh_from_db()
+    return delivery, created
+
+
+def schedule_delivery(delivery_id):
+    """Queue the delivery in Celery after the current transaction commits."""
+    def _dispatch():
+        from .tasks import deliver_medical_records
+
+        try:
+            deliver_medical_records.delay(str(delivery_id))
+        except Exception as e:
+            logger.warning(f"Celery unavailable for record delivery, running inline: {str(e)}")
+            try:
+                run_delivery(delivery_id)
+            except Exception:
+                logger.error(f"Failed to deliver medical records {delivery_id}", exc_info=True)
+
+    transaction.on_commit(_dispatch)
+
+
+def run_delivery(delivery_id, last_attempt=True):
+    """
+    Run the delivery's remaining stages. A failure is recorded and re-raised; the
+    delivery fails on the ``last_attempt`` and is queued for the retry otherwise.
+    """
+    delivery = MedicalRecordDelivery.objects.select_related(
+        'request__patient', 'request__approved_by', 'requested_by'
+    ).filter(id=delivery_id).first()
+    if delivery is None or delivery.status not in ACTIVE:
+        return delivery
+
+    delivery.attempts += 1
+    _save(delivery, 'attempts')
+    storage = get_storage()
+    try:
+        if delivery.sent_at is None:
+            pdf = None
+            if not (delivery.storage_key and storage.exists(delivery.storage_key)):
+                records = _stage(delivery, 'collecting', 'collect', _collect, delivery)
+                pdf = _stage(delivery, 'rendering', 'render', _render, delivery, records)
+            _stage(delivery, 'sending', 'send', _send, delivery, pdf)
+    except Exception as e:
+        delivery.status = 'failed' if last_attempt else 'queued'
+        delivery.error = str(e) or e.__class__.__name__
+        delivery.finished_at = timezone.now() if last_attempt else None
+        _save(delivery, 'status', 'error', 'finished_at')
+        _notify(delivery)
+        raise
+
+    _complete(delivery)
+    return delivery
+
+
+def _stage(delivery, stage_status, stage, run, *args):
+    delivery.status = stage_status
+    _save(delivery, 'status')
+    _notify(delivery)
+    started = time.perf_counter()
+    result = run(*args)
+    delivery.stage_timings = {**delivery.stage_timings, stage: int((time.perf_counter() - started) * 1000)}
+    _save(delivery, 'stage_timings')
+    return result
+
+
+def _collect(delivery):
+    mreq = delivery.request
+    return {
+        'request': {
+            'id': mreq.id,
+            'type': mreq.request_type,
+            'urgency': mreq.urgency,
+            'reason': mreq.reason,
+            'approved_at': str(mreq.approved_at) if mreq.approved_at else None,
+        },
+        'records': _collect_records(mreq.patient, mreq.requested_records),
+    }
+
+
+def _render(delivery, details):
+    """Draw the PDF encrypted and keep it in the store until it is sent."""
+    mreq = delivery.request
+    patient = mreq.patient
+    doctor = delivery.requested_by or mreq.approved_by
+    pdf = generate_records_pdf(
+        patient_name=getattr(patient, 'full_name', patient.email),
+        patient_email=getattr(patient, 'email', ''),
+        details=details,
+        password=_build_password(doctor, patient),
+    )
+    key = storage_key(delivery)
+    get_storage().save_bytes(key, pdf, CONTENT_TYPE)
+    delivery.storage_key = key
+    _save(delivery, 'storage_key')
+    return pdf
+
+
+def _send(delivery, pdf=None):
+    if pdf is None:
+        with get_storage().open(delivery.storage_key) as f:
+            pdf = f.read()
+    delivery.message_id = message_id(delivery)
+    _save(delivery, 'message_id')
+    send_encrypted_pdf_to_patient(
+        getattr(delivery.request.patient, 'email', ''), pdf, delivery.file_name, message_id=delivery.message_id
+    )
+    # Recorded before anything else can fail, so a retry does not send it again
+    delivery.sent_at = timezone.now()
+    _save(delivery, 'sent_at')
+
+
+def _complete(delivery):
+    mreq = delivery.request
+    now = timezone.now()
+    with transaction.atomic():
+        delivery.status, delivery.error, delivery.finished_at = 'delivered', '', now
+        _save(delivery, 'status', 'error', 'finished_at')
+        MedicalRecordRequest.objects.filter(pk=mreq.pk).update(
+            status='delivered', delivered_at=delivery.sent_at, delivery_reference=delivery.file_name, updated_at=now
+        )
+    if delivery.storage_key:
+        get_storage().delete(delivery.storage_key)
+        delivery.storage_key = ''
+        _save(delivery, 'storage_key')
+    logger.info(f"Delivered medical record request {mreq.id} after {delivery.attempts} attempt(s): {delivery.stage_timings}")
+
+    _notify(delivery)
+    chat_events.publish_now([chat_events.user_group(mreq.patient_id)], chat_events.encode('notification', notification={
+        'type': 'medical_record_request_delivered',
+        'request_id': mreq.id,
+        'patient_id': mreq.patient_id,
+        'delivery_reference': delivery.file_name,
+    }))
+
+
+def _save(delivery, *fields):
+    delivery.save(update_fields=[*fields, 'updated_at'])
+
+
+def _notify(delivery):
+    if delivery.requested_by_id:
+        chat_events.publish_now(
+            [chat_events.user_group(delivery.requested_by_id)],
+            chat_events.encode('notification', notification=delivery_payload(delivery)),
+        )
+
+
+def delivery_payload(delivery):
+    return {
+        'type': 'medical_record_delivery',
+        'delivery_id': str(delivery.id),
+        'request_id': delivery.request_id,
+        'status': delivery.status,
+        'attempts': delivery.attempts,
+        'stage_timings': delivery.stage_timings,
+        'error': delivery.error or None,
+        'created_at': delivery.created_at,
+        'sent_at': delivery.sent_at,
+        'finished_at': delivery.finished_at,
+    }
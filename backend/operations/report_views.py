@@ -0,0 +1,35 @@
+from rest_framework import status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from .models import ReportJob
+from .reports import download_response, job_payload
+
+
+def _own_job(request, job_id):
+    return ReportJob.objects.filter(id=job_id, owner=request.user).select_related('artifact').first()
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def report_job_detail(request, job_id):
+    """The state of a report job (see reports.py); download_url is set once it is completed."""
+    job = _own_job(request, job_id)
+    if not job:
+        return Response({'error': 'Report job not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(job_payload(job))
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def download_report(request, job_id):
+    """The rendered PDF of a completed report job."""
+    job = _own_job(request, job_id)
+    if not job:
+        return Response({'error': 'Report job not found'}, status=status.HTTP_404_NOT_FOUND)
+    if job.status != 'completed' or job.artifact is None:
+        return Response(
+            {'error': 'Report is not ready', 'job': job_payload(job)}, status=status.HTTP_409_CONFLICT
+        )
+    return download_response(job)
@@ -0,0 +1,219 @@
+"""
+Background rendering of report PDFs into a content-addressed artifact store.
+
+The analytics report (analytics.views.generate_analytics_pdf) and the archive
+export (archive_views.archive_export) built their ReportLab documents, charts
+included, on the request thread; archive PDFs were then kept in Redis as raw
+bytes for 180 seconds. Report requests now go through this module:
+
+- the view gathers the report's input data and calls ``request_report``; the
+  SHA-256 of kind, renderer version and inputs is the report's fingerprint
+- when an artifact with that fingerprint exists the job is completed on the spot
+  and the stored file is served, with no rendering and no Celery round trip
+- otherwise a ``ReportJob`` is queued and the ``render_report`` Celery task draws
+  it (inline when Celery is unavailable); jobs sharing a fingerprint share one
+  render. The client polls the job or waits for the ``report_ready`` event on its
+  messaging WebSocket, then downloads the file
+- PDFs are stored under ``reports/`` in the attachment storage backend (local disk
+  served by the front proxy, or S3) and pruned after ``REPORT_ARTIFACT_TTL_DAYS``
+  without downloads; nothing is cached in Redis
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import chat_events
+from .attachment_storage import get_storage
+from .models import ReportArtifact, ReportJob
+
+logger = logging.getLogger(__name__)
+
+# kind -> (dotted path of ``render(params)``, version); a renderer returns the PDF
+# bytes or the path of a staging file holding it. Bump the version when a report's
+# layout changes so stored PDFs are not served for it any more
+RENDERERS = {
+    'analytics': ('backend.analytics.views.render_analytics_report', 3),
+    'archive': ('backend.operations.pdf_service.render_archive_report', 2),
+}
+ACTIVE = ('queued', 'rendering')
+CONTENT_TYPE = 'application/pdf'
+
+
+def fingerprint(kind, data):
+    _, version = RENDERERS[kind]
+    encoded = json.dumps([kind, version, data], cls=DjangoJSONEncoder, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def artifact_key(report_fingerprint):
+    return f"reports/{report_fingerprint[:2]}/{report_fingerprint}.pdf"
+
+
+def request_report(kind, params, owner, file_name, content=None):
+    """
+    A job for this report: completed at once when its PDF is stored, queued otherwise.
+    ``params`` go to the renderer; ``content`` is the data the PDF is drawn from when
+    ``params`` only point to it (defaults to ``params``).
+    """
+    report_fingerprint = fingerprint(kind, params if content is None else content)
+    now = timezone.now()
+    fields = {'owner': owner, 'kind': kind, 'fingerprint': report_fingerprint, 'params': params, 'file_name': file_name}
+
+    artifact = ReportArtifact.objects.filter(fingerprint=report_fingerprint).first()
+    if artifact is not None:
+        ReportArtifact.objects.filter(pk=artifact.pk).update(last_used_at=now)
+        return ReportJob.objects.create(status='completed', artifact=artifact, finished_at=now, **fields)
+
+    # One render per fingerprint, started by its earliest waiting job; jobs stuck longer
+    # than REPORT_JOB_STALE_SECONDS (a lost worker) do not hold new ones back. Peers are
+    # looked at only once this job exists: a render finishing from then on completes it
+    # along with the others, and one that finished just before left its artifact behind
+    job = ReportJob.objects.create(**fields)
+    stale = now - timedelta(seconds=getattr(settings, 'REPORT_JOB_STALE_SECONDS', 600))
+    first = ReportJob.objects.filter(
+        fingerprint=report_fingerprint, status__in=ACTIVE, created_at__gte=stale
+    ).order_by('created_at', 'id').values_list('id', flat=True).first()
+    if first == job.id:
+        schedule_render(job.id)
+    else:
+        artifact = ReportArtifact.objects.filter(fingerprint=report_fingerprint).first()
+        if artifact is not None:
+            _finish(report_fingerprint, artifact=artifact)
+    # Rendered already if Celery was unavailable and we are not in a transaction
+    job.refresh_from_db()
+    return job
+
+
+def schedule_render(job_id):
+    """Queue the render in Celery after the current transaction commits."""
+    def _dispatch():
+        from .tasks import render_report
+
+        try:
+            render_report.delay(str(job_id))
+        except Exception as e:
+            logger.warning(f"Celery unavailable for report rendering, running inline: {str(e)}")
+            try:
+                render_job(job_id)
+            except Exception:
+                logger.error(f"Failed to render report job {job_id}", exc_info=True)
+
+    transaction.on_commit(_dispatch)
+
+
+def render_job(job_id):
+    """
+    Render the job's report unless its artifact exists, then complete every job
+    waiting on that fingerprint. Failures fail those jobs and are re-raised.
+    """
+    job = ReportJob.objects.filter(id=job_id).first()
+    if job is None or job.status not in ACTIVE:
+        return job
+
+    artifact = ReportArtifact.objects.filter(fingerprint=job.fingerprint).first()
+    if artifact is None:
+        ReportJob.objects.filter(fingerprint=job.fingerprint, status='queued').update(status='rendering')
+        path, _ = RENDERERS[job.kind]
+        started = time.perf_counter()
+        try:
+            pdf = import_string(path)(job.params)
+        except Exception as e:
+            _finish(job.fingerprint, error=str(e) or e.__class__.__name__)
+            raise
+        render_ms = int((time.perf_counter() - started) * 1000)
+        key = artifact_key(job.fingerprint)
+        if isinstance(pdf, (bytes, bytearray)):
+            size = len(pdf)
+            get_storage().save_bytes(key, pdf, CONTENT_TYPE)
+        else:
+            # Large reports are rendered into a staging file, which the store takes over
+            size = os.path.getsize(pdf)
+            get_storage().put_file(pdf, key, CONTENT_TYPE)
+        artifact, _ = ReportArtifact.objects.get_or_create(
+            fingerprint=job.fingerprint,
+            defaults={'kind': job.kind, 'storage_key': key, 'size': size, 'render_ms': render_ms},
+        )
+        logger.info(f"Rendered {job.kind} report {job.fingerprint[:12]} ({size} bytes) in {render_ms}ms")
+
+    _finish(job.fingerprint, artifact=artifact)
+    return ReportJob.objects.select_related('artifact').get(id=job_id)
+
+
+def _finish(report_fingerprint, artifact=None, error=''):
+    """Complete (or fail) the waiting jobs of a fingerprint and tell their owners."""
+    waiting = list(ReportJob.objects.filter(fingerprint=report_fingerprint, status__in=ACTIVE))
+    if not waiting:
+        return
+    now = timezone.now()
+    job_status = 'completed' if artifact is not None else 'failed'
+    ReportJob.objects.filter(id__in=[job.id for job in waiting], status__in=ACTIVE).update(
+        status=job_status, artifact=artifact, error=error, finished_at=now
+    )
+    for job in waiting:
+        job.status, job.artifact, job.error, job.finished_at = job_status, artifact, error, now
+        chat_events.publish_now(
+            [chat_events.user_group(job.owner_id)], chat_events.encode('report_ready', job=job_payload(job))
+        )
+
+
+def job_payload(job):
+    completed = job.status == 'completed' and job.artifact_id is not None
+    return {
+        'job_id': str(job.id),
+        'kind': job.kind,
+        'status': job.status,
+        'file_name': job.file_name,
+        'size': job.artifact.size if completed else None,
+        'error': job.error or None,
+        'created_at': job.created_at,
+        'finished_at': job.finished_at,
+        'status_url': reverse('report_job_detail', args=[job.id]),
+        'download_url': reverse('download_report', args=[job.id]) if completed else None,
+    }
+
+
+def download_response(job):
+    """Serve the job's stored PDF through the storage backend (front proxy, FileResponse or S3)."""
+    ReportArtifact.objects.filter(pk=job.artifact_id).update(last_used_at=timezone.now())
+    return get_storage().download_response(job.artifact.storage_key, job.file_name, CONTENT_TYPE)
+
+
+def report_response(job):
+    """The PDF when the job is completed, otherwise its state: 202 while queued, 500 when it failed."""
+    if job.status == 'completed' and job.artifact_id is not None:
+        return download_response(job)
+    if job.status == 'failed':
+        return Response(
+            {'error': f'Error generating PDF report: {job.error}', 'job': job_payload(job)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+        )
+    return Response(job_payload(job), status=status.HTTP_202_ACCEPTED)
+
+
+def prune_artifacts(ttl_days=None):
+    """Delete PDFs not served for ``REPORT_ARTIFACT_TTL_DAYS`` and jobs older than that; returns the PDF count."""
+    if ttl_days is None:
+        ttl_days = getattr(settings, 'REPORT_ARTIFACT_TTL_DAYS', 30)
+    cutoff = timezone.now() - timedelta(days=ttl_days)
+    storage = get_storage()
+    deleted = 0
+    for artifact_id, key in ReportArtifact.objects.filter(last_used_at__lt=cutoff).values_list('id', 'storage_key'):
+        # Re-checked in the DELETE so a file served meanwhile is kept
+        if ReportArtifact.objects.filter(id=artifact_id, last_used_at__lt=cutoff).delete()[0]:
+            storage.delete(key)
+            deleted += 1
+    ReportJob.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from django.utils import timezone
-from .models import AppointmentManagement, QueueManagement, PriorityQueue, Notification, Messaging, Conversation, Message, MessageReaction, MessageNotification, MedicineInventory, PatientAssignment, ConsultationNotes, QueueSchedule, QueueStatus, QueueStatusLog, PatientAssessmentArchive, ArchiveAccessLog, MedicalRecordRequest
+from django.db import models
+from .models import AppointmentManagement, QueueManagement, PriorityQueue, Notification, Messaging, Conversation, ConversationInbox, Message, MessageReaction, MessageNotification, MedicineInventory, PatientAssignment, ConsultationNotes, QueueSchedule, QueueStatus, QueueStatusLog, PatientAssessmentArchive, ArchiveAccessLog, MedicalRecordRequest
 from backend.users.models import User
 
 class DashboardStatsSerializer(serializers.Serializer):
@@ -85,11 +86,19 @@ class MessageReactionSerializer(serializers.ModelSerializer):
         model = MessageReaction
         fields = ['id', 'user', 'reaction_type', 'created_at']
 
+class MessageListSerializer(serializers.ListSerializer):
+    """Decrypts the whole page once before the per-message fields are rendered"""
+    def to_representation(self, data):
+        messages = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        Message.decrypt_batch(messages)
+        return super().to_representation(messages)
+
 class MessageSerializer(serializers.ModelSerializer):
     """Serializer for messages"""
     sender = UserSerializer(read_only=True)
     reactions = MessageReactionSerializer(many=True, read_only=True)
     has_attachment = serializers.ReadOnlyField()
+    attachment = serializers.SerializerMethodField()
     decrypted_content = serializers.SerializerMethodField()
     is_delivered = serializers.ReadOnlyField()
     read_at = serializers.ReadOnlyField()
@@ -97,14 +106,20 @@ class MessageSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Message
-        fields = ['id', 'sender', 'content', 'decrypted_content', 'file_attachment', 'file_name', 'file_size', 
+        fields = ['id', 'sender', 'content', 'decrypted_content', 'file_attachment', 'attachment', 'file_name', 'file_size', 
                  'has_attachment', 'is_read', 'is_delivered', 'read_at', 'delivered_at', 
                  'created_at', 'updated_at', 'reactions']
+        list_serializer_class = MessageListSerializer
     
     def get_decrypted_content(self, obj):
         """Return decrypted content for the message"""
         return obj.decrypt_content()
 
+    def get_attachment(self, obj):
+        """Stored attachment with its download/thumbnail URLs (see attachments.py)"""
+        from .attachments import attachment_payload
+        return attachment_payload(obj)
+
 class ConversationSerializer(serializers.ModelSerializer):
     """Serializer for conversations"""
     participants = UserSerializer(many=True, read_only=True)
@@ -140,23 +155,62 @@ class ConversationSerializer(serializers.ModelSerializer):
                 return UserSerializer(other).data
         return None
 
+class ConversationInboxSerializer(serializers.ModelSerializer):
+    """
+    Conversation list entry rendered from the denormalized inbox row; same shape as
+    ConversationSerializer without any per-conversation queries
+    """
+    id = serializers.IntegerField(source='conversation_id', read_only=True)
+    participants = serializers.SerializerMethodField()
+    other_participant = UserSerializer(read_only=True)
+    last_message = serializers.SerializerMethodField()
+    created_at = serializers.DateTimeField(source='conversation.created_at', read_only=True)
+    updated_at = serializers.DateTimeField(source='last_activity_at', read_only=True)
+    is_active = serializers.BooleanField(source='conversation.is_active', read_only=True)
+    
+    class Meta:
+        model = ConversationInbox
+        fields = ['id', 'participants', 'other_participant', 'last_message',
+                 'unread_count', 'created_at', 'updated_at', 'is_active']
+    
+    def get_participants(self, obj):
+        request = self.context.get('request')
+        participants = [UserSerializer(request.user).data] if request and request.user else []
+        if obj.other_participant:
+            participants.append(UserSerializer(obj.other_participant).data)
+        return participants
+    
+    def get_last_message(self, obj):
+        """Preview of the last message (the full message comes from get_messages)"""
+        if not obj.last_message_id:
+            return None
+        return {
+            'id': obj.last_message_id,
+            'sender': {'id': obj.last_message_sender_id},
+            'content': obj.last_message_preview,
+            'decrypted_content': obj.last_message_preview,
+            'has_attachment': obj.last_message_has_attachment,
+            'created_at': obj.last_activity_at,
+        }
+
 class CreateMessageSerializer(serializers.ModelSerializer):
     """Serializer for creating new messages"""
+    upload_id = serializers.UUIDField(required=False, write_only=True, help_text="Completed attachment upload session")
+
     class Meta:
         model = Message
-        fields = ['content', 'file_attachment']
+        fields = ['content', 'file_attachment', 'upload_id']
     
     def validate_file_attachment(self, value):
         """Validate file attachment"""
+        from .attachments import ALLOWED_CONTENT_TYPES, max_attachment_size
         if value:
-            # Check file size (max 10MB)
-            if value.size > 10 * 1024 * 1024:
-                raise serializers.ValidationError("File size cannot exceed 10MB")
+            # Check file size (ATTACHMENT_MAX_SIZE, 10MB by default)
+            if value.size > max_attachment_size():
+                raise serializers.ValidationError(f"File size cannot exceed {max_attachment_size() // (1024 * 1024)}MB")
             
             # Check file type
-            allowed_types = ['image/jpeg', 'image/png', 'image/gif', 'application/pdf', 
-                           'text/plain', 'application/msword', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document']
-            if value.content_type not in allowed_types:
+            if value.content_type not in ALLOWED_CONTENT_TYPES:
                 raise serializers.ValidationError("File type not allowed")
         
         return value
@@ -174,7 +228,7 @@ class MessageNotificationSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = MessageNotification
-        fields = ['id', 'message', 'recipient', 'notification_type', 'is_sent', 'sent_at', 'created_at']
+        fields = ['id', 'message', 'recipient', 'notification_type', 'seq', 'is_sent', 'sent_at', 'created_at']
 
 class MedicineInventorySerializer(serializers.ModelSerializer):
     """Serializer for medicine inventory"""
@@ -365,6 +419,12 @@ class UpdateQueueStatusSerializer(serializers.ModelSerializer):
         return value
 
 # Archive Serializers
+class PatientAssessmentArchiveListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        records = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        PatientAssessmentArchive.decrypt_batch(records)
+        return super().to_representation(records)
+
 class PatientAssessmentArchiveSerializer(serializers.ModelSerializer):
     patient_id = serializers.IntegerField(source='user.id', read_only=True)
     patient_name = serializers.CharField(source='user.full_name', read_only=True)
@@ -375,6 +435,7 @@ class PatientAssessmentArchiveSerializer(serializers.ModelSerializer):
         fields = ['id', 'patient_id', 'patient_name', 'assessment_type', 'medical_condition',
                   'medical_history_summary', 'diagnostics', 'last_assessed_at', 'hospital_name',
                   'decrypted_assessment_data', 'created_at', 'updated_at']
+        list_serializer_class = PatientAssessmentArchiveListSerializer
 
     def get_decrypted_assessment_data(self, obj):
         return obj.decrypt_payload()
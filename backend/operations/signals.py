@@ -0,0 +1,25 @@
+import logging
+
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import Notification
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Notification)
+def notification_saved(sender, instance, created, **kwargs):
+    """
+    Keep the recipient's unread counter in step with single notification inserts
+    (batched fan-outs use bulk_create and bump the counters themselves). Deletes are
+    left to the periodic recount so bulk deletes stay single queries.
+    """
+    if not created or instance.is_read:
+        return
+    try:
+        from .notification_fanout import increment_unread
+        increment_unread([instance.user_id])
+    except Exception as e:
+        logger.error(f"Error updating unread counter for notification {instance.id}: {str(e)}")
+
@@ -2,6 +2,7 @@
 Celery tasks for operations module.
 """
 import logging
+from datetime import timedelta
 from celery import shared_task
 from django.utils import timezone
 from channels.layers import get_channel_layer
@@ -18,6 +19,7 @@ def auto_close_queues():
     """
     from .models import QueueStatus, QueueStatusLog
     from .serializers import QueueStatusSerializer
+    from .queue_snapshot import queue_snapshots
     
     logger.info(f"Running auto_close_queues task at {timezone.now()}")
     
@@ -37,6 +39,7 @@ def auto_close_queues():
                 queue_status.is_open = False
                 queue_status.update_status_message()
                 queue_status.save()
+                queue_snapshots.record_status(queue_status.department, False)
                 
                 # Log the automatic closure
                 QueueStatusLog.objects.create(
@@ -165,8 +168,8 @@ def update_queue_statistics():
     Periodic task to update queue statistics and estimated wait times.
     Runs every 2 minutes to keep queue information current.
     """
-    from .models import QueueStatus, QueueManagement
-    from datetime import timedelta
+    from .models import QueueStatus, QueueManagement, priority_queue_positions
+    from .queue_snapshot import queue_snapshots
     
     logger.info(f"Running update_queue_statistics task at {timezone.now()}")
     
@@ -176,37 +179,22 @@ def update_queue_statistics():
         
         for queue_status in open_queues:
             try:
-                # Count waiting patients
-                waiting_count = QueueManagement.objects.filter(
-                    department=queue_status.department,
-                    status='waiting'
-                ).count()
+                # Consistency checks for the incremental position engines (no-ops when positions are contiguous)
+                QueueManagement.update_queue_positions_for_department(queue_status.department)
+                priority_queue_positions.renumber(queue_status.department)
+
+                # Reconcile the department snapshot with the database; a changed snapshot
+                # is broadcast as a versioned reset delta, an unchanged one is not broadcast
+                snapshot = queue_snapshots.reconcile(queue_status.department)
                 
                 # Update statistics
-                queue_status.total_waiting = waiting_count
-                
-                # Calculate estimated wait time (5 minutes per patient as baseline)
-                if waiting_count > 0:
-                    queue_status.estimated_wait_time = timedelta(minutes=5 * waiting_count)
-                else:
-                    queue_status.estimated_wait_time = None
+                queue_status.total_waiting = snapshot['total_waiting']
+                queue_status.estimated_wait_time = (
+                    timedelta(minutes=snapshot['estimated_wait_minutes']) if snapshot['total_waiting'] else None
+                )
                 
                 queue_status.update_status_message()
                 queue_status.save()
-                
-                # Broadcast updated statistics
-                try:
-                    from .serializers import QueueStatusSerializer
-                    channel_layer = get_channel_layer()
-                    async_to_sync(channel_layer.group_send)(
-                        f'queue_{queue_status.department}',
-                        {
-                            'type': 'queue_status_update',
-                            'status': QueueStatusSerializer(queue_status).data
-                        }
-                    )
-                except Exception as e:
-                    logger.warning(f"Failed to broadcast statistics for {queue_status.department}: {str(e)}")
                     
             except Exception as e:
                 logger.error(f"Error updating statistics for {queue_status.department}: {str(e)}", exc_info=True)
@@ -223,3 +211,168 @@ def update_queue_statistics():
         return {'error': str(e)}
 
 
+
+
+@shared_task(name='backend.operations.tasks.fan_out_notification')
+def fan_out_notification(message, audience):
+    """
+    Create one notification per active user of an audience in batched inserts and
+    broadcast it once to the audience's channel group.
+    """
+    from .notification_fanout import fan_out
+
+    try:
+        return fan_out(message, audience)
+    except Exception as e:
+        logger.error(f"Error fanning out notification to {audience}: {str(e)}", exc_info=True)
+        return {'error': str(e)}
+
+
+@shared_task(name='backend.operations.tasks.reconcile_notification_counters')
+def reconcile_notification_counters():
+    """
+    Periodic task rebuilding the denormalized unread counters from the notifications
+    table, correcting updates that bypassed the counters (e.g. admin edits).
+    """
+    from .notification_fanout import recount_unread
+
+    try:
+        counts = recount_unread()
+        return {'users_with_unread': len(counts), 'timestamp': timezone.now().isoformat()}
+    except Exception as e:
+        logger.error(f"Error in reconcile_notification_counters task: {str(e)}", exc_info=True)
+        return {'error': str(e)}
+
+
+@shared_task(name='backend.operations.tasks.generate_attachment_thumbnail')
+def generate_attachment_thumbnail(blob_id):
+    """
+    Create the thumbnail of an image attachment blob (see attachments.py).
+    """
+    from .attachments import generate_thumbnail
+
+    try:
+        return {'blob_id': blob_id, 'thumbnail_key': generate_thumbnail(blob_id)}
+    except Exception as e:
+        logger.error(f"Error in generate_attachment_thumbnail task: {str(e)}", exc_info=True)
+        return {'error': str(e)}
+
+
+@shared_task(name='backend.operations.tasks.expire_attachment_uploads')
+def expire_attachment_uploads():
+    """
+    Periodic task expiring unfinished attachment upload sessions and removing
+    their staging files.
+    """
+    from .attachments import expire_uploads
+
+    try:
+        expired = expire_uploads()
+        logger.info(f"Expired {expired} attachment upload sessions")
+        return {'expired': expired, 'timestamp': timezone.now().isoformat()}
+    except Exception as e:
+        logger.error(f"Error in expire_attachment_uploads task: {str(e)}", exc_info=True)
+        return {'error': str(e)}
+
+
+@shared_task(name='backend.operations.tasks.prune_notification_log')
+def prune_notification_log():
+    """
+    Periodic task deleting acknowledged message notifications older than
+    NOTIFICATION_LOG_RETENTION_DAYS.
+    """
+    from .notification_log import prune
+
+    try:
+        deleted = prune()
+        logger.info(f"Pruned {deleted} acknowledged message notifications")
+        return {'deleted': deleted, 'timestamp': timezone.now().isoformat()}
+    except Exception as e:
+        logger.error(f"Error in prune_notification_log task: {str(e)}", exc_info=True)
+        return {'error': str(e)}
+
+
+@shared_task(name='backend.operations.tasks.index_message_search')
+def index_message_search(message_ids):
+    """
+    Add newly sent messages to the message search index.
+    """
+    from .message_search import index_message_ids
+
+    try:
+        tokens = index_message_ids(message_ids)
+        return {'messages': len(message_ids), 'tokens': tokens}
+    except Exception as e:
+        logger.error(f"Error in index_message_search task: {str(e)}", exc_info=True)
+        return {'error': str(e)}
+
+
+@shared_task(name='backend.operations.tasks.index_message_search_backlog')
+def index_message_search_backlog():
+    """
+    Periodic task indexing every message past the search index watermark.
+    """
+    from .message_search import index_backlog
+
+    try:
+        indexed = index_backlog()
+        logger.info(f"Indexed {indexed} messages for search")
+        return {'indexed': indexed, 'timestamp': timezone.now().isoformat()}
+    except Exception as e:
+        logger.error(f"Error in index_message_search_backlog task: {str(e)}", exc_info=True)
+        return {'error': str(e)}
+
+
+@shared_task(name='backend.operations.tasks.render_report')
+def render_report(job_id):
+    """
+    Render a queued report job into the report store (see reports.py).
+    """
+    from .reports import render_job
+
+    try:
+        job = render_job(job_id)
+        return {'job_id': job_id, 'status': getattr(job, 'status', None)}
+    except Exception as e:
+        logger.error(f"Error in render_report task: {str(e)}", exc_info=True)
+        return {'error': str(e)}
+
+
+@shared_task(name='backend.operations.tasks.prune_report_artifacts')
+def prune_report_artifacts():
+    """
+    Periodic task deleting stored report PDFs that were not downloaded for
+    REPORT_ARTIFACT_TTL_DAYS, and old report jobs.
+    """
+    from .reports import prune_artifacts
+
+    try:
+        deleted = prune_artifacts()
+        logger.info(f"Pruned {deleted} report artifacts")
+        return {'deleted': deleted, 'timestamp': timezone.now().isoformat()}
+    except Exception as e:
+        logger.error(f"Error in prune_report_artifacts task: {str(e)}", exc_info=True)
+        return {'error': str(e)}
+
+
+@shared_task(bind=True, name='backend.operations.tasks.deliver_medical_records')
+def deliver_medical_records(self, delivery_id):
+    """
+    Collect, render (encrypted) and email a medical record delivery (see
+    record_delivery.py); a failed stage is retried with exponential backoff.
+    """
+    from django.conf import settings
+    from .record_delivery import run_delivery
+
+    max_retries = getattr(settings, 'RECORD_DELIVERY_MAX_RETRIES', 3)
+    last_attempt = self.request.retries >= max_retries
+    try:
+        delivery = run_delivery(delivery_id, last_attempt=last_attempt)
+        return {'delivery_id': delivery_id, 'status': getattr(delivery, 'status', None)}
+    except Exception as e:
+        if not last_attempt:
+            countdown = getattr(settings, 'RECORD_DELIVERY_RETRY_DELAY', 30) * (2 ** self.request.retries)
+            logger.warning(f"Retrying medical record delivery {delivery_id} in {countdown}s: {str(e)}")
+            raise self.retry(exc=e, countdown=countdown, max_retries=max_retries)
+        logger.error(f"Error in deliver_medical_records task: {str(e)}", exc_info=True)
+        return {'error': str(e)}
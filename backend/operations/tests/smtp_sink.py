@@ -0,0 +1,96 @@
+"""
+A local SMTP server for tests: accepts mail on 127.0.0.1 and keeps the parsed
+messages in memory, so code sending through Django's SMTP backend can be tested
+end to end without a real mail server.
+
+    with SMTPSink() as sink, override_settings(**sink.email_settings()):
+        ...
+    sink.messages  # email.message.EmailMessage objects, in order received
+
+``fail_next`` makes the sink reject that many messages with a temporary 451
+error after their data has been sent, as a struggling mail server would;
+``reply_delay`` holds every reply to a message's data for that many seconds, as a
+slow one would.
+"""
+
+import socketserver
+import threading
+import time
+from email import policy
+from email.parser import BytesParser
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        sink = self.server.sink
+        self.reply("220 localhost test SMTP sink")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self.wfile.write(b"250-localhost\r\n250 8BITMIME\r\n")
+            elif verb in ("HELO", "MAIL", "RCPT", "RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                for raw in iter(self.rfile.readline, b""):
+                    if raw in (b".\r\n", b".\n"):
+                        break
+                    data.append(raw[1:] if raw.startswith(b"..") else raw)
+                time.sleep(sink.reply_delay)
+                if sink.take_failure():
+                    self.reply("451 Temporary failure, try again later")
+                else:
+                    sink.messages.append(BytesParser(policy=policy.default).parsebytes(b"".join(data)))
+                    self.reply("250 Queued")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class SMTPSink:
+    def __init__(self, fail_next=0, reply_delay=0):
+        self.messages = []
+        self.fail_next = fail_next
+        self.reply_delay = reply_delay
+        self._lock = threading.Lock()
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.sink = self
+        self.port = self._server.server_address[1]
+
+    def take_failure(self):
+        with self._lock:
+            if self.fail_next > 0:
+                self.fail_next -= 1
+                return True
+            return False
+
+    def email_settings(self):
+        return {
+            "EMAIL_BACKEND": "django.core.mail.backends.smtp.EmailBackend",
+            "EMAIL_HOST": "127.0.0.1",
+            "EMAIL_PORT": self.port,
+            "EMAIL_USE_TLS": False,
+            "EMAIL_USE_SSL": False,
+            "EMAIL_HOST_USER": "",
+            "EMAIL_HOST_PASSWORD": "",
+            "EMAIL_TIMEOUT": 5,
+        }
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
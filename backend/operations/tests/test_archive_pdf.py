@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+from itertools import count
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from backend.users.models import PatientProfile, User
+from backend.operations import pdf_service, reports
+from backend.operations.attachment_storage import get_storage
+from backend.operations.models import PatientAssessmentArchive, ReportJob
+
+
+class ArchivePdfStreamingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = User.objects.create_user(
+            email="archive.doctor@example.com", password="Password123", role=User.Role.DOCTOR, full_name="Doctor"
+        )
+        patient = User.objects.create_user(
+            email="archive.patient@example.com", password="Password123", role=User.Role.PATIENT, full_name="Patient"
+        )
+        profile, _ = PatientProfile.objects.get_or_create(user=patient)
+        profile.graphic_flow_sheets = [
+            {"time_of_reading": f"2025-01-01T{i % 24:02d}:00:00Z", "intake_ml": 250, "output_ml": 200}
+            for i in range(300)
+        ]
+        profile.save()
+        cls.record = PatientAssessmentArchive.objects.create(
+            user=patient,
+            patient_profile=profile,
+            assessment_type="inpatient",
+            medical_condition="observation",
+            assessment_data={"note": "ok"},
+            last_assessed_at=timezone.now(),
+            hospital_name="Test Hospital",
+        )
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.staging = os.path.join(root, "staging")
+        overrides = override_settings(
+            ATTACHMENT_STORAGE_BACKEND="local",
+            ATTACHMENT_STORAGE_ROOT=os.path.join(root, "store"),
+            ATTACHMENT_STAGING_DIR=self.staging,
+            ATTACHMENT_SERVE_MODE="django",
+            CHAT_EVENTS_PUBLISHER_THREADS=0,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def _export_job(self):
+        with patch("backend.operations.reports.schedule_render"):
+            return reports.request_report(
+                "archive", {"archive_id": self.record.id}, self.doctor, "archive.pdf",
+                content=pdf_service.archive_report_content(self.record),
+            )
+
+    def test_story_is_fed_to_the_document_lazily(self):
+        source = iter(range(1000))
+        feed = pdf_service._FlowableFeed(source)
+        self.assertEqual(len(feed), feed.lookahead)
+        self.assertEqual(next(source), feed.lookahead)
+
+    def test_large_objects_are_split_into_tables(self):
+        styles = pdf_service._get_archive_custom_styles()
+        with override_settings(ARCHIVE_PDF_TABLE_ROWS=40):
+            tables = list(pdf_service._dict_flowables({f"field_{i}": i for i in range(95)}, styles))
+        self.assertEqual([table._nrows for table in tables], [40, 40, 15])
+
+    def test_export_is_rendered_into_a_staging_file_moved_into_the_store(self):
+        job = self._export_job()
+        with patch("backend.operations.chat_events.publish_now"):
+            job = reports.render_job(job.id)
+        self.assertEqual(job.status, "completed")
+        self.assertEqual(os.listdir(self.staging), [])
+        with get_storage().open(job.artifact.storage_key) as f:
+            pdf = f.read()
+        self.assertTrue(pdf.startswith(b"%PDF"))
+        self.assertEqual(len(pdf), job.artifact.size)
+        self.assertGreater(pdf.count(b"/Type /Page\n"), 1)
+
+    @override_settings(ARCHIVE_PDF_MEMORY_LIMIT_MB=1)
+    def test_render_over_the_memory_ceiling_fails_the_job(self):
+        job = self._export_job()
+        rss = (n * 1024 * 1024 for n in count())
+        with patch.object(pdf_service._FlowableFeed, "check_every", 10), \
+                patch("backend.operations.pdf_service._rss_bytes", side_effect=lambda: next(rss)), \
+                patch("backend.operations.chat_events.publish_now"):
+            with self.assertRaises(pdf_service.ArchiveTooLarge):
+                reports.render_job(job.id)
+        job = ReportJob.objects.get(id=job.id)
+        self.assertEqual(job.status, "failed")
+        self.assertIn("more than 1MB", job.error)
+        self.assertEqual(os.listdir(self.staging), [])
@@ -0,0 +1,162 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from backend.users.models import User
+from backend.operations.attachments import expire_uploads, generate_thumbnail, staging_path
+from backend.operations.attachment_storage import get_storage
+from backend.operations.models import AttachmentBlob, AttachmentUpload, Conversation, Message
+
+BASE = "/api/operations/messaging"
+
+
+class AttachmentUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = User.objects.create_user(
+            email="attach.doctor@example.com", password="Password123", role=User.Role.DOCTOR, full_name="Doctor"
+        )
+        cls.nurse = User.objects.create_user(
+            email="attach.nurse@example.com", password="Password123", role=User.Role.NURSE, full_name="Nurse"
+        )
+        cls.conversation = Conversation.objects.create()
+        cls.conversation.participants.add(cls.doctor, cls.nurse)
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        overrides = override_settings(
+            ATTACHMENT_STORAGE_BACKEND="local",
+            ATTACHMENT_STORAGE_ROOT=os.path.join(root, "store"),
+            ATTACHMENT_STAGING_DIR=os.path.join(root, "staging"),
+            ATTACHMENT_SERVE_MODE="accel",
+            ATTACHMENT_MAX_CHUNK_SIZE=1024,
+            CHAT_EVENTS_PUBLISHER_THREADS=0,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.doctor)
+
+    def _open(self, data, content_type="application/pdf", name="scan.pdf"):
+        resp = self.client.post(
+            f"{BASE}/conversations/{self.conversation.id}/attachments/",
+            {"file_name": name, "content_type": content_type, "size": len(data)},
+            format="json",
+        )
+        self.assertEqual(resp.status_code, 201, resp.content)
+        return resp.json()["upload_id"]
+
+    def _put(self, upload_id, data, start, end=None, total="*"):
+        end = start + len(data) - 1 if end is None else end
+        return self.client.generic(
+            "PUT", f"{BASE}/attachments/{upload_id}/", data, content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes {start}-{end}/{total}",
+        )
+
+    def _upload(self, data, chunk=1024, **kwargs):
+        upload_id = self._open(data, **kwargs)
+        for start in range(0, len(data), chunk):
+            resp = self._put(upload_id, data[start:start + chunk], start)
+            self.assertEqual(resp.status_code, 200, resp.content)
+        resp = self.client.post(f"{BASE}/attachments/{upload_id}/complete/")
+        self.assertEqual(resp.status_code, 200, resp.content)
+        return upload_id, resp.json()
+
+    def test_chunks_resume_from_the_committed_offset(self):
+        data = os.urandom(2500)
+        upload_id = self._open(data)
+        self.assertEqual(self._put(upload_id, data[:1000], 0).json()["offset"], 1000)
+
+        conflict = self._put(upload_id, data[1500:2500], 1500)
+        self.assertEqual(conflict.status_code, 409)
+        self.assertEqual(conflict.json()["offset"], 1000)
+        self.assertEqual(self.client.get(f"{BASE}/attachments/{upload_id}/").json()["offset"], 1000)
+
+        self.assertEqual(self._put(upload_id, data[1000:2000], 1000).json()["offset"], 2000)
+        early = self.client.post(f"{BASE}/attachments/{upload_id}/complete/")
+        self.assertEqual(early.status_code, 400)
+        self._put(upload_id, data[2000:], 2000)
+        completed = self.client.post(f"{BASE}/attachments/{upload_id}/complete/").json()
+
+        self.assertEqual(completed["sha256"], hashlib.sha256(data).hexdigest())
+        blob = AttachmentBlob.objects.get(sha256=completed["sha256"])
+        with get_storage().open(blob.storage_key) as f:
+            self.assertEqual(f.read(), data)
+        self.assertFalse(os.path.exists(staging_path(AttachmentUpload.objects.get(id=upload_id))))
+
+    def test_content_range_must_match_the_session(self):
+        data = os.urandom(100)
+        upload_id = self._open(data)
+        self.assertEqual(self._put(upload_id, data, 0, total=len(data) + 1).status_code, 400)
+        self.assertEqual(self._put(upload_id, data[:10], 10, end=9).status_code, 400)
+        self.assertEqual(self._put(upload_id, data, 0, total=len(data)).json()["offset"], len(data))
+
+    def test_identical_files_share_one_blob_without_telling_the_uploader(self):
+        data = b"same bytes " * 100
+        first_id, first = self._upload(data)
+        second_id, second = self._upload(data, content_type="text/plain", name="notes.txt")
+        self.assertNotIn("deduplicated", first)
+        self.assertEqual(set(first), set(second))
+        self.assertEqual(AttachmentBlob.objects.count(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            sent = [
+                self.client.post(
+                    f"{BASE}/conversations/{self.conversation.id}/send/", {"content": "file", "upload_id": upload_id},
+                    format="json",
+                ).json()
+                for upload_id in (first_id, second_id)
+            ]
+        self.assertEqual([m["attachment"]["content_type"] for m in sent], ["application/pdf", "text/plain"])
+        download = self.client.get(sent[1]["attachment"]["download_url"])
+        self.assertEqual(download["Content-Type"], "text/plain")
+
+    def test_message_links_upload_and_download_is_handed_to_the_proxy(self):
+        data = b"%PDF-1.4 report"
+        upload_id, _ = self._upload(data)
+        with self.captureOnCommitCallbacks(execute=True):
+            resp = self.client.post(
+                f"{BASE}/conversations/{self.conversation.id}/send/", {"content": "see attached", "upload_id": upload_id},
+                format="json",
+            )
+        self.assertEqual(resp.status_code, 201, resp.content)
+        message = Message.objects.get(id=resp.json()["id"])
+        self.assertEqual((message.file_name, message.file_size), ("scan.pdf", len(data)))
+        self.assertTrue(resp.json()["has_attachment"])
+
+        nurse = APIClient()
+        nurse.force_authenticate(self.nurse)
+        download = nurse.get(resp.json()["attachment"]["download_url"])
+        self.assertEqual(download.status_code, 200)
+        self.assertEqual(download["X-Accel-Redirect"], f"/protected-attachments/{message.attachment.storage_key}")
+        self.assertEqual(download.content, b"")
+
+    def test_image_uploads_get_a_background_thumbnail(self):
+        buffer = io.BytesIO()
+        Image.new("RGB", (1200, 800), "red").save(buffer, format="PNG")
+        with patch("backend.operations.tasks.generate_attachment_thumbnail.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                _, completed = self._upload(buffer.getvalue(), content_type="image/png", name="rash.png")
+        blob = AttachmentBlob.objects.get(sha256=completed["sha256"])
+        delay.assert_called_once_with(blob.id)
+
+        key = generate_thumbnail(blob.id)
+        with get_storage().open(key) as f:
+            self.assertLessEqual(max(Image.open(f).size), 320)
+
+    def test_expired_sessions_drop_their_staging_files(self):
+        upload = AttachmentUpload.objects.get(id=self._open(b"x" * 10))
+        AttachmentUpload.objects.filter(id=upload.id).update(expires_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(expire_uploads(), 1)
+        self.assertFalse(os.path.exists(staging_path(upload)))
+        self.assertEqual(AttachmentUpload.objects.get(id=upload.id).status, "expired")
@@ -0,0 +1,88 @@
+import json
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from backend.users.models import User
+from backend.operations import chat_events
+from backend.operations.consumers import MessageConsumer
+from backend.operations.models import Conversation
+from backend.operations.serializers import MessageSerializer
+
+IN_MEMORY_LAYER = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER, CHAT_EVENTS_PUBLISHER_THREADS=0)
+class ChatEventTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = User.objects.create_user(
+            email="events.doctor@example.com", password="Password123", role=User.Role.DOCTOR, full_name="Doctor"
+        )
+        cls.nurses = [
+            User.objects.create_user(
+                email=f"events.nurse{i}@example.com", password="Password123", role=User.Role.NURSE, full_name=f"Nurse {i}"
+            )
+            for i in range(3)
+        ]
+        cls.conversation = Conversation.objects.create()
+        cls.conversation.participants.add(cls.doctor, *cls.nurses)
+
+    def test_send_message_serializes_once_and_publishes_one_event_to_all_recipients(self):
+        client = APIClient()
+        client.force_authenticate(self.doctor)
+        with patch("backend.operations.chat_views.MessageSerializer", wraps=MessageSerializer) as serializer, \
+                patch("backend.operations.chat_events.apublish") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                resp = client.post(
+                    f"/api/operations/messaging/conversations/{self.conversation.id}/send/", {"content": "hello"}, format="json"
+                )
+        self.assertEqual(resp.status_code, 201, resp.content)
+        self.assertEqual(serializer.call_count, 1)
+        publish.assert_called_once()
+        groups, text = publish.call_args.args
+        self.assertEqual(sorted(groups), sorted(f"messaging_{nurse.id}" for nurse in self.nurses))
+        event = json.loads(text)
+        self.assertEqual(event["type"], "new_message")
+        self.assertEqual(event["message"]["id"], resp.json()["id"])
+
+    def test_publish_delivers_the_same_text_to_every_group(self):
+        layer = get_channel_layer()
+        channels = []
+        for nurse in self.nurses:
+            channel = async_to_sync(layer.new_channel)()
+            async_to_sync(layer.group_add)(chat_events.user_group(nurse.id), channel)
+            channels.append(channel)
+
+        text = chat_events.encode("messages_read", receipt={"conversation_id": 1, "up_to_id": 5})
+        chat_events.publish([chat_events.user_group(nurse.id) for nurse in self.nurses], text)
+
+        for channel in channels:
+            event = async_to_sync(layer.receive)(channel)
+            self.assertEqual(event, {"type": chat_events.EVENT_TYPE, "text": text})
+
+    @override_settings(CHAT_EVENTS_PUBLISHER_THREADS=2)
+    def test_publish_returns_before_the_channel_layer_round_trip(self):
+        with patch("backend.operations.chat_events.publish_now") as publish_now:
+            future = chat_events.publish(["messaging_1"], "{}")
+            chat_events.wait_for_pending(timeout=5)
+        self.assertTrue(future.done())
+        publish_now.assert_called_once_with(["messaging_1"], "{}")
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER)
+class MessageConsumerChatEventTests(TransactionTestCase):
+    async def test_consumer_forwards_pre_encoded_text(self):
+        communicator = WebsocketCommunicator(MessageConsumer.as_asgi(), "/ws/messaging/42/")
+        communicator.scope["url_route"] = {"kwargs": {"user_id": "42"}}
+        communicator.scope["user"] = User(id=42)
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        text = chat_events.encode("messages_delivered", receipt={"conversation_id": 3, "up_to_id": 9})
+        await get_channel_layer().group_send("messaging_42", {"type": chat_events.EVENT_TYPE, "text": text})
+        self.assertEqual(await communicator.receive_from(), text)
+        await communicator.disconnect()
@@ -0,0 +1,69 @@
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from backend.users.models import User
+from backend.operations.models import Conversation, Message, MessageReaction
+
+IN_MEMORY_LAYER = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
+@override_settings(CHANNEL_LAYERS=IN_MEMORY_LAYER)
+class AsyncChatViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = User.objects.create_user(
+            email="async.doctor@example.com", password="Password123", role=User.Role.DOCTOR, full_name="Doctor"
+        )
+        cls.nurse = User.objects.create_user(
+            email="async.nurse@example.com", password="Password123", role=User.Role.NURSE, full_name="Nurse"
+        )
+        cls.outsider = User.objects.create_user(
+            email="async.outsider@example.com", password="Password123", role=User.Role.NURSE, full_name="Outsider"
+        )
+        cls.conversation = Conversation.objects.create()
+        cls.conversation.participants.add(cls.doctor, cls.nurse)
+        cls.message = Message.objects.create(conversation=cls.conversation, sender=cls.nurse, content="hello")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.doctor)
+
+    def test_requires_authentication(self):
+        response = APIClient().get("/api/operations/messaging/conversations/")
+        self.assertEqual(response.status_code, 401)
+        self.assertIn("WWW-Authenticate", response)
+
+    def test_jwt_authentication_and_method_check(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.doctor)}")
+        response = client.get("/api/operations/messaging/conversations/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(client.post("/api/operations/messaging/conversations/").status_code, 405)
+
+    def test_non_participant_gets_404(self):
+        client = APIClient()
+        client.force_authenticate(self.outsider)
+        url = f"/api/operations/messaging/conversations/{self.conversation.id}/messages/"
+        self.assertEqual(client.get(url).status_code, 404)
+
+    def test_reaction_toggles(self):
+        url = f"/api/operations/messaging/messages/{self.message.id}/react/"
+        response = self.client.post(url, {"reaction_type": "like"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["action"], "added")
+        response = self.client.post(url, {"reaction_type": "like"}, format="json")
+        self.assertEqual(response.json()["action"], "removed")
+        self.assertFalse(MessageReaction.objects.filter(message=self.message).exists())
+
+    def test_send_with_unfinished_upload_is_rejected_without_saving(self):
+        url = f"/api/operations/messaging/conversations/{self.conversation.id}/send/"
+        with patch("backend.operations.chat_events.apublish") as publish:
+            response = self.client.post(
+                url, {"content": "see file", "upload_id": "00000000-0000-0000-0000-000000000000"}, format="json"
+            )
+        self.assertEqual(response.status_code, 400)
+        publish.assert_not_awaited()
+        self.assertEqual(Message.objects.filter(conversation=self.conversation).count(), 1)
@@ -0,0 +1,91 @@
+import base64
+import importlib
+from unittest.mock import patch
+
+from cryptography.fernet import Fernet
+from django.apps import apps
+from django.test import TestCase, override_settings
+
+from backend.users.models import User
+from backend.operations import crypto
+from backend.operations.models import Conversation, Message, PatientAssessmentArchive
+from backend.operations.serializers import MessageSerializer, PatientAssessmentArchiveSerializer
+
+OLD_KEY = Fernet.generate_key().decode()
+NEW_KEY = Fernet.generate_key().decode()
+
+
+@override_settings(MESSAGE_ENCRYPTION_KEY=NEW_KEY, MESSAGE_ENCRYPTION_KEYS=[], ARCHIVE_ENCRYPTION_KEYS=[])
+class CryptoTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = User.objects.create_user(
+            email="crypto.doctor@example.com", password="Password123", role=User.Role.DOCTOR, full_name="Doctor"
+        )
+        cls.nurse = User.objects.create_user(
+            email="crypto.nurse@example.com", password="Password123", role=User.Role.NURSE, full_name="Nurse"
+        )
+
+    def setUp(self):
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.doctor, self.nurse)
+
+    def test_tokens_are_stored_without_a_second_base64_layer(self):
+        message = Message.objects.create(conversation=self.conversation, sender=self.nurse, content="hello")
+        self.assertTrue(message.encrypted_content.startswith("gAAAAA"))
+        self.assertEqual(Fernet(NEW_KEY).decrypt(message.encrypted_content.encode()), b"hello")
+        self.assertEqual(Message.objects.get(id=message.id).decrypt_content(), "hello")
+        self.assertIs(crypto.get_cipher(), crypto.get_cipher())
+
+    def test_legacy_double_encoded_values_still_decrypt(self):
+        token = Fernet(NEW_KEY).encrypt(b"legacy")
+        legacy = base64.b64encode(token).decode()
+        self.assertTrue(legacy.startswith(crypto.LEGACY_PREFIX))
+        self.assertEqual(crypto.decrypt(legacy), "legacy")
+
+    def test_old_keys_keep_decrypting_after_rotation(self):
+        with override_settings(MESSAGE_ENCRYPTION_KEY=OLD_KEY):
+            stored = crypto.encrypt("before rotation")
+        with override_settings(MESSAGE_ENCRYPTION_KEYS=[NEW_KEY, OLD_KEY]):
+            self.assertEqual(crypto.decrypt(stored), "before rotation")
+            rotated = crypto.rotate(stored)
+        self.assertEqual(Fernet(NEW_KEY).decrypt(rotated.encode()), b"before rotation")
+
+    @override_settings(MESSAGE_ENCRYPTION_KEY="not-a-fernet-key")
+    def test_invalid_key_falls_back_to_plaintext(self):
+        message = Message.objects.create(conversation=self.conversation, sender=self.nurse, content="plain")
+        self.assertEqual(message.encrypted_content, "")
+        self.assertEqual(message.decrypt_content(), "plain")
+
+    def test_list_serializer_decrypts_the_page_once(self):
+        Message.objects.bulk_create([
+            Message(conversation=self.conversation, sender=self.nurse, content=f"m{i}", encrypted_content=crypto.encrypt(f"m{i}"))
+            for i in range(20)
+        ])
+        messages = Message.objects.filter(conversation=self.conversation).order_by("id")
+        with patch("backend.operations.crypto.decrypt_many", wraps=crypto.decrypt_many) as decrypt_many, \
+                patch("backend.operations.crypto.decrypt") as decrypt:
+            data = MessageSerializer(messages, many=True).data
+        decrypt_many.assert_called_once()
+        decrypt.assert_not_called()
+        self.assertEqual([row["decrypted_content"] for row in data], [f"m{i}" for i in range(20)])
+
+    def test_archive_payloads_round_trip_and_batch(self):
+        record = PatientAssessmentArchive.objects.create(user=self.nurse, assessment_data={"bp": "120/80"})
+        self.assertTrue(record.encrypted_assessment_data.startswith("gAAAAA"))
+        data = PatientAssessmentArchiveSerializer(PatientAssessmentArchive.objects.all(), many=True).data
+        self.assertEqual(data[0]["decrypted_assessment_data"], {"bp": "120/80"})
+
+    def test_migration_strips_the_outer_base64_layer(self):
+        token = Fernet(NEW_KEY).encrypt(b"migrated").decode()
+        message = Message.objects.create(
+            conversation=self.conversation, sender=self.nurse, content="migrated",
+            encrypted_content=base64.b64encode(token.encode()).decode(),
+        )
+        migration = importlib.import_module("backend.operations.migrations.0037_message_token_storage")
+        migration.strip_double_encoding(apps, None)
+        message.refresh_from_db()
+        self.assertEqual(message.encrypted_content, token)
+        migration.restore_double_encoding(apps, None)
+        message.refresh_from_db()
+        self.assertTrue(message.encrypted_content.startswith(crypto.LEGACY_PREFIX))
@@ -0,0 +1,75 @@
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from backend.users.models import User
+from backend.operations.inbox import ensure_entries, rebuild_inbox, record_message
+from backend.operations.models import Conversation, ConversationInbox, Message
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class ConversationInboxTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = User.objects.create_user(
+            email="inbox.doctor@example.com", password="Password123", role=User.Role.DOCTOR, full_name="Doctor"
+        )
+        cls.nurse = User.objects.create_user(
+            email="inbox.nurse@example.com", password="Password123", role=User.Role.NURSE, full_name="Nurse"
+        )
+
+    def _client(self, user):
+        client = APIClient()
+        client.force_authenticate(user=user)
+        return client
+
+    def _conversations(self, count, prefix="peer"):
+        others = User.objects.bulk_create([
+            User(email=f"inbox.{prefix}{i}@example.com", role=User.Role.NURSE, full_name=f"Peer {i}") for i in range(count)
+        ])
+        for other in others:
+            conversation = Conversation.objects.create()
+            conversation.participants.add(self.doctor, other)
+            ensure_entries(conversation, [self.doctor.id, other.id])
+            message = Message.objects.create(conversation=conversation, sender=other, content=f"hello from {other.full_name}")
+            record_message(message, [self.doctor.id, other.id])
+
+    def test_send_and_open_keep_inbox_in_sync(self):
+        doctor, nurse = self._client(self.doctor), self._client(self.nurse)
+        created = doctor.post("/api/operations/messaging/conversations/create/", {"other_user_id": self.nurse.id}, format="json")
+        self.assertEqual(created.status_code, 201)
+        conversation_id = created.data["id"]
+        self.assertEqual(created.data["other_participant"]["id"], self.nurse.id)
+
+        for text in ("first", "second", "third"):
+            nurse.post(f"/api/operations/messaging/conversations/{conversation_id}/send/", {"content": text}, format="json")
+
+        [entry] = doctor.get("/api/operations/messaging/conversations/").data
+        self.assertEqual(entry["unread_count"], 3)
+        self.assertEqual(entry["last_message"]["content"], "third")
+        self.assertEqual(entry["last_message"]["sender"]["id"], self.nurse.id)
+        self.assertEqual(nurse.get("/api/operations/messaging/conversations/").data[0]["unread_count"], 0)
+
+        doctor.get(f"/api/operations/messaging/conversations/{conversation_id}/messages/")
+        self.assertEqual(doctor.get("/api/operations/messaging/conversations/").data[0]["unread_count"], 0)
+
+    def test_inbox_is_one_query_regardless_of_conversation_count(self):
+        self._conversations(3)
+        client = self._client(self.doctor)
+        with CaptureQueriesContext(connection) as few:
+            response = client.get("/api/operations/messaging/conversations/")
+        self.assertEqual(len(response.data), 3)
+        self._conversations(40, prefix="more")
+        with CaptureQueriesContext(connection) as many:
+            response = client.get("/api/operations/messaging/conversations/")
+        self.assertEqual(len(response.data), 43)
+        self.assertEqual(len(few.captured_queries), len(many.captured_queries))
+        self.assertFalse(any('FROM "messages"' in q["sql"] for q in many.captured_queries))
+
+    def test_rebuild_matches_incremental_updates(self):
+        self._conversations(5)
+        expected = list(ConversationInbox.objects.order_by("id").values())
+        ConversationInbox.objects.update(unread_count=99, last_message_preview="stale")
+        rebuild_inbox()
+        self.assertEqual(list(ConversationInbox.objects.order_by("id").values()), expected)
@@ -36,9 +36,8 @@ class MedicalRequestFlowTests(TestCase):
 
     def _create_request(self, payload):
         with (
-            patch("backend.operations.medical_request_views.generate_records_pdf", return_value=b"PDF"),
-            patch("backend.operations.medical_request_views.encrypt_pdf_aes256", return_value=b"PDF"),
-            patch("backend.operations.medical_request_views.send_encrypted_pdf_to_patient", return_value=True),
+            patch("backend.operations.record_delivery.generate_records_pdf", return_value=b"PDF"),
+            patch("backend.operations.record_delivery.send_encrypted_pdf_to_patient", return_value=True),
         ):
             return self.client.post("/api/operations/medical-requests/", payload, format="json")
 
@@ -125,15 +124,17 @@ class MedicalRequestFlowTests(TestCase):
         self.assertEqual(resp_approve.status_code, 200, resp_approve.content)
         self.assertEqual(resp_approve.json().get("status"), "approved")
 
-        # Deliver
+        # Deliver: accepted at once, then sent by the worker (inline here, Celery being unavailable)
         with (
-            patch("backend.operations.medical_request_views.generate_records_pdf", return_value=b"PDF"),
-            patch("backend.operations.medical_request_views.encrypt_pdf_aes256", return_value=b"PDF"),
-            patch("backend.operations.medical_request_views.send_encrypted_pdf_to_patient", return_value=True),
+            patch("backend.operations.record_delivery.generate_records_pdf", return_value=b"PDF"),
+            patch("backend.operations.record_delivery.send_encrypted_pdf_to_patient", return_value=True),
+            patch("backend.operations.tasks.deliver_medical_records.delay", side_effect=ConnectionError("no broker")),
+            self.captureOnCommitCallbacks(execute=True),
         ):
             resp_deliver = self.client.post(f"/api/operations/medical-requests/{req_id}/deliver/")
-        self.assertEqual(resp_deliver.status_code, 200, resp_deliver.content)
-        self.assertIn(resp_deliver.json().get("status"), ["delivered", "completed", "approved"])  # allow for serializer variations
+        self.assertEqual(resp_deliver.status_code, 202, resp_deliver.content)
+        self.assertEqual(resp_deliver.json()["delivery"]["status"], "queued")
+        self.assertEqual(MedicalRecordRequest.objects.get(id=req_id).status, "delivered")
 
     def test_role_restrictions_on_approve(self):
         """Only doctors can approve requests."""
@@ -0,0 +1,144 @@
+import json
+from datetime import timedelta
+
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from backend.users.models import User
+from backend.operations.consumers import MessageConsumer
+from backend.operations.message_history import InvalidCursor, decode_cursor, encode_cursor, message_page
+from backend.operations.models import Conversation, Message
+from backend.operations.routing import websocket_urlpatterns
+from backend.operations.ws_auth import JWTAuthMiddlewareStack
+
+
+def make_conversation(count):
+    doctor = User.objects.create_user(
+        email="history.doctor@example.com", password="Password123", role=User.Role.DOCTOR, full_name="Doctor"
+    )
+    nurse = User.objects.create_user(
+        email="history.nurse@example.com", password="Password123", role=User.Role.NURSE, full_name="Nurse"
+    )
+    conversation = Conversation.objects.create()
+    conversation.participants.add(doctor, nurse)
+    Message.objects.bulk_create([
+        Message(conversation=conversation, sender=doctor if i % 2 else nurse, content=f"message {i}")
+        for i in range(count)
+    ])
+    # Several messages share a timestamp so the id tiebreaker matters
+    start = timezone.now() - timedelta(hours=2)
+    for i, message in enumerate(Message.objects.filter(conversation=conversation).order_by("id")):
+        Message.objects.filter(id=message.id).update(created_at=start + timedelta(seconds=i // 3))
+    return conversation, doctor, nurse
+
+
+class MessageHistoryPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.conversation, cls.doctor, cls.nurse = make_conversation(130)
+
+    def _all_ids(self):
+        return list(Message.objects.filter(conversation=self.conversation).order_by("created_at", "id").values_list("id", flat=True))
+
+    def test_before_pages_walk_history_without_gaps_or_duplicates(self):
+        page = message_page(self.conversation)
+        seen = [m.id for m in page["messages"]]
+        self.assertEqual(len(seen), 50)
+        while page["has_more_before"]:
+            page = message_page(self.conversation, before=page["before_cursor"])
+            seen = [m.id for m in page["messages"]] + seen
+        self.assertEqual(seen, self._all_ids())
+
+    def test_after_cursor_returns_newer_messages(self):
+        ids = self._all_ids()
+        oldest = message_page(self.conversation, before=message_page(self.conversation, limit=120)["before_cursor"])
+        self.assertEqual([m.id for m in oldest["messages"]], ids[:10])
+        newer = message_page(self.conversation, after=oldest["after_cursor"], limit=5)
+        self.assertEqual([m.id for m in newer["messages"]], ids[10:15])
+        self.assertTrue(newer["has_more_after"])
+
+    def test_cursor_round_trip_and_validation(self):
+        message = Message.objects.filter(conversation=self.conversation).first()
+        self.assertEqual(decode_cursor(encode_cursor(message)), (message.created_at, message.id))
+        with self.assertRaises(InvalidCursor):
+            decode_cursor("not-a-cursor")
+
+    def test_get_messages_returns_one_page_with_constant_queries(self):
+        client = APIClient()
+        client.force_authenticate(user=self.doctor)
+        url = f"/api/operations/messaging/conversations/{self.conversation.id}/messages/"
+        response = client.get(url, {"limit": 20})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 20)
+        self.assertEqual(response.data["results"][-1]["id"], self._all_ids()[-1])
+
+        with CaptureQueriesContext(connection) as small:
+            client.get(url, {"limit": 5, "before": response.data["before_cursor"]})
+        with CaptureQueriesContext(connection) as large:
+            client.get(url, {"limit": 50, "before": response.data["before_cursor"]})
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+        self.assertEqual(client.get(url, {"before": "garbage"}).status_code, 400)
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class MessageConsumerLoadMoreTests(TransactionTestCase):
+    def setUp(self):
+        self.conversation, self.doctor, self.nurse = make_conversation(60)
+
+    async def test_load_more_uses_the_same_cursor(self):
+        first_page = await database_sync_to_async(message_page)(self.conversation)
+        communicator = WebsocketCommunicator(
+            MessageConsumer.as_asgi(), f"/ws/messaging/{self.doctor.id}/"
+        )
+        communicator.scope["url_route"] = {"kwargs": {"user_id": str(self.doctor.id)}}
+        communicator.scope["user"] = self.doctor
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        await communicator.send_to(text_data=json.dumps({
+            "type": "load_more",
+            "conversation_id": self.conversation.id,
+            "before": first_page["before_cursor"],
+        }))
+        response = json.loads(await communicator.receive_from())
+        while response["type"] != "message_history":
+            response = json.loads(await communicator.receive_from())
+        self.assertEqual(len(response["results"]), 10)
+        self.assertFalse(response["has_more_before"])
+        self.assertLess(response["results"][-1]["id"], first_page["messages"][0].id)
+        await communicator.disconnect()
+
+    async def test_socket_under_another_users_id_gets_no_history(self):
+        outsider = await database_sync_to_async(User.objects.create_user)(
+            email="history.outsider@example.com", password="Password123", role=User.Role.NURSE, full_name="Outsider"
+        )
+        for user in (outsider, AnonymousUser()):
+            communicator = WebsocketCommunicator(
+                MessageConsumer.as_asgi(), f"/ws/messaging/{self.doctor.id}/"
+            )
+            communicator.scope["url_route"] = {"kwargs": {"user_id": str(self.doctor.id)}}
+            communicator.scope["user"] = user
+            connected, code = await communicator.connect()
+            self.assertFalse(connected)
+            self.assertEqual(code, 4403)
+            self.assertTrue(await communicator.receive_nothing())
+
+    async def test_access_token_in_the_query_string_authenticates_the_socket(self):
+        token = str(AccessToken.for_user(self.doctor))
+        application = JWTAuthMiddlewareStack(URLRouter(websocket_urlpatterns))
+        communicator = WebsocketCommunicator(application, f"/ws/messaging/{self.doctor.id}/?token={token}")
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        await communicator.disconnect()
+
+        communicator = WebsocketCommunicator(application, f"/ws/messaging/{self.nurse.id}/?token={token}")
+        connected, _ = await communicator.connect()
+        self.assertFalse(connected)
@@ -0,0 +1,92 @@
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from backend.users.models import User
+from backend.operations import message_search
+from backend.operations.models import Conversation, Message, MessageSearchToken, MessageSearchWatermark, QueueCounter
+
+BASE = "/api/operations/messaging"
+
+
+@override_settings(MESSAGE_SEARCH_SETTLE_SECONDS=0, CHAT_EVENTS_PUBLISHER_THREADS=0)
+class MessageSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = User.objects.create_user(
+            email="search.doctor@example.com", password="Password123", role=User.Role.DOCTOR, full_name="Doctor"
+        )
+        cls.nurse = User.objects.create_user(
+            email="search.nurse@example.com", password="Password123", role=User.Role.NURSE, full_name="Nurse"
+        )
+        cls.outsider = User.objects.create_user(
+            email="search.outsider@example.com", password="Password123", role=User.Role.NURSE, full_name="Outsider"
+        )
+        cls.shared = Conversation.objects.create()
+        cls.shared.participants.add(cls.doctor, cls.nurse)
+        cls.private = Conversation.objects.create()
+        cls.private.participants.add(cls.doctor, cls.outsider)
+
+    def _send(self, conversation, content, sender=None):
+        return Message.objects.create(conversation=conversation, sender=sender or self.doctor, content=content)
+
+    def test_index_holds_only_keyed_tokens_and_is_idempotent(self):
+        message = self._send(self.shared, "Patient in bed 4 needs insulin")
+        message_search.index_message_ids([message.id])
+        message_search.index_message_ids([message.id])
+        tokens = set(MessageSearchToken.objects.values_list("token", flat=True))
+        self.assertEqual(len(tokens), 5)  # "4" is shorter than two characters
+        self.assertIn(message_search.blind_token("insulin"), tokens)
+        with override_settings(MESSAGE_SEARCH_KEY="another key"):
+            self.assertNotIn(message_search.blind_token("insulin"), tokens)
+
+    def test_search_matches_all_terms_in_visible_conversations_newest_first(self):
+        first = self._send(self.shared, "Insulin dose for bed 4 confirmed")
+        self._send(self.shared, "Insulin stock is low")
+        second = self._send(self.shared, "Please recheck the INSULIN dose, bed 4.")
+        self._send(self.private, "insulin dose for the private patient")
+        message_search.index_backlog()
+
+        page = message_search.search(self.nurse.id, "insulin dose", limit=1)
+        self.assertEqual([hit["message_id"] for hit in page["results"]], [second.id])
+        self.assertTrue(page["has_more"])
+        self.assertIn("INSULIN dose", page["results"][0]["snippet"])
+
+        rest = message_search.search(self.nurse.id, "insulin dose", before=page["next_before"])
+        self.assertEqual([hit["message_id"] for hit in rest["results"]], [first.id])
+        self.assertFalse(rest["has_more"])
+
+        self.assertEqual(len(message_search.search(self.doctor.id, "insulin dose")["results"]), 3)
+
+    def test_history_cursor_opens_the_thread_at_the_hit(self):
+        messages = [self._send(self.shared, f"round {i}") for i in range(5)]
+        message_search.index_backlog()
+        client = APIClient()
+        client.force_authenticate(self.nurse)
+        hits = client.get(f"{BASE}/search/", {"q": "round", "conversation_id": self.shared.id}).json()["results"]
+        hit = next(h for h in hits if h["message_id"] == messages[2].id)
+
+        page = client.get(f"{BASE}/conversations/{self.shared.id}/messages/", {"before": hit["history_cursor"]}).json()
+        self.assertEqual([m["id"] for m in page["results"]], [m.id for m in messages[:3]])
+        self.assertEqual(client.get(f"{BASE}/search/").status_code, 400)
+
+    def test_backlog_sweep_advances_a_watermark_and_waits_for_recent_messages(self):
+        first = self._send(self.shared, "first")
+        self.assertEqual(message_search.index_backlog(), 1)
+        self.assertEqual(message_search.index_backlog(), 0)
+        self.assertEqual(MessageSearchWatermark.objects.get(name="messages").last_message_id, first.id)
+        self.assertFalse(QueueCounter.objects.exists())
+        self._send(self.shared, "second")
+        with override_settings(MESSAGE_SEARCH_SETTLE_SECONDS=3600):
+            self.assertEqual(message_search.index_backlog(), 0)
+        self.assertEqual(message_search.index_backlog(), 1)
+
+    def test_send_message_queues_indexing_after_commit(self):
+        client = APIClient()
+        client.force_authenticate(self.doctor)
+        with patch("backend.operations.tasks.index_message_search.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                resp = client.post(f"{BASE}/conversations/{self.shared.id}/send/", {"content": "hello"}, format="json")
+        self.assertEqual(resp.status_code, 201, resp.content)
+        delay.assert_called_once_with([resp.json()["id"]])
@@ -0,0 +1,78 @@
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from backend.users.models import User
+from backend.operations.models import Notification, NotificationCounter
+from backend.operations.notification_fanout import (
+    audience_group,
+    dispatch_fan_out,
+    fan_out,
+    recount_unread,
+    unread_count,
+)
+
+
+@override_settings(CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}})
+class NotificationFanOutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create([
+            User(email=f"fanout.doctor{i}@example.com", role=User.Role.DOCTOR, full_name=f"Doctor {i}", is_active=i < 24)
+            for i in range(25)
+        ])
+        cls.doctors = list(User.objects.filter(role=User.Role.DOCTOR).order_by("id"))
+        cls.patient = User.objects.create_user(
+            email="fanout.patient@example.com",
+            password="Password123",
+            role=User.Role.PATIENT,
+            full_name="Patient",
+        )
+
+    def test_fan_out_inserts_in_batches_and_broadcasts_once(self):
+        with patch("backend.operations.notification_fanout.broadcast_to_audience") as broadcast:
+            with CaptureQueriesContext(connection) as ctx:
+                result = fan_out("Analytics ready", "doctors", batch_size=10)
+        self.assertEqual(result["recipients"], 24)
+        self.assertEqual(Notification.objects.filter(message="Analytics ready").count(), 24)
+        self.assertFalse(Notification.objects.filter(user=self.patient).exists())
+        inserts = [q for q in ctx.captured_queries if q["sql"].startswith('INSERT INTO "notifications"')]
+        self.assertEqual(len(inserts), 3)
+        broadcast.assert_called_once_with("doctors", "Analytics ready")
+
+    def test_counters_follow_fan_out_single_inserts_and_reads(self):
+        fan_out("One", "doctors", broadcast=False)
+        doctor = self.doctors[0]
+        Notification.objects.create(user=doctor, message="Two")
+        self.assertEqual(unread_count(doctor), 2)
+
+        client = APIClient()
+        client.force_authenticate(user=doctor)
+        notification = Notification.objects.filter(user=doctor, message="Two").get()
+        client.patch(f"/api/operations/notifications/{notification.id}/mark-read/")
+        client.patch(f"/api/operations/notifications/{notification.id}/mark-read/")
+        self.assertEqual(unread_count(doctor), 1)
+        client.post("/api/operations/notifications/mark-all-read/")
+        self.assertEqual(unread_count(doctor), 0)
+        self.assertEqual(recount_unread([doctor.id]), {doctor.id: 0})
+
+    def test_recount_repairs_drifted_counters(self):
+        fan_out("One", "doctors", broadcast=False)
+        NotificationCounter.objects.update(unread=7)
+        Notification.objects.filter(user=self.doctors[1]).update(is_read=True)
+        recount_unread()
+        self.assertEqual(unread_count(self.doctors[0]), 1)
+        self.assertEqual(unread_count(self.doctors[1]), 0)
+
+    def test_dispatch_runs_in_celery_after_commit(self):
+        with patch("backend.operations.tasks.fan_out_notification.delay") as delay:
+            with self.captureOnCommitCallbacks(execute=False) as callbacks:
+                dispatch_fan_out("Queue open", "patients")
+            delay.assert_not_called()
+            for callback in callbacks:
+                callback()
+        delay.assert_called_once_with("Queue open", "patients")
+        self.assertEqual(audience_group("patients"), "notifications_patients")
@@ -0,0 +1,131 @@
+import json
+
+from channels.testing import WebsocketCommunicator
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from backend.users.models import User
+from backend.operations import notification_log
+from backend.operations.consumers import MessageConsumer
+from backend.operations.models import Conversation, Message, MessageNotification, NotificationCursor
+
+LOG_SETTINGS = {
+    "CHANNEL_LAYERS": {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+    "CHAT_EVENTS_PUBLISHER_THREADS": 0,
+    "PRESENCE_BACKEND": "local",
+}
+
+
+@override_settings(**LOG_SETTINGS)
+class NotificationLogTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = User.objects.create_user(
+            email="log.doctor@example.com", password="Password123", role=User.Role.DOCTOR, full_name="Doctor"
+        )
+        cls.nurses = [
+            User.objects.create_user(
+                email=f"log.nurse{i}@example.com", password="Password123", role=User.Role.NURSE, full_name=f"Nurse {i}"
+            )
+            for i in range(2)
+        ]
+        cls.conversation = Conversation.objects.create()
+        cls.conversation.participants.add(cls.doctor, *cls.nurses)
+
+    def _message(self, content="hello"):
+        return Message.objects.create(conversation=self.conversation, sender=self.doctor, content=content)
+
+    def test_sequences_increase_per_recipient(self):
+        first = self._message().create_notifications()
+        second = self._message().create_notifications()
+        self.assertEqual(first, {self.nurses[0].id: 1, self.nurses[1].id: 1})
+        self.assertEqual(second, {self.nurses[0].id: 2, self.nurses[1].id: 2})
+        self.assertFalse(MessageNotification.objects.filter(recipient=self.doctor).exists())
+
+    def test_append_cost_does_not_depend_on_recipient_count(self):
+        message = self._message()
+        with CaptureQueriesContext(connection) as ctx:
+            notification_log.append(message, [n.id for n in self.nurses], "new_message")
+        with CaptureQueriesContext(connection) as single:
+            notification_log.append(message, [self.nurses[0].id], "new_message")
+        self.assertEqual(len(ctx.captured_queries), len(single.captured_queries))
+
+    def test_replay_returns_the_whole_gap_in_pages(self):
+        nurse = self.nurses[0]
+        for i in range(25):
+            self._message(f"m{i}").create_notifications()
+
+        replay = notification_log.replay(nurse.id, 3)
+        self.assertEqual([n["seq"] for n in replay["notifications"]], list(range(4, 26)))
+        self.assertEqual((replay["last_seq"], replay["has_more"]), (25, False))
+        self.assertEqual(set(replay["notifications"][0]), {
+            "seq", "notification_type", "message_id", "conversation_id", "sender_id", "sender_name", "created_at",
+        })
+
+        page = notification_log.replay(nurse.id, 0, limit=10)
+        self.assertEqual((page["last_seq"], page["has_more"]), (10, True))
+
+    def test_ack_moves_the_cursor_forward_only(self):
+        nurse = self.nurses[0]
+        for _ in range(3):
+            self._message().create_notifications()
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertTrue(notification_log.ack(nurse.id, 2))
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertFalse(notification_log.ack(nurse.id, 1))
+        notification_log.ack(nurse.id, 99)
+        self.assertEqual(NotificationCursor.objects.get(user=nurse).acked_seq, 3)
+        self.assertEqual(notification_log.replay(nurse.id)["notifications"], [])
+
+    def test_rest_endpoints_follow_the_cursor(self):
+        nurse = self.nurses[0]
+        for _ in range(3):
+            self._message().create_notifications()
+        client = APIClient()
+        client.force_authenticate(nurse)
+        second = MessageNotification.objects.get(recipient=nurse, seq=2)
+        resp = client.post(f"/api/operations/messaging/notifications/{second.id}/mark-sent/")
+        self.assertEqual(resp.status_code, 200)
+        pending = client.get("/api/operations/messaging/notifications/").json()
+        self.assertEqual([n["seq"] for n in pending], [3])
+
+        other = MessageNotification.objects.get(recipient=self.nurses[1], seq=3)
+        self.assertEqual(client.post(f"/api/operations/messaging/notifications/{other.id}/mark-sent/").status_code, 404)
+
+
+@override_settings(**LOG_SETTINGS)
+class MessageConsumerReplayTests(TransactionTestCase):
+    def setUp(self):
+        self.doctor = User.objects.create_user(
+            email="replay.doctor@example.com", password="Password123", role=User.Role.DOCTOR, full_name="Doctor"
+        )
+        self.nurse = User.objects.create_user(
+            email="replay.nurse@example.com", password="Password123", role=User.Role.NURSE, full_name="Nurse"
+        )
+        conversation = Conversation.objects.create()
+        conversation.participants.add(self.doctor, self.nurse)
+        for i in range(30):
+            Message.objects.create(conversation=conversation, sender=self.doctor, content=f"m{i}").create_notifications()
+
+    async def _next(self, communicator, event_type):
+        while True:
+            event = json.loads(await communicator.receive_from())
+            if event["type"] == event_type:
+                return event
+
+    async def test_reconnect_replays_the_gap_and_acks_advance_the_cursor(self):
+        communicator = WebsocketCommunicator(MessageConsumer.as_asgi(), f"/ws/messaging/{self.nurse.id}/?last_seq=5")
+        communicator.scope["url_route"] = {"kwargs": {"user_id": str(self.nurse.id)}}
+        communicator.scope["user"] = self.nurse
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        replay = await self._next(communicator, "notification_replay")
+        self.assertEqual([n["seq"] for n in replay["notifications"]], list(range(6, 31)))
+
+        await communicator.send_to(text_data=json.dumps({"type": "ack", "seq": 30}))
+        await communicator.send_to(text_data=json.dumps({"type": "resume"}))
+        self.assertEqual((await self._next(communicator, "notification_replay"))["notifications"], [])
+        await communicator.disconnect()
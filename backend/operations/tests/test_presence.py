@@ -0,0 +1,121 @@
+import json
+from unittest.mock import patch
+
+from channels.db import database_sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from backend.users.models import GeneralDoctorProfile, NurseProfile, User
+from backend.operations import presence
+from backend.operations.consumers import MessageConsumer
+from backend.operations.models import Conversation
+
+PRESENCE_SETTINGS = {
+    "CHANNEL_LAYERS": {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+    "PRESENCE_BACKEND": "local",
+    "PRESENCE_TYPING_INTERVAL": 60,
+}
+
+
+@override_settings(**PRESENCE_SETTINGS)
+class PresenceStoreTests(TestCase):
+    def test_user_stays_online_until_the_last_connection_leaves(self):
+        self.assertTrue(presence.connect(1, "St. Luke's", "conn-a"))
+        self.assertFalse(presence.connect(1, "st. luke's ", "conn-b"))
+        self.assertEqual(presence.online_user_ids("ST. LUKE'S"), {1})
+        self.assertFalse(presence.disconnect(1, "St. Luke's", "conn-a"))
+        self.assertTrue(presence.disconnect(1, "St. Luke's", "conn-b"))
+        self.assertEqual(presence.online_user_ids("St. Luke's"), set())
+
+    def test_missed_heartbeats_expire(self):
+        with patch("backend.operations.presence.time.time", return_value=1000.0):
+            presence.connect(7, "General", "conn")
+        with patch("backend.operations.presence.time.time", return_value=1000.0 + presence.presence_ttl() + 1):
+            self.assertEqual(presence.online_user_ids("General"), set())
+            self.assertTrue(presence.connect(7, "General", "conn"))
+
+
+@override_settings(**PRESENCE_SETTINGS)
+class PresenceViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        common = {"password": "Password123", "hospital_name": "General", "verification_status": "approved"}
+        cls.doctor = User.objects.create_user(
+            email="presence.doctor@example.com", role=User.Role.DOCTOR, full_name="Doctor", **common
+        )
+        GeneralDoctorProfile.objects.create(user=cls.doctor, specialization="General")
+        cls.nurses = []
+        for i in range(2):
+            nurse = User.objects.create_user(
+                email=f"presence.nurse{i}@example.com", role=User.Role.NURSE, full_name=f"Nurse {i}", **common
+            )
+            NurseProfile.objects.create(user=nurse)
+            cls.nurses.append(nurse)
+
+    def test_available_users_and_nurses_are_annotated_without_db_writes(self):
+        presence.connect(self.nurses[0].id, "General", "conn")
+        client = APIClient()
+        client.force_authenticate(self.doctor)
+        with CaptureQueriesContext(connection) as ctx:
+            users = client.get("/api/operations/messaging/available-users/").json()["users"]
+        self.assertFalse([q for q in ctx.captured_queries if not q["sql"].lstrip().upper().startswith("SELECT")])
+        self.assertEqual({u["id"]: u["is_online"] for u in users}, {self.nurses[0].id: True, self.nurses[1].id: False})
+
+        nurses = client.get("/api/operations/availability/nurses/").json()["nurses"]
+        self.assertEqual({n["id"]: n["is_online"] for n in nurses}, {self.nurses[0].id: True, self.nurses[1].id: False})
+
+
+@override_settings(**PRESENCE_SETTINGS)
+class MessageConsumerPresenceTests(TransactionTestCase):
+    def setUp(self):
+        self.doctor = User.objects.create_user(
+            email="presence.ws.doctor@example.com", password="Password123", role=User.Role.DOCTOR,
+            full_name="Doctor", hospital_name="General",
+        )
+        self.nurse = User.objects.create_user(
+            email="presence.ws.nurse@example.com", password="Password123", role=User.Role.NURSE,
+            full_name="Nurse", hospital_name="General",
+        )
+        self.conversation = Conversation.objects.create()
+        self.conversation.participants.add(self.doctor, self.nurse)
+
+    async def _connect(self, user):
+        communicator = WebsocketCommunicator(MessageConsumer.as_asgi(), f"/ws/messaging/{user.id}/")
+        communicator.scope["url_route"] = {"kwargs": {"user_id": str(user.id)}}
+        communicator.scope["user"] = user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def _next(self, communicator, event_type, user_id=None):
+        while True:
+            event = json.loads(await communicator.receive_from())
+            if event["type"] == event_type and user_id in (None, event.get("user_id")):
+                return event
+
+    async def test_snapshot_presence_changes_and_typing(self):
+        doctor = await self._connect(self.doctor)
+        self.assertEqual((await self._next(doctor, "presence_snapshot"))["online"], [self.doctor.id])
+
+        nurse = await self._connect(self.nurse)
+        self.assertEqual((await self._next(nurse, "presence_snapshot"))["online"], sorted([self.doctor.id, self.nurse.id]))
+        self.assertTrue((await self._next(doctor, "presence", self.nurse.id))["online"])
+
+        typing = {"type": "typing", "conversation_id": self.conversation.id, "is_typing": True}
+        await nurse.send_to(text_data=json.dumps(typing))
+        event = await self._next(doctor, "typing")
+        self.assertEqual((event["user_id"], event["is_typing"]), (self.nurse.id, True))
+
+        # A repeat inside the interval is dropped; a state change goes through
+        await nurse.send_to(text_data=json.dumps(typing))
+        await nurse.send_to(text_data=json.dumps(dict(typing, is_typing=False)))
+        self.assertFalse((await self._next(doctor, "typing"))["is_typing"])
+
+        await nurse.disconnect()
+        self.assertFalse((await self._next(doctor, "presence", self.nurse.id))["online"])
+        online = await database_sync_to_async(presence.online_user_ids)("General")
+        self.assertEqual(online, {self.doctor.id})
+        await doctor.disconnect()
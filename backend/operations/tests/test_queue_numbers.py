@@ -0,0 +1,53 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from backend.users.models import User, PatientProfile
+from backend.operations.models import PriorityQueue, QueueManagement, normal_queue_numbers
+
+
+class QueueNumberAllocatorTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(
+            email="numbers.patient@example.com",
+            password="Password123",
+            role=User.Role.PATIENT,
+            full_name="Numbers Patient",
+        )
+        self.patient_profile = PatientProfile.objects.create(user=user)
+
+    def test_numbers_continue_after_existing_rows(self):
+        QueueManagement.objects.bulk_create([
+            QueueManagement(patient=self.patient_profile, queue_number=41, department="OPD", position_in_queue=1),
+        ])
+        entry = QueueManagement.objects.create(patient=self.patient_profile, department="Pharmacy")
+        self.assertEqual(entry.queue_number, 42)
+
+    def test_numbers_are_unique_across_departments(self):
+        numbers = [
+            PriorityQueue.objects.create(patient=self.patient_profile, department=department).queue_number
+            for department in ["OPD", "Pharmacy", "OPD", "Appointment"]
+        ]
+        self.assertEqual(len(set(numbers)), len(numbers))
+        self.assertEqual(numbers, sorted(numbers))
+
+    def test_allocation_does_not_scan_table(self):
+        normal_queue_numbers.next_number()
+        with CaptureQueriesContext(connection) as ctx:
+            normal_queue_numbers.next_number()
+        self.assertFalse(any("MAX(" in q["sql"].upper() for q in ctx.captured_queries))
+
+    def test_priority_positions_close_gaps(self):
+        entries = [
+            PriorityQueue.objects.create(patient=self.patient_profile, department="OPD")
+            for _ in range(3)
+        ]
+        self.assertEqual([e.priority_position for e in entries], [1, 2, 3])
+        entries[0].mark_started()
+        entries[1].delete()
+        late = PriorityQueue.objects.create(patient=self.patient_profile, department="OPD")
+        positions = list(
+            PriorityQueue.objects.filter(department="OPD", status="waiting")
+            .order_by("priority_position").values_list("pk", "priority_position")
+        )
+        self.assertEqual(positions, [(entries[2].pk, 1), (late.pk, 2)])
@@ -0,0 +1,119 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from backend.users.models import User, PatientProfile
+from backend.operations.models import QueueManagement, normal_queue_positions
+
+
+class QueuePositionEngineTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(
+            email="queue.patient@example.com",
+            password="Password123",
+            role=User.Role.PATIENT,
+            full_name="Queue Patient",
+        )
+        self.patient_profile = PatientProfile.objects.create(user=user)
+
+    def _fill(self, count, department="OPD"):
+        # bulk_create bypasses save(); positions are laid out the way the engine keeps them
+        start = QueueManagement.objects.count()
+        now = timezone.now() - timezone.timedelta(hours=1)
+        QueueManagement.objects.bulk_create([
+            QueueManagement(
+                patient=self.patient_profile,
+                queue_number=start + i,
+                department=department,
+                status="waiting",
+                position_in_queue=i,
+                enqueue_time=now + timezone.timedelta(seconds=start + i),
+            )
+            for i in range(1, count + 1)
+        ])
+
+    def _positions(self, department="OPD"):
+        return list(
+            QueueManagement.objects.filter(department=department, status="waiting")
+            .order_by("enqueue_time")
+            .values_list("position_in_queue", flat=True)
+        )
+
+    def _join(self, department="OPD"):
+        return QueueManagement.objects.create(
+            patient=self.patient_profile, department=department, status="waiting"
+        )
+
+    def test_join_appends_to_tail(self):
+        self._fill(3)
+        entry = self._join()
+        self.assertEqual(normal_queue_positions.position_of(entry), 4)
+        self.assertEqual(self._positions(), [1, 2, 3, 4])
+
+    def test_leaving_waiting_closes_gap(self):
+        self._fill(4)
+        head = QueueManagement.objects.get(position_in_queue=1)
+        head.mark_started()
+        self.assertEqual(self._positions(), [1, 2, 3])
+
+        middle = QueueManagement.objects.get(status="waiting", position_in_queue=2)
+        middle.mark_completed()
+        self.assertEqual(self._positions(), [1, 2])
+
+        QueueManagement.objects.get(status="waiting", position_in_queue=1).delete()
+        self.assertEqual(self._positions(), [1])
+
+    def test_completing_in_progress_entry_keeps_waiting_positions(self):
+        self._fill(3)
+        head = QueueManagement.objects.get(position_in_queue=1)
+        head.mark_started()
+        head.mark_completed()
+        self.assertEqual(self._positions(), [1, 2])
+
+    def test_departments_are_independent(self):
+        self._fill(2, department="OPD")
+        self._fill(2, department="Pharmacy")
+        QueueManagement.objects.get(department="OPD", position_in_queue=1).mark_started()
+        self.assertEqual(self._positions("OPD"), [1])
+        self.assertEqual(self._positions("Pharmacy"), [1, 2])
+
+    def test_join_and_serve_query_count_is_independent_of_queue_length(self):
+        def measure(department):
+            with CaptureQueriesContext(connection) as join_ctx:
+                entry = self._join(department)
+            entry = QueueManagement.objects.get(pk=entry.pk)
+            with CaptureQueriesContext(connection) as serve_ctx:
+                entry.mark_completed()
+            return len(join_ctx), len(serve_ctx)
+
+        self._fill(5, department="OPD")
+        self._fill(200, department="Pharmacy")
+        # First joins seed the number and tail counters; compare steady-state cost
+        measure("OPD")
+        measure("Pharmacy")
+        self.assertEqual(measure("OPD"), measure("Pharmacy"))
+
+    def test_renumber_repairs_out_of_band_edits(self):
+        self._fill(4)
+        QueueManagement.objects.filter(position_in_queue=2).update(status="cancelled")
+        QueueManagement.objects.filter(position_in_queue=4).update(position_in_queue=9)
+        QueueManagement.update_queue_positions_for_department("OPD")
+        self.assertEqual(self._positions(), [1, 2, 3])
+
+    def test_serving_skips_a_head_another_nurse_already_claimed(self):
+        from unittest.mock import patch
+        from backend.operations.views import _claim_queue_head
+
+        self._fill(3)
+        head = normal_queue_positions.head
+        stale = head("OPD")
+        first, _ = _claim_queue_head(normal_queue_positions, "OPD")
+        self.assertEqual(first.pk, stale.pk)
+        # A second nurse read the head before the first one's claim committed
+        reads = iter([stale])
+        with patch.object(normal_queue_positions, "head", side_effect=lambda d: next(reads, None) or head(d)):
+            second, position = _claim_queue_head(normal_queue_positions, "OPD")
+        self.assertNotEqual(second.pk, stale.pk)
+        self.assertEqual(position, 1)
+        self.assertEqual(self._positions(), [1])
@@ -0,0 +1,150 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from backend.users.models import User, GeneralDoctorProfile, NurseProfile, PatientProfile
+from backend.operations.models import AppointmentManagement, PriorityQueue, QueueManagement, QueueStatus
+from backend.operations.queue_snapshot import QueueSnapshotStore
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class QueueSnapshotStoreTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(
+            email="snapshot.patient@example.com",
+            password="Password123",
+            role=User.Role.PATIENT,
+            full_name="Snapshot Patient",
+        )
+        self.patient_profile = PatientProfile.objects.create(user=user)
+        QueueStatus.objects.create(department="OPD", is_open=True)
+        self.store = QueueSnapshotStore(head_size=3)
+
+    def _join(self, priority=False):
+        if priority:
+            entry = PriorityQueue.objects.create(patient=self.patient_profile, department="OPD")
+        else:
+            entry = QueueManagement.objects.create(patient=self.patient_profile, department="OPD")
+        self.store.record_join("OPD", entry, "priority" if priority else "normal")
+        return entry
+
+    def _assert_matches_database(self):
+        cached = self.store.get("OPD")
+        fresh = self.store.build("OPD", version=cached["version"])
+        for key in ("waiting_normal", "waiting_priority", "total_waiting", "in_progress", "head"):
+            self.assertEqual(cached[key], fresh[key], key)
+
+    def test_events_keep_snapshot_in_sync_with_database(self):
+        self.store.get("OPD")
+        normal = [self._join() for _ in range(3)]
+        priority = self._join(priority=True)
+        self._assert_matches_database()
+
+        priority.mark_started()
+        self.store.record_serve("OPD", priority, "priority", priority.priority_position)
+        self._assert_matches_database()
+        self.assertEqual(self.store.get("OPD")["current_serving"], priority.queue_number)
+
+        normal[1].delete()
+        self.store.record_leave("OPD", normal[1], "normal", normal[1].position_in_queue)
+        self._assert_matches_database()
+
+        priority.mark_completed()
+        self.store.record_leave("OPD", priority, "priority", None, was_status="in_progress")
+        self._assert_matches_database()
+        self.assertIsNone(self.store.get("OPD")["current_serving"])
+        self.assertEqual(self.store.get("OPD")["version"], 7)
+
+    def test_events_do_not_recount_queues(self):
+        self.store.get("OPD")
+        entry = QueueManagement.objects.create(patient=self.patient_profile, department="OPD")
+        with CaptureQueriesContext(connection) as ctx:
+            self.store.record_join("OPD", entry, "normal")
+        self.assertFalse(any("COUNT(" in q["sql"].upper() for q in ctx.captured_queries))
+
+    def test_delta_is_broadcast_on_commit_with_version(self):
+        self.store.get("OPD")
+        entry = QueueManagement.objects.create(patient=self.patient_profile, department="OPD")
+        with patch.object(self.store, "broadcast") as broadcast:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.store.record_join("OPD", entry, "normal")
+        department, delta = broadcast.call_args.args
+        self.assertEqual(department, "OPD")
+        self.assertEqual(delta["op"], "join")
+        self.assertEqual(delta["version"], 1)
+        self.assertEqual(delta["total_waiting"], 1)
+        self.assertEqual(delta["entry"]["queue_number"], entry.queue_number)
+        self.assertIn("head", delta)
+
+    def test_reconcile_only_bumps_version_when_snapshot_drifted(self):
+        self.store.get("OPD")
+        self.assertEqual(self.store.reconcile("OPD")["version"], 0)
+        # A join that bypassed the store
+        QueueManagement.objects.create(patient=self.patient_profile, department="OPD")
+        snapshot = self.store.reconcile("OPD")
+        self.assertEqual(snapshot["version"], 1)
+        self.assertEqual(snapshot["total_waiting"], 1)
+
+    def test_join_queue_updates_snapshot(self):
+        client = APIClient()
+        client.force_authenticate(user=self.patient_profile.user)
+        with patch("backend.operations.views.queue_snapshots", self.store):
+            response = client.post("/api/operations/queue/join/", {"department": "OPD"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.store.get("OPD")["total_waiting"], 1)
+        self.assertEqual(QueueStatus.objects.get(department="OPD").total_waiting, 1)
+
+    def test_serving_twice_moves_through_the_queue_once_each(self):
+        nurse = User.objects.create_user(
+            email="snapshot.nurse@example.com", password="Password123", role=User.Role.NURSE, full_name="Snapshot Nurse"
+        )
+        NurseProfile.objects.create(user=nurse)
+        entries = [self._join() for _ in range(3)]
+        client = APIClient()
+        client.force_authenticate(user=nurse)
+        with patch("backend.operations.views.queue_snapshots", self.store):
+            for expected in entries[:2]:
+                response = client.post("/api/operations/queue/start-processing/", {"department": "OPD"}, format="json")
+                self.assertEqual(response.status_code, 200, response.content)
+                self.assertEqual(response.json()["current_serving"], expected.queue_number)
+        self.assertEqual(
+            list(QueueManagement.objects.filter(department="OPD", status="waiting").values_list("position_in_queue", flat=True)),
+            [1],
+        )
+        self._assert_matches_database()
+
+    def test_appointment_lifecycle_updates_snapshot(self):
+        doctor = User.objects.create_user(
+            email="snapshot.doctor@example.com", password="Password123", role=User.Role.DOCTOR, full_name="Snapshot Doctor"
+        )
+        patient = User.objects.create_user(
+            email="snapshot.booked@example.com", password="Password123", role=User.Role.PATIENT, full_name="Booked Patient"
+        )
+        start = timezone.now() + timezone.timedelta(minutes=10)
+        appointment = AppointmentManagement.objects.create(
+            patient=PatientProfile.objects.create(user=patient),
+            doctor=GeneralDoctorProfile.objects.create(user=doctor, specialization="General"),
+            department="OPD",
+            appointment_date=start,
+            appointment_time=start.time(),
+            appointment_type="consultation",
+            queue_number=4321,
+            status="scheduled",
+        )
+        self._join()
+        client = APIClient()
+        client.force_authenticate(user=doctor)
+        base = f"/api/operations/appointments/{appointment.appointment_id}"
+        with patch("backend.operations.views.queue_snapshots", self.store):
+            for action, waiting, in_progress in (("check-in", 2, 0), ("start", 1, 1), ("finish", 1, 0)):
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.assertEqual(client.post(f"{base}/{action}/").status_code, 200)
+                snapshot = self.store.get("OPD")
+                self.assertEqual((snapshot["total_waiting"], snapshot["in_progress"]), (waiting, in_progress), action)
+                self._assert_matches_database()
@@ -0,0 +1,98 @@
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from backend.users.models import User
+from backend.operations.models import Conversation, ConversationReadState, Message
+from backend.operations import receipts
+from backend.operations.receipts import mark_delivered, mark_read
+
+
+class ReceiptTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = User.objects.create_user(
+            email="receipts.doctor@example.com", password="Password123", role=User.Role.DOCTOR, full_name="Doctor"
+        )
+        cls.nurse = User.objects.create_user(
+            email="receipts.nurse@example.com", password="Password123", role=User.Role.NURSE, full_name="Nurse"
+        )
+
+    def _conversation(self, unread):
+        conversation = Conversation.objects.create()
+        conversation.participants.add(self.doctor, self.nurse)
+        Message.objects.bulk_create([
+            Message(conversation=conversation, sender=self.nurse, content=f"message {i}") for i in range(unread)
+        ])
+        Message.objects.create(conversation=conversation, sender=self.doctor, content="own message")
+        return conversation
+
+    def _mark_read_queries(self, unread):
+        conversation = self._conversation(unread)
+        with patch("backend.operations.receipts.send_receipt") as send_receipt:
+            with self.captureOnCommitCallbacks(execute=True):
+                with CaptureQueriesContext(connection) as ctx:
+                    conversation.mark_messages_as_read(self.doctor)
+        return conversation, ctx.captured_queries, send_receipt
+
+    def test_read_is_one_update_and_one_receipt_regardless_of_unread_count(self):
+        _, few_queries, _ = self._mark_read_queries(5)
+        conversation, many_queries, send_receipt = self._mark_read_queries(500)
+        self.assertEqual(len(few_queries), len(many_queries))
+
+        incoming = Message.objects.filter(conversation=conversation, sender=self.nurse)
+        self.assertFalse(incoming.filter(is_read=False).exists())
+        self.assertFalse(incoming.filter(is_delivered=False).exists())
+        self.assertFalse(Message.objects.get(conversation=conversation, sender=self.doctor).is_read)
+
+        last_id = incoming.order_by("-id").values_list("id", flat=True).first()
+        send_receipt.assert_called_once()
+        sender_id, kind, receipt = send_receipt.call_args.args
+        self.assertEqual((sender_id, kind), (self.nurse.id, "read"))
+        self.assertEqual(receipt["up_to_id"], last_id)
+        self.assertEqual(receipt["conversation_id"], conversation.id)
+
+        state = ConversationReadState.objects.get(conversation=conversation, user=self.doctor)
+        self.assertEqual((state.read_up_to_id, state.delivered_up_to_id), (last_id, last_id))
+
+    def test_watermark_only_moves_forward(self):
+        conversation = self._conversation(10)
+        ids = list(Message.objects.filter(conversation=conversation, sender=self.nurse).order_by("id").values_list("id", flat=True))
+        mark_read(conversation, self.doctor, up_to_id=ids[4])
+        self.assertEqual(Message.objects.filter(conversation=conversation, is_read=True).count(), 5)
+        mark_delivered(conversation, self.doctor)
+        mark_read(conversation, self.doctor, up_to_id=ids[2])
+        state = ConversationReadState.objects.get(conversation=conversation, user=self.doctor)
+        self.assertEqual(state.read_up_to_id, ids[4])
+        self.assertEqual(state.delivered_up_to_id, ids[-1])
+        self.assertEqual(mark_read(conversation, self.doctor, up_to_id=ids[4]), {})
+
+    def test_backends_without_update_returning_select_then_update(self):
+        for vendor, expected in (("postgresql", True), ("mysql", False)):
+            with patch.object(connection, "vendor", vendor):
+                self.assertIs(receipts._can_return_from_update(), expected, vendor)
+
+        conversation = self._conversation(3)
+        with patch.object(receipts, "_can_return_from_update", return_value=False), \
+                CaptureQueriesContext(connection) as ctx:
+            mark_read(conversation, self.doctor)
+        updates = [q["sql"].upper() for q in ctx.captured_queries if q["sql"].upper().startswith('UPDATE "MESSAGES"')]
+        self.assertTrue(updates)
+        self.assertFalse(any("RETURNING" in sql for sql in updates))
+        incoming = Message.objects.filter(conversation=conversation, sender=self.nurse)
+        self.assertFalse(incoming.filter(is_read=False).exists())
+        self.assertFalse(incoming.filter(delivered_at__isnull=True).exists())
+
+    def test_opening_thread_sends_single_receipt_frame(self):
+        conversation = self._conversation(120)
+        client = APIClient()
+        client.force_authenticate(user=self.doctor)
+        with patch("backend.operations.chat_events.apublish") as publish:
+            response = client.get(f"/api/operations/messaging/conversations/{conversation.id}/messages/")
+        self.assertEqual(response.status_code, 200)
+        publish.assert_awaited_once()
+        self.assertEqual(publish.call_args.args[0], [f"messaging_{self.nurse.id}"])
+        self.assertEqual(Message.objects.filter(conversation=conversation, is_read=False).count(), 1)
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+from datetime import date
+from smtplib import SMTPDataError
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from backend.users.models import PatientProfile, User
+from backend.operations import pdf_service, record_delivery
+from backend.operations.attachment_storage import get_storage
+from backend.operations.models import MedicalRecordDelivery, MedicalRecordRequest
+from backend.operations.tests.smtp_sink import SMTPSink
+
+
+def user_password_matches(pdf, password):
+    """Check ``password`` against the /U entry of an AES-256 (revision 5) encrypted PDF."""
+    u = bytes.fromhex(re.search(rb"/U <([0-9A-F]+)>", pdf).group(1).decode())
+    return hashlib.sha256(password.encode() + u[32:40]).digest() == u[:32]
+
+
+class MedicalRecordDeliveryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = User.objects.create_user(
+            email="delivery.doctor@example.com", password="Password123", role=User.Role.DOCTOR, full_name="Gregory House"
+        )
+        cls.patient = User.objects.create_user(
+            email="delivery.patient@example.com", password="Password123", role=User.Role.PATIENT,
+            full_name="Pat Patient", date_of_birth=date(1990, 5, 1),
+        )
+        profile, _ = PatientProfile.objects.get_or_create(user=cls.patient)
+        profile.progress_notes = [{"note": "Recovering well"}]
+        profile.save()
+        cls.mreq = MedicalRecordRequest.objects.create(
+            patient=cls.patient, requested_by=cls.patient, request_type="full_records",
+            requested_records={"progress_notes": True}, reason="Transfer of care",
+            status="approved", approved_by=cls.doctor, approved_at=timezone.now(),
+        )
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        self.store = os.path.join(root, "store")
+        self.sink = SMTPSink().__enter__()
+        self.addCleanup(self.sink.__exit__)
+        overrides = override_settings(
+            ATTACHMENT_STORAGE_BACKEND="local",
+            ATTACHMENT_STORAGE_ROOT=self.store,
+            CHAT_EVENTS_PUBLISHER_THREADS=0,
+            **self.sink.email_settings(),
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.doctor)
+        self.url = f"/api/operations/medical-requests/{self.mreq.id}/deliver/"
+
+    def _queued_delivery(self, **headers):
+        with patch("backend.operations.record_delivery.schedule_delivery") as schedule:
+            response = self.client.post(self.url, **headers)
+        self.assertEqual(response.status_code, 202, response.content)
+        schedule.assert_called_once()
+        return response.json()["delivery"]
+
+    def _run(self, delivery_id, **kwargs):
+        with patch("backend.operations.chat_events.publish_now") as publish:
+            record_delivery.run_delivery(delivery_id, **kwargs)
+        return [json.loads(call.args[1]) for call in publish.call_args_list]
+
+    def test_delivery_is_queued_and_the_worker_emails_the_encrypted_pdf(self):
+        delivery = self._queued_delivery()
+        self.assertEqual(delivery["status"], "queued")
+        self.assertEqual(self.sink.messages, [])
+
+        self._run(delivery["delivery_id"])
+        self.assertEqual(len(self.sink.messages), 1)
+        attachment = next(self.sink.messages[0].iter_attachments())
+        pdf = attachment.get_content()
+        self.assertEqual(attachment.get_filename(), f"medical-records-{self.patient.id}-{self.mreq.id}.pdf")
+        self.assertIn(b"/CFM /AESV3", pdf)
+        self.assertNotIn(b"Recovering well", pdf)
+        self.assertTrue(user_password_matches(pdf, "GH1990"))
+        self.assertFalse(user_password_matches(pdf, "XX0000"))
+
+        saved = MedicalRecordDelivery.objects.get(id=delivery["delivery_id"])
+        self.assertEqual(saved.status, "delivered")
+        self.assertEqual(set(saved.stage_timings), {"collect", "render", "send"})
+        self.assertEqual(self.sink.messages[0]["Message-ID"], saved.message_id)
+        self.assertFalse(get_storage().exists(record_delivery.storage_key(saved)))
+        self.mreq.refresh_from_db()
+        self.assertEqual(self.mreq.status, "delivered")
+
+    def test_delivering_again_under_the_same_key_sends_once(self):
+        with patch("backend.operations.tasks.deliver_medical_records.delay", side_effect=ConnectionError("no broker")), \
+                patch("backend.operations.chat_events.publish_now"), \
+                self.captureOnCommitCallbacks(execute=True):
+            first = self.client.post(self.url, HTTP_IDEMPOTENCY_KEY="click-1")
+        self.assertEqual(first.status_code, 202)
+
+        again = self.client.post(self.url, HTTP_IDEMPOTENCY_KEY="click-1")
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.json()["delivery"]["delivery_id"], first.json()["delivery"]["delivery_id"])
+        self.assertEqual(again.json()["status"], "delivered")
+        self.assertEqual(len(self.sink.messages), 1)
+        self.assertEqual(MedicalRecordDelivery.objects.filter(request=self.mreq).count(), 1)
+
+    def test_second_delivery_under_another_key_is_refused_while_one_is_under_way(self):
+        first = self._queued_delivery(HTTP_IDEMPOTENCY_KEY="click-1")
+        with patch("backend.operations.record_delivery.schedule_delivery") as schedule:
+            response = self.client.post(self.url, HTTP_IDEMPOTENCY_KEY="click-2")
+        self.assertEqual(response.status_code, 409, response.content)
+        schedule.assert_not_called()
+        self.assertEqual(
+            [str(pk) for pk in MedicalRecordDelivery.objects.filter(request=self.mreq).values_list("id", flat=True)],
+            [first["delivery_id"]],
+        )
+
+    def test_retry_after_a_mail_server_failure_sends_the_stored_pdf(self):
+        delivery = self._queued_delivery()
+        self.sink.fail_next = 1
+        with self.assertRaises(SMTPDataError):
+            self._run(delivery["delivery_id"], last_attempt=False)
+        saved = MedicalRecordDelivery.objects.get(id=delivery["delivery_id"])
+        self.assertEqual(saved.status, "queued")
+        self.assertIn("Temporary failure", saved.error)
+        self.assertTrue(get_storage().exists(saved.storage_key))
+
+        with patch.object(record_delivery, "generate_records_pdf", wraps=pdf_service.generate_records_pdf) as render:
+            self._run(delivery["delivery_id"], last_attempt=False)
+        render.assert_not_called()
+        saved.refresh_from_db()
+        self.assertEqual((saved.status, saved.attempts, saved.error), ("delivered", 2, ""))
+        self.assertEqual(len(self.sink.messages), 1)
+
+    def test_status_changes_are_pushed_over_the_websocket(self):
+        delivery = self._queued_delivery()
+        events = [event["notification"] for event in self._run(delivery["delivery_id"])]
+        self.assertEqual(
+            [event["status"] for event in events if event["type"] == "medical_record_delivery"],
+            ["collecting", "rendering", "sending", "delivered"],
+        )
+        self.assertEqual(events[-1]["type"], "medical_record_request_delivered")
+        self.assertEqual(events[-1]["patient_id"], self.patient.id)
+
+    def test_last_failed_attempt_fails_the_delivery(self):
+        delivery = self._queued_delivery()
+        self.sink.fail_next = 1
+        with self.assertRaises(SMTPDataError):
+            self._run(delivery["delivery_id"])
+        saved = MedicalRecordDelivery.objects.get(id=delivery["delivery_id"])
+        self.assertEqual(saved.status, "failed")
+        self.assertIsNotNone(saved.finished_at)
+        self.mreq.refresh_from_db()
+        self.assertEqual(self.mreq.status, "approved")
@@ -0,0 +1,160 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from backend.users.models import User
+from backend.operations import reports
+from backend.operations.attachment_storage import get_storage
+from backend.operations.models import PatientAssessmentArchive, ReportArtifact, ReportJob
+
+
+class ReportRenderingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.doctor = User.objects.create_user(
+            email="reports.doctor@example.com", password="Password123", role=User.Role.DOCTOR, full_name="Doctor"
+        )
+        cls.other = User.objects.create_user(
+            email="reports.other@example.com", password="Password123", role=User.Role.NURSE, full_name="Nurse"
+        )
+        cls.record = PatientAssessmentArchive.objects.create(
+            user=cls.doctor,
+            assessment_type="intake",
+            medical_condition="flu",
+            assessment_data={"note": "ok"},
+            last_assessed_at=timezone.now(),
+            hospital_name="Test Hospital",
+        )
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        overrides = override_settings(
+            ATTACHMENT_STORAGE_BACKEND="local",
+            ATTACHMENT_STORAGE_ROOT=os.path.join(root, "store"),
+            ATTACHMENT_SERVE_MODE="django",
+            CHAT_EVENTS_PUBLISHER_THREADS=0,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.doctor)
+        self.url = f"/api/operations/archives/{self.record.id}/export/"
+
+    def _queued_export(self):
+        with patch("backend.operations.reports.schedule_render") as schedule:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 202)
+        return response.json(), schedule
+
+    def test_export_queues_a_job_then_serves_the_rendered_pdf(self):
+        job, schedule = self._queued_export()
+        schedule.assert_called_once()
+        self.assertEqual(job["status"], "queued")
+        self.assertIsNone(job["download_url"])
+
+        with patch("backend.operations.chat_events.publish_now") as publish:
+            reports.render_job(job["job_id"])
+        self.assertIn('"type":"report_ready"', publish.call_args.args[1])
+
+        status_response = self.client.get(job["status_url"])
+        self.assertEqual(status_response.json()["status"], "completed")
+        download = self.client.get(status_response.json()["download_url"])
+        self.assertEqual(download.status_code, 200)
+        self.assertTrue(b"".join(download.streaming_content).startswith(b"%PDF"))
+
+    def test_unchanged_record_is_served_from_the_store_without_rendering(self):
+        job, _ = self._queued_export()
+        with patch("backend.operations.chat_events.publish_now"):
+            reports.render_job(job["job_id"])
+
+        with patch("backend.operations.pdf_service.generate_archive_pdf") as render, \
+                patch("backend.operations.reports.schedule_render") as schedule:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/pdf")
+        render.assert_not_called()
+        schedule.assert_not_called()
+
+        # A changed record is a different report
+        PatientAssessmentArchive.objects.filter(id=self.record.id).update(medical_condition="cold")
+        job, _ = self._queued_export()
+        self.assertEqual(job["status"], "queued")
+
+    def test_concurrent_requests_share_one_render(self):
+        first, schedule = self._queued_export()
+        second, second_schedule = self._queued_export()
+        second_schedule.assert_not_called()
+
+        with patch("backend.operations.chat_events.publish_now") as publish, \
+                patch("backend.operations.pdf_service.generate_archive_pdf", return_value=b"%PDF-1.4 test") as render:
+            reports.render_job(first["job_id"])
+        render.assert_called_once()
+        self.assertEqual(publish.call_count, 2)
+        self.assertEqual(ReportJob.objects.filter(status="completed").count(), 2)
+        self.assertEqual(ReportArtifact.objects.count(), 1)
+
+    def test_render_finishing_while_a_request_arrives_does_not_strand_it(self):
+        first, _ = self._queued_export()
+        create = ReportJob.objects.create
+
+        def render_first_then_create(**fields):
+            reports.render_job(first["job_id"])
+            return create(**fields)
+
+        with patch("backend.operations.chat_events.publish_now"), \
+                patch.object(ReportJob.objects, "create", side_effect=render_first_then_create):
+            second, schedule = self._queued_export()
+        schedule.assert_called_once()
+        with patch("backend.operations.chat_events.publish_now"), \
+                patch("backend.operations.pdf_service.generate_archive_pdf") as render:
+            reports.render_job(second["job_id"])
+        render.assert_not_called()
+        self.assertEqual(ReportJob.objects.get(id=second["job_id"]).status, "completed")
+
+    def test_waiting_request_is_completed_when_the_render_finished_meanwhile(self):
+        first, _ = self._queued_export()
+        ReportJob.objects.filter(id=first["job_id"]).update(status="rendering")
+        artifact_lookup = ReportArtifact.objects.filter
+        rendered = []
+
+        def finish_render_then_look_up(*args, **kwargs):
+            # The render completes right after the second job was created and saw it in flight
+            if ReportJob.objects.count() == 2 and not rendered:
+                rendered.append(True)
+                reports.render_job(first["job_id"])
+            return artifact_lookup(*args, **kwargs)
+
+        with patch("backend.operations.chat_events.publish_now"), \
+                patch("backend.operations.reports.schedule_render") as schedule, \
+                patch.object(ReportArtifact.objects, "filter", side_effect=finish_render_then_look_up):
+            response = self.client.get(self.url)
+        schedule.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ReportJob.objects.filter(status="completed").count(), 2)
+
+    def test_jobs_are_private_to_their_owner(self):
+        job, _ = self._queued_export()
+        other = APIClient()
+        other.force_authenticate(self.other)
+        self.assertEqual(other.get(job["status_url"]).status_code, 404)
+        self.assertEqual(self.client.get(f"{job['status_url']}download/").status_code, 409)
+
+    def test_prune_removes_unused_artifacts(self):
+        job, _ = self._queued_export()
+        with patch("backend.operations.chat_events.publish_now"):
+            reports.render_job(job["job_id"])
+        artifact = ReportArtifact.objects.get()
+        self.assertTrue(get_storage().exists(artifact.storage_key))
+
+        self.assertEqual(reports.prune_artifacts(), 0)
+        ReportArtifact.objects.update(last_used_at=timezone.now() - timedelta(days=31))
+        self.assertEqual(reports.prune_artifacts(), 1)
+        self.assertFalse(get_storage().exists(artifact.storage_key))
+        self.assertIsNone(ReportJob.objects.get(id=job["job_id"]).artifact)
@@ -0,0 +1,89 @@
+from datetime import timedelta
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from backend.users.models import User, PatientProfile
+from backend.operations.models import DepartmentServiceStats, QueueManagement
+
+
+class DepartmentServiceStatsTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(
+            email="stats.patient@example.com",
+            password="Password123",
+            role=User.Role.PATIENT,
+            full_name="Stats Patient",
+        )
+        self.patient_profile = PatientProfile.objects.create(user=user)
+
+    def _completed(self, count, minutes, department="OPD"):
+        now = timezone.now() - timedelta(days=1)
+        # Keep clear of numbers the allocator hands out to save()-created entries
+        start = 10000 + QueueManagement.objects.count()
+        QueueManagement.objects.bulk_create([
+            QueueManagement(
+                patient=self.patient_profile,
+                queue_number=start + i + 1,
+                department=department,
+                status="completed",
+                enqueue_time=now,
+                started_at=now + timedelta(hours=i),
+                finished_at=now + timedelta(hours=i, minutes=minutes),
+            )
+            for i in range(count)
+        ])
+
+    def test_aggregate_tracks_ewma_and_percentiles(self):
+        stats = DepartmentServiceStats(department="OPD")
+        for minutes in [10, 10, 10, 10, 40]:
+            stats.add_sample(minutes * 60)
+        self.assertEqual(stats.sample_count, 5)
+        self.assertEqual(stats.p50_seconds, 600)
+        self.assertEqual(stats.p90_seconds, 2400)
+        self.assertAlmostEqual(stats.window_mean_seconds, 960)
+        # EWMA reacts to the slow last sample without jumping all the way to it
+        self.assertTrue(600 < stats.ewma_seconds < 2400)
+
+    def test_window_is_bounded(self):
+        stats = DepartmentServiceStats(department="OPD")
+        for i in range(DepartmentServiceStats.WINDOW_SIZE + 25):
+            stats.add_sample(i)
+        self.assertEqual(len(stats.window_seconds), DepartmentServiceStats.WINDOW_SIZE)
+        self.assertEqual(stats.sample_count, DepartmentServiceStats.WINDOW_SIZE + 25)
+
+    def test_missing_row_is_seeded_from_recent_history(self):
+        self._completed(3, minutes=20)
+        stats = DepartmentServiceStats.for_department("OPD")
+        self.assertEqual(stats.sample_count, 3)
+        self.assertEqual(stats.average_service_time, timedelta(minutes=20))
+
+    def test_default_service_time_without_history(self):
+        stats = DepartmentServiceStats.for_department("Pharmacy")
+        self.assertEqual(stats.average_service_time, DepartmentServiceStats.DEFAULT_SERVICE_TIME)
+
+    def test_mark_completed_records_service_time(self):
+        entry = QueueManagement.objects.create(patient=self.patient_profile, department="OPD")
+        entry.mark_started()
+        entry.started_at = timezone.now() - timedelta(minutes=12)
+        entry.mark_completed()
+        stats = DepartmentServiceStats.objects.get(department="OPD")
+        self.assertEqual(stats.sample_count, 1)
+        self.assertAlmostEqual(stats.ewma_seconds, 12 * 60, delta=5)
+
+    def test_wait_estimate_does_not_scan_history(self):
+        def measure():
+            waiting = QueueManagement.objects.create(patient=self.patient_profile, department="OPD")
+            with CaptureQueriesContext(connection) as ctx:
+                estimate = waiting.get_estimated_wait_range()
+            waiting.delete()
+            return len(ctx), estimate
+
+        DepartmentServiceStats.for_department("OPD")
+        small_count, _ = measure()
+        self._completed(300, minutes=5)
+        large_count, estimate = measure()
+        self.assertEqual(small_count, large_count)
+        self.assertEqual(set(estimate), {"expected", "p50", "p90"})
@@ -3,6 +3,9 @@ from . import views
 from .archive_views import archive_list, archive_detail, archive_create, archive_export, archive_logs, archive_update, archive_unarchive
 from . import secure_views
 from . import monitoring_views
+from . import attachment_views
+from . import chat_views
+from . import report_views
 from .medical_request_views import (
     medical_requests, approve_medical_request, deliver_medical_request,
     reject_medical_request, upload_certificate, add_doctor_notes, mark_request_processing
@@ -33,12 +36,17 @@ urlpatterns = [
     path('patient/dashboard/summary/', views.patient_dashboard_summary, name='patient_dashboard_summary'),
     
     # Messaging endpoints
-    path('messaging/conversations/', views.get_conversations, name='get_conversations'),
+    path('messaging/conversations/', chat_views.get_conversations, name='get_conversations'),
     path('messaging/conversations/create/', views.create_conversation, name='create_conversation'),
-    path('messaging/conversations/<int:conversation_id>/messages/', views.get_messages, name='get_messages'),
-    path('messaging/conversations/<int:conversation_id>/send/', views.send_message, name='send_message'),
-    path('messaging/messages/<int:message_id>/react/', views.add_reaction, name='add_reaction'),
+    path('messaging/conversations/<int:conversation_id>/messages/', chat_views.get_messages, name='get_messages'),
+    path('messaging/conversations/<int:conversation_id>/send/', chat_views.send_message, name='send_message'),
+    path('messaging/messages/<int:message_id>/react/', chat_views.add_reaction, name='add_reaction'),
     path('messaging/available-users/', views.get_available_users, name='get_available_users'),
+    path('messaging/search/', views.search_messages, name='search_messages'),
+    path('messaging/conversations/<int:conversation_id>/attachments/', attachment_views.create_attachment_upload, name='create_attachment_upload'),
+    path('messaging/attachments/<uuid:upload_id>/', attachment_views.attachment_upload_detail, name='attachment_upload_detail'),
+    path('messaging/attachments/<uuid:upload_id>/complete/', attachment_views.complete_attachment_upload, name='complete_attachment_upload'),
+    path('messaging/messages/<int:message_id>/attachment/', attachment_views.download_message_attachment, name='download_message_attachment'),
 
     # Availability endpoints
     path('availability/doctors/free/', views.available_doctors_free, name='available_doctors_free'),
@@ -93,6 +101,10 @@ urlpatterns = [
     path('archives/<int:archive_id>/export/', archive_export, name='archive_export'),
     path('archives/logs/', archive_logs, name='archive_logs'),
 
+    # Report rendering jobs (analytics and archive PDFs)
+    path('reports/jobs/<uuid:job_id>/', report_views.report_job_detail, name='report_job_detail'),
+    path('reports/jobs/<uuid:job_id>/download/', report_views.download_report, name='download_report'),
+
     # Public UI config endpoint for connectivity probing
     path('ui-config/', views.ui_config, name='ui_config'),
 
@@ -6,13 +6,14 @@ from rest_framework import status
 from django.db.models import Count, Q
 from django.utils import timezone
 from django.core.cache import cache
-from django.db import DatabaseError
+from django.db import DatabaseError, transaction
 from django.db.models import Q
 from datetime import datetime, timedelta
 
-from .models import AppointmentManagement, QueueManagement, PriorityQueue, Notification, Messaging, DoctorAvailability, Conversation, Message, MessageReaction, MessageNotification, QueueSchedule, QueueStatus, QueueStatusLog
+from .models import AppointmentManagement, QueueManagement, PriorityQueue, Notification, Messaging, DoctorAvailability, Conversation, Message, QueueSchedule, QueueStatus, QueueStatusLog, normal_queue_positions, priority_queue_positions
+from .queue_snapshot import queue_snapshots
 from backend.users.models import User, GeneralDoctorProfile, NurseProfile
-from .serializers import DashboardStatsSerializer, ConversationSerializer, MessageSerializer, CreateMessageSerializer, CreateReactionSerializer, UserSerializer, MessageNotificationSerializer, QueueScheduleSerializer, QueueStatusSerializer, QueueStatusLogSerializer, CreateQueueScheduleSerializer, UpdateQueueStatusSerializer, NotificationSerializer, QueueSerializer
+from .serializers import DashboardStatsSerializer, ConversationInboxSerializer, UserSerializer, MessageNotificationSerializer, QueueScheduleSerializer, QueueStatusSerializer, QueueStatusLogSerializer, CreateQueueScheduleSerializer, UpdateQueueStatusSerializer, NotificationSerializer, QueueSerializer
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
 from django.core.mail import send_mail
@@ -60,10 +61,8 @@ def doctor_dashboard_stats(request):
         total_patients = normal_queue + priority_queue
         
         # 3. Notifications (unread messages from patients, nurses, other doctors)
-        notifications = Notification.objects.filter(
-            user=doctor,
-            is_read=False
-        ).count()
+        from .notification_fanout import unread_count
+        notifications = unread_count(doctor)
         
         # 4. Monthly cancelled appointments for the current month
         # Determine month boundaries in local timezone
@@ -202,8 +201,11 @@ def mark_notification_as_read(request, notification_id):
                 'error': 'Notification not found'
             }, status=status.HTTP_404_NOT_FOUND)
         
-        notification.is_read = True
-        notification.save()
+        if not notification.is_read:
+            from .notification_fanout import decrement_unread
+            notification.is_read = True
+            notification.save()
+            decrement_unread(doctor.id)
         
         return Response({
             'message': 'Notification marked as read'
@@ -223,10 +225,12 @@ def mark_all_notifications_read(request):
     try:
         doctor = request.user
         
+        from .notification_fanout import reset_unread
         updated_count = Notification.objects.filter(
             user=doctor,
             is_read=False
         ).update(is_read=True)
+        reset_unread(doctor.id)
         
         return Response({
             'message': f'{updated_count} notifications marked as read'
@@ -271,6 +275,7 @@ def check_in_appointment(request, appointment_id):
                 department=department,
                 status='waiting'
             )
+            transaction.on_commit(lambda: queue_snapshots.record_join(department, queue_entry, 'normal'))
 
         # Refresh QueueStatus metrics
         queue_status, _ = QueueStatus.objects.get_or_create(department=department, defaults={'is_open': True})
@@ -317,10 +322,12 @@ def start_consultation(request, appointment_id):
         department = 'OPD'
         queue_entry = QueueManagement.objects.filter(patient=appt.patient, department=department, status__in=['waiting', 'in_progress']).order_by('position_in_queue', 'enqueue_time').first()
         if queue_entry and queue_entry.status == 'waiting':
+            served_position = normal_queue_positions.stored_position(queue_entry)
             try:
                 queue_entry.mark_started()
             except Exception:
                 QueueManagement.objects.filter(pk=queue_entry.id).update(status='in_progress', started_at=timezone.now())
+            transaction.on_commit(lambda: queue_snapshots.record_serve(department, queue_entry, 'normal', served_position))
 
         # Refresh queue status current serving
         queue_status, _ = QueueStatus.objects.get_or_create(department=department, defaults={'is_open': True})
@@ -361,6 +368,8 @@ def finish_consultation(request, appointment_id):
         department = 'OPD'
         queue_entry = QueueManagement.objects.filter(patient=appt.patient, department=department, status__in=['in_progress', 'waiting']).order_by('started_at', 'enqueue_time').first()
         if queue_entry:
+            was_status = queue_entry.status
+            left_position = normal_queue_positions.stored_position(queue_entry) if was_status == 'waiting' else None
             try:
                 queue_entry.mark_completed()
                 if not queue_entry.dequeue_time:
@@ -368,6 +377,7 @@ def finish_consultation(request, appointment_id):
                     queue_entry.save()
             except Exception:
                 QueueManagement.objects.filter(pk=queue_entry.id).update(status='completed', finished_at=timezone.now(), dequeue_time=timezone.now())
+            transaction.on_commit(lambda: queue_snapshots.record_leave(department, queue_entry, 'normal', left_position, was_status=was_status))
 
         # Update queue status metrics
         queue_status, _ = QueueStatus.objects.get_or_create(department=department, defaults={'is_open': True})
@@ -1135,9 +1145,10 @@ def patient_dashboard_summary(request):
                     status__in=['waiting', 'in_progress']
                 ).first()
             if queue_entry:
-                est_td = queue_entry.get_estimated_wait_time()
-                if est_td:
-                    estimated_wait_minutes = max(0, int(est_td.total_seconds() // 60))
+                wait_minutes = _wait_range_minutes(queue_entry.get_estimated_wait_range())
+                estimated_wait_minutes = wait_minutes['expected']
+                summary['estimatedWaitP50Mins'] = wait_minutes['p50']
+                summary['estimatedWaitP90Mins'] = wait_minutes['p90']
             else:
                 try:
                     qs = QueueStatus.objects.get(department=department)
@@ -1158,29 +1169,6 @@ def patient_dashboard_summary(request):
 
 
 # Messaging Views
-@api_view(['GET'])
-@permission_classes([IsAuthenticated])
-def get_conversations(request):
-    """
-    Get all conversations for the current user
-    """
-    try:
-        user = request.user
-        
-        # Get conversations where user is a participant
-        conversations = Conversation.objects.filter(
-            participants=user,
-            is_active=True
-        ).prefetch_related('participants', 'messages__sender', 'messages__reactions__user')
-        
-        serializer = ConversationSerializer(conversations, many=True, context={'request': request})
-        return Response(serializer.data, status=status.HTTP_200_OK)
-        
-    except Exception as e:
-        return Response({
-            'error': f'Failed to fetch conversations: {str(e)}'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def create_conversation(request):
@@ -1215,15 +1203,21 @@ def create_conversation(request):
             participants=other_user
         ).first()
         
+        from .inbox import ensure_entries, inbox_entry
+        
         if existing_conversation:
-            serializer = ConversationSerializer(existing_conversation, context={'request': request})
+            ensure_entries(existing_conversation)
+            entry = inbox_entry(user, existing_conversation)
+            serializer = ConversationInboxSerializer(entry, context={'request': request})
             return Response(serializer.data, status=status.HTTP_200_OK)
         
         # Create new conversation
         conversation = Conversation.objects.create()
         conversation.participants.add(user, other_user)
+        ensure_entries(conversation, [user.id, other_user.id])
         
-        serializer = ConversationSerializer(conversation, context={'request': request})
+        entry = inbox_entry(user, conversation)
+        serializer = ConversationInboxSerializer(entry, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
         
     except Exception as e:
@@ -1233,163 +1227,32 @@ def create_conversation(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def get_messages(request, conversation_id):
+def search_messages(request):
     """
-    Get messages for a specific conversation
+    Search the messages of the user's conversations (see message_search.py).
+    Query params: q (required), conversation_id, before (next_before of the previous page), limit.
     """
-    try:
-        user = request.user
-        
-        # Check if user is participant in conversation
-        conversation = Conversation.objects.filter(
-            id=conversation_id,
-            participants=user
-        ).first()
-        
-        if not conversation:
-            return Response({
-                'error': 'Conversation not found or access denied'
-            }, status=status.HTTP_404_NOT_FOUND)
-        
-        # Get messages with reactions
-        messages = conversation.messages.all().prefetch_related('reactions__user')
-        serializer = MessageSerializer(messages, many=True)
-        
-        # Mark messages as read and delivered
-        conversation.mark_messages_as_read(user)
-        conversation.mark_messages_as_delivered(user)
-        
-        # Send delivery notifications for unread messages
-        unread_messages = conversation.messages.filter(
-            is_delivered=False
-        ).exclude(sender=user)
-        
-        for message in unread_messages:
-            send_delivery_notification(message, user.id)
-        
-        return Response(serializer.data, status=status.HTTP_200_OK)
-        
-    except Exception as e:
-        return Response({
-            'error': f'Failed to fetch messages: {str(e)}'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-@api_view(['POST'])
-@permission_classes([IsAuthenticated])
-def send_message(request, conversation_id):
-    """
-    Send a message to a conversation
-    """
-    try:
-        user = request.user
-        
-        # Check if user is participant in conversation
-        conversation = Conversation.objects.filter(
-            id=conversation_id,
-            participants=user
-        ).first()
-        
-        if not conversation:
-            return Response({
-                'error': 'Conversation not found or access denied'
-            }, status=status.HTTP_404_NOT_FOUND)
-        
-        serializer = CreateMessageSerializer(data=request.data)
-        if serializer.is_valid():
-            message = serializer.save(
-                conversation=conversation,
-                sender=user
-            )
-            
-            # Update file information if attachment exists
-            if message.file_attachment:
-                message.file_name = message.file_attachment.name.split('/')[-1]
-                message.file_size = message.file_attachment.size
-                message.save()
-            
-            # Update conversation timestamp
-            conversation.save()
-            
-            # Create notifications for recipients
-            message.create_notifications()
-            
-            # Send real-time notifications via WebSocket
-            send_message_notification(message)
-            
-            response_serializer = MessageSerializer(message)
-            return Response(response_serializer.data, status=status.HTTP_201_CREATED)
-        
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-        
-    except Exception as e:
-        return Response({
-            'error': f'Failed to send message: {str(e)}'
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    from .message_search import search
 
-@api_view(['POST'])
-@permission_classes([IsAuthenticated])
-def add_reaction(request, message_id):
-    """
-    Add a reaction to a message
-    """
+    query = (request.query_params.get('q') or '').strip()
+    if not query:
+        return Response({'error': 'q is required'}, status=status.HTTP_400_BAD_REQUEST)
     try:
-        user = request.user
-        
-        # Get message and check if user has access
-        message = Message.objects.filter(
-            id=message_id,
-            conversation__participants=user
-        ).first()
-        
-        if not message:
-            return Response({
-                'error': 'Message not found or access denied'
-            }, status=status.HTTP_404_NOT_FOUND)
-        
-        serializer = CreateReactionSerializer(data=request.data)
-        if serializer.is_valid():
-            reaction_type = serializer.validated_data['reaction_type']
-            
-            # Check if user already reacted with this type
-            existing_reaction = MessageReaction.objects.filter(
-                message=message,
-                user=user,
-                reaction_type=reaction_type
-            ).first()
-            
-            if existing_reaction:
-                # Remove existing reaction
-                existing_reaction.delete()
-                return Response({
-                    'message': 'Reaction removed',
-                    'action': 'removed'
-                }, status=status.HTTP_200_OK)
-            else:
-                # Remove other reactions from this user
-                MessageReaction.objects.filter(
-                    message=message,
-                    user=user
-                ).exclude(reaction_type=reaction_type).delete()
-                
-                # Add new reaction
-                reaction = MessageReaction.objects.create(
-                    message=message,
-                    user=user,
-                    reaction_type=reaction_type
-                )
-                
-                return Response({
-                    'message': 'Reaction added',
-                    'action': 'added',
-                    'reaction': CreateReactionSerializer(reaction).data
-                }, status=status.HTTP_201_CREATED)
-        
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-        
+        conversation_id = request.query_params.get('conversation_id')
+        results = search(
+            request.user.id,
+            query,
+            conversation_id=int(conversation_id) if conversation_id else None,
+            before=request.query_params.get('before') or None,
+            limit=request.query_params.get('limit'),
+        )
+    except ValueError:
+        return Response({'error': 'Invalid conversation_id or before'}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({
-            'error': f'Failed to add reaction: {str(e)}'
+            'error': f'Failed to search messages: {str(e)}'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return Response(results, status=status.HTTP_200_OK)
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
@@ -1441,8 +1304,11 @@ def get_available_users(request):
             )
         except Exception:
             pass
+        # Online status comes from the presence store, not the database (see presence.py)
+        from . import presence
+        online = presence.online_user_ids(user.hospital_name)
         return Response({
-            'users': serializer.data,
+            'users': [dict(row, is_online=row['id'] in online) for row in serializer.data],
             'total_count': available_users.count(),
             'message': f'Found {available_users.count()} verified providers in your hospital'
         }, status=status.HTTP_200_OK)
@@ -1569,8 +1435,15 @@ def available_nurses(request):
             cached = cache.get(cache_key)
         except Exception:
             cached = None
+        # Online status is live (presence.py), so it is applied on top of the cached payload
+        from . import presence
+        online = presence.online_user_ids(user.hospital_name)
+
+        def with_presence(payload):
+            return dict(payload, nurses=[dict(n, is_online=n['id'] in online) for n in payload['nurses']])
+
         if cached:
-            return Response(cached, status=status.HTTP_200_OK)
+            return Response(with_presence(cached), status=status.HTTP_200_OK)
 
         # Admin-approved nurses in same hospital (case-insensitive)
         nurses_qs = NurseProfile.objects.select_related('user').filter(
@@ -1637,7 +1510,7 @@ def available_nurses(request):
             cache.set(cache_key, payload, timeout=60)
         except Exception:
             pass
-        return Response(payload, status=status.HTTP_200_OK)
+        return Response(with_presence(payload), status=status.HTTP_200_OK)
 
     except DatabaseError as db_err:
         return Response({'error': 'Database error while fetching nurses.', 'detail': str(db_err)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -1760,10 +1633,10 @@ def get_message_notifications(request):
     try:
         user = request.user
         
-        # Get unread message notifications
-        notifications = MessageNotification.objects.filter(
-            recipient=user,
-            is_sent=False
+        # Get notifications the user has not acknowledged yet
+        from .notification_log import unacked
+        notifications = unacked(user.id).select_related(
+            'message__sender', 'message__attachment', 'recipient'
         ).order_by('-created_at')[:20]
         
         serializer = MessageNotificationSerializer(notifications, many=True)
@@ -1778,25 +1651,16 @@ def get_message_notifications(request):
 @permission_classes([IsAuthenticated])
 def mark_notification_as_sent(request, notification_id):
     """
-    Mark a notification as sent
+    Mark a notification (and every earlier one in the user's log) as sent
     """
     try:
-        user = request.user
-        
-        notification = MessageNotification.objects.filter(
-            id=notification_id,
-            recipient=user
-        ).first()
+        from .notification_log import ack_notification
         
-        if not notification:
+        if not ack_notification(request.user.id, notification_id):
             return Response({
                 'error': 'Notification not found'
             }, status=status.HTTP_404_NOT_FOUND)
         
-        notification.is_sent = True
-        notification.sent_at = timezone.now()
-        notification.save()
-        
         return Response({
             'message': 'Notification marked as sent'
         }, status=status.HTTP_200_OK)
@@ -1825,20 +1689,15 @@ def mark_message_as_read(request, message_id):
                 'error': 'Message not found or access denied'
             }, status=status.HTTP_404_NOT_FOUND)
         
-        if not message.is_read and message.sender != user:
-            message.is_read = True
-            message.read_at = timezone.now()
-            message.save()
+        if not message.is_read and message.sender_id != user.id:
+            from .receipts import mark_read
             
-            # Create read notification
-            MessageNotification.objects.create(
-                message=message,
-                recipient=message.sender,
-                notification_type='message_read'
-            )
+            # Reading a message also reads everything before it (watermark receipt)
+            mark_read(message.conversation_id, user, up_to_id=message.id)
             
-            # Send real-time read notification
-            send_read_notification(message, user.id)
+            # Log a read notification for the sender
+            from .notification_log import append
+            append(message, [message.sender_id], 'message_read')
         
         return Response({
             'message': 'Message marked as read'
@@ -2825,51 +2684,6 @@ def assign_patient_to_doctor(request):
             'error': f'Failed to assign patient: {str(e)}'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-def send_message_notification(message):
-    """Send real-time notification via WebSocket"""
-    channel_layer = get_channel_layer()
-    message_data = MessageSerializer(message).data
-    
-    # Send to all participants except sender
-    for participant in message.conversation.participants.exclude(id=message.sender.id):
-        group_name = f'messaging_{participant.id}'
-        async_to_sync(channel_layer.group_send)(
-            group_name,
-            {
-                'type': 'new_message',
-                'message': message_data
-            }
-        )
-
-def send_delivery_notification(message, recipient_id):
-    """Send delivery notification via WebSocket"""
-    channel_layer = get_channel_layer()
-    message_data = MessageSerializer(message).data
-    
-    group_name = f'messaging_{message.sender.id}'
-    async_to_sync(channel_layer.group_send)(
-        group_name,
-        {
-            'type': 'message_delivered',
-            'message': message_data
-        }
-    )
-
-def send_read_notification(message, reader_id):
-    """Send read notification via WebSocket"""
-    channel_layer = get_channel_layer()
-    message_data = MessageSerializer(message).data
-    
-    group_name = f'messaging_{message.sender.id}'
-    async_to_sync(channel_layer.group_send)(
-        group_name,
-        {
-            'type': 'message_read',
-            'message': message_data
-        }
-    )
-
-
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_doctor_assignments(request):
@@ -3325,6 +3139,7 @@ def queue_status(request):
                     logger.warning(f"Could not link schedule: {str(e)}")
                 
                 queue_status.save()
+                queue_snapshots.record_status(department, is_open)
                 
                 # Log the status change
                 QueueStatusLog.objects.create(
@@ -3340,30 +3155,12 @@ def queue_status(request):
                 if is_open and not old_status:
                     should_notify_patients = True
                     
-                    # Schedule patient notifications in background to avoid blocking the request
+                    # Fan out patient notifications from Celery after commit to avoid blocking the request
                     try:
-                        import asyncio
-                        import threading
-                        from .async_services import AsyncNotificationService
+                        from .notification_fanout import dispatch_fan_out
                         
                         notification_message = f"The {department} queue is now OPEN! You can now join the queue."
-                        
-                        def _run_notify():
-                            try:
-                                asyncio.run(
-                                    AsyncNotificationService.send_notification_to_all_patients(
-                                        message=notification_message,
-                                        department=department
-                                    )
-                                )
-                            except Exception as e:
-                                import logging
-                                logging.getLogger(__name__).error(
-                                    f"Error in background notifications: {str(e)}",
-                                    exc_info=True
-                                )
-                        
-                        threading.Thread(target=_run_notify, daemon=True).start()
+                        dispatch_fan_out(notification_message, 'patients')
                     except Exception as e:
                         import logging
                         logger = logging.getLogger(__name__)
@@ -3464,6 +3261,16 @@ def queue_status_logs(request):
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+def _wait_range_minutes(estimate):
+    """Convert a get_estimated_wait_range() result into whole minutes (0 when unknown)."""
+    minutes = {'expected': 0, 'p50': 0, 'p90': 0}
+    for key in minutes:
+        td = (estimate or {}).get(key)
+        if td:
+            minutes[key] = max(0, int(td.total_seconds() // 60))
+    return minutes
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def join_queue(request):
@@ -3549,7 +3356,7 @@ def join_queue(request):
                 changed_by=request.user,
                 additional_notes=f'Priority patient {request.user.get_full_name()} joined queue (#{queue_entry.queue_number})'
             )
-            notif_message = f'You joined the priority queue. Your number is #{queue_entry.queue_number}. Position: {getattr(queue_entry, "priority_position", None)}'
+            notif_message = f'You joined the priority queue. Your number is #{queue_entry.queue_number}. Position: {priority_queue_positions.position_of(queue_entry)}'
         else:
             queue_entry = QueueManagement.objects.create(
                 patient=request.user.patient_profile,
@@ -3565,18 +3372,11 @@ def join_queue(request):
                 changed_by=request.user,
                 additional_notes=f'Patient {request.user.get_full_name()} joined queue (#{queue_entry.queue_number})'
             )
-            notif_message = f'You joined the queue. Your number is #{queue_entry.queue_number}. Position: {getattr(queue_entry, "position_in_queue", None)}'
+            notif_message = f'You joined the queue. Your number is #{queue_entry.queue_number}. Position: {normal_queue_positions.position_of(queue_entry)}'
         
-        # Update queue status counts and broadcast updates
-        waiting_normal = QueueManagement.objects.filter(
-            department=department,
-            status='waiting'
-        ).count()
-        waiting_priority = PriorityQueue.objects.filter(
-            department=department,
-            status='waiting'
-        ).count()
-        queue_status.total_waiting = waiting_normal + waiting_priority
+        # Apply the join to the department snapshot (broadcasts a queue_delta on commit)
+        snapshot = queue_snapshots.record_join(department, queue_entry, entry_type)
+        queue_status.total_waiting = snapshot['total_waiting']
         queue_status.last_updated_by = request.user
         queue_status.update_status_message()
         queue_status.save()
@@ -3590,34 +3390,19 @@ def join_queue(request):
             sent_at=timezone.now()
         )
 
+        # Compute position and estimated wait (expected/p50/p90) for the user.
+        # Positions are assigned in-memory by the position engines on create.
+        if entry_type == 'priority':
+            position_value = priority_queue_positions.position_of(queue_entry)
+        else:
+            position_value = normal_queue_positions.position_of(queue_entry)
+        wait_minutes = _wait_range_minutes(queue_entry.get_estimated_wait_range())
+        estimated_wait_minutes = wait_minutes['expected']
+
         # Broadcast updates via WebSocket (non-blocking)
         try:
             channel_layer = get_channel_layer()
 
-            # Compute position and estimated wait for the user
-            queue_entry.refresh_from_db()
-            if entry_type == 'priority':
-                position_value = queue_entry.priority_position
-                est_td = queue_entry.get_estimated_wait_time()
-            else:
-                position_value = queue_entry.position_in_queue
-                est_td = queue_entry.get_estimated_wait_time()
-            estimated_wait_minutes = 0
-            if est_td:
-                try:
-                    estimated_wait_minutes = int(est_td.total_seconds() // 60)
-                except Exception:
-                    estimated_wait_minutes = 0
-
-            # Broadcast department-wide status
-            async_to_sync(channel_layer.group_send)(
-                f'queue_{department}',
-                {
-                    'type': 'queue_status_update',
-                    'status': QueueStatusSerializer(queue_status).data
-                }
-            )
-
             # Notify user about successful join
             async_to_sync(channel_layer.group_send)(
                 f'queue_user_{request.user.id}',
@@ -3641,7 +3426,9 @@ def join_queue(request):
                     'type': 'queue_position_update',
                     'position': {
                         'position': str(position_value) if position_value is not None else '',
-                        'estimated_wait_time': estimated_wait_minutes
+                        'estimated_wait_time': estimated_wait_minutes,
+                        'estimated_wait_p50': wait_minutes['p50'],
+                        'estimated_wait_p90': wait_minutes['p90']
                     }
                 }
             )
@@ -3650,9 +3437,9 @@ def join_queue(request):
         
         from .serializers import QueueSerializer, PriorityQueueSerializer
         if entry_type == 'priority':
-            return Response({'type': 'priority', 'entry': PriorityQueueSerializer(queue_entry).data}, status=status.HTTP_201_CREATED)
+            return Response({'type': 'priority', 'entry': PriorityQueueSerializer(queue_entry).data, 'estimated_wait_minutes': wait_minutes}, status=status.HTTP_201_CREATED)
         else:
-            return Response({'type': 'normal', 'entry': QueueSerializer(queue_entry).data}, status=status.HTTP_201_CREATED)
+            return Response({'type': 'normal', 'entry': QueueSerializer(queue_entry).data, 'estimated_wait_minutes': wait_minutes}, status=status.HTTP_201_CREATED)
     
     except Exception as e:
         return Response({
@@ -3739,6 +3526,33 @@ def ui_config(request):
     }
     return Response(config, status=status.HTTP_200_OK)
 
+def _claim_queue_head(positions, department):
+    """
+    Move the head of a department's waiting line to in_progress and close its gap.
+    The head row is locked and the UPDATE only matches it while still waiting, so two
+    nurses serving at once never claim (or release) the same entry.
+    Returns ``(entry, position)``, or ``(None, None)`` when nobody is waiting.
+    """
+    model = positions.model
+    while True:
+        head = positions.head(department)
+        if head is None:
+            return None, None
+        locked = model.objects.select_for_update().filter(pk=head.pk, status='waiting').first()
+        if locked is None:
+            # Served by someone else while we waited for the lock; try the new head
+            continue
+        position = getattr(locked, positions.position_field)
+        claimed = model.objects.filter(pk=locked.pk, status='waiting').update(
+            status='in_progress',
+            started_at=timezone.now()
+        )
+        if claimed == 1:
+            # The update bypasses save(); close the gap in the waiting line explicitly
+            positions.release(department, position)
+            return locked, position
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def start_queue_processing(request):
@@ -3764,91 +3578,84 @@ def start_queue_processing(request):
         if not queue_status.is_open:
             return Response({'error': 'Queue is currently closed'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # First, complete any currently in-progress patient
-        prev_priority = PriorityQueue.objects.filter(
-            department=department,
-            status='in_progress'
-        ).order_by('started_at', 'enqueue_time').first()
-        prev_normal = QueueManagement.objects.filter(
-            department=department,
-            status='in_progress'
-        ).order_by('started_at', 'enqueue_time').first()
-        previous_entry = prev_priority or prev_normal
-        if previous_entry:
-            try:
-                previous_entry.mark_completed()
-                # Ensure dequeue_time is set for normal queue completion
-                if isinstance(previous_entry, QueueManagement) and not previous_entry.dequeue_time:
-                    previous_entry.dequeue_time = timezone.now()
-                    previous_entry.save()
-            except Exception:
-                # Fallback to direct update if model method is unavailable in this context
-                if isinstance(previous_entry, PriorityQueue):
-                    PriorityQueue.objects.filter(pk=previous_entry.id).update(
-                        status='completed',
-                        finished_at=timezone.now()
-                    )
-                else:
-                    QueueManagement.objects.filter(pk=previous_entry.id).update(
-                        status='completed',
-                        finished_at=timezone.now(),
-                        dequeue_time=timezone.now()
-                    )
-                    QueueManagement.update_queue_positions_for_department(department)
-            # Clear current serving if it was the previous entry
-            if queue_status.current_serving == previous_entry.queue_number:
-                queue_status.current_serving = None
-
-        # Get the next waiting patient, prioritizing priority queue
-        next_priority = PriorityQueue.objects.filter(
-            department=department,
-            status='waiting'
-        ).order_by('priority_position', 'enqueue_time').first()
-
-        next_type = None
-        if next_priority:
-            PriorityQueue.objects.filter(pk=next_priority.id).update(
-                status='in_progress',
-                started_at=timezone.now()
-            )
-            next_entry = next_priority
-            next_type = 'priority'
-        else:
-            next_normal = QueueManagement.objects.filter(
+        with transaction.atomic():
+            # First, complete any currently in-progress patient
+            # (locked, so two nurses serving at once cannot both complete it)
+            prev_priority = PriorityQueue.objects.select_for_update().filter(
                 department=department,
-                status='waiting'
-            ).order_by('position_in_queue', 'enqueue_time').first()
-
-            if not next_normal:
-                # Update status to reflect no waiting patients
-                queue_status.current_serving = None
-                queue_status.total_waiting = 0
-                queue_status.update_status_message()
-                queue_status.last_updated_by = request.user
-                queue_status.save()
-                return Response({'message': 'No patients waiting in the queue'}, status=status.HTTP_200_OK)
+                status='in_progress'
+            ).order_by('started_at', 'enqueue_time').first()
+            prev_normal = QueueManagement.objects.select_for_update().filter(
+                department=department,
+                status='in_progress'
+            ).order_by('started_at', 'enqueue_time').first()
+            previous_entry = prev_priority or prev_normal
+            completed_entry = None
+            if previous_entry:
+                try:
+                    previous_entry.mark_completed()
+                    # Ensure dequeue_time is set for normal queue completion
+                    if isinstance(previous_entry, QueueManagement) and not previous_entry.dequeue_time:
+                        previous_entry.dequeue_time = timezone.now()
+                        previous_entry.save()
+                except Exception:
+                    # Fallback to direct update if model method is unavailable in this context
+                    if isinstance(previous_entry, PriorityQueue):
+                        PriorityQueue.objects.filter(pk=previous_entry.id).update(
+                            status='completed',
+                            finished_at=timezone.now()
+                        )
+                    else:
+                        QueueManagement.objects.filter(pk=previous_entry.id).update(
+                            status='completed',
+                            finished_at=timezone.now(),
+                            dequeue_time=timezone.now()
+                        )
+                # Clear current serving if it was the previous entry
+                if queue_status.current_serving == previous_entry.queue_number:
+                    queue_status.current_serving = None
+                completed_entry = previous_entry
+
+            # Get the next waiting patient, prioritizing priority queue
+            next_priority, served_position = _claim_queue_head(priority_queue_positions, department)
+
+            next_type = None
+            if next_priority:
+                next_entry = next_priority
+                next_type = 'priority'
+            else:
+                next_normal, served_position = _claim_queue_head(normal_queue_positions, department)
+
+                if not next_normal:
+                    if completed_entry:
+                        queue_snapshots.record_leave(
+                            department, completed_entry,
+                            'priority' if isinstance(completed_entry, PriorityQueue) else 'normal',
+                            None, was_status='in_progress'
+                        )
+                    # Update status to reflect no waiting patients
+                    queue_status.current_serving = None
+                    queue_status.total_waiting = 0
+                    queue_status.update_status_message()
+                    queue_status.last_updated_by = request.user
+                    queue_status.save()
+                    return Response({'message': 'No patients waiting in the queue'}, status=status.HTTP_200_OK)
 
-            QueueManagement.objects.filter(pk=next_normal.id).update(
-                status='in_progress',
-                started_at=timezone.now()
-            )
-            next_entry = next_normal
-            next_type = 'normal'
+                next_entry = next_normal
+                next_type = 'normal'
 
-        # Refresh from DB to get updated values
-        next_entry.refresh_from_db()
+            # Refresh from DB to get updated values
+            next_entry.refresh_from_db()
 
-        # Update queue status metrics across both queues
-        remaining_waiting = (
-            QueueManagement.objects.filter(department=department, status='waiting').count() +
-            PriorityQueue.objects.filter(department=department, status='waiting').count()
-        )
+            # Apply the serve to the department snapshot instead of recounting both queues
+            snapshot = queue_snapshots.record_serve(department, next_entry, next_type, served_position, completed=completed_entry)
+            remaining_waiting = snapshot['total_waiting']
 
-        queue_status.current_serving = next_entry.queue_number
-        queue_status.total_waiting = remaining_waiting
-        queue_status.last_updated_by = request.user
-        queue_status.update_status_message()
-        queue_status.save()
+            queue_status.current_serving = next_entry.queue_number
+            queue_status.total_waiting = remaining_waiting
+            queue_status.last_updated_by = request.user
+            queue_status.update_status_message()
+            queue_status.save()
 
         # Log processing start (system note; no status change)
         try:
@@ -3875,14 +3682,6 @@ def start_queue_processing(request):
         # Broadcast via WebSocket to department and specific patient
         try:
             channel_layer = get_channel_layer()
-            # Department status update
-            async_to_sync(channel_layer.group_send)(
-                f'queue_{department}',
-                {
-                    'type': 'queue_status_update',
-                    'status': QueueStatusSerializer(queue_status).data
-                }
-            )
             # Patient-specific notification
             async_to_sync(channel_layer.group_send)(
                 f'queue_user_{next_entry.patient.user.id}',
@@ -3986,7 +3785,9 @@ def nurse_remove_from_queue(request):
                 queue_status.current_serving = None
 
             # Delete the entry
+            removed_status = removed_entry.status
             removed_entry.delete()
+            removed_position = removed_entry.priority_position
         else:
             # Accept both primary key and queue_number
             removed_entry = QueueManagement.objects.filter(id=entry_id, department=department).first()
@@ -3998,16 +3799,20 @@ def nurse_remove_from_queue(request):
             if queue_status and queue_status.current_serving == removed_entry.queue_number:
                 queue_status.current_serving = None
 
-            # Delete and recalculate positions for normal queue
+            # Delete; the model closes the gap in the waiting line
+            removed_status = removed_entry.status
             removed_entry.delete()
-            QueueManagement.update_queue_positions_for_department(department)
+            removed_position = removed_entry.position_in_queue
 
-        # Update QueueStatus counts and broadcast
+        # Apply the removal to the department snapshot (broadcasts a queue_delta on commit)
+        snapshot = queue_snapshots.record_leave(
+            department, removed_entry, 'priority' if queue_type == 'priority' else 'normal',
+            removed_position, was_status=removed_status
+        )
+
+        # Update QueueStatus counts
         if queue_status:
-            queue_status.total_waiting = (
-                QueueManagement.objects.filter(department=department, status='waiting').count() +
-                PriorityQueue.objects.filter(department=department, status='waiting').count()
-            )
+            queue_status.total_waiting = snapshot['total_waiting']
             queue_status.last_updated_by = request.user
             queue_status.update_status_message()
             queue_status.save()
@@ -4023,19 +3828,6 @@ def nurse_remove_from_queue(request):
             except Exception:
                 pass
 
-            # Broadcast via WebSocket
-            try:
-                channel_layer = get_channel_layer()
-                async_to_sync(channel_layer.group_send)(
-                    f'queue_{department}',
-                    {
-                        'type': 'queue_status_update',
-                        'status': QueueStatusSerializer(queue_status).data
-                    }
-                )
-            except Exception:
-                pass
-
         return Response({'message': 'Entry removed successfully'}, status=status.HTTP_200_OK)
     except Exception as e:
         return Response({'error': f'Failed to remove entry: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -4069,25 +3861,32 @@ def nurse_mark_served(request):
                 entry = PriorityQueue.objects.filter(queue_number=entry_id, department=department).first()
             if not entry:
                 return Response({'error': 'Priority queue entry not found'}, status=status.HTTP_404_NOT_FOUND)
+            served_status = entry.status
             entry.mark_completed()
+            served_position = entry.priority_position
         else:
             entry = QueueManagement.objects.filter(id=entry_id, department=department).first()
             if not entry:
                 entry = QueueManagement.objects.filter(queue_number=entry_id, department=department).first()
             if not entry:
                 return Response({'error': 'Queue entry not found'}, status=status.HTTP_404_NOT_FOUND)
+            served_status = entry.status
             entry.mark_completed()
+            served_position = entry.position_in_queue
             # Ensure dequeue_time is set for normal queue completion
             if hasattr(entry, 'dequeue_time') and not entry.dequeue_time:
                 entry.dequeue_time = timezone.now()
                 entry.save()
 
-        # Update QueueStatus counts and broadcast
+        # Apply the completion to the department snapshot (broadcasts a queue_delta on commit)
+        snapshot = queue_snapshots.record_leave(
+            department, entry, 'priority' if queue_type == 'priority' else 'normal',
+            served_position, was_status=served_status
+        )
+
+        # Update QueueStatus counts
         if queue_status:
-            queue_status.total_waiting = (
-                QueueManagement.objects.filter(department=department, status='waiting').count() +
-                PriorityQueue.objects.filter(department=department, status='waiting').count()
-            )
+            queue_status.total_waiting = snapshot['total_waiting']
             # Clear current serving if this was the current one
             if queue_status.current_serving == entry.queue_number:
                 queue_status.current_serving = None
@@ -4118,19 +3917,6 @@ def nurse_mark_served(request):
             except Exception:
                 pass
 
-            # Broadcast via WebSocket
-            try:
-                channel_layer = get_channel_layer()
-                async_to_sync(channel_layer.group_send)(
-                    f'queue_{department}',
-                    {
-                        'type': 'queue_status_update',
-                        'status': QueueStatusSerializer(queue_status).data
-                    }
-                )
-            except Exception:
-                pass
-
         return Response({'message': 'Entry marked as served'}, status=status.HTTP_200_OK)
     except Exception as e:
         return Response({'error': f'Failed to mark as served: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -0,0 +1,41 @@
+"""
+WebSocket authentication with the frontend's JWT access token.
+
+The SPA keeps its access token in localStorage and sends it as a Bearer header
+on REST calls; browsers cannot set headers on a WebSocket handshake, so sockets
+pass it as ``?token=<access>``. ``JWTAuthMiddleware`` sets ``scope['user']``
+from that token and otherwise leaves the session user that
+``AuthMiddlewareStack`` resolved.
+"""
+
+from urllib.parse import parse_qs
+
+from channels.auth import AuthMiddlewareStack
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+
+
+@database_sync_to_async
+def user_for_token(raw_token):
+    """The active user of a valid access token, else None."""
+    auth = JWTAuthentication()
+    try:
+        return auth.get_user(auth.get_validated_token(raw_token))
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    async def __call__(self, scope, receive, send):
+        token = parse_qs(scope.get('query_string', b'').decode()).get('token', [None])[0]
+        if token:
+            user = await user_for_token(token)
+            if user is not None:
+                scope = dict(scope, user=user)
+        return await super().__call__(scope, receive, send)
+
+
+def JWTAuthMiddlewareStack(inner):
+    return AuthMiddlewareStack(JWTAuthMiddleware(inner))
@@ -304,6 +304,7 @@ EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
 EMAIL_HOST = "smtp.gmail.com"
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
+EMAIL_TIMEOUT = int(os.getenv('EMAIL_TIMEOUT', '30'))  # seconds an SMTP connect or command may block a worker
 
 # Frontend URL for email verification links
 FRONTEND_URL = "http://localhost:8080"
@@ -328,8 +329,73 @@ CACHES = {
     }
 }
 
+# SARIMA grid search (analytics.predictive_analytics._sarima_grid_search)
+SARIMA_GRID_WORKERS = int(os.getenv('SARIMA_GRID_WORKERS', '0'))  # 0 = one process per CPU
+SARIMA_FIT_TIMEOUT = float(os.getenv('SARIMA_FIT_TIMEOUT', '60'))  # seconds per candidate fit
+SARIMA_GRID_TOP_K = int(os.getenv('SARIMA_GRID_TOP_K', '5'))  # candidates fully refitted after screening
+SARIMA_SCREEN_MAXITER = int(os.getenv('SARIMA_SCREEN_MAXITER', '10'))  # optimizer iterations per screening fit
+ANALYTICS_STREAM_HEARTBEAT = float(os.getenv('ANALYTICS_STREAM_HEARTBEAT', '15'))  # seconds of silence before an SSE keep-alive
+ANALYTICS_STREAM_REPLAY_SIZE = int(os.getenv('ANALYTICS_STREAM_REPLAY_SIZE', '200'))  # events kept for Last-Event-ID resume
+NOTIFICATION_FANOUT_BATCH_SIZE = int(os.getenv('NOTIFICATION_FANOUT_BATCH_SIZE', '2000'))  # rows per bulk insert in notification_fanout
+CHAT_EVENTS_PUBLISHER_THREADS = int(os.getenv('CHAT_EVENTS_PUBLISHER_THREADS', '2'))  # threads sending chat events after commit; 0 = inline
+CHAT_API_DB_THREADS = int(os.getenv('CHAT_API_DB_THREADS', '8'))  # threads running ORM work for the async chat views; 0 = one per request
+NOTIFICATION_REPLAY_LIMIT = int(os.getenv('NOTIFICATION_REPLAY_LIMIT', '200'))  # notifications per notification_replay frame
+NOTIFICATION_LOG_RETENTION_DAYS = int(os.getenv('NOTIFICATION_LOG_RETENTION_DAYS', '30'))  # acknowledged message notifications kept this long
+
+# Message search blind index (operations/message_search.py)
+MESSAGE_SEARCH_KEY = os.getenv('MESSAGE_SEARCH_KEY', '')  # HMAC key for index tokens; derived from SECRET_KEY when empty
+MESSAGE_SEARCH_BATCH_SIZE = int(os.getenv('MESSAGE_SEARCH_BATCH_SIZE', '2000'))  # messages per index sweep batch
+MESSAGE_SEARCH_SETTLE_SECONDS = int(os.getenv('MESSAGE_SEARCH_SETTLE_SECONDS', '60'))  # sweep skips messages younger than this
+
+# Background report rendering (operations/reports.py); PDFs are stored under reports/ in the attachment storage
+REPORT_ARTIFACT_TTL_DAYS = int(os.getenv('REPORT_ARTIFACT_TTL_DAYS', '30'))  # stored PDFs not downloaded for this long are deleted
+REPORT_JOB_STALE_SECONDS = int(os.getenv('REPORT_JOB_STALE_SECONDS', '600'))  # unfinished jobs older than this no longer hold back a new render
+
+# Medical record deliveries (operations/record_delivery.py); encrypted PDFs wait under deliveries/ in the attachment storage until sent
+RECORD_DELIVERY_MAX_RETRIES = int(os.getenv('RECORD_DELIVERY_MAX_RETRIES', '3'))  # retries of a failing stage before the delivery fails
+RECORD_DELIVERY_RETRY_DELAY = int(os.getenv('RECORD_DELIVERY_RETRY_DELAY', '30'))  # seconds before the first retry, doubled for each further one
+RECORD_DELIVERY_STALE_SECONDS = int(os.getenv('RECORD_DELIVERY_STALE_SECONDS', '900'))  # unfinished deliveries untouched this long are queued again when re-posted
+
+# AI insights models (analytics/model_registry.py)
+AI_MODEL_DIR = os.getenv('AI_MODEL_DIR', 'models')  # MediSyncAIInsights artifacts; relative to the working directory, as before
+AI_MODEL_RELOAD_CHECK_SECONDS = float(os.getenv('AI_MODEL_RELOAD_CHECK_SECONDS', '30'))  # how often the artifacts are checked for a new version; 0 = on every use
+AI_INFERENCE_URL = os.getenv('AI_INFERENCE_URL', '')  # e.g. http://127.0.0.1:8765 to predict in run_inference_worker instead of in process
+AI_INFERENCE_TIMEOUT = float(os.getenv('AI_INFERENCE_TIMEOUT', '5'))  # seconds to wait on the inference worker before predicting in process
+
+# Analytics report charts (analytics/charts.py)
+CHART_CACHE_SIZE = int(os.getenv('CHART_CACHE_SIZE', '256'))  # laid-out charts kept in memory per process, keyed by data fingerprint
+
+# Archive PDF exports (operations/pdf_service.py); rendered into ATTACHMENT_STAGING_DIR, then moved into the report store
+ARCHIVE_PDF_TABLE_ROWS = int(os.getenv('ARCHIVE_PDF_TABLE_ROWS', '40'))  # rows per form table; larger JSON objects are split over several tables
+ARCHIVE_PDF_MEMORY_LIMIT_MB = int(os.getenv('ARCHIVE_PDF_MEMORY_LIMIT_MB', '512'))  # a render growing the worker's RSS by more than this fails; 0 disables
+
+# Message attachments (operations/attachments.py, operations/attachment_storage.py)
+ATTACHMENT_STORAGE_BACKEND = os.getenv('ATTACHMENT_STORAGE_BACKEND', 'local')  # local | s3 (AWS or MinIO, needs boto3)
+ATTACHMENT_STORAGE_ROOT = os.getenv('ATTACHMENT_STORAGE_ROOT', os.path.join('/tmp', 'medisync_attachments', 'store'))
+ATTACHMENT_STAGING_DIR = os.getenv('ATTACHMENT_STAGING_DIR', os.path.join('/tmp', 'medisync_attachments', 'staging'))
+ATTACHMENT_SERVE_MODE = os.getenv('ATTACHMENT_SERVE_MODE', 'django' if DEBUG else 'accel')  # accel (nginx) | sendfile | django
+ATTACHMENT_ACCEL_PREFIX = os.getenv('ATTACHMENT_ACCEL_PREFIX', '/protected-attachments/')  # nginx internal location aliased to the storage root
+ATTACHMENT_S3_BUCKET = os.getenv('ATTACHMENT_S3_BUCKET', 'medisync-attachments')
+ATTACHMENT_S3_ENDPOINT_URL = os.getenv('ATTACHMENT_S3_ENDPOINT_URL', '')  # e.g. http://localhost:9000 for MinIO
+ATTACHMENT_S3_REGION = os.getenv('ATTACHMENT_S3_REGION', '')
+ATTACHMENT_S3_ACCESS_KEY = os.getenv('ATTACHMENT_S3_ACCESS_KEY', '')
+ATTACHMENT_S3_SECRET_KEY = os.getenv('ATTACHMENT_S3_SECRET_KEY', '')
+ATTACHMENT_URL_TTL = int(os.getenv('ATTACHMENT_URL_TTL', '300'))  # seconds presigned download URLs stay valid
+ATTACHMENT_MAX_SIZE = int(os.getenv('ATTACHMENT_MAX_SIZE', str(10 * 1024 * 1024)))  # bytes per attachment
+ATTACHMENT_MAX_CHUNK_SIZE = int(os.getenv('ATTACHMENT_MAX_CHUNK_SIZE', str(4 * 1024 * 1024)))  # bytes per upload request
+ATTACHMENT_UPLOAD_TTL_HOURS = int(os.getenv('ATTACHMENT_UPLOAD_TTL_HOURS', '24'))  # unfinished upload sessions expire after this
+
+# Presence and typing indicators (operations/presence.py)
+PRESENCE_BACKEND = os.getenv('PRESENCE_BACKEND', 'redis')  # redis | local (single process, development/tests)
+PRESENCE_REDIS_URL = os.getenv('PRESENCE_REDIS_URL', 'redis://localhost:6379/2')
+PRESENCE_TTL = int(os.getenv('PRESENCE_TTL', '75'))  # seconds a connection stays online without a heartbeat
+PRESENCE_TYPING_INTERVAL = float(os.getenv('PRESENCE_TYPING_INTERVAL', '3'))  # min seconds between repeated typing events
+
 # Message Encryption Settings
 MESSAGE_ENCRYPTION_KEY = "your-32-character-secret-key-here"  # Change this in production
+# Comma-separated Fernet keys, newest first: the first encrypts, all decrypt (see operations/crypto.py)
+MESSAGE_ENCRYPTION_KEYS = [k for k in os.getenv('MESSAGE_ENCRYPTION_KEYS', '').split(',') if k]
+ARCHIVE_ENCRYPTION_KEYS = [k for k in os.getenv('ARCHIVE_ENCRYPTION_KEYS', '').split(',') if k]
 
 # Channels Configuration for WebSocket
 ASGI_APPLICATION = "backend.asgi.application"
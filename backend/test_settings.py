@@ -9,4 +9,7 @@ DATABASES = {
 }
 
 # Speed up tests: disable password validators, channels layers, etc. as needed
-AUTH_PASSWORD_VALIDATORS = []
\ No newline at end of file
+AUTH_PASSWORD_VALIDATORS = []
+# Async chat views run their ORM work on the request's own thread, so it shares the
+# test case's connection (and transaction) instead of opening pool connections
+CHAT_API_DB_THREADS = 0
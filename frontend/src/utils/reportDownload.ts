@@ -0,0 +1,57 @@
+// Downloads report PDFs that are rendered in the background (backend operations/reports.py).
+// A report endpoint answers 200 with the PDF when it was already rendered, or 202 with a
+// job to poll until the PDF can be downloaded from the report store.
+
+import type { AxiosInstance } from 'axios';
+
+export interface ReportJob {
+  job_id: string;
+  kind: string;
+  status: 'queued' | 'rendering' | 'completed' | 'failed';
+  file_name: string;
+  size: number | null;
+  error: string | null;
+  download_url: string | null;
+}
+
+interface FetchReportOptions {
+  params?: Record<string, unknown>;
+  pollIntervalMs?: number;
+  timeoutMs?: number;
+}
+
+const sleep = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Paths relative to the axios baseURL (which already ends in /api)
+const jobPath = (jobId: string) => `/operations/reports/jobs/${jobId}/`;
+
+/**
+ * Returns the report PDF from a report endpoint, waiting for its render job when needed.
+ * Throws when the job fails or is not finished within `timeoutMs`.
+ */
+export async function fetchReportPdf(
+  api: AxiosInstance,
+  url: string,
+  { params, pollIntervalMs = 1500, timeoutMs = 180000 }: FetchReportOptions = {},
+): Promise<Blob> {
+  const response = await api.get(url, { params, responseType: 'blob' });
+  if (response.status !== 202) {
+    return new Blob([response.data], { type: 'application/pdf' });
+  }
+
+  let job = JSON.parse(await (response.data as Blob).text()) as ReportJob;
+  const deadline = Date.now() + timeoutMs;
+  while (job.status === 'queued' || job.status === 'rendering') {
+    if (Date.now() > deadline) {
+      throw new Error('Report generation is taking longer than expected');
+    }
+    await sleep(pollIntervalMs);
+    job = (await api.get<ReportJob>(jobPath(job.job_id))).data;
+  }
+  if (job.status !== 'completed') {
+    throw new Error(job.error || 'Report generation failed');
+  }
+
+  const download = await api.get(`${jobPath(job.job_id)}download/`, { responseType: 'blob' });
+  return new Blob([download.data], { type: 'application/pdf' });
+}
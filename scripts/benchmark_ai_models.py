@@ -0,0 +1,100 @@
+"""
+How much of an analytics report's AI section is spent loading models.
+
+Usage:
+  python scripts/benchmark_ai_models.py [--samples 200] [--reports 10] [--batch 50]
+
+What it does:
+  - Trains MediSyncAIInsights on synthetic snapshots into a temporary directory.
+  - Scores one snapshot per report, the way the three AI sections of a report do:
+      1. per-call: a fresh MediSyncAIInsights() for each section (the old
+         behaviour), so every report deserializes the models three times
+      2. registry: model_registry.get_model() for each section, loaded once
+  - Scores --batch snapshots one by one and with a single batched predict().
+  - With --worker, also predicts through run_inference_worker's HTTP server on
+    a free local port.
+
+Notes:
+  - TensorFlow is used when installed; otherwise only the RandomForest loads.
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+import django  # noqa: E402
+
+django.setup()
+
+from django.test import override_settings  # noqa: E402
+from backend.analytics import model_registry  # noqa: E402
+from backend.analytics.ai_insights_model import MediSyncAIInsights, generate_synthetic_data  # noqa: E402
+
+SECTIONS = 3
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.mean(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--reports", type=int, default=10)
+    parser.add_argument("--batch", type=int, default=50)
+    parser.add_argument("--worker", action="store_true", help="Also predict through the inference worker")
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp()
+    try:
+        snapshots = generate_synthetic_data(num_samples=args.samples)
+        MediSyncAIInsights(model_dir=root, load=False).train_models(snapshots)
+        snapshot = snapshots[0]
+
+        with override_settings(AI_MODEL_DIR=root, AI_INFERENCE_URL=""):
+            model_registry.clear()
+            per_call = timed(lambda: [MediSyncAIInsights(model_dir=root).predict([snapshot]) for _ in range(SECTIONS)],
+                             args.reports)
+            first = timed(model_registry.local_model, 1)
+            registry = timed(lambda: [model_registry.get_model().predict([snapshot]) for _ in range(SECTIONS)],
+                             args.reports)
+            print(f"per-call:  {per_call:8.1f}ms per report ({SECTIONS} model loads)")
+            print(f"registry:  {registry:8.1f}ms per report (one load of {first:.1f}ms per process)")
+
+            batch = (snapshots * (args.batch // len(snapshots) + 1))[:args.batch]
+            model = model_registry.get_model()
+            single = timed(lambda: [model.predict([s]) for s in batch], 3)
+            batched = timed(lambda: model.predict(batch), 3)
+            print(f"{args.batch} snapshots: {single:8.1f}ms one by one, {batched:8.1f}ms batched")
+
+        if args.worker:
+            server = model_registry.make_server(port=0)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            try:
+                url = f"http://127.0.0.1:{server.server_address[1]}"
+                with override_settings(AI_MODEL_DIR=root, AI_INFERENCE_URL=url):
+                    remote = timed(lambda: [model_registry.get_model().predict([snapshot]) for _ in range(SECTIONS)],
+                                   args.reports)
+                print(f"worker:    {remote:8.1f}ms per report")
+            finally:
+                server.shutdown()
+                server.server_close()
+    finally:
+        model_registry.clear()
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Load-time and peak-memory benchmark for analytics DataFrame loading.
+
+Usage:
+  python scripts/benchmark_analytics_loading.py [--rows 1000000] [--chunk-size 20000] [--keep]
+
+What it does:
+  - Inserts a synthetic PatientRecord table of --rows rows (batched bulk_create),
+    unless that many benchmark rows already exist from a previous --keep run.
+  - Loads it twice and reports wall time and peak traced memory for each:
+      1. get_data_from_queryset: queryset.values() of every column into a DataFrame
+      2. load_analysis_frame: projected columns, streamed chunks, categorical dtypes
+  - Prints the resulting DataFrame memory footprint of both.
+
+Notes:
+  - Peak memory is measured with tracemalloc (Python allocations, including NumPy buffers).
+  - Benchmark rows belong to a dedicated user and are deleted at the end unless --keep is passed.
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from datetime import timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from backend.analytics.models import PatientRecord  # noqa: E402
+from backend.analytics.predictive_analytics import get_data_from_queryset, load_analysis_frame  # noqa: E402
+
+BENCH_EMAIL = "bench.analytics@example.com"
+CONDITIONS = ["Flu", "Asthma", "Diabetes", "Hypertension", "Dengue", "Pneumonia", "Arthritis", "Cancer"]
+MEDICATIONS = ["Paracetamol", "Ibuprofen", "Aspirin", "Penicillin", "Insulin", "Lipitor", None]
+
+
+def ensure_rows(rows, batch_size=10000):
+    User = get_user_model()
+    user, _ = User.objects.get_or_create(email=BENCH_EMAIL, defaults={"full_name": "Bench Analytics", "role": "patient"})
+    existing = PatientRecord.objects.filter(patient=user).count()
+    rng = np.random.default_rng(11)
+    start = timezone.now() - timedelta(days=730)
+    for offset in range(existing, rows, batch_size):
+        n = min(batch_size, rows - offset)
+        days = rng.integers(0, 730, n)
+        PatientRecord.objects.bulk_create([
+            PatientRecord(
+                patient=user,
+                date_of_admission=start + timedelta(days=int(days[i])),
+                medical_condition=CONDITIONS[int(rng.integers(len(CONDITIONS)))],
+                age=int(rng.integers(18, 95)),
+                gender="Male" if rng.random() < 0.5 else "Female",
+                medication=MEDICATIONS[int(rng.integers(len(MEDICATIONS)))],
+            )
+            for i in range(n)
+        ], batch_size=batch_size)
+    return user
+
+
+def measure(label, load):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    df = load()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    frame_mb = df.memory_usage(deep=True).sum() / 2**20
+    print(f"{label:<24} rows={len(df):>9} time={elapsed:7.2f}s peak={peak / 2**20:8.1f} MiB frame={frame_mb:7.1f} MiB")
+    del df
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=20000)
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic rows for later runs")
+    args = parser.parse_args()
+
+    user = ensure_rows(args.rows)
+    queryset = PatientRecord.objects.filter(patient=user)
+
+    values_time, values_peak = measure("queryset.values()", lambda: get_data_from_queryset(queryset))
+    loader_time, loader_peak = measure(
+        "load_analysis_frame", lambda: load_analysis_frame(queryset, analysis_type="full_analysis", chunk_size=args.chunk_size)
+    )
+    print(f"load time: {values_time / loader_time:.1f}x faster, peak memory: {values_peak / loader_peak:.1f}x lower")
+
+    if not args.keep:
+        get_user_model().objects.filter(email=BENCH_EMAIL).delete()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Peak memory of rendering a long-stay patient's archive PDF.
+
+Usage:
+  python scripts/benchmark_archive_export.py [--entries 10000] [--keep]
+
+What it does:
+  - Creates a patient whose profile has --entries graphic flow sheet entries and
+    an archived assessment for them.
+  - Renders the archive report in a fresh child process (so its peak RSS belongs
+    to this render alone) and prints render time, the RSS before rendering, the
+    peak RSS, the PDF size and page count.
+  - Exports the archive once through GET /api/operations/archives/<id>/export/
+    and checks that the response is streamed from the report store.
+
+Notes:
+  - The child loads Django and the record before the "before" RSS is taken, so
+    the growth is what rendering itself costs.
+  - Peak RSS is VmHWM of the child; ru_maxrss is not used because Linux carries
+    the parent's peak over into a forked child.
+  - Benchmark users are deleted at the end unless --keep is passed.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.test import override_settings  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+from backend.operations.models import PatientAssessmentArchive, ReportArtifact, ReportJob  # noqa: E402
+from backend.operations.pdf_service import render_archive_report  # noqa: E402
+from backend.users.models import PatientProfile  # noqa: E402
+
+BENCH_DOMAIN = "bench-archive.example.com"
+
+
+def build_record(entries):
+    User = get_user_model()
+    User.objects.filter(email__endswith=f"@{BENCH_DOMAIN}").delete()
+    patient = User.objects.create(email=f"patient@{BENCH_DOMAIN}", full_name="Bench Patient", role="patient", password="!")
+    doctor = User.objects.create(email=f"doctor@{BENCH_DOMAIN}", full_name="Bench Doctor", role="doctor", password="!")
+    profile, _ = PatientProfile.objects.get_or_create(user=patient)
+    profile.graphic_flow_sheets = [
+        {
+            "time_of_reading": f"2025-{1 + i // 2400 % 12:02d}-{1 + i // 96 % 28:02d}T{i // 4 % 24:02d}:{i % 4 * 15:02d}:00Z",
+            "repeated_vitals": {"bp": "120/80", "hr": 70 + i % 20, "rr": 16, "temp_c": 36.6, "o2_sat": 98, "pain": i % 10},
+            "intake_ml": 250,
+            "output_ml": 200,
+            "site_checks": "IV site clean/dry/intact",
+            "nursing_interventions": ["repositioned patient", "oral care"],
+        }
+        for i in range(entries)
+    ]
+    profile.save()
+    record = PatientAssessmentArchive.objects.create(
+        user=patient, patient_profile=profile, assessment_type="inpatient", medical_condition="long stay observation",
+        assessment_data={"note": "benchmark"}, last_assessed_at=timezone.now(), hospital_name="Bench Hospital",
+    )
+    return doctor, record
+
+
+def rss_kb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+
+
+def peak_rss_kb():
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+
+
+def child(archive_id):
+    """Render one archive report and print its measurements as JSON."""
+    record = PatientAssessmentArchive.objects.select_related("user", "patient_profile").get(id=archive_id)
+    len(record.patient_profile.graphic_flow_sheets)
+    before = rss_kb()
+    started = time.perf_counter()
+    result = render_archive_report({"archive_id": archive_id})
+    elapsed = time.perf_counter() - started
+    if isinstance(result, (bytes, bytearray)):
+        pdf = bytes(result)
+    else:
+        with open(result, "rb") as f:
+            pdf = f.read()
+        os.remove(result)
+    print(json.dumps({
+        "seconds": elapsed, "before_kb": before, "peak_kb": peak_rss_kb(),
+        "size": len(pdf), "pages": pdf.count(b"/Type /Page\n"),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic data")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child(args.child)
+
+    doctor, record = build_record(args.entries)
+    print(f"{args.entries} graphic flow sheet entries")
+    root = tempfile.mkdtemp()
+    try:
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", str(record.id)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        stats = json.loads(output.strip().splitlines()[-1])
+        print(f"render: {stats['seconds']:7.1f}s  rss before {stats['before_kb'] / 1024:6.0f}MB  "
+              f"peak {stats['peak_kb'] / 1024:6.0f}MB (+{(stats['peak_kb'] - stats['before_kb']) / 1024:.0f}MB)  "
+              f"{stats['size']} bytes, {stats['pages']} pages")
+
+        client = APIClient()
+        client.force_authenticate(doctor)
+        with override_settings(ATTACHMENT_STORAGE_ROOT=os.path.join(root, "store"),
+                               ATTACHMENT_STAGING_DIR=os.path.join(root, "staging"),
+                               ATTACHMENT_SERVE_MODE="django", ALLOWED_HOSTS=["*"]), \
+                patch("backend.operations.tasks.render_report.delay", side_effect=ConnectionError("no broker")), \
+                patch("backend.operations.chat_events.publish_now"):
+            response = client.get(f"/api/operations/archives/{record.id}/export/")
+            size = sum(len(chunk) for chunk in response.streaming_content) if response.streaming else len(response.content)
+            print(f"export: status={response.status_code} streamed={response.streaming} {size} bytes")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+        jobs = ReportJob.objects.filter(owner=doctor)
+        ReportArtifact.objects.filter(fingerprint__in=jobs.values("fingerprint")).delete()
+        if not args.keep:
+            get_user_model().objects.filter(email__endswith=f"@{BENCH_DOMAIN}").delete()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""
+Concurrency benchmark for the chat REST endpoints on the ASGI stack.
+
+Usage:
+  python scripts/benchmark_async_chat.py [--users 1000] [--rtt-ms 5] [--send-every 5] [--keep]
+
+What it does:
+  - Creates --users users paired into conversations with 20 messages each and
+    gives every user a JWT access token.
+  - Starts all users at once against the Django ASGI application, in process:
+    each lists its conversations, opens its conversation (which sends a read
+    receipt) and every --send-every'th user sends a message. Twice:
+      1. async: the chat_views endpoints under /api/operations/messaging/
+      2. thread-bound: the previous sync DRF views (copied below, mounted under
+         /legacy/), which Django runs on one thread per request
+  - Prints wall time, request latency (median / p95), database connections
+    opened and failed requests for each.
+
+Notes:
+  - Uses an in-memory channel layer whose group_send sleeps --rtt-ms to stand in
+    for a Redis round trip. Search indexing of sent messages is skipped (it goes
+    to Celery in both versions).
+  - No sockets are opened: requests are ASGI calls, so the numbers show the
+    server side (database connections, waiting) rather than network I/O.
+  - Django's ASGI handler starts a short-lived thread per request in both modes
+    (for sync signal receivers), so thread counts are not compared; what differs
+    is whether that thread runs the view and opens its own connection.
+  - Benchmark users and their conversations are deleted at the end unless --keep is passed.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+import django  # noqa: E402
+
+django.setup()
+
+from channels.layers import InMemoryChannelLayer  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.core.asgi import get_asgi_application  # noqa: E402
+from django.db.backends.signals import connection_created  # noqa: E402
+from django.test import override_settings  # noqa: E402
+from django.urls import include, path  # noqa: E402
+from unittest.mock import patch  # noqa: E402
+from rest_framework import status  # noqa: E402
+from rest_framework.decorators import api_view, permission_classes  # noqa: E402
+from rest_framework.permissions import IsAuthenticated  # noqa: E402
+from rest_framework.response import Response  # noqa: E402
+from rest_framework_simplejwt.tokens import AccessToken  # noqa: E402
+from backend.operations import chat_events  # noqa: E402
+from backend.operations.inbox import inbox_for, rebuild_inbox, record_message  # noqa: E402
+from backend.operations.message_history import message_page, parse_limit, serialize_page  # noqa: E402
+from backend.operations.models import Conversation, Message  # noqa: E402
+from backend.operations.serializers import (  # noqa: E402
+    ConversationInboxSerializer, CreateMessageSerializer, MessageSerializer,
+)
+
+BENCH_DOMAIN = "bench-async-chat.example.com"
+RTT = 0.005
+
+
+class DelayedChannelLayer(InMemoryChannelLayer):
+    async def group_send(self, group, message):
+        await asyncio.sleep(RTT)
+        return await super().group_send(group, message)
+
+
+# Previous sync views, as they were before chat_views.py
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def legacy_get_conversations(request):
+    serializer = ConversationInboxSerializer(inbox_for(request.user), many=True, context={'request': request})
+    return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def legacy_get_messages(request, conversation_id):
+    conversation = Conversation.objects.filter(id=conversation_id, participants=request.user).first()
+    page = message_page(conversation, limit=parse_limit(request.query_params.get('limit')))
+    data = serialize_page(page)
+    conversation.mark_messages_as_read(request.user)
+    return Response(data, status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def legacy_send_message(request, conversation_id):
+    conversation = Conversation.objects.filter(id=conversation_id, participants=request.user).first()
+    serializer = CreateMessageSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    serializer.validated_data.pop('upload_id', None)
+    message = serializer.save(conversation=conversation, sender=request.user)
+    conversation.save()
+    participant_ids = list(conversation.participants.values_list('id', flat=True))
+    record_message(message, participant_ids)
+    seqs = message.create_notifications(participant_ids)
+    message_data = MessageSerializer(message).data
+    chat_events.publish_new_message(message, message_data, participant_ids, seqs)
+    return Response(message_data, status=status.HTTP_201_CREATED)
+
+
+urlpatterns = [
+    path('legacy/conversations/', legacy_get_conversations),
+    path('legacy/conversations/<int:conversation_id>/messages/', legacy_get_messages),
+    path('legacy/conversations/<int:conversation_id>/send/', legacy_send_message),
+    path('api/operations/', include('backend.operations.urls')),
+]
+
+ROUTES = {
+    "async": "/api/operations/messaging/conversations/",
+    "thread-bound": "/legacy/conversations/",
+}
+
+
+async def call(app, method, path, token, body=None):
+    """One HTTP request straight through the ASGI application; returns (status, seconds)."""
+    data = json.dumps(body).encode() if body is not None else b""
+    headers = [(b"host", b"testserver"), (b"authorization", f"Bearer {token}".encode())]
+    if body is not None:
+        headers += [(b"content-type", b"application/json"), (b"content-length", str(len(data)).encode())]
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method, "scheme": "http",
+        "path": path, "raw_path": path.encode(), "query_string": b"", "root_path": "", "headers": headers,
+        "server": ("testserver", 80), "client": ("127.0.0.1", 50000),
+    }
+    delivered = False
+
+    async def receive():
+        nonlocal delivered
+        if not delivered:
+            delivered = True
+            return {"type": "http.request", "body": data, "more_body": False}
+        await asyncio.Event().wait()
+
+    result = {}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+
+    started = time.perf_counter()
+    await app(scope, receive, send)
+    return result.get("status"), time.perf_counter() - started
+
+
+async def user_session(app, base, user_id, conversation_id, token, sends):
+    results = [await call(app, "GET", base, token)]
+    results.append(await call(app, "GET", f"{base}{conversation_id}/messages/", token))
+    if sends:
+        results.append(await call(app, "POST", f"{base}{conversation_id}/send/", token, {"content": f"hello from {user_id}"}))
+    return results
+
+
+async def run_mode(app, base, sessions, send_every):
+    opened = []
+
+    def count_connection(sender, connection, **kwargs):
+        opened.append(connection.alias)
+
+    connection_created.connect(count_connection)
+    started = time.perf_counter()
+    results = await asyncio.gather(*(
+        user_session(app, base, user_id, conversation_id, token, index % send_every == 0)
+        for index, (user_id, conversation_id, token) in enumerate(sessions)
+    ))
+    wall = time.perf_counter() - started
+    connection_created.disconnect(count_connection)
+    chat_events.wait_for_pending()
+    calls = [item for session in results for item in session]
+    return wall, [seconds for _, seconds in calls], len(opened), sum(1 for code, _ in calls if code not in (200, 201))
+
+
+def ensure_users(count):
+    User = get_user_model()
+    users = list(User.objects.filter(email__endswith=f"@{BENCH_DOMAIN}").order_by("id"))
+    if len(users) < count:
+        User.objects.bulk_create([
+            User(email=f"user{i}@{BENCH_DOMAIN}", full_name=f"Bench User {i}", role="nurse", password="!")
+            for i in range(len(users), count)
+        ])
+        users = list(User.objects.filter(email__endswith=f"@{BENCH_DOMAIN}").order_by("id"))
+    users = users[:count]
+    sessions = []
+    conversations = []
+    for first, second in zip(users[0::2], users[1::2]):
+        conversation = Conversation.objects.filter(participants=first).filter(participants=second).first()
+        if conversation is None:
+            conversation = Conversation.objects.create()
+            conversation.participants.add(first, second)
+            Message.objects.bulk_create([
+                Message(conversation=conversation, sender=(first, second)[i % 2], content=f"seed message {i}")
+                for i in range(20)
+            ])
+        conversations.append(conversation)
+        for user in (first, second):
+            sessions.append((user.id, conversation.id, str(AccessToken.for_user(user))))
+    rebuild_inbox(Conversation.objects.filter(id__in=[c.id for c in conversations]))
+    return sessions
+
+
+def report(label, wall, latencies, connections, failed):
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{label:<13} wall={wall:6.2f}s  median={statistics.median(latencies) * 1000:8.1f}ms  "
+        f"p95={p95 * 1000:8.1f}ms  db connections={connections:<5} failed={failed}/{len(latencies)}"
+    )
+
+
+def main():
+    global RTT
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--rtt-ms", type=float, default=5.0)
+    parser.add_argument("--send-every", type=int, default=5, help="Every Nth user also sends a message")
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic data for later runs")
+    args = parser.parse_args()
+    RTT = args.rtt_ms / 1000
+
+    sessions = ensure_users(args.users)
+    layers = {"default": {"BACKEND": f"{__name__}.DelayedChannelLayer"}}
+    app = get_asgi_application()
+    with override_settings(CHANNEL_LAYERS=layers, ALLOWED_HOSTS=["*"], ROOT_URLCONF=__name__), \
+            patch("backend.operations.message_search.schedule_indexing"):
+        for label, base in ROUTES.items():
+            report(label, *asyncio.run(run_mode(app, base, sessions, args.send_every)))
+    print(f"{len(sessions)} concurrent users, {args.rtt_ms}ms per channel-layer send")
+
+    if not args.keep:
+        User = get_user_model()
+        Conversation.objects.filter(participants__email__endswith=f"@{BENCH_DOMAIN}").delete()
+        User.objects.filter(email__endswith=f"@{BENCH_DOMAIN}").delete()
+
+
+if __name__ == "__main__":
+    main()
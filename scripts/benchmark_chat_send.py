@@ -0,0 +1,123 @@
+"""
+Per-message latency benchmark for the send_message endpoint.
+
+Usage:
+  python scripts/benchmark_chat_send.py [--messages 200] [--participants 5] [--rtt-ms 1.0] [--keep]
+
+What it does:
+  - Creates one conversation with --participants users.
+  - Posts --messages messages through the send_message view (APIClient) twice:
+      1. previous behaviour: the message is serialized again for the event and sent
+         with one async_to_sync(group_send) per recipient on the request thread
+      2. chat_events: the response payload is encoded once and published to all
+         recipients after commit from the publisher thread pool
+  - Prints mean / p95 request latency for each.
+
+Notes:
+  - Uses an in-memory channel layer whose group_send sleeps --rtt-ms to stand in
+    for a Redis round trip, so the numbers do not depend on a running Redis.
+  - Benchmark users and their conversation are deleted at the end unless --keep is passed.
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+import django  # noqa: E402
+
+django.setup()
+
+from asgiref.sync import async_to_sync  # noqa: E402
+from channels.layers import InMemoryChannelLayer, get_channel_layer  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.test import override_settings  # noqa: E402
+from unittest.mock import patch  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+from backend.operations import chat_events  # noqa: E402
+from backend.operations.models import Conversation  # noqa: E402
+from backend.operations.serializers import MessageSerializer  # noqa: E402
+
+BENCH_DOMAIN = "bench-chat.example.com"
+RTT = 0.001
+
+
+class DelayedChannelLayer(InMemoryChannelLayer):
+    async def group_send(self, group, message):
+        await asyncio.sleep(RTT)
+        return await super().group_send(group, message)
+
+
+def previous_publish(message, message_data, participant_ids):
+    channel_layer = get_channel_layer()
+    message_data = MessageSerializer(message).data
+    for participant in message.conversation.participants.exclude(id=message.sender.id):
+        async_to_sync(channel_layer.group_send)(
+            f"messaging_{participant.id}",
+            {"type": "new_message", "message": message_data},
+        )
+
+
+def ensure_conversation(participants):
+    User = get_user_model()
+    users = []
+    for i in range(participants):
+        user, _ = User.objects.get_or_create(
+            email=f"user{i}@{BENCH_DOMAIN}", defaults={"full_name": f"Bench User {i}", "role": "nurse", "password": "!"}
+        )
+        users.append(user)
+    conversation = Conversation.objects.create()
+    conversation.participants.add(*users)
+    return conversation, users[0]
+
+
+def run(client, conversation, count):
+    url = f"/api/operations/messaging/conversations/{conversation.id}/send/"
+    client.post(url, {"content": "warm-up"}, format="json")
+    latencies = []
+    for i in range(count):
+        started = time.perf_counter()
+        response = client.post(url, {"content": f"benchmark message {i}"}, format="json")
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 201, response.content
+    chat_events.wait_for_pending()
+    return latencies
+
+
+def report(label, latencies):
+    p95 = sorted(latencies)[int(len(latencies) * 0.95) - 1]
+    print(f"{label:<28} mean={statistics.mean(latencies) * 1000:7.2f}ms p95={p95 * 1000:7.2f}ms")
+    return statistics.mean(latencies)
+
+
+def main():
+    global RTT
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--participants", type=int, default=5)
+    parser.add_argument("--rtt-ms", type=float, default=1.0)
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic data for later runs")
+    args = parser.parse_args()
+    RTT = args.rtt_ms / 1000
+
+    layers = {"default": {"BACKEND": f"{__name__}.DelayedChannelLayer"}}
+    with override_settings(CHANNEL_LAYERS=layers, ALLOWED_HOSTS=["*"]):
+        conversation, sender = ensure_conversation(args.participants)
+        client = APIClient()
+        client.force_authenticate(sender)
+        with patch("backend.operations.chat_events.publish_new_message", previous_publish):
+            before = report("per-recipient group_send", run(client, conversation, args.messages))
+        after = report("chat_events", run(client, conversation, args.messages))
+    print(f"speedup: {before / after:.1f}x ({args.participants - 1} recipients, {args.rtt_ms}ms per group_send)")
+
+    if not args.keep:
+        conversation.delete()
+        get_user_model().objects.filter(email__endswith=f"@{BENCH_DOMAIN}").delete()
+
+
+if __name__ == "__main__":
+    main()
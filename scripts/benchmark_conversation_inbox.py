@@ -0,0 +1,108 @@
+"""
+Inbox benchmark for a user with many conversations.
+
+Usage:
+  python scripts/benchmark_conversation_inbox.py [--conversations 500] [--messages 20] [--keep]
+
+What it does:
+  - Creates one benchmark doctor with --conversations one-to-one conversations,
+    each holding --messages messages (bulk inserts) and the matching inbox rows.
+  - Renders the conversation list twice and reports wall time and query count:
+      1. ConversationSerializer over conversations prefetched with all messages
+         (the previous get_conversations)
+      2. ConversationInboxSerializer over inbox_for(user) (the current endpoint)
+
+Notes:
+  - Benchmark users cascade-delete their conversations at the end unless --keep is passed.
+"""
+
+import argparse
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from backend.operations.inbox import inbox_for, rebuild_inbox  # noqa: E402
+from backend.operations.models import Conversation, Message  # noqa: E402
+from backend.operations.serializers import ConversationInboxSerializer, ConversationSerializer  # noqa: E402
+
+BENCH_DOMAIN = "bench-inbox.example.com"
+
+
+def ensure_conversations(count, messages):
+    User = get_user_model()
+    owner, created = User.objects.get_or_create(
+        email=f"owner@{BENCH_DOMAIN}", defaults={"full_name": "Bench Owner", "role": "doctor"}
+    )
+    if not created and Conversation.objects.filter(participants=owner).count() >= count:
+        return owner
+    peers = User.objects.bulk_create([
+        User(email=f"peer{i}@{BENCH_DOMAIN}", full_name=f"Bench Peer {i}", role="nurse", password="!")
+        for i in range(count)
+    ])
+    conversations = Conversation.objects.bulk_create([Conversation() for _ in peers])
+    Through = Conversation.participants.through
+    Through.objects.bulk_create(
+        [Through(conversation_id=c.id, user_id=owner.id) for c in conversations]
+        + [Through(conversation_id=c.id, user_id=p.id) for c, p in zip(conversations, peers)]
+    )
+    Message.objects.bulk_create(
+        [
+            Message(conversation=c, sender=p if i % 2 else owner, content=f"message {i} " + "x" * 80)
+            for c, p in zip(conversations, peers)
+            for i in range(messages)
+        ],
+        batch_size=5000,
+    )
+    rebuild_inbox(Conversation.objects.filter(id__in=[c.id for c in conversations]))
+    return owner
+
+
+def timed(label, render):
+    with CaptureQueriesContext(connection) as ctx:
+        started = time.perf_counter()
+        rows = render()
+        elapsed = time.perf_counter() - started
+    print(f"{label:<28} conversations={len(rows):>5} time={elapsed:7.3f}s queries={len(ctx.captured_queries):>6}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=500)
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic data for later runs")
+    args = parser.parse_args()
+
+    owner = ensure_conversations(args.conversations, args.messages)
+    context = {"request": SimpleNamespace(user=owner)}
+
+    def previous():
+        conversations = Conversation.objects.filter(participants=owner, is_active=True).prefetch_related(
+            "participants", "messages__sender", "messages__reactions__user"
+        )
+        return ConversationSerializer(conversations, many=True, context=context).data
+
+    def current():
+        return ConversationInboxSerializer(inbox_for(owner), many=True, context=context).data
+
+    before = timed("prefetch + per-row queries", previous)
+    after = timed("denormalized inbox", current)
+    print(f"speedup: {before / after:.1f}x")
+
+    if not args.keep:
+        Conversation.objects.filter(participants=owner).delete()
+        get_user_model().objects.filter(email__endswith=f"@{BENCH_DOMAIN}").delete()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Decryption and storage benchmark for encrypted message content.
+
+Usage:
+  python scripts/benchmark_message_crypto.py [--messages 1000] [--length 280] [--repeat 5]
+
+What it does:
+  - Builds --messages in-memory Message rows encrypted under a generated key,
+    once in the previous double-base64 format and once as plain Fernet tokens.
+  - Times decrypting the page three ways (best of --repeat):
+      1. previous decrypt_content: new Fernet + settings read + base64 unwrap per message
+      2. current decrypt_content per message (cached MultiFernet)
+      3. Message.decrypt_batch, as MessageListSerializer calls it once per page
+  - Prints the average stored size per row for messages and archived assessments
+    in both formats.
+
+Notes:
+  - No database access; the key is applied with override_settings.
+"""
+
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+import django  # noqa: E402
+
+django.setup()
+
+from cryptography.fernet import Fernet  # noqa: E402
+from django.conf import settings  # noqa: E402
+from django.test import override_settings  # noqa: E402
+from backend.operations import crypto  # noqa: E402
+from backend.operations.models import Message  # noqa: E402
+
+
+def legacy_decrypt(message):
+    key = getattr(settings, "MESSAGE_ENCRYPTION_KEY", None)
+    if isinstance(key, str):
+        key = key.encode()
+    f = Fernet(key)
+    return f.decrypt(base64.b64decode(message.encrypted_content.encode())).decode()
+
+
+def best_of(repeat, run):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def average_size(values):
+    return sum(len(value) for value in values) / len(values)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--length", type=int, default=280, help="Characters per message")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    key = Fernet.generate_key().decode()
+    with override_settings(MESSAGE_ENCRYPTION_KEY=key, MESSAGE_ENCRYPTION_KEYS=[]):
+        texts = [f"message {i} " + "x" * max(0, args.length - 12) for i in range(args.messages)]
+        tokens = [crypto.encrypt(text) for text in texts]
+        legacy = [base64.b64encode(token.encode()).decode() for token in tokens]
+
+        legacy_messages = [Message(id=i, content=t, encrypted_content=v) for i, (t, v) in enumerate(zip(texts, legacy))]
+        messages = [Message(id=i, content=t, encrypted_content=v) for i, (t, v) in enumerate(zip(texts, tokens))]
+
+        def per_message():
+            for message in messages:
+                message.__dict__.pop("_decrypted_content", None)
+                message.decrypt_content()
+
+        def batch():
+            for message in messages:
+                message.__dict__.pop("_decrypted_content", None)
+            Message.decrypt_batch(messages)
+
+        previous = best_of(args.repeat, lambda: [legacy_decrypt(m) for m in legacy_messages])
+        cached = best_of(args.repeat, per_message)
+        batched = best_of(args.repeat, batch)
+        assert [m.decrypt_content() for m in messages] == texts
+
+        payload = json.dumps({"vitals": {"bp": "120/80", "hr": 72}, "notes": "y" * 600})
+        archive_token = crypto.encrypt(payload, crypto.ARCHIVES)
+
+    print(f"{'previous per-message':<24} {args.messages} messages {previous * 1000:8.1f} ms")
+    print(f"{'cached per-message':<24} {args.messages} messages {cached * 1000:8.1f} ms")
+    print(f"{'decrypt_batch':<24} {args.messages} messages {batched * 1000:8.1f} ms  speedup {previous / batched:.1f}x")
+    print(f"messages.encrypted_content: {average_size(legacy):.0f} -> {average_size(tokens):.0f} bytes/row")
+    legacy_archive = base64.b64encode(archive_token.encode()).decode()
+    print(f"patient_assessment_archives.encrypted_assessment_data: {len(legacy_archive)} -> {len(archive_token)} bytes/row")
+
+
+if __name__ == "__main__":
+    main()
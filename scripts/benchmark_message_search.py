@@ -0,0 +1,150 @@
+"""
+Query latency benchmark for message search.
+
+Usage:
+  python scripts/benchmark_message_search.py [--messages 1000000] [--conversations 2000]
+      [--user-conversations 50] [--runs 50] [--keep]
+
+What it does:
+  - Creates --conversations conversations and --messages messages of 6-14 words
+    drawn from a Zipf-distributed vocabulary (a few very common words, a long tail
+    of rare ones), then builds the blind index with index_backlog().
+  - Adds the searching user to --user-conversations of the conversations.
+  - Times message_search.search() (index query, decrypting the page, snippets) for
+    a rare word, a common word and multi-word queries; prints median / p95.
+  - For comparison, times one "scan everything" search: decrypting and matching
+    every message of the user's conversations, which is what finding a message
+    through get_messages amounts to.
+
+Notes:
+  - Messages are bulk-inserted (encrypted with the configured key, if any);
+    building the index is reported separately from query time.
+  - Benchmark users and their conversations are deleted at the end unless --keep
+    is passed; a kept dataset is reused by the next run.
+"""
+
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import transaction  # noqa: E402
+from django.test import override_settings  # noqa: E402
+from backend.operations import crypto, message_search  # noqa: E402
+from backend.operations.models import Conversation, Message  # noqa: E402
+
+BENCH_DOMAIN = "bench-search.example.com"
+VOCABULARY_SIZE = 20000
+QUERIES = {
+    "rare word": "term5000",
+    "common word": "term3",
+    "common + mid": "term3 term100",
+    "three words": "term2 term10 term50",
+}
+
+
+def vocabulary():
+    words = [f"term{rank}" for rank in range(VOCABULARY_SIZE)]
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(VOCABULARY_SIZE)))
+    return words, cum_weights
+
+
+def build_dataset(args):
+    User = get_user_model()
+    sender, _ = User.objects.get_or_create(
+        email=f"sender@{BENCH_DOMAIN}", defaults={"full_name": "Bench Sender", "role": "doctor", "password": "!"}
+    )
+    reader, _ = User.objects.get_or_create(
+        email=f"reader@{BENCH_DOMAIN}", defaults={"full_name": "Bench Reader", "role": "nurse", "password": "!"}
+    )
+    existing = Message.objects.filter(sender=sender).count()
+    if existing >= args.messages:
+        print(f"reusing {existing} messages")
+        return reader
+
+    conversations = Conversation.objects.bulk_create([Conversation() for _ in range(args.conversations)])
+    through = Conversation.participants.through
+    through.objects.bulk_create(
+        [through(conversation_id=c.id, user_id=sender.id) for c in conversations]
+        + [through(conversation_id=c.id, user_id=reader.id) for c in conversations[:args.user_conversations]]
+    )
+    words, cum_weights = vocabulary()
+    rng = random.Random(7)
+    started = time.perf_counter()
+    batch = 10000
+    for offset in range(0, args.messages, batch):
+        rows = []
+        for i in range(offset, min(offset + batch, args.messages)):
+            content = " ".join(rng.choices(words, cum_weights=cum_weights, k=rng.randint(6, 14)))
+            rows.append(Message(
+                conversation=conversations[i % len(conversations)], sender=sender, content=content,
+                encrypted_content=crypto.encrypt(content, crypto.MESSAGES),
+            ))
+        with transaction.atomic():
+            Message.objects.bulk_create(rows)
+    print(f"inserted {args.messages} messages in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    with override_settings(MESSAGE_SEARCH_SETTLE_SECONDS=-60):
+        indexed = 1
+        while indexed:
+            indexed = message_search.index_backlog(batch_size=5000)
+    print(f"built the index in {time.perf_counter() - started:.1f}s")
+    return reader
+
+
+def time_search(user_id, query, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = message_search.search(user_id, query)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return statistics.median(timings), timings[max(0, int(len(timings) * 0.95) - 1)], len(result["results"])
+
+
+def scan_everything(user_id, query):
+    terms = message_search.tokenize(query)
+    started = time.perf_counter()
+    messages = Message.decrypt_batch(list(
+        Message.objects.filter(conversation__participants__id=user_id)
+        .only("id", "content", "encrypted_content").order_by("-id")
+    ))
+    hits = [m.id for m in messages if set(terms) <= set(message_search.tokenize(m.decrypt_content()))]
+    return time.perf_counter() - started, len(messages), len(hits)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--conversations", type=int, default=2000)
+    parser.add_argument("--user-conversations", type=int, default=50)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic data for later runs")
+    args = parser.parse_args()
+
+    reader = build_dataset(args)
+    for label, query in QUERIES.items():
+        median, p95, hits = time_search(reader.id, query, args.runs)
+        print(f"{label:<14} {query!r:<28} median={median * 1000:7.2f}ms p95={p95 * 1000:7.2f}ms hits/page={hits}")
+    elapsed, scanned, hits = scan_everything(reader.id, QUERIES["rare word"])
+    print(f"scan everything: {elapsed * 1000:.0f}ms to decrypt and match {scanned} messages ({hits} hits)")
+
+    if not args.keep:
+        sender = get_user_model().objects.get(email=f"sender@{BENCH_DOMAIN}")
+        Conversation.objects.filter(participants=sender).delete()
+        get_user_model().objects.filter(email__endswith=f"@{BENCH_DOMAIN}").delete()
+
+
+if __name__ == "__main__":
+    main()
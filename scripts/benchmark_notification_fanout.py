@@ -0,0 +1,107 @@
+"""
+Fan-out benchmark for audience-wide notifications.
+
+Usage:
+  python scripts/benchmark_notification_fanout.py [--recipients 10000] [--batch-size 2000] [--keep]
+
+What it does:
+  - Creates --recipients synthetic active doctor accounts (bulk_create, unusable passwords).
+  - Times two ways of notifying every active doctor:
+      1. per-user loop: Notification.objects.create for each doctor (the previous
+         analytics_result_completed behaviour), run with the counter signal disconnected
+      2. notification_fanout.fan_out: batched bulk_create plus one counter UPDATE per batch
+  - Prints inserted rows, wall time and INSERT statements issued for each.
+
+Notes:
+  - Run against the configured database (PostgreSQL by default); timings on SQLite differ.
+  - The channel-layer broadcast is skipped so the numbers only cover the database work.
+  - Benchmark users and their notifications are deleted at the end unless --keep is passed.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.db.models.signals import post_save  # noqa: E402
+from backend.operations.models import Notification  # noqa: E402
+from backend.operations.notification_fanout import audience_recipients, fan_out  # noqa: E402
+from backend.operations.signals import notification_saved  # noqa: E402
+
+BENCH_DOMAIN = "bench-fanout.example.com"
+
+
+def ensure_recipients(count):
+    User = get_user_model()
+    existing = User.objects.filter(email__endswith=f"@{BENCH_DOMAIN}").count()
+    users = []
+    for i in range(existing, count):
+        user = User(email=f"doctor{i}@{BENCH_DOMAIN}", full_name=f"Bench Doctor {i}", role="doctor", is_active=True)
+        user.set_unusable_password()
+        users.append(user)
+    User.objects.bulk_create(users, batch_size=2000)
+
+
+def per_user_loop(message):
+    post_save.disconnect(notification_saved, sender=Notification)
+    try:
+        User = get_user_model()
+        for doctor in User.objects.filter(role="doctor", is_active=True):
+            Notification.objects.create(user=doctor, message=message)
+    finally:
+        post_save.connect(notification_saved, sender=Notification)
+
+
+def timed(label, run, message):
+    inserts = 0
+
+    def count_inserts(execute, sql, params, many, context):
+        nonlocal inserts
+        if sql.lstrip().upper().startswith('INSERT INTO "NOTIFICATIONS"'):
+            inserts += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count_inserts):
+        started = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - started
+    rows = Notification.objects.filter(message=message).count()
+    print(f"{label:<20} rows={rows:>7} time={elapsed:8.2f}s inserts={inserts:>6}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipients", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic users for later runs")
+    args = parser.parse_args()
+
+    ensure_recipients(args.recipients)
+    print(f"active doctors: {audience_recipients('doctors').count()}")
+
+    loop_message = "benchmark: per-user loop"
+    bulk_message = "benchmark: bulk fan-out"
+    loop = timed("per-user loop", lambda: per_user_loop(loop_message), loop_message)
+    bulk = timed(
+        "bulk fan-out",
+        lambda: fan_out(bulk_message, "doctors", batch_size=args.batch_size, broadcast=False),
+        bulk_message,
+    )
+    print(f"speedup: {loop / bulk:.1f}x")
+
+    Notification.objects.filter(message__in=[loop_message, bulk_message]).delete()
+    if not args.keep:
+        get_user_model().objects.filter(email__endswith=f"@{BENCH_DOMAIN}").delete()
+
+
+if __name__ == "__main__":
+    main()
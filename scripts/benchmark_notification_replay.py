@@ -0,0 +1,102 @@
+"""
+Reconnect benchmark for MessageConsumer notification delivery.
+
+Usage:
+  python scripts/benchmark_notification_replay.py [--pending 200] [--runs 20] [--keep]
+
+What it does:
+  - Creates a doctor and a nurse sharing one conversation and appends --pending
+    new_message notifications to the nurse's log.
+  - Measures what a reconnecting client gets, averaged over --runs:
+      1. previous behaviour: the latest 20 unsent rows serialized with the nested
+         MessageNotificationSerializer, one WebSocket frame each
+      2. notification_log.replay: every notification after the client's last_seq
+         in one frame of lightweight entries
+  - Prints time, queries, frames, bytes and notifications delivered for each.
+
+Notes:
+  - Frames are encoded but not sent; the numbers cover the database and encoding work.
+  - Benchmark users and their conversation are deleted at the end unless --keep is passed.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from backend.operations import notification_log  # noqa: E402
+from backend.operations.chat_events import encode  # noqa: E402
+from backend.operations.models import Conversation, Message, MessageNotification  # noqa: E402
+from backend.operations.serializers import MessageNotificationSerializer  # noqa: E402
+
+BENCH_DOMAIN = "bench-replay.example.com"
+
+
+def previous_frames(user_id):
+    notifications = MessageNotification.objects.filter(recipient_id=user_id, is_sent=False).order_by("-created_at")[:20]
+    return [
+        json.dumps({"type": "notification", "notification": notification})
+        for notification in MessageNotificationSerializer(notifications, many=True).data
+    ], 20
+
+
+def replay_frames(user_id):
+    replay = notification_log.replay(user_id, 0)
+    return [encode("notification_replay", **replay)], len(replay["notifications"])
+
+
+def measure(label, build, user_id, runs):
+    elapsed = 0.0
+    for _ in range(runs):
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            frames, delivered = build(user_id)
+            elapsed += time.perf_counter() - started
+    size = sum(len(frame) for frame in frames)
+    print(
+        f"{label:<22} {elapsed / runs * 1000:8.2f}ms  queries={len(ctx.captured_queries):<3} "
+        f"frames={len(frames):<3} bytes={size:<8} delivered={delivered}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pending", type=int, default=200)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic data for later runs")
+    args = parser.parse_args()
+
+    User = get_user_model()
+    doctor, _ = User.objects.get_or_create(
+        email=f"doctor@{BENCH_DOMAIN}", defaults={"full_name": "Bench Doctor", "role": "doctor", "password": "!"}
+    )
+    nurse, _ = User.objects.get_or_create(
+        email=f"nurse@{BENCH_DOMAIN}", defaults={"full_name": "Bench Nurse", "role": "nurse", "password": "!"}
+    )
+    conversation = Conversation.objects.create()
+    conversation.participants.add(doctor, nurse)
+    for i in range(args.pending):
+        message = Message.objects.create(conversation=conversation, sender=doctor, content=f"benchmark message {i}")
+        message.create_notifications([doctor.id, nurse.id])
+
+    print(f"{args.pending} pending notifications")
+    measure("latest 20, per row", previous_frames, nurse.id, args.runs)
+    measure("notification_replay", replay_frames, nurse.id, args.runs)
+
+    if not args.keep:
+        conversation.delete()
+        User.objects.filter(email__endswith=f"@{BENCH_DOMAIN}").delete()
+
+
+if __name__ == "__main__":
+    main()
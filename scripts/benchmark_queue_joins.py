@@ -0,0 +1,131 @@
+"""
+Concurrency benchmark for queue number and position allocation.
+
+Usage:
+  python scripts/benchmark_queue_joins.py [--joins 300] [--workers 64] [--department OPD]
+
+What it does:
+  - Creates one patient per join and releases all joins at once through a start gate
+    once every join is submitted, each worker thread on its own database connection
+    (the DB path of join_queue).
+  - Every third join goes to the priority queue, the rest to the normal queue.
+  - Afterwards it checks that queue numbers are unique per table and that the waiting
+    positions of the department are exactly 1..N for both queues.
+
+Notes:
+  - Run against PostgreSQL (the default settings) for meaningful contention; SQLite
+    serializes writers and will mostly measure lock waits.
+  - Rows created by the run are removed at the end unless --keep is passed.
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from backend.users.models import PatientProfile  # noqa: E402
+from backend.operations.models import PriorityQueue, QueueManagement  # noqa: E402
+
+
+def setup_patients(count, run_id):
+    User = get_user_model()
+    users = User.objects.bulk_create([
+        User(email=f"bench.{run_id}.{i}@example.com", full_name=f"Bench Patient {i}", role="patient")
+        for i in range(count)
+    ])
+    if not all(u.pk for u in users):
+        users = list(User.objects.filter(email__startswith=f"bench.{run_id}.").order_by("id"))
+    return PatientProfile.objects.bulk_create([PatientProfile(user=u) for u in users])
+
+
+def join(start_gate, profile, department, priority):
+    try:
+        start_gate.wait()
+        start = time.perf_counter()
+        if priority:
+            entry = PriorityQueue.objects.create(patient=profile, department=department, priority_level="senior")
+        else:
+            entry = QueueManagement.objects.create(patient=profile, department=department)
+        return entry.pk, time.perf_counter() - start, None
+    except Exception as e:  # collisions surface here as IntegrityError
+        return None, 0.0, e
+    finally:
+        connection.close()
+
+
+def check(model, position_field, department, ids):
+    rows = list(model.objects.filter(pk__in=ids).values_list("queue_number", position_field))
+    numbers = [n for n, _ in rows]
+    duplicates = len(numbers) - len(set(numbers))
+    waiting = list(
+        model.objects.filter(department=department, status="waiting")
+        .order_by(position_field).values_list(position_field, flat=True)
+    )
+    contiguous = waiting == list(range(1, len(waiting) + 1))
+    return len(rows), duplicates, contiguous
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--joins", type=int, default=300)
+    parser.add_argument("--workers", type=int, default=64)
+    parser.add_argument("--department", default="OPD")
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark rows")
+    args = parser.parse_args()
+
+    run_id = uuid.uuid4().hex[:8]
+    profiles = setup_patients(args.joins, run_id)
+    # An Event rather than a Barrier: joins beyond --workers wait in the pool's queue,
+    # so a barrier sized to the pool would leave the last partial group blocked forever
+    start_gate = threading.Event()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = [
+            pool.submit(join, start_gate, p, args.department, i % 3 == 0)
+            for i, p in enumerate(profiles)
+        ]
+        start_gate.set()
+        results = [f.result() for f in futures]
+    wall = time.perf_counter() - started
+
+    errors = [e for _, _, e in results if e is not None]
+    latencies = sorted(t for pk, t, _ in results if pk is not None)
+    normal_ids = [pk for (pk, _, _), i in zip(results, range(len(results))) if pk and i % 3 != 0]
+    priority_ids = [pk for (pk, _, _), i in zip(results, range(len(results))) if pk and i % 3 == 0]
+
+    n_rows, n_dup, n_ok = check(QueueManagement, "position_in_queue", args.department, normal_ids)
+    p_rows, p_dup, p_ok = check(PriorityQueue, "priority_position", args.department, priority_ids)
+
+    print(f"database: {connection.vendor}, joins: {args.joins}, workers: {args.workers}")
+    print(f"wall time: {wall:.2f}s ({args.joins / wall:.0f} joins/s)")
+    if latencies:
+        p50 = latencies[len(latencies) // 2]
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"per-join latency: p50={p50 * 1000:.1f}ms p99={p99 * 1000:.1f}ms")
+    print(f"errors: {len(errors)}" + (f" (first: {errors[0]!r})" if errors else ""))
+    print(f"normal queue:   rows={n_rows} duplicate_numbers={n_dup} contiguous_positions={n_ok}")
+    print(f"priority queue: rows={p_rows} duplicate_numbers={p_dup} contiguous_positions={p_ok}")
+
+    if not args.keep:
+        QueueManagement.objects.filter(pk__in=normal_ids).delete()
+        PriorityQueue.objects.filter(pk__in=priority_ids).delete()
+        get_user_model().objects.filter(email__startswith=f"bench.{run_id}.").delete()
+
+    if errors or n_dup or p_dup or not (n_ok and p_ok):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
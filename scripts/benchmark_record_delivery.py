@@ -0,0 +1,117 @@
+"""
+How long a doctor waits on "deliver" when the mail server is slow.
+
+Usage:
+  python scripts/benchmark_record_delivery.py [--smtp-delay 3] [--deliveries 5] [--keep]
+
+What it does:
+  - Starts the local SMTP stand-in of the test suite (backend/operations/tests/
+    smtp_sink.py), answering every message --smtp-delay seconds late.
+  - Creates approved medical record requests and posts
+    /api/operations/medical-requests/<id>/deliver/ for each:
+      1. worker: the Celery dispatch is recorded and the delivery run afterwards,
+         as a worker would; prints the response time and the stage timings
+      2. no worker: Celery is unavailable, so the delivery runs inline after the
+         view's transaction, on the request thread (the old behaviour)
+  - Checks that every email arrived with an AES-256 encrypted PDF attached.
+
+Notes:
+  - The stage timings are those recorded on MedicalRecordDelivery.stage_timings.
+  - Benchmark users are deleted at the end unless --keep is passed.
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.test import override_settings  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+from backend.operations.models import MedicalRecordDelivery, MedicalRecordRequest  # noqa: E402
+from backend.operations.record_delivery import run_delivery  # noqa: E402
+from backend.operations.tests.smtp_sink import SMTPSink  # noqa: E402
+from backend.users.models import PatientProfile  # noqa: E402
+
+BENCH_DOMAIN = "bench-delivery.example.com"
+
+
+def build_requests(count):
+    User = get_user_model()
+    User.objects.filter(email__endswith=f"@{BENCH_DOMAIN}").delete()
+    doctor = User.objects.create(email=f"doctor@{BENCH_DOMAIN}", full_name="Bench Doctor", role="doctor", password="!")
+    patient = User.objects.create(email=f"patient@{BENCH_DOMAIN}", full_name="Bench Patient", role="patient",
+                                  password="!", date_of_birth=date(1980, 1, 1))
+    profile, _ = PatientProfile.objects.get_or_create(user=patient)
+    profile.progress_notes = [{"note": f"Progress note {i}"} for i in range(200)]
+    profile.save()
+    requests = [
+        MedicalRecordRequest.objects.create(
+            patient=patient, requested_by=patient, request_type="full_records", requested_records={},
+            reason="Benchmark", status="approved", approved_by=doctor, approved_at=timezone.now(),
+        )
+        for _ in range(count)
+    ]
+    return doctor, requests
+
+
+def post(client, mreq):
+    started = time.perf_counter()
+    response = client.post(f"/api/operations/medical-requests/{mreq.id}/deliver/")
+    return response, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--smtp-delay", type=float, default=3.0)
+    parser.add_argument("--deliveries", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic data")
+    args = parser.parse_args()
+
+    doctor, requests = build_requests(args.deliveries * 2)
+    client = APIClient()
+    client.force_authenticate(doctor)
+    root = tempfile.mkdtemp()
+    try:
+        with SMTPSink(reply_delay=args.smtp_delay) as sink, \
+                override_settings(ATTACHMENT_STORAGE_ROOT=os.path.join(root, "store"), ALLOWED_HOSTS=["*"],
+                                  CHAT_EVENTS_PUBLISHER_THREADS=0, **sink.email_settings()), \
+                patch("backend.operations.chat_events.publish_now"):
+            with patch("backend.operations.tasks.deliver_medical_records.delay") as delay:
+                waits = [post(client, mreq)[1] for mreq in requests[:args.deliveries]]
+            for call in delay.call_args_list:
+                run_delivery(call.args[0])
+            timings = [d.stage_timings for d in MedicalRecordDelivery.objects.filter(request__in=requests[:args.deliveries])]
+            print(f"worker:    response {statistics.mean(waits) * 1000:8.1f}ms mean  "
+                  + "  ".join(f"{stage} {statistics.mean(t[stage] for t in timings):7.1f}ms"
+                              for stage in ("collect", "render", "send")))
+
+            with patch("backend.operations.tasks.deliver_medical_records.delay", side_effect=ConnectionError("no broker")):
+                waits = [post(client, mreq)[1] for mreq in requests[args.deliveries:]]
+            print(f"no worker: response {statistics.mean(waits) * 1000:8.1f}ms mean")
+
+            encrypted = sum(
+                1 for message in sink.messages
+                if b"/CFM /AESV3" in next(message.iter_attachments()).get_content()
+            )
+            print(f"{len(sink.messages)} emails received, {encrypted} with an AES-256 encrypted PDF")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+        if not args.keep:
+            get_user_model().objects.filter(email__endswith=f"@{BENCH_DOMAIN}").delete()
+
+
+if __name__ == "__main__":
+    main()
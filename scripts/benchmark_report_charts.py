@@ -0,0 +1,110 @@
+"""
+CPU time and size of analytics PDF reports with their six charts.
+
+Usage:
+  python scripts/benchmark_report_charts.py [--reports 20] [--threads 8]
+
+What it does:
+  - Renders the analytics report (render_analytics_report, as a report worker
+    does) for synthetic analytics data with all six charts filled in.
+  - Measures, single threaded:
+      1. cold: the chart cache is cleared before every report, so every chart is
+         laid out again
+      2. memoized: the same data again, charts come from the chart cache
+    and prints CPU time per report and the PDF size.
+  - Renders --reports reports with different data on --threads threads at once
+    and checks that each one is the same size as that report rendered alone.
+
+Notes:
+  - CPU time is process time (time.process_time) over the whole run divided by
+    the number of reports.
+  - No database access is needed; the report data is passed in directly.
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
+import django  # noqa: E402
+
+django.setup()
+
+from backend.analytics import charts  # noqa: E402
+from backend.analytics.views import render_analytics_report  # noqa: E402
+
+
+def report_params(seed=0):
+    data = {
+        "patient_demographics": {
+            "age_distribution": {"0-18": 12 + seed, "19-35": 40, "36-50": 33, "51-65": 20, "65+": 9},
+            "gender_proportions": {"Male": 48.0, "Female": 50.0, "Other": 2.0},
+        },
+        "health_trends": {"top_illnesses_by_week": [
+            {"medical_condition": f"Condition {i}", "count": 50 - i * 4 + seed} for i in range(10)
+        ]},
+        "medication_analysis": {"medication_pareto_data": [
+            {"medication": f"Medication {i}", "frequency": 30 - i * 3 + seed} for i in range(10)
+        ]},
+        "volume_prediction": {"evaluation_metrics": {"mae": 3.21 + seed, "rmse": 4.56 + seed}},
+        "surge_prediction": {"forecasted_monthly_cases": [
+            {"date": f"2026-{m:02d}", "total_cases": 100 + m * 7 + seed} for m in range(1, 7)
+        ]},
+    }
+    return {
+        "hospital_info": {"name": "Bench Hospital", "address": "1 Bench Street", "phone": "555-0100", "email": "h@example.com"},
+        "user_info": {"name": "Bench Doctor", "role": "Doctor", "department": "General", "specialization": "General"},
+        "analytics_data": data,
+        "title": "Patient Findings Generated Report",
+    }
+
+
+def cpu_per_report(count, params, clear):
+    started = time.process_time()
+    size = 0
+    for _ in range(count):
+        if clear:
+            charts.clear_cache()
+        size = len(render_analytics_report(params))
+    return (time.process_time() - started) / count, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reports", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    params = report_params()
+    render_analytics_report(params)  # imports and font setup
+
+    cpu, size = cpu_per_report(args.reports, params, clear=True)
+    print(f"cold charts:     {cpu * 1000:7.1f}ms CPU per report  {size} bytes")
+    charts.clear_cache()
+    cpu, size = cpu_per_report(args.reports, params, clear=False)
+    print(f"memoized charts: {cpu * 1000:7.1f}ms CPU per report  {size} bytes")
+
+    # A report drawn while other threads draw theirs must come out as it does alone
+    expected = {seed: len(render_analytics_report(report_params(seed))) for seed in range(4)}
+    charts.clear_cache()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        results = list(pool.map(lambda n: _try_render(report_params(n % 4)), range(args.reports)))
+    failed = sum(1 for n, pdf in enumerate(results) if pdf is None or len(pdf) != expected[n % 4])
+    print(f"{args.reports} reports on {args.threads} threads: {time.perf_counter() - started:6.2f}s wall, "
+          f"{failed} failed or incomplete")
+
+
+def _try_render(params):
+    try:
+        return render_analytics_report(params)
+    except Exception as exc:
+        print(f"  render failed: {exc!r}")
+        return None
+
+
+if __name__ == "__main__":
+    main()